@@ -0,0 +1,49 @@
+# src/benchmarks/_bootstrap.py
+
+import gc
+import importlib.util
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+# اسکریپت‌ها مستقیم اجرا می‌شوند (python benchmarks/bench_xxx.py)؛ ریشه مخزن با نام src ثبت می‌شود،
+# همان کاری که tests/conftest.py می‌کند.
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if "src" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        "src", REPO_ROOT / "__init__.py", submodule_search_locations=[str(REPO_ROOT)])
+    _src = importlib.util.module_from_spec(_spec)
+    sys.modules["src"] = _src
+    _spec.loader.exec_module(_src)
+
+# لاگ هر ثبت زمان‌ها را مخدوش می‌کند
+logging.disable(logging.CRITICAL)
+
+from src.data_access.database_manager import DatabaseManager
+
+
+def fresh_database(path: str, **kwargs: Any) -> DatabaseManager:
+    """فایل دیتابیس (و فایل‌های WAL آن) را پاک می‌کند و یک دیتابیس تازه با همه جداول می‌سازد."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    db_manager = DatabaseManager(path, **kwargs)
+    db_manager.create_tables()
+    return db_manager
+
+
+def best_of(function: Callable[[], Any], repeat: int = 3) -> float:
+    """
+    کمترین زمان (ثانیه) از repeat اجرا. نتیجه هر اجرا پیش از اجرای بعدی دور ریخته می‌شود تا اشیای زنده
+    اجرای قبلی زمان garbage collector اجرای بعدی را بالا نبرند.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
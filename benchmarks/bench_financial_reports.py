@@ -0,0 +1,92 @@
+# src/benchmarks/bench_financial_reports.py
+"""
+زمان تراز آزمایشی، صورت سود و زیان و ترازنامه (هر سه از یک کوئری GROUP BY گردش حساب‌ها)
+در برابر خواندن همه تراکنش‌ها به پایتون (روش قبلی گزارش‌ها).
+
+    python benchmarks/bench_financial_reports.py --transactions 1000000 --accounts 500
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date
+
+from _bootstrap import best_of, fresh_database
+
+from src.business_logic.account_manager import AccountManager
+from src.business_logic.financial_transaction_manager import FinancialTransactionManager
+from src.business_logic.person_manager import PersonManager
+from src.business_logic.product_manager import ProductManager
+from src.business_logic.reports_manager import ReportsManager
+from src.constants import AccountType, FinancialTransactionType
+from src.data_access import (AccountsRepository, FinancialTransactionsRepository, InventoryMovementsRepository,
+                             PersonsRepository, ProductsRepository)
+
+
+def seed(db_manager, transaction_count: int, account_count: int) -> None:
+    random.seed(3)
+    account_types = [account_type.value for account_type in AccountType]
+    transaction_types = [FinancialTransactionType.INCOME.value, FinancialTransactionType.EXPENSE.value]
+    with db_manager.transaction() as conn:
+        conn.execute("INSERT INTO fiscal_years (name, start_date, end_date, status) "
+                     "VALUES ('1404', '2024-01-01', '2025-12-31', 'باز')")
+        conn.executemany("INSERT INTO accounts (name, type, balance) VALUES (?, ?, 0)",
+                         [(f"Bench {i}", account_types[i % len(account_types)]) for i in range(account_count)])
+        account_ids = [row[0] for row in conn.execute("SELECT id FROM accounts WHERE name LIKE 'Bench %'")]
+        # amount ستون INTEGER واحد خرد است
+        conn.executemany(
+            "INSERT INTO financial_transactions (transaction_date, account_id, transaction_type, amount, fiscal_year_id) "
+            "VALUES (?, ?, ?, ?, 1)",
+            ((f"{random.choice([2024, 2025])}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}T10:00:00",
+              random.choice(account_ids), random.choice(transaction_types), random.randint(1, 1_000_000))
+             for _ in range(transaction_count)))
+
+
+def load_all_and_fold(ft_repository) -> dict:
+    """روش قبلی: همه تراکنش‌ها به entity تبدیل و در پایتون برای هر حساب جمع می‌شوند."""
+    totals = defaultdict(int)
+    for transaction in ft_repository.get_all():
+        totals[(transaction.account_id, transaction.transaction_type)] += transaction.amount
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_financial_reports.db"))
+    args = parser.parse_args()
+
+    db_manager = fresh_database(args.db)
+    start = time.perf_counter()
+    seed(db_manager, args.transactions, args.accounts)
+    print(f"seeded {args.transactions} transactions over {args.accounts} accounts in {time.perf_counter() - start:.1f} s")
+
+    ft_repository = FinancialTransactionsRepository(db_manager)
+    person_manager = PersonManager(PersonsRepository(db_manager))
+    account_manager = AccountManager(AccountsRepository(db_manager), ft_repository, person_manager)
+    reports_manager = ReportsManager(account_manager, FinancialTransactionManager(ft_repository, account_manager),
+                                     ProductManager(ProductsRepository(db_manager), InventoryMovementsRepository(db_manager)),
+                                     person_manager, InventoryMovementsRepository(db_manager))
+
+    trial_balance = reports_manager.get_trial_balance(date(2025, 12, 31))
+    total_turnover = sum(row['debit_turnover'] + row['credit_turnover'] for row in trial_balance)
+    total_amount = sum(load_all_and_fold(ft_repository).values())
+    assert total_turnover == total_amount, (total_turnover, total_amount)
+
+    timings = [
+        ("load all transactions (old reports)", lambda: load_all_and_fold(ft_repository)),
+        ("trial balance", lambda: reports_manager.get_trial_balance(date(2025, 12, 31))),
+        ("income statement", lambda: reports_manager.get_income_statement_data(date(2025, 1, 1), date(2025, 6, 30))),
+        ("balance sheet", lambda: reports_manager.get_balance_sheet_data(date(2025, 6, 30))),
+    ]
+    for name, report in timings:
+        print(f"  {name:<36} {best_of(report):6.2f} s")
+    db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
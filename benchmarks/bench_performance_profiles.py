@@ -0,0 +1,71 @@
+# src/benchmarks/bench_performance_profiles.py
+"""
+سرعت ثبت فاکتور فروش (هر فاکتور پنج قلم) با هر پروفایل کارایی DB_PERFORMANCE_PROFILES،
+با اتصال‌های pool و بدون pool.
+
+    python benchmarks/bench_performance_profiles.py --invoices 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+from _bootstrap import fresh_database
+
+from src.business_logic.account_manager import AccountManager
+from src.business_logic.financial_transaction_manager import FinancialTransactionManager
+from src.business_logic.invoice_manager import InvoiceManager
+from src.business_logic.person_manager import PersonManager
+from src.business_logic.product_manager import ProductManager
+from src.config import DB_PERFORMANCE_PROFILES
+from src.constants import AccountType, InvoiceType, PersonType, ProductType
+from src.data_access import (AccountsRepository, FinancialTransactionsRepository, InventoryMovementsRepository,
+                             InvoiceItemsRepository, InvoicesRepository, PersonsRepository, ProductsRepository)
+
+
+def invoices_per_second(path: str, profile: str, use_pool: bool, invoice_count: int) -> float:
+    db_manager = fresh_database(path, use_pool=use_pool, performance_profile=profile)
+    person_manager = PersonManager(PersonsRepository(db_manager))
+    account_manager = AccountManager(AccountsRepository(db_manager), FinancialTransactionsRepository(db_manager),
+                                     person_manager)
+    product_manager = ProductManager(ProductsRepository(db_manager), InventoryMovementsRepository(db_manager))
+    ft_manager = FinancialTransactionManager(account_manager.financial_transactions_repository, account_manager)
+    invoice_manager = InvoiceManager(InvoicesRepository(db_manager), InvoiceItemsRepository(db_manager),
+                                     product_manager, ft_manager, person_manager, account_manager)
+    db_manager.execute_query("INSERT INTO fiscal_years (name, start_date, end_date, status) "
+                             "VALUES ('1404', '2025-01-01', '2025-12-31', 'باز')")
+    account_manager.add_account("حساب‌های دریافتنی", AccountType.ASSET)
+    account_manager.add_account("فروش", AccountType.REVENUE)
+    customer = person_manager.add_person("Customer", PersonType.CUSTOMER)
+    product = product_manager.create_product("Widget", ProductType.FINISHED_GOOD, Decimal("10"),
+                                             Decimal(invoice_count * 5), "pcs")
+    items = [{'product_id': product.id, 'quantity': 1, 'unit_price': 10}] * 5
+
+    start = time.perf_counter()
+    for i in range(invoice_count):
+        invoice_manager.create_invoice(date(2025, 1, 5), customer.id, InvoiceType.SALE, items,
+                                       fiscal_year_id=1, invoice_number_override=f"B-{i}")
+    elapsed = time.perf_counter() - start
+    db_manager.close()
+    return invoice_count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--invoices", type=int, default=200)
+    # روی دیسک واقعی اجرا شود؛ روی tmpfs هزینه fsync پروفایل‌ها دیده نمی‌شود
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_performance_profiles.db"))
+    args = parser.parse_args()
+
+    print(f"invoices/s ({args.invoices} five-line sale invoices), pooled / non-pooled")
+    for profile in DB_PERFORMANCE_PROFILES:
+        pooled = invoices_per_second(args.db, profile, True, args.invoices)
+        non_pooled = invoices_per_second(args.db, profile, False, args.invoices)
+        print(f"  {profile:<12} {pooled:8.0f} / {non_pooled:.0f}")
+
+
+if __name__ == "__main__":
+    main()
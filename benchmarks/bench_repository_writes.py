@@ -0,0 +1,85 @@
+# src/benchmarks/bench_repository_writes.py
+"""
+سرعت مسیرهای نوشتن و جستجوی BaseRepository (دستورات SQL cache شده و تبدیل مستقیم entity به tuple)
+روی financial_transactions: add، add_many، update و find_by_criteria.
+
+    python benchmarks/bench_repository_writes.py --rows 50000
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from _bootstrap import fresh_database
+
+from src.business_logic.entities.account_entity import AccountEntity
+from src.business_logic.entities.financial_transaction_entity import FinancialTransactionEntity
+from src.constants import AccountType, FinancialTransactionType, ReferenceType
+from src.data_access import AccountsRepository, FinancialTransactionsRepository
+
+FIND_QUERY_COUNT = 2000
+
+
+def _transaction(account_id: int, i: int) -> FinancialTransactionEntity:
+    return FinancialTransactionEntity(
+        transaction_date=datetime(2025, 1, 1 + i % 28), account_id=account_id,
+        transaction_type=FinancialTransactionType.INCOME, amount=Decimal("12.5"), description="bench",
+        fiscal_year_id=1, reference_id=i, reference_type=ReferenceType.INVOICE)
+
+
+def run_once(path: str, row_count: int) -> dict:
+    db_manager = fresh_database(path)
+    db_manager.execute_query("INSERT INTO fiscal_years (name, start_date, end_date, status) "
+                             "VALUES ('1404', '2025-01-01', '2025-12-31', 'باز')")
+    account = AccountsRepository(db_manager).add(AccountEntity(name="Bench", type=AccountType.ASSET))
+    repository = FinancialTransactionsRepository(db_manager)
+    rates = {}
+
+    entities = [_transaction(account.id, i) for i in range(row_count)]
+    start = time.perf_counter()
+    with db_manager.transaction():
+        for entity in entities:
+            repository.add(entity)
+    rates["add (in one tx)"] = row_count / (time.perf_counter() - start)
+
+    entities = [_transaction(account.id, i) for i in range(row_count)]
+    start = time.perf_counter()
+    repository.add_many(entities)
+    rates["add_many"] = row_count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with db_manager.transaction():
+        for entity in entities:
+            entity.amount = Decimal("3")
+            repository.update(entity)
+    rates["update (in one tx)"] = row_count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(FIND_QUERY_COUNT):
+        repository.find_by_criteria({"account_id": account.id, "reference_id": i})
+    rates["find_by_criteria"] = FIND_QUERY_COUNT / (time.perf_counter() - start)
+
+    db_manager.close()
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_repository_writes.db"))
+    args = parser.parse_args()
+
+    runs = [run_once(args.db, args.rows) for _ in range(args.runs)]
+    print(f"{args.rows} financial_transactions rows, median of {args.runs} runs")
+    for name in runs[0]:
+        unit = "q/s" if name == "find_by_criteria" else "rows/s"
+        print(f"  {name:<20} {statistics.median(run[name] for run in runs):10,.0f} {unit}")
+
+
+if __name__ == "__main__":
+    main()
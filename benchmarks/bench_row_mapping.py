@@ -0,0 +1,76 @@
+# src/benchmarks/bench_row_mapping.py
+"""
+نگاشت ردیف‌های financial_transactions به entity: _CompiledRowMapper (آرگومان‌های موقعیتی، model_type(*args))
+در برابر همان طرح نگاشت با یک دیکشنری kwargs برای هر ردیف (model_type(**values)).
+
+    python benchmarks/bench_row_mapping.py --rows 1000000
+"""
+
+import argparse
+import os
+import tempfile
+
+from _bootstrap import best_of, fresh_database
+
+from src.constants import FinancialTransactionType, ReferenceType
+from src.data_access.base_repository import _DefaultFactory, _NULL_NOT_ALLOWED
+from src.data_access.financial_transactions_repository import FinancialTransactionsRepository
+
+
+def map_rows_with_kwargs(mapper, rows):
+    """همان تبدیل‌های mapper، ولی با ساختن دیکشنری kwargs برای هر ردیف (روش قبلی)."""
+    positional, keyword, raw_keyword = mapper._plan_for(tuple(rows[0].keys()))
+    plan = positional + keyword + tuple((index, name, None, None) for index, name in raw_keyword)
+    model_type = mapper.model_type
+    entities = []
+    for row in rows:
+        values = {}
+        for index, name, converter, null_value in plan:
+            value = None if index is None else row[index]
+            if value is None:
+                if null_value is _NULL_NOT_ALLOWED:
+                    raise mapper._null_field_error(name, row)
+                values[name] = null_value() if isinstance(null_value, _DefaultFactory) else null_value
+            elif converter is None:
+                values[name] = value
+            else:
+                values[name] = converter(value)
+        entities.append(model_type(**values))
+    return entities
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_row_mapping.db"))
+    args = parser.parse_args()
+
+    db_manager = fresh_database(args.db)
+    db_manager.execute_query("INSERT INTO fiscal_years (name, start_date, end_date, status) "
+                             "VALUES ('1404', '2025-01-01', '2025-12-31', 'باز')")
+    transaction_types = [FinancialTransactionType.INCOME.value, FinancialTransactionType.EXPENSE.value]
+    with db_manager.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO financial_transactions (transaction_date, account_id, transaction_type, amount, "
+            "description, reference_id, reference_type, fiscal_year_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((f"2025-01-{i % 28 + 1:02d}T10:00:00", 1, transaction_types[i % 2], i, "bench", i,
+              ReferenceType.INVOICE.value, 1) for i in range(args.rows)))
+
+    repository = FinancialTransactionsRepository(db_manager)
+    rows = db_manager.fetch_all("SELECT * FROM financial_transactions")
+    mapper = repository._row_mapper
+
+    sample = rows[:10_000]
+    assert map_rows_with_kwargs(mapper, sample) == mapper.map_rows(sample)
+    kwargs_time = best_of(lambda: map_rows_with_kwargs(mapper, rows), args.repeat)
+    positional_time = best_of(lambda: mapper.map_rows(rows), args.repeat)
+
+    print(f"rows: {len(rows)}")
+    print(f"per-row kwargs dict:   {kwargs_time:.2f} s")
+    print(f"positional (*args):    {positional_time:.2f} s ({kwargs_time / positional_time:.2f}x)")
+    db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
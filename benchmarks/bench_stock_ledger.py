@@ -0,0 +1,89 @@
+# src/benchmarks/bench_stock_ledger.py
+"""
+کاردکس یک کالا با تعداد زیاد حرکت انبار: خواندن موجودی اول دوره از product_stock_snapshots و
+اسکن فقط بازه گزارش، در برابر خواندن همه حرکات کالا (روش قبلی گزارش).
+
+    python benchmarks/bench_stock_ledger.py --movements 500000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+from _bootstrap import best_of, fresh_database
+
+from src.business_logic.product_manager import ProductManager
+from src.business_logic.reports_manager import ReportsManager
+from src.constants import InventoryMovementType, ProductType
+from src.data_access import InventoryMovementsRepository, ProductsRepository
+from src.data_access.database_manager import SCHEMA_MIGRATIONS
+
+INITIAL_STOCK = Decimal("50")
+
+
+def seed(db_manager, product_id: int, movement_count: int) -> None:
+    random.seed(7)
+    # دستور پرکردن product_stock_snapshots از روی inventory_movements در مهاجرت 5
+    snapshot_backfill = next(statements for version, _, statements in SCHEMA_MIGRATIONS if version == 5)[1]
+    with db_manager.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO inventory_movements (product_id, movement_date, quantity_change, movement_type, description) "
+            "VALUES (?, ?, ?, ?, ?)",
+            ((product_id,
+              f"{random.choice([2023, 2024, 2025])}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+              f"T{random.randint(0, 23):02d}:{random.randint(0, 59):02d}:00",
+              random.choice([1, -1]) * random.randint(1, 500) / 10, InventoryMovementType.PURCHASE_RECEIPT.value, "bench")
+             for _ in range(movement_count)))
+        conn.execute("DELETE FROM product_stock_snapshots WHERE product_id = ?", (product_id,))
+        conn.execute(snapshot_backfill)
+        total = conn.execute("SELECT SUM(quantity_change) FROM inventory_movements WHERE product_id = ?",
+                             (product_id,)).fetchone()[0]
+        conn.execute("UPDATE products SET stock_quantity = stock_quantity + ? WHERE id = ?", (total, product_id))
+
+
+def brute_force_balances(db_manager, product_id: int, start_date: date, end_date: date):
+    """موجودی اول و آخر بازه با جمع مستقیم حرکات (برای بررسی درستی)."""
+    before = db_manager.fetch_one(
+        "SELECT COALESCE(SUM(quantity_change), 0) FROM inventory_movements WHERE product_id = ? AND movement_date < ?",
+        (product_id, start_date.isoformat()))[0]
+    through_end = db_manager.fetch_one(
+        "SELECT COALESCE(SUM(quantity_change), 0) FROM inventory_movements WHERE product_id = ? AND movement_date < ?",
+        (product_id, date.fromordinal(end_date.toordinal() + 1).isoformat()))[0]
+    return float(INITIAL_STOCK) + before, float(INITIAL_STOCK) + through_end
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--movements", type=int, default=500_000)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_stock_ledger.db"))
+    args = parser.parse_args()
+
+    db_manager = fresh_database(args.db)
+    movements_repository = InventoryMovementsRepository(db_manager)
+    product_manager = ProductManager(ProductsRepository(db_manager), movements_repository)
+    product = product_manager.create_product("Bench", ProductType.RAW_MATERIAL, Decimal("1"), INITIAL_STOCK, "kg")
+    start = time.perf_counter()
+    seed(db_manager, product.id, args.movements)
+    print(f"seeded {args.movements} movements in {time.perf_counter() - start:.1f} s")
+
+    reports_manager = ReportsManager(None, None, product_manager, None, movements_repository)
+    print(f"  {'load all movements (old report)':<34} "
+          f"{best_of(lambda: movements_repository.get_by_product_id(product.id)):6.2f} s")
+    for name, start_date, end_date in [("one-month ledger", date(2025, 6, 1), date(2025, 6, 30)),
+                                       ("one-year ledger", date(2024, 1, 1), date(2024, 12, 31))]:
+        ledger = reports_manager.get_stock_ledger(product.id, start_date, end_date)
+        opening, closing = brute_force_balances(db_manager, product.id, start_date, end_date)
+        # ردیف اول کاردکس «موجودی از قبل» است
+        assert abs(float(ledger[0]['balance']) - opening) < 1e-6
+        assert abs(float(ledger[-1]['balance']) - closing) < 1e-6
+        elapsed = best_of(lambda: reports_manager.get_stock_ledger(product.id, start_date, end_date))
+        print(f"  {name + f' ({len(ledger)} lines)':<34} {elapsed:6.2f} s")
+    db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
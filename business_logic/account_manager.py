@@ -1,18 +1,22 @@
 # src/business_logic/account_manager.py
 
-from typing import Optional, List, Dict, Any # <<< Dict, Any اضافه شد
-from datetime import date, datetime
+from typing import Optional, List, Dict, Any, Iterable, FrozenSet, Tuple, TypeVar # <<< Dict, Any اضافه شد
+from datetime import date
 from src.business_logic.person_manager import PersonManager
 
 from src.business_logic.entities.account_entity import AccountEntity
 from src.business_logic.entities.financial_transaction_entity import FinancialTransactionEntity
+from src.business_logic.posting_rules import PostingRulesRegistry
 from src.data_access.accounts_repository import AccountsRepository
 from src.data_access.financial_transactions_repository import FinancialTransactionsRepository
-from src.constants import AccountType, FinancialTransactionType, DATE_FORMAT,PersonType
+from src.constants import AccountType, FinancialTransactionType, PersonType, InvoiceType
+from src.utils.money import Money
 import logging
 from decimal import Decimal
 logger = logging.getLogger(__name__)
 
+RollUpValue = TypeVar("RollUpValue", Decimal, Tuple[Decimal, ...])
+
 class AccountManager:
     def __init__(self, 
                  accounts_repository: 'AccountsRepository', 
@@ -23,6 +27,11 @@ class AccountManager:
         self.accounts_repository = accounts_repository
         self.financial_transactions_repository = financial_transactions_repository
         self.person_manager = person_manager
+        # ساختار درخت حساب‌ها برای roll-up: (ترتیب post-order به صورت (account_id, parent_id), مجموعه زیرشاخه هر حساب)
+        # با هر تغییر در حساب‌ها (افزودن/ویرایش/حذف) باطل می‌شود.
+        self._hierarchy_cache: Optional[Tuple[List[Tuple[int, Optional[int]]], Dict[int, FrozenSet[int]]]] = None
+        # حساب‌های نقش‌های ثبت اسناد و حساب معین اشخاص؛ با افزودن، تغییر نام و حذف حساب‌ها باطل می‌شود
+        self.posting_rules = PostingRulesRegistry(accounts_repository)
     
 
     def add_account(self, 
@@ -57,10 +66,14 @@ class AccountManager:
             name=name,
             type=account_type,
             parent_id=parent_id, # <<< مقداردهی parent_id
-            balance=initial_balance 
+            balance=Money.of(initial_balance).to_decimal()
         )
         try:
-            created_account = self.accounts_repository.add(account_entity)
+            with self.accounts_repository.db_manager.transaction():
+                created_account = self.accounts_repository.add(account_entity)
+                self.accounts_repository.insert_closure_paths(created_account.id, parent_id)
+            self.invalidate_hierarchy_cache()
+            self.posting_rules.invalidate()
             logger.info(f"Account '{created_account.name}' (ID: {created_account.id}, ParentID: {parent_id}, Type: {account_type.value}) added with balance {initial_balance}.")
             return created_account
         except Exception as e:
@@ -74,6 +87,10 @@ class AccountManager:
             return None
         return self.accounts_repository.get_by_id(account_id)
 
+    def get_accounts_by_ids(self, account_ids: Iterable[int]) -> Dict[int, AccountEntity]:
+        # چند حساب با یک کوئری (به جای get_account_by_id در حلقه)
+        return self.accounts_repository.get_by_ids(account_ids)
+
     def get_all_accounts(self) -> List[AccountEntity]:
         # بدون تغییر - همه حساب‌ها را برمی‌گرداند، نه ساختار درختی
         return self.accounts_repository.get_all()
@@ -89,16 +106,24 @@ class AccountManager:
             return []
         return self.accounts_repository.get_child_accounts(parent_id)
 
-    def _build_account_tree_recursive(self, parent_id: Optional[int]) -> List[Dict[str, Any]]:
+    def _build_account_tree_recursive(self,
+                                      parent_id: Optional[int],
+                                      _children_by_parent: Optional[Dict[Optional[int], List[AccountEntity]]] = None
+                                      ) -> List[Dict[str, Any]]:
         """
         Helper recursive function to build a tree structure of accounts.
         Each node in the tree is a dictionary with account data and a 'children' key.
+        All accounts are loaded with a single query and grouped by parent_id once.
         """
+        if _children_by_parent is None:
+            _children_by_parent = {}
+            for account in sorted(self.get_all_accounts(), key=lambda acc: acc.name):
+                _children_by_parent.setdefault(account.parent_id, []).append(account)
         children_list = []
-        child_accounts = self.accounts_repository.get_child_accounts(parent_id)
+        child_accounts = _children_by_parent.get(parent_id, [])
         for account in child_accounts:
             if account.id is None: continue # Should not happen
-            children_of_this_account = self._build_account_tree_recursive(account.id)
+            children_of_this_account = self._build_account_tree_recursive(account.id, _children_by_parent)
             children_list.append({
                 "id": account.id,
                 "name": account.name,
@@ -133,6 +158,82 @@ class AccountManager:
         logger.debug("Account tree built.")
         return root_nodes
 
+    # --- roll-up مانده‌ها در درخت حساب‌ها ---
+    def invalidate_hierarchy_cache(self) -> None:
+        """ساختار کش‌شده درخت حساب‌ها را باطل می‌کند (بعد از هر تغییر در parent_id یا حساب‌ها)."""
+        self._hierarchy_cache = None
+
+    def _get_hierarchy(self) -> Tuple[List[Tuple[int, Optional[int]]], Dict[int, FrozenSet[int]]]:
+        """
+        ترتیب post-order حساب‌ها و مجموعه شناسه‌های زیرشاخه هر حساب (شامل خودش) را
+        با یک پیمایش غیربازگشتی درخت می‌سازد و تا تغییر بعدی حساب‌ها نگه می‌دارد.
+        حسابی که والدش وجود ندارد ریشه در نظر گرفته می‌شود.
+        """
+        if self._hierarchy_cache is not None:
+            return self._hierarchy_cache
+
+        all_accounts = [acc for acc in self.get_all_accounts() if acc.id is not None]
+        known_ids = {acc.id for acc in all_accounts}
+        children_ids: Dict[Optional[int], List[int]] = {}
+        parent_of: Dict[int, Optional[int]] = {}
+        for acc in all_accounts:
+            parent_id = acc.parent_id if acc.parent_id in known_ids else None
+            parent_of[acc.id] = parent_id
+            children_ids.setdefault(parent_id, []).append(acc.id)
+
+        post_order: List[Tuple[int, Optional[int]]] = []
+        descendants: Dict[int, FrozenSet[int]] = {}
+        # پشته (account_id, آیا فرزندانش پردازش شده‌اند)
+        stack: List[Tuple[int, bool]] = [(root_id, False) for root_id in reversed(children_ids.get(None, []))]
+        while stack:
+            acc_id, children_done = stack.pop()
+            if children_done:
+                subtree = {acc_id}
+                for child_id in children_ids.get(acc_id, ()):
+                    subtree.update(descendants[child_id])
+                descendants[acc_id] = frozenset(subtree)
+                post_order.append((acc_id, parent_of[acc_id]))
+                continue
+            stack.append((acc_id, True))
+            stack.extend((child_id, False) for child_id in reversed(children_ids.get(acc_id, ())))
+
+        if len(post_order) != len(all_accounts):
+            # حساب‌هایی که در یک حلقه parent_id گیر افتاده‌اند از هیچ ریشه‌ای قابل دسترسی نیستند
+            logger.warning(f"{len(all_accounts) - len(post_order)} account(s) are unreachable from the account tree roots "
+                           "(parent_id cycle) and are excluded from roll-ups.")
+        self._hierarchy_cache = (post_order, descendants)
+        return self._hierarchy_cache
+
+    def get_ancestor_ids(self, account_id: int) -> List[int]:
+        """اجداد یک حساب از والد مستقیم تا ریشه، با یک جستجوی index در account_closure."""
+        return self.accounts_repository.get_ancestor_ids(account_id)
+
+    def get_descendant_ids(self, account_id: int, include_self: bool = True) -> FrozenSet[int]:
+        """شناسه تمام حساب‌های زیرمجموعه یک حساب (در تمام سطوح)، از ساختار کش‌شده درخت."""
+        subtree = self._get_hierarchy()[1].get(account_id, frozenset((account_id,)))
+        return subtree if include_self else subtree - {account_id}
+
+    def roll_up_totals(self, direct_totals: Dict[int, RollUpValue]) -> Dict[int, RollUpValue]:
+        """
+        مقادیر مستقیم هر حساب (یک عدد یا tuple از اعداد، مثل گردش بدهکار/بستانکار) را
+        با یک پیمایش post-order به والدها منتقل می‌کند؛ خروجی برای هر حساب جمع خودش و تمام زیرشاخه‌هایش است.
+        حساب‌هایی که نه خودشان و نه زیرشاخه‌شان مقداری ندارند در خروجی نمی‌آیند.
+        """
+        post_order, _ = self._get_hierarchy()
+        rolled_up: Dict[int, RollUpValue] = dict(direct_totals)
+        for acc_id, parent_id in post_order:
+            if parent_id is None or acc_id not in rolled_up:
+                continue
+            value = rolled_up[acc_id]
+            parent_value = rolled_up.get(parent_id)
+            if parent_value is None:
+                rolled_up[parent_id] = value
+            elif isinstance(value, tuple):
+                rolled_up[parent_id] = tuple(a + b for a, b in zip(parent_value, value))
+            else:
+                rolled_up[parent_id] = parent_value + value
+        return rolled_up
+
     def get_accounts_for_combobox(self) -> List[Dict[str, Any]]:
         """
         یک لیست مسطح از تمام حساب‌ها با تورفتگی برای نمایش در کمبوباکس برمی‌گرداند.
@@ -179,6 +280,8 @@ class AccountManager:
             return None
 
         updated_fields = False
+        original_parent_id = account_to_update.parent_id
+        original_name = account_to_update.name
         if name is not None:
             if not name: raise ValueError("نام حساب برای به‌روزرسانی نمی‌تواند خالی باشد.")
             account_to_update.name = name
@@ -205,7 +308,9 @@ class AccountManager:
                 if not parent_account:
                     raise ValueError(f"حساب والد جدید با شناسه {parent_id} یافت نشد.")
 
-                # TODO: Advanced: Add cycle detection
+                # جلوگیری از حلقه: والد جدید نباید در زیردرخت همین حساب باشد
+                if self.accounts_repository.is_in_subtree(account_id, parent_id):
+                    raise ValueError(f"حساب '{parent_account.name}' زیرمجموعه همین حساب است و نمی‌تواند والد آن باشد.")
 
                 if account_to_update.parent_id != parent_id:
                     account_to_update.parent_id = parent_id
@@ -215,7 +320,13 @@ class AccountManager:
 
         if updated_fields:
             try:
-                updated_account = self.accounts_repository.update(account_to_update)
+                with self.accounts_repository.db_manager.transaction():
+                    updated_account = self.accounts_repository.update(account_to_update)
+                    if account_to_update.parent_id != original_parent_id:
+                        self.accounts_repository.move_closure_subtree(account_id, account_to_update.parent_id)
+                self.invalidate_hierarchy_cache()
+                if account_to_update.name != original_name or account_type is not None:
+                    self.posting_rules.invalidate()
                 logger.info(f"Account '{updated_account.name}' (ID: {updated_account.id}) details updated.")
                 return updated_account
             except Exception as e:
@@ -226,10 +337,13 @@ class AccountManager:
             return account_to_update
 
     # ... (متدهای get_account_balance_as_of, process_financial_transaction بدون تغییر) ...
-    def get_account_balance_as_of(self, account_id: int, as_of_date: date) -> float:
-        # ... (کد قبلی این متد، که مانده مستقیم حساب را بر اساس تراکنش‌ها محاسبه می‌کند) ...
-        # برای ترازنامه درختی، این متد باید بتواند مانده‌های فرزندان را هم جمع بزند (پیچیدگی بیشتر)
-        # فعلاً همان مانده مستقیم را برمی‌گرداند.
+    def get_account_balance_as_of(self, account_id: int, as_of_date: date, include_children: bool = False) -> float:
+        """
+        مانده حساب (اثر تجمعی تراکنش‌ها) در پایان as_of_date.
+        از جدول account_balance_snapshots خوانده می‌شود که هنگام ثبت هر تراکنش به‌روز می‌شود،
+        بنابراین هزینه آن به تعداد تراکنش‌های حساب بستگی ندارد.
+        با include_children=True مانده تمام حساب‌های زیرمجموعه هم جمع زده می‌شود.
+        """
         if not isinstance(account_id, int) or account_id <= 0:
             raise ValueError("شناسه حساب نامعتبر است.")
         if not isinstance(as_of_date, date):
@@ -238,65 +352,86 @@ class AccountManager:
         account = self.accounts_repository.get_by_id(account_id)
         if not account:
             raise ValueError(f"حسابی با شناسه {account_id} یافت نشد.")
-        
-        all_transactions_for_account = self.financial_transactions_repository.get_by_account_id(account_id)
-        calculated_balance = 0.0
-        
-        for transaction in all_transactions_for_account:
-            if not isinstance(transaction.transaction_date, str):
-                logger.error(f"Transaction {transaction.id} has an invalid date format type: {type(transaction.transaction_date)}")
-                continue
 
-            transaction_date_obj = datetime.strptime(transaction.transaction_date.split(" ")[0], DATE_FORMAT).date() 
-            if transaction_date_obj <= as_of_date:
-                change_amount = 0.0
-                transaction_amount = transaction.amount
-
-                if account.type == AccountType.ASSET:
-                    if transaction.transaction_type in [FinancialTransactionType.INCOME, FinancialTransactionType.TRANSFER]:
-                        change_amount = transaction_amount
-                    elif transaction.transaction_type == FinancialTransactionType.EXPENSE:
-                        change_amount = -transaction_amount
-                elif account.type == AccountType.LIABILITY:
-                    if transaction.transaction_type in [FinancialTransactionType.INCOME, FinancialTransactionType.TRANSFER]:
-                        change_amount = transaction_amount
-                    elif transaction.transaction_type == FinancialTransactionType.EXPENSE:
-                        change_amount = -transaction_amount
-                elif account.type == AccountType.EQUITY:
-                    if transaction.transaction_type in [FinancialTransactionType.INCOME, FinancialTransactionType.TRANSFER]:
-                        change_amount = transaction_amount
-                    elif transaction.transaction_type == FinancialTransactionType.EXPENSE:
-                        change_amount = -transaction_amount
-                elif account.type == AccountType.REVENUE: 
-                    if transaction.transaction_type in [FinancialTransactionType.INCOME, FinancialTransactionType.TRANSFER]:
-                        change_amount = transaction_amount
-                    elif transaction.transaction_type == FinancialTransactionType.EXPENSE: 
-                        change_amount = -transaction_amount
-                elif account.type == AccountType.EXPENSE: 
-                    if transaction.transaction_type in [FinancialTransactionType.EXPENSE, FinancialTransactionType.TRANSFER]:
-                        change_amount = transaction_amount
-                    elif transaction.transaction_type == FinancialTransactionType.INCOME: 
-                        change_amount = -transaction_amount
-                
-                calculated_balance += change_amount
-        
+        if include_children:
+            calculated_balance = float(self.financial_transactions_repository.get_subtree_snapshot_balance_as_of(account_id, as_of_date))
+            logger.debug(f"Rolled-up balance for account ID {account_id} as of {as_of_date} is {calculated_balance:.2f}")
+            return calculated_balance
+
+        calculated_balance = float(self.financial_transactions_repository.get_snapshot_balance_as_of(account_id, as_of_date))
         logger.debug(f"Direct balance for account ID {account_id} as of {as_of_date} is {calculated_balance:.2f}")
         return calculated_balance
+
+    def get_account_balances_as_of(self, as_of_date: date, include_children: bool = False) -> Dict[int, float]:
+        """
+        مانده همه حساب‌ها در پایان as_of_date با یک کوئری (حساب‌های بدون تراکنش: 0).
+        با include_children=True مانده هر حساب شامل مانده زیرشاخه‌هایش است.
+        """
+        if not isinstance(as_of_date, date):
+            raise ValueError("تاریخ مورد نظر نامعتبر است.")
+        balances = self.financial_transactions_repository.get_snapshot_balances_as_of(as_of_date)
+        if include_children:
+            balances = self.roll_up_totals(balances)
+        return {account_id: float(balance) for account_id, balance in balances.items()}
+
+    @staticmethod
+    def balance_effect(transaction_type: FinancialTransactionType, amount: Any) -> Decimal:
+        """تغییری که یک تراکنش مالی روی مانده حساب می‌گذارد (واریز/درآمد مثبت، برداشت/هزینه منفی)."""
+        transaction_amount = amount if isinstance(amount, Decimal) else Decimal(str(amount or '0.0'))
+        if transaction_type in [FinancialTransactionType.INCOME, FinancialTransactionType.DEPOSIT]:
+            return transaction_amount
+        if transaction_type in [FinancialTransactionType.EXPENSE, FinancialTransactionType.WITHDRAWAL]:
+            return -transaction_amount
+        return Decimal("0.0")
+
+    @staticmethod
+    def transaction_type_for(account_type: AccountType, is_debit: bool) -> FinancialTransactionType:
+        """
+        نوع تراکنش یک ردیف بدهکار/بستانکار بر اساس ماهیت حساب (همان قاعده گزارش‌ها):
+        برای حساب‌های دارایی و هزینه بدهکار افزایش (INCOME) است و برای بدهی، سرمایه و درآمد بستانکار.
+        """
+        increases = is_debit if account_type in (AccountType.ASSET, AccountType.EXPENSE) else not is_debit
+        return FinancialTransactionType.INCOME if increases else FinancialTransactionType.EXPENSE
+
+    def apply_balance_deltas(self, deltas: Dict[int, Decimal]) -> None:
+        """
+        تغییرات مانده چند حساب را (هر حساب با یک ردیف UPDATE ... SET balance = balance + ?) اعمال می‌کند.
+        باید داخل تراکنش ثبت سند صدا زده شود؛ اگر یکی از حساب‌ها وجود نداشته باشد ValueError می‌دهد.
+        """
+        deltas = {account_id: delta for account_id, delta in deltas.items() if delta != 0}
+        updated = self.accounts_repository.apply_balance_deltas(deltas)
+        if updated != len(deltas):
+            raise ValueError("مانده بعضی از حساب‌های سند به‌روز نشد؛ حساب یافت نشد.")
+
     def get_person_subsidiary_account_id(self, person_id: int) -> Optional[int]:
         """
         شناسه حساب معین (فرعی) مربوط به یک شخص را پیدا کرده یا ایجاد می‌کند.
         این حساب معمولاً زیرمجموعه "حساب‌های دریافتنی" (برای مشتریان) یا "حساب‌های پرداختنی" (برای تامین‌کنندگان) است.
         """
+        cached_account_id = self.posting_rules.person_account_id(person_id)
+        if cached_account_id is not None:
+            return cached_account_id
         logger.debug(f"Searching for or creating subsidiary account for Person ID: {person_id}")
         
         # قرارداد نامگذاری برای حساب‌های اشخاص: "PERSON-[person_id]"
         # این نام در UI به کاربر نمایش داده نمی‌شود و فقط برای شناسایی داخلی است.
         account_name_for_person = f"PERSON-{person_id}"
         
-        # 1. ابتدا سعی می‌کنیم حساب را بر اساس نام پیدا کنیم.
-        existing_account = self.accounts_repository.get_by_name(account_name_for_person)
+        # 1. ابتدا حساب را از ستون person_id (با index یکتا) پیدا می‌کنیم.
+        existing_account = self.accounts_repository.get_by_person_id(person_id)
         if existing_account and existing_account.id:
             logger.debug(f"Found existing subsidiary account ID {existing_account.id} for Person ID {person_id}.")
+            self.posting_rules.remember_person_account(person_id, existing_account.id)
+            return existing_account.id
+
+        # حساب‌های قدیمی که هنوز person_id ندارند با نام پیدا شده و به شخص متصل می‌شوند.
+        existing_account = self.accounts_repository.get_by_name(account_name_for_person)
+        if existing_account and existing_account.id:
+            if existing_account.person_id is None:
+                existing_account.person_id = person_id
+                self.accounts_repository.update(existing_account)
+                logger.info(f"Linked legacy subsidiary account ID {existing_account.id} to Person ID {person_id}.")
+            self.posting_rules.remember_person_account(person_id, existing_account.id)
             return existing_account.id
 
         # 2. اگر حساب وجود نداشت، آن را ایجاد می‌کنیم.
@@ -307,10 +442,11 @@ class AccountManager:
             raise ValueError(f"شخص با شناسه {person_id} برای ایجاد حساب معین یافت نشد.")
         
         # تعیین حساب کل (والد) بر اساس نوع شخص
-        parent_account_name = "حساب‌های دریافتنی" if person.person_type == PersonType.CUSTOMER else "حساب‌های پرداختنی"
-        parent_account = self.accounts_repository.get_by_name(parent_account_name)
+        parent_role = "accounts_receivable" if person.person_type == PersonType.CUSTOMER else "accounts_payable"
+        parent_account_name = self.posting_rules.account_names[parent_role]
+        parent_account_id = self.posting_rules.account_id(parent_role)
         
-        if not parent_account or not parent_account.id:
+        if not parent_account_id:
             logger.error(f"Parent account '{parent_account_name}' not found. Cannot create subsidiary account.")
             # این خطا باید در UI نمایش داده شود تا کاربر بداند که باید حساب کل را ایجاد کند
             raise ValueError(f"حساب کل '{parent_account_name}' برای ایجاد حساب معین یافت نشد. لطفاً ابتدا این حساب را در سرفصل حساب‌ها تعریف کنید.")
@@ -319,16 +455,40 @@ class AccountManager:
         new_account_entity = AccountEntity(
             name=account_name_for_person, # نام داخلی برای شناسایی
             type=AccountType.ASSET if person.person_type == PersonType.CUSTOMER else AccountType.LIABILITY,
-            parent_id=parent_account.id,
+            parent_id=parent_account_id,
+            person_id=person_id,
           #  description=f"حساب معین برای: {person.name}" # توضیحات خودکار
         )
-        created_account = self.accounts_repository.add(new_account_entity)
+        with self.accounts_repository.db_manager.transaction():
+            created_account = self.accounts_repository.add(new_account_entity)
+            if created_account and created_account.id:
+                self.accounts_repository.insert_closure_paths(created_account.id, parent_account_id)
+        self.invalidate_hierarchy_cache()
         if created_account and created_account.id:
             logger.info(f"Created new subsidiary account ID {created_account.id} for Person ID {person_id}.")
+            self.posting_rules.remember_person_account(person_id, created_account.id)
             return created_account.id
         
         raise Exception(f"ایجاد خودکار حساب معین برای شخص با شناسه {person_id} ناموفق بود.")
 
+    def get_person_account_balances(self,
+                                    person_type: PersonType,
+                                    aging_as_of: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        مانده حساب معین همه اشخاص یک نوع با یک کوئری تجمیعی.
+        اگر aging_as_of داده شود، مانده فاکتورهای باز (فروش برای مشتری، خرید برای تامین‌کننده)
+        به تفکیک سن بدهی تا آن تاریخ نیز برگردانده می‌شود.
+        """
+        invoice_type = None
+        if aging_as_of is not None:
+            if person_type == PersonType.CUSTOMER:
+                invoice_type = InvoiceType.SALE
+            elif person_type == PersonType.SUPPLIER:
+                invoice_type = InvoiceType.PURCHASE
+            else:
+                raise ValueError(f"گزارش سن بدهی برای اشخاص از نوع '{person_type.value}' پشتیبانی نمی‌شود.")
+        return self.accounts_repository.get_person_balances(person_type, invoice_type, aging_as_of)
+
     
     def get_default_account_id_by_name(self, account_name: str) -> Optional[int]:
         """
@@ -345,69 +505,29 @@ class AccountManager:
 
 
     def process_financial_transaction(self, transaction: FinancialTransactionEntity) -> bool:
-        # ... (کد قبلی این متد بدون تغییر) ...
+        """
+        اثر یک تراکنش مالی را با یک دستور UPDATE ... SET balance = balance + ? روی مانده حساب اعمال می‌کند.
+        ردیف حساب خوانده و بازنویسی نمی‌شود، پس ثبت‌های همزمان روی یک حساب هیچ تغییری را گم نمی‌کنند.
+        باید در همان تراکنش دیتابیسی صدا زده شود که ردیف financial_transactions را درج می‌کند.
+        """
         if not isinstance(transaction, FinancialTransactionEntity):
             logger.error("Invalid transaction object passed to process_financial_transaction.")
             return False
-            
-        account = self.accounts_repository.get_by_id(transaction.account_id)
-        if not account:
-            logger.error(f"Account ID {transaction.account_id} not found for processing FT ID {transaction.id}.")
-            return False 
-
-        change_amount = 0.0
-        transaction_amount = transaction.amount 
-
-        if account.type == AccountType.ASSET:
-            if transaction.transaction_type in [FinancialTransactionType.INCOME, FinancialTransactionType.TRANSFER]:
-                change_amount = transaction_amount
-            elif transaction.transaction_type == FinancialTransactionType.EXPENSE:
-                change_amount = -transaction_amount
-        elif account.type == AccountType.LIABILITY:
-            if transaction.transaction_type in [FinancialTransactionType.INCOME, FinancialTransactionType.TRANSFER]:
-                change_amount = transaction_amount
-            elif transaction.transaction_type == FinancialTransactionType.EXPENSE:
-                change_amount = -transaction_amount
-        elif account.type == AccountType.EQUITY:
-            if transaction.transaction_type in [FinancialTransactionType.INCOME, FinancialTransactionType.TRANSFER]:
-                change_amount = transaction_amount
-            elif transaction.transaction_type == FinancialTransactionType.EXPENSE:
-                change_amount = -transaction_amount
-        elif account.type == AccountType.REVENUE: 
-            if transaction.transaction_type in [FinancialTransactionType.INCOME, FinancialTransactionType.TRANSFER]:
-                change_amount = transaction_amount
-            elif transaction.transaction_type == FinancialTransactionType.EXPENSE: 
-                change_amount = -transaction_amount
-        elif account.type == AccountType.EXPENSE: 
-            if transaction.transaction_type in [FinancialTransactionType.EXPENSE, FinancialTransactionType.TRANSFER]:
-                change_amount = transaction_amount
-            elif transaction.transaction_type == FinancialTransactionType.INCOME: 
-                change_amount = -transaction_amount
-        if not isinstance(account.balance, Decimal):
-            account.balance = Decimal(str(account.balance or '0.0'))
-
-    # اطمینان از اینکه transaction.amount از نوع Decimal است
-        transaction_amount = transaction.amount if isinstance(transaction.amount, Decimal) else Decimal(str(transaction.amount or '0.0'))
-        change_amount = Decimal("0.0")
-        if transaction.transaction_type in [FinancialTransactionType.INCOME, FinancialTransactionType.DEPOSIT]:
-            change_amount = transaction_amount # باید Decimal باشد
-        elif transaction.transaction_type in [FinancialTransactionType.EXPENSE, FinancialTransactionType.WITHDRAWAL]:
-             change_amount = -transaction_amount # باید Decimal باشد
-
-        if change_amount != 0:
-            original_balance = account.balance
-            account.balance += change_amount
-            try:
-                self.accounts_repository.update(account) 
-                logger.info(f"Balance for account '{account.name}' (ID: {account.id}) changed by {change_amount:.2f} due to FT ID {transaction.id} (Type: {transaction.transaction_type.value}). Old: {original_balance:.2f}, New: {account.balance:.2f}.")
-                return True
-            except Exception as e:
-                logger.error(f"Failed to update balance for account ID {account.id} after processing FT ID {transaction.id}: {e}", exc_info=True)
-                account.balance = original_balance 
+
+        change_amount = self.balance_effect(transaction.transaction_type, transaction.amount)
+        if change_amount == 0:
+            logger.debug(f"No balance change calculated for account ID {transaction.account_id} from FT ID {transaction.id} (FT Type: {transaction.transaction_type.value}).")
+            return False
+
+        try:
+            if not self.accounts_repository.apply_balance_delta(transaction.account_id, change_amount):
+                logger.error(f"Account ID {transaction.account_id} not found for processing FT ID {transaction.id}.")
                 return False
-        else:
-            logger.debug(f"No balance change calculated for account ID {account.id} from FT ID {transaction.id} (FT Type: {transaction.transaction_type.value}, Acc Type: {account.type.value}).")
+        except Exception as e:
+            logger.error(f"Failed to update balance for account ID {transaction.account_id} after processing FT ID {transaction.id}: {e}", exc_info=True)
             return False
+        logger.info(f"Balance for account ID {transaction.account_id} changed by {change_amount:.2f} due to FT ID {transaction.id} (Type: {transaction.transaction_type.value}).")
+        return True
 
 
     def delete_account(self, account_id: int) -> bool:
@@ -431,7 +551,13 @@ class AccountManager:
             # raise ValueError(f"امکان حذف حساب '{account_to_delete.name}' وجود ندارد زیرا دارای حساب‌های زیرمجموعه است. ابتدا حساب‌های فرزند را منتقل یا حذف کنید.")
 
         try:
-            self.accounts_repository.delete(account_id)
+            with self.accounts_repository.db_manager.transaction():
+                self.accounts_repository.detach_closure_children(account_id)
+                # delete خطا را به False تبدیل می‌کند؛ raise لازم است تا جدا کردن closure هم rollback شود
+                if not self.accounts_repository.delete(account_id):
+                    raise Exception(f"خطا در حذف حساب با شناسه {account_id}.")
+            self.invalidate_hierarchy_cache()
+            self.posting_rules.invalidate()
             logger.info(f"Account with ID {account_id} (Name: {account_to_delete.name}) deleted successfully.")
             return True
         except Exception as e: 
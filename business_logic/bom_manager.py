@@ -160,9 +160,10 @@ class BomManager:
     def get_all_boms_with_product_names(self) -> List[BOMEntity]:
         logger.debug("Fetching all BOMs with product names.")
         all_boms = self.bom_repo.get_all(order_by="name ASC") 
+        products = self.product_manager.get_products_by_ids(bom.product_id for bom in all_boms)
         for bom_loop_var in all_boms: 
             if bom_loop_var.product_id:
-                product = self.product_manager.get_product_by_id(bom_loop_var.product_id)
+                product = products.get(bom_loop_var.product_id)
                 if product: bom_loop_var.product_name = product.name
                 else: bom_loop_var.product_name = f"محصول ID:{bom_loop_var.product_id} یافت نشد"
             else: bom_loop_var.product_name = "بدون محصول نهایی"
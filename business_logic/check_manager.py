@@ -4,13 +4,16 @@ from datetime import date, datetime
 from decimal import Decimal
 
 # --- Entity و Constant Imports ---
+from src.config import UI_LIST_PAGE_SIZE
 from .entities.check_entity import CheckEntity
-from ..constants import CheckType, CheckStatus, FinancialTransactionType, ReferenceType,AccountType
+from .financial_transaction_manager import JournalLine
+from ..constants import CheckType, CheckStatus, ReferenceType,AccountType
 
 # --- Type Hinting Imports ---
 if TYPE_CHECKING:
     from ..data_access.checks_repository import ChecksRepository
     from ..data_access.payment_header_repository import PaymentHeaderRepository
+    from ..data_access.base_repository import KeysetPage, KeysetKey
 
     from .financial_transaction_manager import FinancialTransactionManager
     from .account_manager import AccountManager
@@ -128,18 +131,12 @@ class CheckManager:
                     
                     logger.info(f"Issued Check Cleared (ID: {check_id}): Dr. Checks Payable ({checks_payable_acc_id}), Cr. Bank ({our_bank_account_id})")
                     # بدهکار: اسناد پرداختنی مدت‌دار (بدهی کاهش می‌یابد)
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_datetime, account_id=checks_payable_acc_id,
-                        transaction_type=FinancialTransactionType.EXPENSE, amount=check_amount, 
-                        description=f"{ft_description_base} (Dr. Checks Payable)", fiscal_year_id=ft_fiscal_year_id,
-                        reference_id=check_id, reference_type=ReferenceType.CHECK
-                    )
                     # بستانکار: حساب بانک ما (دارایی کاهش می‌یابد)
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_datetime, account_id=our_bank_account_id,
-                        transaction_type=FinancialTransactionType.EXPENSE, amount=check_amount, 
-                        description=f"{ft_description_base} (Cr. Bank)", fiscal_year_id=ft_fiscal_year_id,
-                        reference_id=check_id, reference_type=ReferenceType.CHECK
+                    self.ft_manager.post_journal_entry(
+                        ft_datetime,
+                        [JournalLine(checks_payable_acc_id, debit=check_amount, description=f"{ft_description_base} (Dr. Checks Payable)"),
+                         JournalLine(our_bank_account_id, credit=check_amount, description=f"{ft_description_base} (Cr. Bank)")],
+                        fiscal_year_id=ft_fiscal_year_id, reference_id=check_id, reference_type=ReferenceType.CHECK
                     )
                 elif check_to_update.check_type == CheckType.RECEIVED: # چک دریافتنی مشتری وصول شده
                     checks_receivable_acc_id = self.accounts_config.get("checks_receivable_account")
@@ -147,18 +144,12 @@ class CheckManager:
 
                     logger.info(f"Received Check Cleared (ID: {check_id}): Dr. Bank ({our_bank_account_id}), Cr. Checks Receivable ({checks_receivable_acc_id})")
                     # بدهکار: حساب بانک ما (دارایی افزایش می‌یابد)
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_datetime, account_id=our_bank_account_id,
-                        transaction_type=FinancialTransactionType.INCOME, amount=check_amount, 
-                        description=f"{ft_description_base} (Dr. Bank)", fiscal_year_id=ft_fiscal_year_id,
-                        reference_id=check_id, reference_type=ReferenceType.CHECK
-                    )
                     # بستانکار: حساب اسناد دریافتنی مدت‌دار (دارایی کاهش می‌یابد)
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_datetime, account_id=checks_receivable_acc_id,
-                        transaction_type=FinancialTransactionType.EXPENSE, amount=check_amount, 
-                        description=f"{ft_description_base} (Cr. Checks Receivable)", fiscal_year_id=ft_fiscal_year_id,
-                        reference_id=check_id, reference_type=ReferenceType.CHECK
+                    self.ft_manager.post_journal_entry(
+                        ft_datetime,
+                        [JournalLine(our_bank_account_id, debit=check_amount, description=f"{ft_description_base} (Dr. Bank)"),
+                         JournalLine(checks_receivable_acc_id, credit=check_amount, description=f"{ft_description_base} (Cr. Checks Receivable)")],
+                        fiscal_year_id=ft_fiscal_year_id, reference_id=check_id, reference_type=ReferenceType.CHECK
                     )
 
             elif new_status == CheckStatus.BOUNCED:
@@ -170,18 +161,12 @@ class CheckManager:
 
                     logger.info(f"Received Check Bounced (ID: {check_id}): Dr. AR ({ar_account_id}), Cr. Checks Receivable ({checks_receivable_acc_id})")
                     # بدهکار: حساب دریافتنی کل (مشتری دوباره بدهکار می‌شود)
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_datetime, account_id=ar_account_id,
-                        transaction_type=FinancialTransactionType.INCOME, amount=check_amount,
-                        description=f"{ft_description_base} (Dr. AR - Bounced)", fiscal_year_id=ft_fiscal_year_id,
-                        reference_id=check_id, reference_type=ReferenceType.CHECK
-                    )
                     # بستانکار: حساب اسناد دریافتنی مدت‌دار
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_datetime, account_id=checks_receivable_acc_id,
-                        transaction_type=FinancialTransactionType.EXPENSE, amount=check_amount,
-                        description=f"{ft_description_base} (Cr. Checks Receivable - Bounced)", fiscal_year_id=ft_fiscal_year_id,
-                        reference_id=check_id, reference_type=ReferenceType.CHECK
+                    self.ft_manager.post_journal_entry(
+                        ft_datetime,
+                        [JournalLine(ar_account_id, debit=check_amount, description=f"{ft_description_base} (Dr. AR - Bounced)"),
+                         JournalLine(checks_receivable_acc_id, credit=check_amount, description=f"{ft_description_base} (Cr. Checks Receivable - Bounced)")],
+                        fiscal_year_id=ft_fiscal_year_id, reference_id=check_id, reference_type=ReferenceType.CHECK
                     )
                     # TODO: Handle bank charges (Dr. Bank Charges Expense, Cr. Bank)
                     if check_to_update.invoice_id is not None:
@@ -203,20 +188,12 @@ class CheckManager:
                     
                     logger.info(f"Issued Check Bounced (ID: {check_id}): Dr. Checks Payable ({checks_payable_acc_id}), Cr. AP ({ap_account_id})")
                     # ۱. بدهکار کردن "اسناد پرداختنی مدت‌دار" (خنثی کردن بستانکاری اولیه که توسط PaymentManager انجام شده بود)
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_datetime, account_id=checks_payable_acc_id,
-                        transaction_type=FinancialTransactionType.EXPENSE, # بدهکار کردن این حساب بدهی
-                        amount=check_amount,
-                        description=f"{ft_description_base} (Dr. Checks Payable - Bounced)", fiscal_year_id=ft_fiscal_year_id,
-                        reference_id=check_id, reference_type=ReferenceType.CHECK
-                    )
                     # ۲. بستانکار کردن "حساب پرداختنی کل" (برقراری مجدد بدهی اولیه به تامین‌کننده)
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_datetime, account_id=ap_account_id,
-                        transaction_type=FinancialTransactionType.INCOME, # بستانکار کردن این حساب بدهی (افزایش بدهی)
-                        amount=check_amount,
-                        description=f"{ft_description_base} (Cr. Accounts Payable - Bounced)", fiscal_year_id=ft_fiscal_year_id,
-                        reference_id=check_id, reference_type=ReferenceType.CHECK
+                    self.ft_manager.post_journal_entry(
+                        ft_datetime,
+                        [JournalLine(checks_payable_acc_id, debit=check_amount, description=f"{ft_description_base} (Dr. Checks Payable - Bounced)"),
+                         JournalLine(ap_account_id, credit=check_amount, description=f"{ft_description_base} (Cr. Accounts Payable - Bounced)")],
+                        fiscal_year_id=ft_fiscal_year_id, reference_id=check_id, reference_type=ReferenceType.CHECK
                     )
                     
                     # ۳. برگرداندن اثر پرداخت روی فاکتور خرید یا سفارش خرید مرتبط (اگر وجود دارد)
@@ -284,15 +261,48 @@ class CheckManager:
         if type_filter: criteria["check_type"] = type_filter.value
         
         checks = self.checks_repository.find_by_criteria(criteria, order_by="due_date ASC")
-        if self.person_manager and self.account_manager:
-            for chk in checks:
-                if chk.person_id:
-                    person = self.person_manager.get_person_by_id(chk.person_id)
-                    if person: chk.person_name = person.name
-                if chk.account_id:
-                    account = self.account_manager.get_account_by_id(chk.account_id)
-                    if account: chk.bank_account_name = account.name
+        self._attach_display_names(checks)
         return checks
+
+    def get_checks_page(self,
+                        after_key: Optional['KeysetKey'] = None,
+                        page_size: int = UI_LIST_PAGE_SIZE,
+                        person_id: Optional[int] = None,
+                        status_filter: Optional[CheckStatus] = None,
+                        type_filter: Optional[CheckType] = None) -> 'KeysetPage[CheckEntity]':
+        """یک صفحه از چک‌ها به ترتیب سررسید (due_date ASC, id ASC) - صفحه‌بندی keyset با فیلتر در SQL."""
+        criteria = self._check_list_criteria(person_id, status_filter, type_filter)
+        page = self.checks_repository.get_page("due_date", page_size, after_key, criteria, descending=False)
+        self._attach_display_names(page.items)
+        return page
+
+    def _attach_display_names(self, checks: List[CheckEntity]) -> None:
+        """نام شخص و حساب بانکی چک‌ها را با دو کوئری دسته‌ای (مستقل از تعداد چک‌ها) پر می‌کند."""
+        if not (self.person_manager and self.account_manager) or not checks:
+            return
+        persons = self.person_manager.get_persons_by_ids(chk.person_id for chk in checks)
+        accounts = self.account_manager.get_accounts_by_ids(chk.account_id for chk in checks)
+        for chk in checks:
+            person = persons.get(chk.person_id)
+            if person: chk.person_name = person.name
+            account = accounts.get(chk.account_id)
+            if account: chk.bank_account_name = account.name
+
+    def count_checks(self,
+                     person_id: Optional[int] = None,
+                     status_filter: Optional[CheckStatus] = None,
+                     type_filter: Optional[CheckType] = None) -> int:
+        return self.checks_repository.count_by_criteria(self._check_list_criteria(person_id, status_filter, type_filter))
+
+    @staticmethod
+    def _check_list_criteria(person_id: Optional[int],
+                             status_filter: Optional[CheckStatus],
+                             type_filter: Optional[CheckType]) -> Dict[str, Any]:
+        criteria: Dict[str, Any] = {}
+        if person_id: criteria["person_id"] = person_id
+        if status_filter: criteria["status"] = status_filter.value
+        if type_filter: criteria["check_type"] = type_filter.value
+        return criteria
         
     def update_check_info(self, 
                           check_id: int,
@@ -0,0 +1,190 @@
+# src/business_logic/columnar_engine.py
+
+from typing import Optional, List, Dict, Any, Tuple, TYPE_CHECKING
+from datetime import date
+from decimal import Decimal
+
+from src.constants import FinancialTransactionType
+from src.utils.money import MINOR_UNIT_EXPONENT
+
+if TYPE_CHECKING:
+    from .financial_transaction_manager import FinancialTransactionManager
+
+import logging
+logger = logging.getLogger(__name__)
+
+# --- NumPy Import (اختیاری) ---
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+# ترتیب ثابت انواع تراکنش؛ ستون transaction_type به اندیس همین لیست تبدیل می‌شود
+TRANSACTION_TYPES: List[FinancialTransactionType] = list(FinancialTransactionType)
+
+PERIOD_MONTH = "month"
+PERIOD_QUARTER = "quarter"
+
+
+def _minor_to_decimal(value: Any) -> Decimal:
+    return Decimal(int(value)).scaleb(-MINOR_UNIT_EXPONENT)
+
+
+class TransactionColumns:
+    """
+    تراکنش‌های مالی تا یک تاریخ به صورت آرایه‌های ستونی NumPy:
+    ids / account_ids (int64)، days (datetime64[D])، type_codes (اندیس در TRANSACTION_TYPES)،
+    amounts (int64 به واحد خرد) و در صورت نیاز ستون‌های توضیحات برای ردیف‌های دفتر.
+    یک بار بارگذاری می‌شود و گردش حساب‌ها، گردش دوره‌ای و مانده تجمعی با group-by برداری
+    (argsort + np.add.reduceat) از روی آن محاسبه می‌شوند. ترتیب ردیف‌ها همان (transaction_date, id) است.
+    خروجی‌ها همان ساختارهای FinancialTransactionManager هستند تا ReportsManager بدون تغییر از آن‌ها استفاده کند.
+    """
+
+    def __init__(self, rows: List[Any], loaded_until: Optional[date], with_details: bool = False):
+        if not NUMPY_AVAILABLE:
+            raise ValueError("برای موتور ستونی گزارش‌ها کتابخانه numpy لازم است.")
+        self.loaded_until = loaded_until
+        self.with_details = with_details
+        columns = list(zip(*rows)) if rows else [()] * (8 if with_details else 5)
+        transaction_dates = np.array(columns[2], dtype=str)
+        # ردیف‌ها به ترتیب id خوانده شده‌اند؛ مرتب‌سازی پایدار روی تاریخ (مقایسه رشته‌ای) همان
+        # ORDER BY transaction_date, id کوئری‌های دفتر را می‌دهد
+        order = np.argsort(transaction_dates, kind="stable")
+        self.ids = np.array(columns[0], dtype=np.int64)[order]
+        self.account_ids = np.array(columns[1], dtype=np.int64)[order]
+        self.days = transaction_dates[order].astype("U10").astype("datetime64[D]")
+        type_index = {transaction_type.value: code for code, transaction_type in enumerate(TRANSACTION_TYPES)}
+        self.type_codes = np.array([type_index[value] for value in columns[3]], dtype=np.int8)[order]
+        # ستون amount در دیتابیس خودش عدد صحیح واحد خرد است
+        self.amounts = np.array(columns[4], dtype=np.int64)[order]
+        self.descriptions = [columns[5][i] for i in order.tolist()] if with_details else []
+        self.reference_ids = [columns[6][i] for i in order.tolist()] if with_details else []
+        self.reference_types = [columns[7][i] for i in order.tolist()] if with_details else []
+
+        # اثر هر تراکنش روی مانده: INCOME/DEPOSIT مثبت، EXPENSE/WITHDRAWAL منفی، TRANSFER صفر
+        # (همان AccountManager.balance_effect و FT_BALANCE_EFFECT_SQL)
+        effect_signs = np.zeros(len(TRANSACTION_TYPES), dtype=np.int64)
+        for code, transaction_type in enumerate(TRANSACTION_TYPES):
+            if transaction_type in (FinancialTransactionType.INCOME, FinancialTransactionType.DEPOSIT):
+                effect_signs[code] = 1
+            elif transaction_type in (FinancialTransactionType.EXPENSE, FinancialTransactionType.WITHDRAWAL):
+                effect_signs[code] = -1
+        self.effects = effect_signs[self.type_codes] * self.amounts
+
+    @classmethod
+    def load(cls,
+             ft_manager: 'FinancialTransactionManager',
+             end_date: Optional[date] = None,
+             with_details: bool = False) -> 'TransactionColumns':
+        """
+        همه تراکنش‌ها تا پایان end_date را (به صورت دسته‌ای) در آرایه‌های ستونی بارگذاری می‌کند.
+        with_details برای ledger_rows لازم است (ستون‌های متنی خواندن را تقریباً دو برابر کند می‌کنند).
+        """
+        rows: List[Any] = []
+        for batch in ft_manager.iter_column_batches(end_date, with_details=with_details):
+            rows.extend(batch)
+        logger.info(f"Loaded {len(rows)} financial transactions into columnar arrays (until {end_date}).")
+        return cls(rows, end_date, with_details)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _check_range(self, end_date: Optional[date]) -> None:
+        if self.loaded_until is not None and (end_date is None or end_date > self.loaded_until):
+            raise ValueError(f"داده‌های ستونی فقط تا تاریخ {self.loaded_until} بارگذاری شده‌اند.")
+
+    def _range_mask(self, start_date: Optional[date], end_date: Optional[date]) -> 'np.ndarray':
+        self._check_range(end_date)
+        mask = np.ones(len(self.ids), dtype=bool)
+        if start_date is not None:
+            mask &= self.days >= np.datetime64(start_date, "D")
+        if end_date is not None:
+            mask &= self.days <= np.datetime64(end_date, "D")
+        return mask
+
+    @staticmethod
+    def _grouped_sums(keys: 'np.ndarray', values: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+        """جمع values به ازای هر کلید یکتا (مرتب‌سازی پایدار + np.add.reduceat روی int64؛ بدون خطای اعشاری)."""
+        if len(keys) == 0:
+            return keys, values
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+        return sorted_keys[starts], np.add.reduceat(values[order], starts)
+
+    def _turnovers(self, mask: 'np.ndarray', bucket_ids: Optional['np.ndarray'] = None
+                   ) -> Dict[Any, Dict[int, Dict[FinancialTransactionType, Decimal]]]:
+        type_count = len(TRANSACTION_TYPES)
+        keys = self.account_ids[mask] * type_count + self.type_codes[mask]
+        if bucket_ids is not None:
+            # کلید ترکیبی (دوره، حساب، نوع تراکنش)؛ شناسه حساب‌ها بسیار کوچک‌تر از 2^40 است
+            keys = (bucket_ids[mask] << 40) + keys
+        unique_keys, totals = self._grouped_sums(keys, self.amounts[mask])
+
+        result: Dict[Any, Dict[int, Dict[FinancialTransactionType, Decimal]]] = {}
+        for key, total in zip(unique_keys.tolist(), totals.tolist()):
+            bucket, account_key = divmod(key, 1 << 40) if bucket_ids is not None else (None, key)
+            account_id, type_code = divmod(account_key, type_count)
+            result.setdefault(bucket, {}).setdefault(account_id, {})[TRANSACTION_TYPES[type_code]] = _minor_to_decimal(total)
+        return result
+
+    def turnovers_by_account(self,
+                             start_date: Optional[date] = None,
+                             end_date: Optional[date] = None) -> Dict[int, Dict[FinancialTransactionType, Decimal]]:
+        """معادل FinancialTransactionManager.get_account_turnovers: {account_id: {نوع تراکنش: مجموع مبلغ}}"""
+        return self._turnovers(self._range_mask(start_date, end_date)).get(None, {})
+
+    def turnovers_by_period(self,
+                            start_date: date,
+                            end_date: date,
+                            period: str = PERIOD_MONTH) -> Dict[date, Dict[int, Dict[FinancialTransactionType, Decimal]]]:
+        """
+        گردش هر حساب به تفکیک دوره (ماه یا فصل میلادی) در بازه: {شروع دوره: {account_id: {نوع تراکنش: مجموع}}}.
+        دوره‌های بدون تراکنش در خروجی نیستند.
+        """
+        if period not in (PERIOD_MONTH, PERIOD_QUARTER):
+            raise ValueError(f"دوره '{period}' پشتیبانی نمی‌شود.")
+        months = self.days.astype("datetime64[M]").astype(np.int64)
+        bucket_ids = months // 3 if period == PERIOD_QUARTER else months
+        months_per_bucket = 3 if period == PERIOD_QUARTER else 1
+        by_bucket = self._turnovers(self._range_mask(start_date, end_date), bucket_ids)
+        return {np.datetime64(int(bucket * months_per_bucket), "M").astype("datetime64[D]").item(): turnovers
+                for bucket, turnovers in sorted(by_bucket.items())}
+
+    def turnovers_by_period_starts(self,
+                                   period_starts: List[date],
+                                   end_date: date) -> Dict[int, Dict[int, Dict[FinancialTransactionType, Decimal]]]:
+        """
+        معادل FinancialTransactionManager.get_account_turnovers_by_period: دوره هر تراکنش با np.searchsorted
+        روی مرزهای period_starts (صعودی) تعیین می‌شود. خروجی: {اندیس دوره: {account_id: {نوع تراکنش: مجموع}}}
+        """
+        boundaries = np.array(period_starts, dtype="datetime64[D]")
+        bucket_ids = np.searchsorted(boundaries, self.days, side="right").astype(np.int64) - 1
+        return self._turnovers(self._range_mask(period_starts[0], end_date), bucket_ids)
+
+    def account_net_effect_before(self, account_id: int, before_date: date) -> Decimal:
+        """معادل FinancialTransactionManager.get_account_net_effect_before (جمع اثر تراکنش‌های قبل از before_date)."""
+        mask = (self.account_ids == account_id) & (self.days < np.datetime64(before_date, "D"))
+        return _minor_to_decimal(self.effects[mask].sum())
+
+    def ledger_rows(self, account_id: int, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+        """
+        ردیف‌های دفتر یک حساب در بازه به ترتیب (transaction_date, id) با running_effect (np.cumsum)،
+        با همان ستون‌های FinancialTransactionsRepository.iter_ledger_batches (amount و running_effect به واحد خرد).
+        """
+        if not self.with_details:
+            raise ValueError("برای دفتر کل، داده‌های ستونی باید همراه با توضیحات تراکنش‌ها بارگذاری شوند.")
+        positions = np.flatnonzero(self._range_mask(start_date, end_date) & (self.account_ids == account_id))
+        running_effects = np.cumsum(self.effects[positions])
+        return [{
+            "id": int(self.ids[position]),
+            "transaction_date": self.days[position].item().isoformat(),
+            "transaction_type": TRANSACTION_TYPES[self.type_codes[position]].value,
+            "amount": int(self.amounts[position]),
+            "description": self.descriptions[position],
+            "reference_id": self.reference_ids[position],
+            "reference_type": self.reference_types[position],
+            "running_effect": running_effect,
+        } for position, running_effect in zip(positions.tolist(), running_effects.tolist())]
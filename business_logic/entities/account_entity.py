@@ -12,5 +12,6 @@ class AccountEntity(BaseEntity):
 
     parent_id: Optional[int] = field(default=None) # شناسه حساب والد
     balance: Decimal = field(default_factory=lambda: Decimal("0.0"))
+    person_id: Optional[int] = field(default=None) # شخصی که این حساب معین اوست (حساب‌های اشخاص)
     # 'id' از BaseEntity به ارث برده می‌شود
     children: List['AccountEntity'] = field(default_factory=list, init=False, compare=False, repr=False)
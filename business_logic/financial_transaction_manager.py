@@ -1,16 +1,28 @@
 # src/business_logic/financial_transaction_manager.py
 
-from typing import Optional, List, Dict, Any # <<< Add Any
-from datetime import date, datetime # <<< Add date and datetime
+from typing import Optional, List, Dict, Any, Iterator, Tuple, Sequence # <<< Add Any
+from datetime import date, datetime, timedelta # <<< Add date and datetime
+from dataclasses import dataclass
 
 from src.business_logic.entities.financial_transaction_entity import FinancialTransactionEntity
 from src.data_access.financial_transactions_repository import FinancialTransactionsRepository
 from src.business_logic.account_manager import AccountManager # Important for updating balances
-from src.constants import FinancialTransactionType, ReferenceType
+from src.constants import FinancialTransactionType, ReferenceType, AccountType
+from src.utils.money import Money
 import logging
-from decimal import Decimal, InvalidOperation # <<< Add InvalidOperation
+from decimal import Decimal
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class JournalLine:
+    """یک ردیف سند حسابداری برای post_journal_entry: دقیقاً یکی از debit و credit مثبت است."""
+    account_id: int
+    debit: Decimal = Decimal("0")
+    credit: Decimal = Decimal("0")
+    description: Optional[str] = None
+
+
 class FinancialTransactionManager:
     def __init__(self, 
                  ft_repository: FinancialTransactionsRepository,
@@ -58,9 +70,9 @@ class FinancialTransactionManager:
 
         # --- شروع اصلاحات در اعتبارسنجی و تبدیل amount ---
         try:
-            # ابتدا سعی می‌کنیم amount را به Decimal تبدیل کنیم
-            amount_dec = Decimal(str(amount))
-        except (InvalidOperation, TypeError):
+            # مبلغ به واحد خرد گرد می‌شود؛ همان مقداری که ذخیره و به مانده‌ها اضافه می‌شود
+            amount_dec = Money.of(amount).to_decimal()
+        except ValueError:
             logger.error(f"Invalid amount format for financial transaction: '{amount}'")
             raise ValueError("مقدار مبلغ تراکنش باید عددی باشد.")
 
@@ -83,19 +95,25 @@ class FinancialTransactionManager:
         )
 
         try:
-            created_ft = self.ft_repository.add(ft_entity)
-            if not created_ft or not created_ft.id:
-                logger.error(f"Failed to save financial transaction to DB for account {account_id}")
-                return None
+            with self.ft_repository.db_manager.transaction():
+                created_ft = self.ft_repository.add(ft_entity)
+                if not created_ft or not created_ft.id:
+                    logger.error(f"Failed to save financial transaction to DB for account {account_id}")
+                    return None
+
+                logger.info(f"FinancialTransaction ID {created_ft.id} created for account ID {account_id}, amount {created_ft.amount}, type {transaction_type.value}.")
+
+                # به‌روزرسانی بالانس حساب
+                balance_updated = self.account_manager.process_financial_transaction(created_ft)
+                if not balance_updated:
+                    # این مورد باید با دقت مدیریت شود. آیا باید تراکنش را برگردانیم؟
+                    logger.warning(f"Account balance may not have been updated for FT ID {created_ft.id}. Review AccountManager logs.")
+
+                # مانده روزانه حساب (برای گزارش‌های «مانده در تاریخ») در همان تراکنش دیتابیس به‌روز می‌شود
+                self.ft_repository.apply_balance_snapshot_delta(
+                    account_id, transaction_date_dt.date(),
+                    self.account_manager.balance_effect(transaction_type, amount_dec))
 
-            logger.info(f"FinancialTransaction ID {created_ft.id} created for account ID {account_id}, amount {created_ft.amount}, type {transaction_type.value}.")
-            
-            # به‌روزرسانی بالانس حساب
-            balance_updated = self.account_manager.process_financial_transaction(created_ft)
-            if not balance_updated:
-                # این مورد باید با دقت مدیریت شود. آیا باید تراکنش را برگردانیم؟
-                logger.warning(f"Account balance may not have been updated for FT ID {created_ft.id}. Review AccountManager logs.")
-            
             return created_ft
         except Exception as e:
             logger.error(f"Error creating financial transaction for account {account_id}: {e}", exc_info=True)
@@ -104,6 +122,81 @@ class FinancialTransactionManager:
             raise # خطا را دوباره raise کنید تا لایه بالاتر (مثلاً InvoiceManager) آن را مدیریت کند
 
 
+    def post_journal_entry(self,
+                           transaction_date: datetime,
+                           lines: Sequence[JournalLine],
+                           description: Optional[str] = None,
+                           category: Optional[str] = None,
+                           reference_id: Optional[int] = None,
+                           reference_type: Optional[ReferenceType] = None,
+                           fiscal_year_id: Optional[int] = None) -> List[FinancialTransactionEntity]:
+        """
+        یک سند حسابداری چند ردیفی را در یک تراکنش دیتابیس ثبت می‌کند.
+        مبلغ ردیف‌ها به واحد خرد گرد می‌شود و تراز بودن سند (جمع بدهکار = جمع بستانکار) یک بار روی همین
+        مبالغ گرد شده بررسی می‌شود، پس سند ذخیره شده هم دقیقاً تراز است. نوع تراکنش هر ردیف از ماهیت
+        حساب آن تعیین می‌شود (AccountManager.transaction_type_for). همه ردیف‌ها با یک executemany درج می‌شوند.
+        مانده حساب‌ها و snapshot روزانه آن‌ها برای هر حساب یک بار (با جمع اثر ردیف‌های آن حساب) به‌روز می‌شوند.
+        ردیفی که توضیح ندارد، description سند را می‌گیرد.
+        """
+        if not isinstance(transaction_date, (datetime, date)):
+            raise ValueError("تاریخ تراکنش باید معتبر باشد.")
+        transaction_date_dt = transaction_date if isinstance(transaction_date, datetime) else datetime.combine(transaction_date, datetime.min.time())
+        if not lines:
+            raise ValueError("سند حسابداری باید حداقل یک ردیف داشته باشد.")
+
+        amounts: List[Tuple[JournalLine, Decimal, bool]] = []
+        total_debit = Decimal("0")
+        total_credit = Decimal("0")
+        for line in lines:
+            if not isinstance(line.account_id, int) or line.account_id <= 0:
+                raise ValueError("شناسه حساب نامعتبر است.")
+            try:
+                debit = Money.of(line.debit or 0).to_decimal()
+                credit = Money.of(line.credit or 0).to_decimal()
+            except ValueError:
+                raise ValueError("مبلغ ردیف سند باید عددی باشد.")
+            if debit < 0 or credit < 0 or (debit > 0) == (credit > 0):
+                raise ValueError("هر ردیف سند باید دقیقاً یک مبلغ مثبت بدهکار یا بستانکار داشته باشد.")
+            amounts.append((line, debit or credit, debit > 0))
+            total_debit += debit
+            total_credit += credit
+        if total_debit != total_credit:
+            raise ValueError(f"سند تراز نیست: جمع بدهکار {total_debit} و جمع بستانکار {total_credit}.")
+
+        account_types = self.account_manager.posting_rules.account_types({line.account_id for line in lines})
+        missing_ids = sorted({line.account_id for line in lines} - set(account_types))
+        if missing_ids:
+            raise ValueError(f"حساب‌های سند یافت نشدند: {', '.join(map(str, missing_ids))}")
+
+        entities: List[FinancialTransactionEntity] = []
+        balance_deltas: Dict[int, Decimal] = {}
+        for line, amount, is_debit in amounts:
+            transaction_type = self.account_manager.transaction_type_for(account_types[line.account_id], is_debit)
+            entities.append(FinancialTransactionEntity(
+                transaction_date=transaction_date_dt,
+                account_id=line.account_id,
+                transaction_type=transaction_type,
+                amount=amount,
+                description=line.description if line.description is not None else description,
+                category=category,
+                reference_id=reference_id,
+                reference_type=reference_type,
+                fiscal_year_id=fiscal_year_id
+            ))
+            balance_deltas[line.account_id] = (balance_deltas.get(line.account_id, Decimal("0"))
+                                               + self.account_manager.balance_effect(transaction_type, amount))
+
+        with self.ft_repository.db_manager.transaction():
+            if self.ft_repository.add_many(entities) is None:
+                raise Exception("خطا در ذخیره ردیف‌های سند حسابداری.")
+            self.account_manager.apply_balance_deltas(balance_deltas)
+            self.ft_repository.apply_balance_snapshot_deltas(
+                transaction_date_dt.date(), {account_id: delta for account_id, delta in balance_deltas.items() if delta != 0})
+
+        logger.info(f"Journal entry posted: FT IDs {entities[0].id}..{entities[-1].id}, {len(entities)} lines, "
+                    f"total {total_debit}, reference {reference_type.value if reference_type else None}:{reference_id}.")
+        return entities
+
     def record_transfer(self,
                         transaction_date: datetime,
                         from_account_id: int,
@@ -115,10 +208,9 @@ class FinancialTransactionManager:
                         reference_type: Optional[ReferenceType] = None,
                         fiscal_year_id: Optional[int] = None) -> tuple[Optional[FinancialTransactionEntity], Optional[FinancialTransactionEntity]]:
         """
-        Records a transfer between two accounts.
-        This creates two financial transactions: one 'EXPENSE' from the source, one 'INCOME' to the destination.
-        Returns a tuple of the two created FinancialTransactionEntity objects.
-        This entire operation should ideally be atomic (all or nothing).
+        Records a transfer between two accounts as one journal entry:
+        Cr. the source account, Dr. the destination account (atomic, via post_journal_entry).
+        Returns a tuple of the two created FinancialTransactionEntity objects (outflow, inflow).
         """
         if from_account_id == to_account_id:
             raise ValueError("حساب مبدا و مقصد نمی‌توانند یکسان باشند.")
@@ -126,94 +218,19 @@ class FinancialTransactionManager:
             raise ValueError("مبلغ انتقال باید مثبت باشد.")
 
         logger.info(f"Recording transfer of {amount} from AccID {from_account_id} to AccID {to_account_id}.")
-        
-        # For simplicity, we perform these sequentially.
-        # In a production system, this should be a database transaction.
-        ft_out = None
-        ft_in = None
-        
-        try:
-            # Leg 1: Outflow from source account (treated as an EXPENSE for this account's balance)
-            desc_out = f"Transfer to account ID {to_account_id}"
-            if description: desc_out = f"{description} (To Acc: {to_account_id})"
-            
-            ft_out = self.create_financial_transaction(
-                transaction_date=transaction_date,
-                account_id=from_account_id,
-                transaction_type=FinancialTransactionType.EXPENSE, # Or FinancialTransactionType.TRANSFER if AccountManager interprets it as outflow
-                amount=amount,
-                description=desc_out,
-                category=category,
-                reference_id=reference_id,
-                reference_type=reference_type,
-                fiscal_year_id=fiscal_year_id
-            )
-            if not ft_out: # If first leg fails
-                logger.error(f"Failed to create outflow transaction for transfer from {from_account_id}.")
-                # No rollback needed for ft_in as it hasn't been created.
-                raise Exception("مرحله اول انتقال (خروج از حساب مبدا) ناموفق بود.")
-
-            # Leg 2: Inflow to destination account (treated as an INCOME for this account's balance)
-            desc_in = f"Transfer from account ID {from_account_id}"
-            if description: desc_in = f"{description} (From Acc: {from_account_id})"
-            
-            ft_in = self.create_financial_transaction(
-                transaction_date=transaction_date,
-                account_id=to_account_id,
-                transaction_type=FinancialTransactionType.INCOME, # Or FinancialTransactionType.TRANSFER if AccountManager interprets it as inflow
-                amount=amount,
-                description=desc_in,
-                category=category,
-                reference_id=reference_id, # Could link ft_out.id as reference too
-                reference_type=reference_type,
-                fiscal_year_id=fiscal_year_id
-            )
-            if not ft_in: # If second leg fails
-                logger.error(f"Failed to create inflow transaction for transfer to {to_account_id}. First leg (FT ID: {ft_out.id}) was successful but needs reversal.")
-                # CRITICAL: Rollback or reverse ft_out here!
-                # This is where a true transaction management system is needed.
-                # For now, we'll log and raise. Manual correction would be needed.
-                # A simple reversal would be to create an opposite FT for from_account_id.
-                self._attempt_reversal(ft_out)
-                raise Exception("مرحله دوم انتقال (ورود به حساب مقصد) ناموفق بود. انتقال کامل نشد و نیاز به بررسی دستی دارد.")
-                
-            logger.info(f"Transfer successful: FT_Out_ID={ft_out.id}, FT_In_ID={ft_in.id}")
-            return ft_out, ft_in
-
-        except Exception as e:
-            logger.error(f"Transfer failed: {e}", exc_info=True)
-            # If ft_out was created but ft_in failed, ft_out needs reversal if not handled by _attempt_reversal
-            # This simplistic try-except doesn't guarantee atomicity.
-            raise # Re-raise the exception
-
-
-    def _attempt_reversal(self, original_ft: FinancialTransactionEntity):
-        """Helper to attempt reversing a transaction. FOR INTERNAL USE AND SIMPLIFICATION."""
-        if not original_ft: return
-        logger.warning(f"Attempting to reverse FT ID: {original_ft.id} for account {original_ft.account_id}")
-        reversal_type = None
-        if original_ft.transaction_type == FinancialTransactionType.INCOME:
-            reversal_type = FinancialTransactionType.EXPENSE
-        elif original_ft.transaction_type == FinancialTransactionType.EXPENSE:
-            reversal_type = FinancialTransactionType.INCOME
-        
-        if reversal_type:
-            try:
-                self.create_financial_transaction(
-                    transaction_date=datetime.now(), # Reversal date
-                    account_id=original_ft.account_id,
-                    transaction_type=reversal_type,
-                    amount=original_ft.amount,
-                    description=f"Reversal of FT ID: {original_ft.id} - {original_ft.description}",
-                    category="Reversal",
-                    fiscal_year_id=original_ft.fiscal_year_id 
-                    # reference_id could point to original_ft.id
-                )
-                logger.info(f"Reversal transaction created for FT ID: {original_ft.id}")
-            except Exception as rev_e:
-                logger.error(f"CRITICAL: Failed to create reversal for FT ID: {original_ft.id}. Manual correction required. Error: {rev_e}")
-        else:
-            logger.error(f"Cannot determine reversal type for FT ID: {original_ft.id} with type {original_ft.transaction_type}. Manual correction required.")
+        desc_out = f"{description} (To Acc: {to_account_id})" if description else f"Transfer to account ID {to_account_id}"
+        desc_in = f"{description} (From Acc: {from_account_id})" if description else f"Transfer from account ID {from_account_id}"
+        ft_out, ft_in = self.post_journal_entry(
+            transaction_date,
+            [JournalLine(from_account_id, credit=amount, description=desc_out),
+             JournalLine(to_account_id, debit=amount, description=desc_in)],
+            category=category,
+            reference_id=reference_id,
+            reference_type=reference_type,
+            fiscal_year_id=fiscal_year_id
+        )
+        logger.info(f"Transfer successful: FT_Out_ID={ft_out.id}, FT_In_ID={ft_in.id}")
+        return ft_out, ft_in
 
 
     def get_transaction_by_id(self, transaction_id: int) -> Optional[FinancialTransactionEntity]:
@@ -250,7 +267,12 @@ class FinancialTransactionManager:
             return False # Or True if "not found" means "already deleted"
 
         try:
-            self.ft_repository.delete(transaction_id)
+            with self.ft_repository.db_manager.transaction():
+                self.ft_repository.delete(transaction_id)
+                # snapshot های مانده روزانه همیشه با ردیف‌های financial_transactions هماهنگ می‌مانند
+                self.ft_repository.apply_balance_snapshot_delta(
+                    ft_to_delete.account_id, ft_to_delete.transaction_date.date(),
+                    -self.account_manager.balance_effect(ft_to_delete.transaction_type, ft_to_delete.amount))
             logger.info(f"FinancialTransaction ID {transaction_id} deleted from repository.")
             # CRITICAL: The balance on account ft_to_delete.account_id is now stale.
             # A robust system would require calling account_manager.process_financial_transaction
@@ -270,7 +292,70 @@ class FinancialTransactionManager:
         """
         تمام تراکنش‌های مالی را در یک بازه زمانی مشخص واکشی می‌کند.
         """
-        criteria = {}
+        criteria = self._date_range_criteria(start_date, end_date)
+        if not criteria:
+            return self.ft_repository.get_all(order_by="transaction_date ASC, id ASC")
+
+        logger.debug(f"Fetching transactions with criteria: {criteria}")
+        return self.ft_repository.find_by_criteria(criteria, order_by="transaction_date ASC, id ASC")
+
+    def iter_transactions_by_date_range(self,
+                                        start_date: Optional[date] = None,
+                                        end_date: Optional[date] = None
+                                        ) -> Iterator[FinancialTransactionEntity]:
+        """
+        مانند get_transactions_by_date_range، اما تراکنش‌ها را به صورت تدریجی (generator) برمی‌گرداند
+        تا گزارش‌ها بتوانند دفاتر چندساله را بدون بارگذاری کامل در حافظه پیمایش کنند.
+        """
+        criteria = self._date_range_criteria(start_date, end_date)
+        return self.ft_repository.iter_by_criteria(criteria, order_by="transaction_date ASC, id ASC")
+
+    def get_account_turnovers(self,
+                              start_date: Optional[date] = None,
+                              end_date: Optional[date] = None
+                              ) -> Dict[int, Dict[FinancialTransactionType, Decimal]]:
+        """گردش هر حساب به تفکیک نوع تراکنش در بازه (یک کوئری GROUP BY در دیتابیس)."""
+        return self.ft_repository.get_turnovers_by_account(start_date, end_date)
+
+    def get_account_turnovers_by_period(self,
+                                        period_starts: List[date],
+                                        end_date: date,
+                                        account_types: Optional[List[AccountType]] = None
+                                        ) -> Dict[int, Dict[int, Dict[FinancialTransactionType, Decimal]]]:
+        """گردش هر حساب به تفکیک دوره (مرزها: period_starts) و نوع تراکنش، با یک اسکن GROUP BY."""
+        return self.ft_repository.get_turnovers_by_period(period_starts, end_date, account_types)
+
+    def get_account_net_effect_before(self, account_id: int, before_date: date) -> Decimal:
+        """
+        اثر خالص تراکنش‌های یک حساب قبل از before_date (برای مانده از قبل دفتر کل)؛
+        همان مانده پایان روز قبل در account_balance_snapshots است و با یک جستجوی index خوانده می‌شود.
+        """
+        return self.ft_repository.get_snapshot_balance_as_of(account_id, before_date - timedelta(days=1))
+
+    def iter_account_ledger_batches(self,
+                                    account_id: int,
+                                    start_date: Optional[date],
+                                    end_date: Optional[date],
+                                    after_key: Optional[Tuple[str, int]] = None,
+                                    limit: Optional[int] = None) -> Iterator[List[Any]]:
+        """ردیف‌های دفتر یک حساب با جمع تجمعی اثر تراکنش‌ها، به ترتیب (تاریخ، شناسه) و به صورت دسته‌ای."""
+        return self.ft_repository.iter_ledger_batches(account_id, start_date, end_date, after_key=after_key, limit=limit)
+
+    def iter_journal_batches(self,
+                             start_date: Optional[date],
+                             end_date: Optional[date],
+                             after_key: Optional[Tuple[str, int]] = None,
+                             limit: Optional[int] = None) -> Iterator[List[Any]]:
+        """ردیف‌های دفتر روزنامه همراه با نام و نوع حساب، به ترتیب (تاریخ، شناسه) و به صورت دسته‌ای."""
+        return self.ft_repository.iter_journal_batches(start_date, end_date, after_key=after_key, limit=limit)
+
+    def iter_column_batches(self, end_date: Optional[date] = None, with_details: bool = False) -> Iterator[List[Any]]:
+        """همه تراکنش‌ها تا end_date (بدون ترتیب) برای ساخت آرایه‌های موتور ستونی گزارش‌ها."""
+        return self.ft_repository.iter_column_batches(end_date, with_details=with_details)
+
+    @staticmethod
+    def _date_range_criteria(start_date: Optional[date], end_date: Optional[date]) -> Dict[str, Any]:
+        criteria: Dict[str, Any] = {}
         # --- شروع اصلاح ---
         if start_date and end_date:
             criteria['transaction_date'] = ('BETWEEN', (
@@ -282,9 +367,4 @@ class FinancialTransactionManager:
         elif end_date:
             criteria['transaction_date'] = ('<=', end_date.strftime('%Y-%m-%d 23:59:59'))
         # --- پایان اصلاح ---
-        
-        if not criteria:
-            return self.ft_repository.get_all(order_by="transaction_date ASC, id ASC")
-
-        logger.debug(f"Fetching transactions with criteria: {criteria}")
-        return self.ft_repository.find_by_criteria(criteria, order_by="transaction_date ASC, id ASC")
+        return criteria
@@ -6,12 +6,15 @@ from decimal import Decimal, InvalidOperation
 
 # --- Entity و Constant Imports ---
 # FIX: افزودن ProductType و AccountType برای رفع NameError
+from src.config import UI_LIST_PAGE_SIZE
+from src.data_access.entity_cache import entity_session
 from .entities.invoice_entity import InvoiceEntity
 from .entities.invoice_item_entity import InvoiceItemEntity
+from .financial_transaction_manager import JournalLine
 from src.constants import (
     InvoiceType, PersonType, InvoiceStatus, 
-    InventoryMovementType, ReferenceType, FinancialTransactionType, 
-    DATE_FORMAT, ProductType, AccountType
+    InventoryMovementType, ReferenceType, 
+    DATE_FORMAT, ProductType
 )
 
 # --- Manager and Repository Imports (با استفاده از TYPE_CHECKING برای جلوگیری از وابستگی دورانی) ---
@@ -22,6 +25,7 @@ if TYPE_CHECKING:
     from .account_manager import AccountManager
     from ..data_access.invoices_repository import InvoicesRepository
     from ..data_access.invoice_items_repository import InvoiceItemsRepository
+    from ..data_access.base_repository import KeysetPage, KeysetKey
 
 import logging
 logger = logging.getLogger(__name__)
@@ -75,12 +79,12 @@ class InvoiceManager:
         invoice.items = self.invoice_items_repo.get_by_invoice_id(invoice.id)
         
         if invoice.items and self.product_manager:
+            products = self.product_manager.get_products_by_ids(item.product_id for item in invoice.items)
             for item in invoice.items:
-                if item.product_id:
-                    product = self.product_manager.get_product_by_id(item.product_id)
-                    if product:
-                        item.product_name = product.name
-                        item.unit_of_measure = product.unit_of_measure
+                product = products.get(item.product_id)
+                if product:
+                    item.product_name = product.name
+                    item.unit_of_measure = product.unit_of_measure
         return invoice
 
 
@@ -88,15 +92,39 @@ class InvoiceManager:
         """لیستی از تمام فاکتورها را برای نمایش در جدول اصلی برمی‌گرداند."""
         logger.debug("Fetching all invoice summaries.")
         all_invoices = self.invoices_repo.get_all(order_by="invoice_date DESC, id DESC")
-        if self.person_manager:
-            for inv in all_invoices:
-                if inv.person_id:
-                    person = self.person_manager.get_person_by_id(inv.person_id)
-                    if person:
-                        inv.person_name = person.name 
+        self._attach_person_names(all_invoices)
         return all_invoices
 
-        return all_invoices
+    def get_invoices_page(self,
+                          after_key: Optional['KeysetKey'] = None,
+                          page_size: int = UI_LIST_PAGE_SIZE,
+                          invoice_type: Optional[InvoiceType] = None,
+                          person_id: Optional[int] = None) -> 'KeysetPage[InvoiceEntity]':
+        """یک صفحه از فاکتورها به ترتیب (invoice_date DESC, id DESC) برای جدول اصلی (صفحه‌بندی keyset)."""
+        page = self.invoices_repo.get_page("invoice_date", page_size, after_key,
+                                           self._invoice_list_criteria(invoice_type, person_id))
+        self._attach_person_names(page.items)
+        return page
+
+    def _attach_person_names(self, invoices: List[InvoiceEntity]) -> None:
+        """نام اشخاص را با یک کوئری دسته‌ای (نه یک کوئری برای هر فاکتور) روی فاکتورها قرار می‌دهد."""
+        if not self.person_manager or not invoices:
+            return
+        persons = self.person_manager.get_persons_by_ids(inv.person_id for inv in invoices)
+        for inv in invoices:
+            person = persons.get(inv.person_id)
+            if person:
+                inv.person_name = person.name
+
+    def count_invoices(self, invoice_type: Optional[InvoiceType] = None, person_id: Optional[int] = None) -> int:
+        return self.invoices_repo.count_by_criteria(self._invoice_list_criteria(invoice_type, person_id))
+
+    @staticmethod
+    def _invoice_list_criteria(invoice_type: Optional[InvoiceType], person_id: Optional[int]) -> Dict[str, Any]:
+        criteria: Dict[str, Any] = {}
+        if invoice_type: criteria["invoice_type"] = invoice_type.value
+        if person_id: criteria["person_id"] = person_id
+        return criteria
     def create_invoice(self, 
                        invoice_date: date, 
                        person_id: int, 
@@ -139,28 +167,27 @@ class InvoiceManager:
             description=description
         )
 
-        created_header: Optional[InvoiceEntity] = None
         try:
-            created_header = self.invoices_repo.add(header_entity)
-            if not created_header or not created_header.id:
-                raise Exception("خطا در ذخیره هدر فاکتور در پایگاه داده.")
-            
-            for item in processed_items:
-                item.invoice_id = created_header.id
-                if not self.invoice_items_repo.add(item):
-                     raise Exception(f"خطا در ذخیره قلم فاکتور برای کالا ID {item.product_id}.")
-            
-            created_header.items = processed_items
-            
-            self._record_financial_impact(created_header)
-            self._record_stock_movements(created_header)
-            
+            # هدر، اقلام، اسناد مالی و حرکات انبار در یک تراکنش (و یک نشست موجودیت) ثبت می‌شوند
+            with entity_session(), self.invoices_repo.db_manager.transaction():
+                created_header = self.invoices_repo.add(header_entity)
+                if not created_header or not created_header.id:
+                    raise Exception("خطا در ذخیره هدر فاکتور در پایگاه داده.")
+
+                for item in processed_items:
+                    item.invoice_id = created_header.id
+                if self.invoice_items_repo.add_many(processed_items) is None:
+                    raise Exception("خطا در ذخیره اقلام فاکتور.")
+
+                created_header.items = processed_items
+
+                self._record_financial_impact(created_header)
+                self._record_stock_movements(created_header)
+
             return self.get_invoice_with_items(created_header.id)
 
         except Exception as e:
-            logger.error(f"Error during Invoice creation for {invoice_number}. Rolling back if possible.", exc_info=True)
-            if created_header and created_header.id:
-                self.invoices_repo.delete(created_header.id)
+            logger.error(f"Error during Invoice creation for {invoice_number}. Transaction rolled back.", exc_info=True)
             raise e
     
     def update_payment_status(self, invoice_id: int, payment_amount_change: Decimal):
@@ -245,30 +272,16 @@ class InvoiceManager:
             if not ar_account_id or not revenue_account_id:
                 raise ValueError("تنظیمات حساب‌های دریافتنی یا درآمد فروش برای برگرداندن آثار مالی فاکتور فروش یافت نشد.")
 
-            # ۱. برگرداندن (بستانکار کردن) حساب دریافتنی کل
-            logger.debug(f"  Reversing AR: Cr. Account ID {ar_account_id}, Amount {invoice_to_reverse.total_amount}")
-            self.ft_manager.create_financial_transaction(
-                transaction_date=transaction_date_to_use, 
-                account_id=ar_account_id,
-                transaction_type=FinancialTransactionType.EXPENSE, # برای بستانکار کردن حساب دارایی
-                amount=invoice_to_reverse.total_amount, 
-                description=f"{base_description_reversal} (Accounts Receivable)", 
-                fiscal_year_id=invoice_to_reverse.fiscal_year_id, 
-                reference_id=invoice_to_reverse.id, 
+            # Dr. Sales Revenue (کاهش درآمد), Cr. Accounts Receivable (کاهش دارایی)
+            logger.debug(f"  Reversing sale: Dr. Account ID {revenue_account_id}, Cr. Account ID {ar_account_id}, Amount {invoice_to_reverse.total_amount}")
+            self.ft_manager.post_journal_entry(
+                transaction_date_to_use,
+                [JournalLine(revenue_account_id, debit=invoice_to_reverse.total_amount, description=f"{base_description_reversal} (Sales Revenue)"),
+                 JournalLine(ar_account_id, credit=invoice_to_reverse.total_amount, description=f"{base_description_reversal} (Accounts Receivable)")],
+                fiscal_year_id=invoice_to_reverse.fiscal_year_id,
+                reference_id=invoice_to_reverse.id,
                 reference_type=ReferenceType.INVOICE_REVERSAL # نوع مرجع جدید
             )
-            # ۲. برگرداندن (بدهکار کردن) حساب درآمد فروش
-            logger.debug(f"  Reversing Revenue: Dr. Account ID {revenue_account_id}, Amount {invoice_to_reverse.total_amount}")
-            self.ft_manager.create_financial_transaction(
-                transaction_date=transaction_date_to_use, 
-                account_id=revenue_account_id,
-                transaction_type=FinancialTransactionType.EXPENSE, # برای بدهکار کردن حساب درآمد
-                amount=invoice_to_reverse.total_amount, 
-                description=f"{base_description_reversal} (Sales Revenue)", 
-                fiscal_year_id=invoice_to_reverse.fiscal_year_id, 
-                reference_id=invoice_to_reverse.id, 
-                reference_type=ReferenceType.INVOICE_REVERSAL
-            )
             # TODO: برگرداندن آثار بهای تمام شده کالای فروش رفته (COGS)
             # اگر COGS ثبت شده بود، باید: Dr. Inventory, Cr. COGS Account
 
@@ -291,36 +304,15 @@ class InvoiceManager:
             if not ap_account_id or not original_debit_account_id:
                 raise ValueError("تنظیمات حساب‌های پرداختنی یا حساب بدهکار (موجودی/هزینه) برای برگرداندن آثار فاکتور خرید یافت نشد.")
 
-            # ۱. برگرداندن (بدهکار کردن) حساب پرداختنی کل
-            logger.debug(f"  Reversing AP: Dr. Account ID {ap_account_id}, Amount {invoice_to_reverse.total_amount}")
-            self.ft_manager.create_financial_transaction(
-                transaction_date=transaction_date_to_use, 
-                account_id=ap_account_id,
-                transaction_type=FinancialTransactionType.EXPENSE, # برای بدهکار کردن حساب بدهی
-                amount=invoice_to_reverse.total_amount, 
-                description=f"{base_description_reversal} (Accounts Payable)", 
-                fiscal_year_id=invoice_to_reverse.fiscal_year_id, 
-                reference_id=invoice_to_reverse.id, 
-                reference_type=ReferenceType.INVOICE_REVERSAL
-            )
-            # ۲. برگرداندن (بستانکار کردن) حساب موجودی کالا / هزینه خرید
-            original_debit_account_entity = self.account_manager.get_account_by_id(original_debit_account_id)
-            if not original_debit_account_entity:
-                 raise ValueError(f"حساب بدهکار اصلی با شناسه {original_debit_account_id} یافت نشد.")
-            
-            # اگر حساب اصلی دارایی بود (موجودی کالا)، برای بستانکار کردنش از EXPENSE استفاده می‌کنیم
-            # اگر حساب اصلی هزینه بود (هزینه خرید)، برای بستانکار کردنش (کاهش هزینه) از INCOME استفاده می‌کنیم
-            reversal_type_for_debit_acc = FinancialTransactionType.EXPENSE if original_debit_account_entity.type == AccountType.ASSET else FinancialTransactionType.INCOME
-            
-            logger.debug(f"  Reversing Inventory/Expense: Cr. Account ID {original_debit_account_id}, Amount {invoice_to_reverse.total_amount}, Type: {reversal_type_for_debit_acc.value}")
-            self.ft_manager.create_financial_transaction(
-                transaction_date=transaction_date_to_use, 
-                account_id=original_debit_account_id,
-                transaction_type=reversal_type_for_debit_acc,
-                amount=invoice_to_reverse.total_amount, 
-                description=f"{base_description_reversal} (Inventory/Purchase Expense)", 
-                fiscal_year_id=invoice_to_reverse.fiscal_year_id, 
-                reference_id=invoice_to_reverse.id, 
+            # Dr. Accounts Payable (کاهش بدهی), Cr. موجودی کالا / هزینه خرید
+            # (نوع تراکنش ردیف بستانکار از ماهیت همان حساب تعیین می‌شود)
+            logger.debug(f"  Reversing purchase: Dr. Account ID {ap_account_id}, Cr. Account ID {original_debit_account_id}, Amount {invoice_to_reverse.total_amount}")
+            self.ft_manager.post_journal_entry(
+                transaction_date_to_use,
+                [JournalLine(ap_account_id, debit=invoice_to_reverse.total_amount, description=f"{base_description_reversal} (Accounts Payable)"),
+                 JournalLine(original_debit_account_id, credit=invoice_to_reverse.total_amount, description=f"{base_description_reversal} (Inventory/Purchase Expense)")],
+                fiscal_year_id=invoice_to_reverse.fiscal_year_id,
+                reference_id=invoice_to_reverse.id,
                 reference_type=ReferenceType.INVOICE_REVERSAL
             )
         
@@ -367,31 +359,16 @@ class InvoiceManager:
             raise ValueError(f"Could not find AR/AP account for Person ID {invoice.person_id}")
 
         if invoice.invoice_type == InvoiceType.SALE:
-            revenue_account_id = self.account_manager.get_default_account_id_by_name("فروش")
+            revenue_account_id = self.account_manager.posting_rules.account_id("sales_revenue")
             if not revenue_account_id:
                  raise ValueError("حساب پیش‌فرض 'فروش' یافت نشد.")
 
-            # --- شروع اصلاح منطق حسابداری ---
-            # برای فاکتور فروش:
-            # ۱. حساب‌های دریافتنی (دارایی) بدهکار (افزایش) می‌شود. نوع تراکنش: INCOME
-            # ۲. حساب درآمد فروش (درآمد) بستانکار (افزایش) می‌شود. نوع تراکنش: INCOME
-
-            logger.debug(f"  Recording financial impact: Dr. Accounts Receivable (ID: {ar_ap_account_id}), Amount: {invoice.total_amount}")
-            self.ft_manager.create_financial_transaction(
-                transaction_date=transaction_date_dt, 
-                account_id=ar_ap_account_id, 
-                transaction_type=FinancialTransactionType.INCOME, # <<< اصلاح شد: برای افزایش دارایی
-                amount=invoice.total_amount, 
-                description=f"{description} (AR)"
-            )
-
-            logger.debug(f"  Recording financial impact: Cr. Sales Revenue (ID: {revenue_account_id}), Amount: {invoice.total_amount}")
-            self.ft_manager.create_financial_transaction(
-                transaction_date=transaction_date_dt, 
-                account_id=revenue_account_id, 
-                transaction_type=FinancialTransactionType.INCOME, # صحیح بود
-                amount=invoice.total_amount, 
-                description=f"{description} (Revenue)"
+            # برای فاکتور فروش: Dr. Accounts Receivable (افزایش دارایی), Cr. Sales Revenue (افزایش درآمد)
+            logger.debug(f"  Recording financial impact: Dr. Accounts Receivable (ID: {ar_ap_account_id}), Cr. Sales Revenue (ID: {revenue_account_id}), Amount: {invoice.total_amount}")
+            self.ft_manager.post_journal_entry(
+                transaction_date_dt,
+                [JournalLine(ar_ap_account_id, debit=invoice.total_amount, description=f"{description} (AR)"),
+                 JournalLine(revenue_account_id, credit=invoice.total_amount, description=f"{description} (Revenue)")]
             )
 
         # --- شروع بخش جدید برای فاکتور خرید ---
@@ -416,14 +393,13 @@ class InvoiceManager:
                 if not debit_account_id: raise ValueError("حساب پیش‌فرض 'هزینه خرید' یافت نشد.")
                 debit_desc_suffix = "(Purchase Expense)"
 
-            # ۱. بدهکار کردن حساب موجودی کالا / هزینه خرید
-            # برای هر دو (که یکی دارایی و دیگری هزینه است)، افزایش آن‌ها با تراکنش INCOME ثبت می‌شود
-            self.ft_manager.create_financial_transaction(transaction_date_dt, debit_account_id, FinancialTransactionType.INCOME, invoice.total_amount, f"{description} {debit_desc_suffix}")
-
-            # ۲. بستانکار کردن حساب پرداختنی (یک بدهی افزایش می‌یابد)
-            self.ft_manager.create_financial_transaction(transaction_date_dt, ap_account_id, FinancialTransactionType.INCOME, invoice.total_amount, f"{description} (AP)")
+            # Dr. موجودی کالا / هزینه خرید, Cr. Accounts Payable (یک بدهی افزایش می‌یابد)
+            self.ft_manager.post_journal_entry(
+                transaction_date_dt,
+                [JournalLine(debit_account_id, debit=invoice.total_amount, description=f"{description} {debit_desc_suffix}"),
+                 JournalLine(ap_account_id, credit=invoice.total_amount, description=f"{description} (AP)")]
+            )
         # --- پایان بخش جدید برای فاکتور خرید ---
-            # --- پایان اصلاح ---
     def _record_stock_movements(self, invoice: InvoiceEntity):
         """
         برای هر قلم کالای موجود در فاکتور، یک حرکت انبار ثبت می‌کند.
@@ -462,15 +438,15 @@ class InvoiceManager:
         ar_ap_account_id = self.account_manager.get_person_subsidiary_account_id(invoice_to_reverse.person_id)
         if not ar_ap_account_id: return False
 
-        revenue_expense_account_id = self.account_manager.get_default_account_id_by_name("فروش")
+        revenue_expense_account_id = self.account_manager.posting_rules.account_id("sales_revenue")
         if not revenue_expense_account_id: return False
 
         if invoice_to_reverse.invoice_type == InvoiceType.SALE:
             # برگرداندن ثبت فروش:
-            # ۱. حساب‌های دریافتنی (دارایی) بستانکار (کاهش) می‌شود. نوع تراکنش: EXPENSE
-            # ۲. حساب درآمد فروش (درآمد) بدهکار (کاهش) می‌شود. نوع تراکنش: EXPENSE
-            self.ft_manager.create_financial_transaction(reversal_date_dt, ar_ap_account_id, FinancialTransactionType.EXPENSE, invoice_to_reverse.total_amount, description)
-            self.ft_manager.create_financial_transaction(reversal_date_dt, revenue_expense_account_id, FinancialTransactionType.EXPENSE, invoice_to_reverse.total_amount, description)
+            # Dr. Sales Revenue (کاهش درآمد), Cr. Accounts Receivable (کاهش دارایی)
+            self.ft_manager.post_journal_entry(reversal_date_dt, [JournalLine(revenue_expense_account_id, debit=invoice_to_reverse.total_amount),
+                                                                  JournalLine(ar_ap_account_id, credit=invoice_to_reverse.total_amount)],
+                                               description=description)
         elif invoice_to_reverse.invoice_type == InvoiceType.PURCHASE:
             ap_account_id = ar_ap_account_id
             
@@ -488,9 +464,10 @@ class InvoiceManager:
             
             # برگرداندن ثبت خرید:
             # ۱. بدهکار کردن حساب پرداختنی (کاهش بدهی)
-            self.ft_manager.create_financial_transaction(reversal_date_dt, ap_account_id, FinancialTransactionType.EXPENSE, invoice_to_reverse.total_amount, description)
             # ۲. بستانکار کردن حساب موجودی کالا / هزینه خرید
-            self.ft_manager.create_financial_transaction(reversal_date_dt, debit_account_id, FinancialTransactionType.EXPENSE, invoice_to_reverse.total_amount, description)
+            self.ft_manager.post_journal_entry(reversal_date_dt, [JournalLine(ap_account_id, debit=invoice_to_reverse.total_amount),
+                                                                  JournalLine(debit_account_id, credit=invoice_to_reverse.total_amount)],
+                                               description=description)
         # --- پایان بخش جدید ---
         return True
 
@@ -507,42 +484,45 @@ class InvoiceManager:
         reversal_datetime = datetime.now()
 
         try:
-            self._reverse_financial_impact(original_invoice, reversal_datetime, reversal_reason)
-            self._reverse_stock_movements(original_invoice, reversal_datetime, reversal_reason)
-            self.invoice_items_repo.delete_by_invoice_id(invoice_id)
-
-            new_items_data = update_data.get("items_data", [])
-            new_total_amount = sum(
-                (Decimal(str(item_data.get('quantity', 0))) * Decimal(str(item_data.get('unit_price', 0)))) 
-                for item_data in new_items_data
-            )
-
-            original_invoice.person_id = update_data.get("person_id", original_invoice.person_id)
-            original_invoice.invoice_date = update_data.get("invoice_date", original_invoice.invoice_date)
-            original_invoice.due_date = update_data.get("due_date", original_invoice.due_date)
-            original_invoice.description = update_data.get("description", original_invoice.description)
-            original_invoice.total_amount = new_total_amount
-
-            updated_header = self.invoices_repo.update(original_invoice)
-            if not updated_header: raise Exception("خطا در به‌روزرسانی هدر فاکتور.")
-
-            for item_dict in new_items_data:
-                item_entity = InvoiceItemEntity(
-                    invoice_id=invoice_id,
-                    product_id=item_dict.get('product_id'),
-                    quantity=Decimal(str(item_dict.get('quantity', 0))),
-                    unit_price=Decimal(str(item_dict.get('unit_price', 0))),
-                    description=item_dict.get('description')
+            with self.invoices_repo.db_manager.transaction():
+                self._reverse_financial_impact(original_invoice, reversal_datetime, reversal_reason)
+                self._reverse_stock_movements(original_invoice, reversal_datetime, reversal_reason)
+                self.invoice_items_repo.delete_by_invoice_id(invoice_id)
+
+                new_items_data = update_data.get("items_data", [])
+                new_total_amount = sum(
+                    (Decimal(str(item_data.get('quantity', 0))) * Decimal(str(item_data.get('unit_price', 0)))) 
+                    for item_data in new_items_data
                 )
-                if not self.invoice_items_repo.add(item_entity):
+
+                original_invoice.person_id = update_data.get("person_id", original_invoice.person_id)
+                original_invoice.invoice_date = update_data.get("invoice_date", original_invoice.invoice_date)
+                original_invoice.due_date = update_data.get("due_date", original_invoice.due_date)
+                original_invoice.description = update_data.get("description", original_invoice.description)
+                original_invoice.total_amount = new_total_amount
+
+                updated_header = self.invoices_repo.update(original_invoice)
+                if not updated_header: raise Exception("خطا در به‌روزرسانی هدر فاکتور.")
+
+                new_item_entities = [
+                    InvoiceItemEntity(
+                        invoice_id=invoice_id,
+                        product_id=item_dict.get('product_id'),
+                        quantity=Decimal(str(item_dict.get('quantity', 0))),
+                        unit_price=Decimal(str(item_dict.get('unit_price', 0))),
+                        description=item_dict.get('description')
+                    )
+                    for item_dict in new_items_data
+                ]
+                if self.invoice_items_repo.add_many(new_item_entities) is None:
                     raise Exception("خطا در ذخیره اقلام جدید فاکتور.")
             
-            full_updated_invoice = self.get_invoice_with_items(invoice_id)
-            if full_updated_invoice:
-                self._record_financial_impact(full_updated_invoice)
-                self._record_stock_movements(full_updated_invoice)
+                full_updated_invoice = self.get_invoice_with_items(invoice_id)
+                if full_updated_invoice:
+                    self._record_financial_impact(full_updated_invoice)
+                    self._record_stock_movements(full_updated_invoice)
 
-            return full_updated_invoice
+                return full_updated_invoice
 
         except Exception as e:
             logger.error(f"--- Error during comprehensive update of Invoice ID {invoice_id}: {e} ---", exc_info=True)
@@ -566,14 +546,15 @@ class InvoiceManager:
         reason_for_reversal = f"Cancel Inv {invoice_to_cancel.invoice_number}"
         
         try:
-            self._reverse_financial_impact(invoice_to_cancel, cancel_dt, reason_for_reversal)
-            self._reverse_stock_movements(invoice_to_cancel, cancel_dt, reason_for_reversal)
-            
-            invoice_to_cancel.status = InvoiceStatus.CANCELED
-            invoice_to_cancel.is_paid = False 
-            invoice_to_cancel.paid_amount = Decimal("0.0") 
-            
-            updated_invoice = self.invoices_repo.update(invoice_to_cancel)
+            with self.invoices_repo.db_manager.transaction():
+                self._reverse_financial_impact(invoice_to_cancel, cancel_dt, reason_for_reversal)
+                self._reverse_stock_movements(invoice_to_cancel, cancel_dt, reason_for_reversal)
+
+                invoice_to_cancel.status = InvoiceStatus.CANCELED
+                invoice_to_cancel.is_paid = False
+                invoice_to_cancel.paid_amount = Decimal("0.0")
+
+                updated_invoice = self.invoices_repo.update(invoice_to_cancel)
             logger.info(f"Invoice ID {invoice_id} status set to CANCELED.")
             
             return updated_invoice
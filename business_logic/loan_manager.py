@@ -10,12 +10,12 @@ from src.business_logic.entities.loan_installment_entity import LoanInstallmentE
 from src.data_access.loans_repository import LoansRepository
 from src.data_access.loan_installments_repository import LoanInstallmentsRepository
 
-from src.business_logic.financial_transaction_manager import FinancialTransactionManager
+from src.business_logic.financial_transaction_manager import FinancialTransactionManager, JournalLine
 from src.business_logic.person_manager import PersonManager
 from src.business_logic.account_manager import AccountManager
 
 from src.constants import (
-    LoanStatus, LoanDirectionType, PaymentMethod, FinancialTransactionType, 
+    LoanStatus, LoanDirectionType, PaymentMethod, 
     AccountType, ReferenceType, DATE_FORMAT
 )
 import logging
@@ -189,93 +189,77 @@ class LoanManager:
         )
 
         # --- Start Transactional Block ---
-        created_loan_header = None
         try:
-            created_loan_header = self.loans_repository.add(loan_entity)
-            if not created_loan_header or not created_loan_header.id:
-                raise Exception("خطا در ذخیره اطلاعات اصلی وام.")
-            
-            logger.info(f"Loan ID {created_loan_header.id} created for Person ID {person_id}, Amount: {loan_amount}.")
-
-            # Generate and save installments (Simplified: uses total_installment_amount)
-            # TODO: Implement proper amortization to break down principal and interest for each installment
-            #       and store it in LoanInstallmentEntity.
-            #       The _calculate_installments is a placeholder.
-            installments_data = self._calculate_installments(
-                Decimal(str(loan_amount)), Decimal(str(annual_interest_rate)), 
-                number_of_installments, start_date, Decimal(str(total_installment_amount))
-            )
-            
-            saved_installments = []
-            for inst_data in installments_data:
-                installment_entity = LoanInstallmentEntity(
-                    loan_id=created_loan_header.id, # type: ignore
-                    due_date=inst_data["due_date"],
-                    installment_amount=float(inst_data["installment_amount"]), # type: ignore
-                    principal_amount=float(inst_data["principal_amount"]), # Will be 0 with current placeholder
-                    interest_amount=float(inst_data["interest_amount"]),   # Will be 0 with current placeholder
-                    fiscal_year_id=fiscal_year_id # Or derive based on due_date
+            with self.loans_repository.db_manager.transaction():
+                created_loan_header = self.loans_repository.add(loan_entity)
+                if not created_loan_header or not created_loan_header.id:
+                    raise Exception("خطا در ذخیره اطلاعات اصلی وام.")
+
+                logger.info(f"Loan ID {created_loan_header.id} created for Person ID {person_id}, Amount: {loan_amount}.")
+
+                # Generate and save installments (Simplified: uses total_installment_amount)
+                # TODO: Implement proper amortization to break down principal and interest for each installment
+                #       and store it in LoanInstallmentEntity.
+                #       The _calculate_installments is a placeholder.
+                installments_data = self._calculate_installments(
+                    Decimal(str(loan_amount)), Decimal(str(annual_interest_rate)), 
+                    number_of_installments, start_date, Decimal(str(total_installment_amount))
                 )
-                saved_installments.append(self.loan_installments_repository.add(installment_entity))
-            
-            created_loan_header.installments = saved_installments # Attach to entity
-            logger.info(f"{len(saved_installments)} installments generated for Loan ID {created_loan_header.id}.")
 
-            # Record initial financial transaction for loan disbursement/receipt
-            ft_date = datetime.combine(start_date, datetime.min.time())
-            ft_desc_base = f"Loan ID {created_loan_header.id} - {loan_direction.value}"
-            
-            loan_gl_account_id = None
-            ft_type_for_bank = None
-            ft_type_for_loan_gl = None
-
-            if loan_direction == LoanDirectionType.GIVEN: # We gave the loan
-                loan_gl_account_id = self.accounts_config.get("loan_asset_account")
-                if not loan_gl_account_id: raise ValueError("حساب دارایی وام (پرداختی توسط ما) در تنظیمات یافت نشد.")
-                # Our Bank (Asset) decreases, Loan Asset increases
-                ft_type_for_bank = FinancialTransactionType.EXPENSE # Credit Bank
-                ft_type_for_loan_gl = FinancialTransactionType.INCOME # Debit Loan Asset
-            
-            elif loan_direction == LoanDirectionType.RECEIVED: # We received the loan
-                loan_gl_account_id = self.accounts_config.get("loan_liability_account")
-                if not loan_gl_account_id: raise ValueError("حساب بدهی وام (دریافتی توسط ما) در تنظیمات یافت نشد.")
-                # Our Bank (Asset) increases, Loan Liability increases
-                ft_type_for_bank = FinancialTransactionType.INCOME # Debit Bank
-                ft_type_for_loan_gl = FinancialTransactionType.INCOME # Credit Loan Liability
-            
-            if not loan_gl_account_id or not ft_type_for_bank or not ft_type_for_loan_gl:
-                 raise Exception("خطا در تعیین حساب‌های GL یا نوع تراکنش برای ثبت اولیه وام.")
-
-
-            # FT for the Bank/Cash account
-            self.ft_manager.create_financial_transaction(
-                transaction_date=ft_date, account_id=related_account_id,
-                transaction_type=ft_type_for_bank, amount=loan_amount,
-                description=f"{ft_desc_base} (Bank/Cash Leg)", fiscal_year_id=fiscal_year_id,
-                reference_id=created_loan_header.id, reference_type=ReferenceType.LOAN
-            )
-            # FT for the Loan GL Account (Loan Asset or Loan Liability)
-            self.ft_manager.create_financial_transaction(
-                transaction_date=ft_date, account_id=loan_gl_account_id,
-                transaction_type=ft_type_for_loan_gl, amount=loan_amount,
-                description=f"{ft_desc_base} (Loan GL Leg)", fiscal_year_id=fiscal_year_id,
-                reference_id=created_loan_header.id, reference_type=ReferenceType.LOAN
-            )
-            
-            # Update loan status after disbursement/receipt
-            created_loan_header.status = LoanStatus.ACTIVE
-            self.loans_repository.update(created_loan_header)
-            logger.info(f"Initial financial transaction for Loan ID {created_loan_header.id} recorded. Status set to ACTIVE.")
+                installment_entities = [
+                    LoanInstallmentEntity(
+                        loan_id=created_loan_header.id, # type: ignore
+                        due_date=inst_data["due_date"],
+                        installment_amount=float(inst_data["installment_amount"]), # type: ignore
+                        principal_amount=float(inst_data["principal_amount"]), # Will be 0 with current placeholder
+                        interest_amount=float(inst_data["interest_amount"]),   # Will be 0 with current placeholder
+                        fiscal_year_id=fiscal_year_id # Or derive based on due_date
+                    )
+                    for inst_data in installments_data
+                ]
+                # همه اقساط با یک executemany درج می‌شوند
+                saved_installments = self.loan_installments_repository.add_many(installment_entities)
+                if saved_installments is None:
+                    raise Exception("خطا در ذخیره اقساط وام.")
+
+                created_loan_header.installments = saved_installments # Attach to entity
+                logger.info(f"{len(saved_installments)} installments generated for Loan ID {created_loan_header.id}.")
+
+                # Record initial financial transaction for loan disbursement/receipt
+                ft_date = datetime.combine(start_date, datetime.min.time())
+                ft_desc_base = f"Loan ID {created_loan_header.id} - {loan_direction.value}"
+
+                bank_leg_description = f"{ft_desc_base} (Bank/Cash Leg)"
+                loan_leg_description = f"{ft_desc_base} (Loan GL Leg)"
+                if loan_direction == LoanDirectionType.GIVEN: # We gave the loan
+                    loan_gl_account_id = self.accounts_config.get("loan_asset_account")
+                    if not loan_gl_account_id: raise ValueError("حساب دارایی وام (پرداختی توسط ما) در تنظیمات یافت نشد.")
+                    # Dr. Loan Asset, Cr. Our Bank
+                    journal_lines = [JournalLine(loan_gl_account_id, debit=loan_amount, description=loan_leg_description),
+                                     JournalLine(related_account_id, credit=loan_amount, description=bank_leg_description)]
+                elif loan_direction == LoanDirectionType.RECEIVED: # We received the loan
+                    loan_gl_account_id = self.accounts_config.get("loan_liability_account")
+                    if not loan_gl_account_id: raise ValueError("حساب بدهی وام (دریافتی توسط ما) در تنظیمات یافت نشد.")
+                    # Dr. Our Bank, Cr. Loan Liability
+                    journal_lines = [JournalLine(related_account_id, debit=loan_amount, description=bank_leg_description),
+                                     JournalLine(loan_gl_account_id, credit=loan_amount, description=loan_leg_description)]
+                else:
+                     raise Exception("خطا در تعیین حساب‌های GL یا نوع تراکنش برای ثبت اولیه وام.")
+
+                self.ft_manager.post_journal_entry(
+                    ft_date, journal_lines, fiscal_year_id=fiscal_year_id,
+                    reference_id=created_loan_header.id, reference_type=ReferenceType.LOAN
+                )
+
+                # Update loan status after disbursement/receipt
+                created_loan_header.status = LoanStatus.ACTIVE
+                self.loans_repository.update(created_loan_header)
+                logger.info(f"Initial financial transaction for Loan ID {created_loan_header.id} recorded. Status set to ACTIVE.")
 
             return created_loan_header
             
         except Exception as e:
-            logger.error(f"Error creating loan for person ID {person_id}: {e}", exc_info=True)
-            # Rollback logic (delete loan header, installments if created) would be needed here.
-            if created_loan_header and created_loan_header.id:
-                self.loan_installments_repository.delete_by_loan_id(created_loan_header.id) # type: ignore
-                self.loans_repository.delete(created_loan_header.id) # type: ignore
-                logger.info(f"Rolled back creation of Loan ID {created_loan_header.id} and its installments due to error.")
+            logger.error(f"Error creating loan for person ID {person_id}: {e}. Transaction rolled back.", exc_info=True)
             raise
         # --- End Transactional Block ---
 
@@ -324,6 +308,9 @@ class LoanManager:
             ft_fiscal_year = fiscal_year_id_for_ft if fiscal_year_id_for_ft is not None else loan.fiscal_year_id
             ft_desc_base = f"Installment Payment for Loan ID {loan.id}, Inst. ID {installment.id}"
 
+            # جمع اعشاری دو مبلغ float ممکن است با جمع دقیق آن‌ها یکی نباشد؛ مبلغ بانک از جمع Decimal ها گرفته می‌شود
+            bank_amount = Decimal(str(principal_portion_paid)) + Decimal(str(interest_portion_paid))
+            journal_lines: List[JournalLine] = []
             if loan.loan_direction == LoanDirectionType.GIVEN: # We gave loan, now receiving payment
                 loan_asset_acc_id = self.accounts_config.get("loan_asset_account")
                 interest_income_acc_id = self.accounts_config.get("interest_income_account")
@@ -331,28 +318,13 @@ class LoanManager:
                     raise ValueError("حساب دارایی وام یا درآمد بهره در تنظیمات یافت نشد.")
 
                 # 1. Debit Our Bank/Cash (Asset increases)
-                self.ft_manager.create_financial_transaction(
-                    transaction_date=ft_date, account_id=payment_account_id,
-                    transaction_type=FinancialTransactionType.INCOME, amount=total_paid_this_installment,
-                    description=f"{ft_desc_base} (Dr. Bank)", fiscal_year_id=ft_fiscal_year,
-                    reference_id=installment.id, reference_type=ReferenceType.LOAN # Refers to LoanInstallment
-                )
+                journal_lines.append(JournalLine(payment_account_id, debit=bank_amount, description=f"{ft_desc_base} (Dr. Bank)"))
                 # 2. Credit Loan Asset (for principal part - Asset decreases)
                 if principal_portion_paid > 0:
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_date, account_id=loan_asset_acc_id,
-                        transaction_type=FinancialTransactionType.EXPENSE, amount=principal_portion_paid,
-                        description=f"{ft_desc_base} (Cr. Loan Asset - Principal)", fiscal_year_id=ft_fiscal_year,
-                        reference_id=installment.id, reference_type=ReferenceType.LOAN
-                    )
+                    journal_lines.append(JournalLine(loan_asset_acc_id, credit=principal_portion_paid, description=f"{ft_desc_base} (Cr. Loan Asset - Principal)"))
                 # 3. Credit Interest Income (Revenue increases)
                 if interest_portion_paid > 0:
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_date, account_id=interest_income_acc_id,
-                        transaction_type=FinancialTransactionType.INCOME, amount=interest_portion_paid,
-                        description=f"{ft_desc_base} (Cr. Interest Income)", fiscal_year_id=ft_fiscal_year,
-                        reference_id=installment.id, reference_type=ReferenceType.LOAN
-                    )
+                    journal_lines.append(JournalLine(interest_income_acc_id, credit=interest_portion_paid, description=f"{ft_desc_base} (Cr. Interest Income)"))
             
             elif loan.loan_direction == LoanDirectionType.RECEIVED: # We took loan, now making payment
                 loan_liability_acc_id = self.accounts_config.get("loan_liability_account")
@@ -362,46 +334,41 @@ class LoanManager:
 
                 # 1. Debit Loan Liability (for principal part - Liability decreases)
                 if principal_portion_paid > 0:
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_date, account_id=loan_liability_acc_id,
-                        transaction_type=FinancialTransactionType.EXPENSE, amount=principal_portion_paid,
-                        description=f"{ft_desc_base} (Dr. Loan Liability - Principal)", fiscal_year_id=ft_fiscal_year,
-                        reference_id=installment.id, reference_type=ReferenceType.LOAN
-                    )
+                    journal_lines.append(JournalLine(loan_liability_acc_id, debit=principal_portion_paid, description=f"{ft_desc_base} (Dr. Loan Liability - Principal)"))
                 # 2. Debit Interest Expense (Expense increases)
                 if interest_portion_paid > 0:
-                    self.ft_manager.create_financial_transaction(
-                        transaction_date=ft_date, account_id=interest_expense_acc_id,
-                        transaction_type=FinancialTransactionType.EXPENSE, amount=interest_portion_paid,
-                        description=f"{ft_desc_base} (Dr. Interest Expense)", fiscal_year_id=ft_fiscal_year,
-                        reference_id=installment.id, reference_type=ReferenceType.LOAN
-                    )
+                    journal_lines.append(JournalLine(interest_expense_acc_id, debit=interest_portion_paid, description=f"{ft_desc_base} (Dr. Interest Expense)"))
                 # 3. Credit Our Bank/Cash (Asset decreases)
-                self.ft_manager.create_financial_transaction(
-                    transaction_date=ft_date, account_id=payment_account_id,
-                    transaction_type=FinancialTransactionType.EXPENSE, amount=total_paid_this_installment,
-                    description=f"{ft_desc_base} (Cr. Bank)", fiscal_year_id=ft_fiscal_year,
-                    reference_id=installment.id, reference_type=ReferenceType.LOAN
-                )
+                journal_lines.append(JournalLine(payment_account_id, credit=bank_amount, description=f"{ft_desc_base} (Cr. Bank)"))
+
+            # سند، وضعیت قسط و وضعیت وام در یک تراکنش ثبت می‌شوند تا سند بدون پرداخت شدن قسط باقی نماند
+            with self.loan_installments_repository.db_manager.transaction():
+                if journal_lines:
+                    self.ft_manager.post_journal_entry(
+                        ft_date, journal_lines, fiscal_year_id=ft_fiscal_year,
+                        reference_id=installment.id, reference_type=ReferenceType.LOAN # Refers to LoanInstallment
+                    )
 
-            # Update installment status
-            installment.paid_date = paid_date
-            installment.payment_method = payment_method
-            installment.principal_amount = principal_portion_paid # Store actual paid principal
-            installment.interest_amount = interest_portion_paid   # Store actual paid interest
-            if description: installment.description = description
-            
-            updated_installment = self.loan_installments_repository.update(installment)
-            logger.info(f"Installment ID {installment.id} for Loan ID {loan.id} marked as paid.")
+                # Update installment status
+                installment.paid_date = paid_date
+                installment.payment_method = payment_method
+                installment.principal_amount = principal_portion_paid # Store actual paid principal
+                installment.interest_amount = interest_portion_paid   # Store actual paid interest
+                if description: installment.description = description
 
-            # Check if loan is fully paid
-            self._check_and_update_loan_status(loan.id) # type: ignore
-            
+                updated_installment = self.loan_installments_repository.update(installment)
+                if not updated_installment:
+                    raise Exception("خطا در به‌روزرسانی وضعیت پرداخت قسط وام.")
+
+                # Check if loan is fully paid
+                self._check_and_update_loan_status(loan.id) # type: ignore
+
+            logger.info(f"Installment ID {installment.id} for Loan ID {loan.id} marked as paid.")
             return updated_installment
 
         except Exception as e:
             logger.error(f"Error recording installment payment for Inst. ID {loan_installment_id}: {e}", exc_info=True)
-            # Rollback FTs would be complex here.
+            # خطای داخل بلوک transaction، سند و تغییرات قسط را با هم rollback کرده است
             raise
         # --- End Transactional Block ---
 
@@ -414,7 +381,8 @@ class LoanManager:
             loan = self.loans_repository.get_by_id(loan_id)
             if loan and loan.status != LoanStatus.PAID_OFF:
                 loan.status = LoanStatus.PAID_OFF
-                self.loans_repository.update(loan)
+                if not self.loans_repository.update(loan):
+                    raise Exception(f"خطا در به‌روزرسانی وضعیت وام با شناسه {loan_id}.")
                 logger.info(f"Loan ID {loan_id} is now fully paid off.")
 
 
@@ -3,8 +3,10 @@
 from typing import Optional, List, Dict, Any
 from datetime import date, datetime
 from decimal import Decimal, ROUND_HALF_UP
+from src.config import UI_LIST_PAGE_SIZE
 from src.business_logic.entities.material_receipt_entity import MaterialReceiptEntity
 from src.data_access.material_receipts_repository import MaterialReceiptsRepository
+from src.data_access.base_repository import KeysetPage, KeysetKey
 from src.business_logic.product_manager import ProductManager
 from src.business_logic.purchase_order_manager import PurchaseOrderManager
 from src.data_access.purchase_order_items_repository import PurchaseOrderItemsRepository
@@ -155,6 +157,18 @@ class MaterialReceiptManager:
         """Retrieves all material receipts."""
         logger.debug("Fetching all material receipts.")
         return self.receipts_repository.get_all()
+
+    def get_receipts_page(self,
+                          after_key: Optional[KeysetKey] = None,
+                          page_size: int = UI_LIST_PAGE_SIZE,
+                          person_id: Optional[int] = None) -> KeysetPage[MaterialReceiptEntity]:
+        """یک صفحه از رسیدها به ترتیب (receipt_date DESC, id DESC) - صفحه‌بندی keyset."""
+        criteria = {"person_id": person_id} if person_id else None
+        return self.receipts_repository.get_page("receipt_date", page_size, after_key, criteria)
+
+    def count_receipts(self, person_id: Optional[int] = None) -> int:
+        return self.receipts_repository.count_by_criteria({"person_id": person_id} if person_id else None)
+
     def get_material_receipt_by_id(self, receipt_id: int) -> Optional[MaterialReceiptEntity]:
         return self.receipts_repository.get_by_id(receipt_id)
 
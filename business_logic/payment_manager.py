@@ -5,9 +5,12 @@ from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
 
 # --- Entity و Constant Imports ---
+from src.config import UI_LIST_PAGE_SIZE
+from src.data_access.entity_cache import entity_session
 from .entities.payment_header_entity import PaymentHeaderEntity
 from .entities.payment_line_item_entity import PaymentLineItemEntity
-from src.constants import PaymentType, PaymentMethod,AccountType, CheckType, CheckStatus, ReferenceType, FinancialTransactionType, PersonType
+from .financial_transaction_manager import JournalLine
+from src.constants import PaymentType, PaymentMethod,AccountType, CheckType, CheckStatus, ReferenceType, PersonType
 
 # --- Type Hinting Imports ---
 if TYPE_CHECKING:
@@ -17,6 +20,7 @@ if TYPE_CHECKING:
     from .purchase_order_manager import PurchaseOrderManager
     from .check_manager import CheckManager
     from .financial_transaction_manager import FinancialTransactionManager
+    from ..data_access.base_repository import KeysetPage, KeysetKey
     from ..data_access.payment_header_repository import PaymentHeaderRepository
     from ..data_access.payment_line_item_repository import PaymentLineItemRepository
 
@@ -77,77 +81,75 @@ class PaymentManager:
             is_direct_posting=is_direct_posting
         )
 
-        created_header: Optional[PaymentHeaderEntity] = None
         try:
-            created_header = self.payment_header_repo.add(header)
-            if not created_header or not created_header.id:
-                raise Exception("خطا در ذخیره هدر پرداخت/دریافت.")
-
-            logger.info(f"PaymentHeader ID {created_header.id} created successfully.")
-            
-            saved_line_items: List[PaymentLineItemEntity] = []
-            for item_data in line_items_data:
-                check_id_for_line: Optional[int] = None
-                
-                # FIX for: Cannot access attribute "record_check" for class "CheckManager"
-                # فرض بر این است که متد صحیح `create_check` است
-                if item_data.get("payment_method") == PaymentMethod.CHECK and item_data.get("check_details") and self.check_manager:
-                    if person_id is None: raise ValueError("شخص برای ایجاد چک جدید الزامی است.")
-                    
-                    check_details = item_data["check_details"]
-                    check_type = CheckType.RECEIVED if payment_type == PaymentType.RECEIPT else CheckType.ISSUED
-                    
-                    created_check = self.check_manager.create_check(
-                        check_number=check_details["check_number"],
+            with entity_session(), self.payment_header_repo.db_manager.transaction():
+                created_header = self.payment_header_repo.add(header)
+                if not created_header or not created_header.id:
+                    raise Exception("خطا در ذخیره هدر پرداخت/دریافت.")
+
+                logger.info(f"PaymentHeader ID {created_header.id} created successfully.")
+
+                saved_line_items: List[PaymentLineItemEntity] = []
+                for item_data in line_items_data:
+                    check_id_for_line: Optional[int] = None
+
+                    # FIX for: Cannot access attribute "record_check" for class "CheckManager"
+                    # فرض بر این است که متد صحیح `create_check` است
+                    if item_data.get("payment_method") == PaymentMethod.CHECK and item_data.get("check_details") and self.check_manager:
+                        if person_id is None: raise ValueError("شخص برای ایجاد چک جدید الزامی است.")
+
+                        check_details = item_data["check_details"]
+                        check_type = CheckType.RECEIVED if payment_type == PaymentType.RECEIPT else CheckType.ISSUED
+
+                        created_check = self.check_manager.create_check(
+                            check_number=check_details["check_number"],
+                            amount=item_data["amount"],
+                            due_date=check_details["due_date"],
+                            person_id=person_id,
+                            check_type=check_type,
+                            bank_account_id=check_details["bank_account_id_for_check"],
+                            issue_date=check_details["issue_date"],
+                            fiscal_year_id=fiscal_year_id
+                        )
+                        if not created_check or not created_check.id:
+                            raise Exception("ایجاد رکورد چک جدید ناموفق بود.")
+                        check_id_for_line = created_check.id
+                    elif item_data.get("existing_check_id"):
+                        check_id_for_line = item_data["existing_check_id"]
+                    elif item_data.get("endorsed_check_id"):
+                        check_id_for_line = item_data["endorsed_check_id"]
+
+                    line_item = PaymentLineItemEntity(
+                        payment_header_id=created_header.id,
+                        payment_method=item_data["payment_method"],
                         amount=item_data["amount"],
-                        due_date=check_details["due_date"],
-                        person_id=person_id,
-                        check_type=check_type,
-                        bank_account_id=check_details["bank_account_id_for_check"],
-                        issue_date=check_details["issue_date"],
-                        fiscal_year_id=fiscal_year_id
+                        account_id=item_data.get("account_id"),
+                        check_id=check_id_for_line,
+                        description=item_data.get("description"),
+                        target_account_id=item_data.get("target_account_id")
                     )
-                    if not created_check or not created_check.id:
-                        raise Exception("ایجاد رکورد چک جدید ناموفق بود.")
-                    check_id_for_line = created_check.id
-                elif item_data.get("existing_check_id"):
-                    check_id_for_line = item_data["existing_check_id"]
-                elif item_data.get("endorsed_check_id"):
-                    check_id_for_line = item_data["endorsed_check_id"]
-
-                line_item = PaymentLineItemEntity(
-                    payment_header_id=created_header.id,
-                    payment_method=item_data["payment_method"],
-                    amount=item_data["amount"],
-                    account_id=item_data.get("account_id"),
-                    check_id=check_id_for_line,
-                    description=item_data.get("description"),
-                    target_account_id=item_data.get("target_account_id")
-                )
-                saved_line_item = self.payment_line_item_repo.add(line_item)
-                if not saved_line_item:
-                    raise Exception(f"خطا در ذخیره قلم پرداخت: {item_data}")
-                
-                self._record_single_payment_line_financial_impact(created_header, saved_line_item)
-                saved_line_items.append(saved_line_item)
-            
-            created_header.line_items = saved_line_items
+                    saved_line_item = self.payment_line_item_repo.add(line_item)
+                    if not saved_line_item:
+                        raise Exception(f"خطا در ذخیره قلم پرداخت: {item_data}")
+
+                    self._record_single_payment_line_financial_impact(created_header, saved_line_item)
+                    saved_line_items.append(saved_line_item)
 
-            if created_header.invoice_id:
-                # FIX for: Argument of type "float" cannot be assigned to parameter of type "Decimal"
-                # اطمینان از اینکه total_amount یک Decimal است
-                self.invoice_manager.update_payment_status(created_header.invoice_id, created_header.total_amount)
-            if created_header.purchase_order_id and hasattr(self.po_manager, 'update_payment_status'):
-                # FIX for: Cannot access attribute "update_payment_status" for class "PurchaseOrderManager"
-                # NOTE: این متد باید در PurchaseOrderManager پیاده‌سازی شود
-                self.po_manager.update_payment_status(created_header.purchase_order_id, created_header.total_amount)
+                created_header.line_items = saved_line_items
+
+                if created_header.invoice_id:
+                    # FIX for: Argument of type "float" cannot be assigned to parameter of type "Decimal"
+                    # اطمینان از اینکه total_amount یک Decimal است
+                    self.invoice_manager.update_payment_status(created_header.invoice_id, created_header.total_amount)
+                if created_header.purchase_order_id and hasattr(self.po_manager, 'update_payment_status'):
+                    # FIX for: Cannot access attribute "update_payment_status" for class "PurchaseOrderManager"
+                    # NOTE: این متد باید در PurchaseOrderManager پیاده‌سازی شود
+                    self.po_manager.update_payment_status(created_header.purchase_order_id, created_header.total_amount)
 
             return created_header
 
         except Exception as e:
-            logger.error(f"Error during payment processing. Rolling back.", exc_info=True)
-            if created_header and created_header.id:
-                self.payment_header_repo.delete(created_header.id)
+            logger.error(f"Error during payment processing. Transaction rolled back.", exc_info=True)
             raise
 
     def _record_single_payment_line_financial_impact(self, payment_header: PaymentHeaderEntity, line_item: PaymentLineItemEntity):
@@ -171,12 +173,12 @@ class PaymentManager:
             # ثبت سند بر اساس نوع حساب مقصد
             if target_account.type == AccountType.EXPENSE:
                 # Dr. Expense Account, Cr. Our Cash/Bank
-                self.ft_manager.create_financial_transaction(transaction_date, target_account.id, FinancialTransactionType.INCOME, line_item.amount, payment_header.description)
-                self.ft_manager.create_financial_transaction(transaction_date, line_item.account_id, FinancialTransactionType.EXPENSE, line_item.amount, f"پرداخت بابت {target_account.name}")
+                self.ft_manager.post_journal_entry(transaction_date, [JournalLine(target_account.id, debit=line_item.amount, description=payment_header.description),
+                                                                      JournalLine(line_item.account_id, credit=line_item.amount, description=f"پرداخت بابت {target_account.name}")])
             elif target_account.type == AccountType.REVENUE:
                 # Dr. Our Cash/Bank, Cr. Revenue Account
-                self.ft_manager.create_financial_transaction(transaction_date, line_item.account_id, FinancialTransactionType.INCOME, line_item.amount, f"دریافت بابت {target_account.name}")
-                self.ft_manager.create_financial_transaction(transaction_date, target_account.id, FinancialTransactionType.INCOME, line_item.amount, payment_header.description)
+                self.ft_manager.post_journal_entry(transaction_date, [JournalLine(line_item.account_id, debit=line_item.amount, description=f"دریافت بابت {target_account.name}"),
+                                                                      JournalLine(target_account.id, credit=line_item.amount, description=payment_header.description)])
             return
 
         # حالت ۲: تسویه حساب شخص (مشتری/تامین‌کننده/کارمند)
@@ -205,22 +207,41 @@ class PaymentManager:
         # ثبت سند حسابداری دوطرفه
         if payment_header.payment_type == PaymentType.RECEIPT: # دریافت از مشتری
             # Dr. Our Side (Cash/Bank/Checks Receivable), Cr. Person (AR)
-            self.ft_manager.create_financial_transaction(transaction_date, our_side_account_id, FinancialTransactionType.INCOME, line_item.amount, f"دریافت از {person.name}")
-            self.ft_manager.create_financial_transaction(transaction_date, person_subsidiary_account_id, FinancialTransactionType.EXPENSE, line_item.amount, f"بابت تسویه توسط {person.name}")
+            self.ft_manager.post_journal_entry(transaction_date, [JournalLine(our_side_account_id, debit=line_item.amount, description=f"دریافت از {person.name}"),
+                                                                  JournalLine(person_subsidiary_account_id, credit=line_item.amount, description=f"بابت تسویه توسط {person.name}")])
         
         elif payment_header.payment_type == PaymentType.PAYMENT: # پرداخت به تامین‌کننده/کارمند
             # Dr. Person (AP), Cr. Our Side (Cash/Bank/Checks Payable)
-            self.ft_manager.create_financial_transaction(transaction_date, person_subsidiary_account_id, FinancialTransactionType.EXPENSE, line_item.amount, f"پرداخت به {person.name}")
-            self.ft_manager.create_financial_transaction(transaction_date, our_side_account_id, FinancialTransactionType.EXPENSE, line_item.amount, f"پرداخت از حساب: {our_side_account_id}")
+            self.ft_manager.post_journal_entry(transaction_date, [JournalLine(person_subsidiary_account_id, debit=line_item.amount, description=f"پرداخت به {person.name}"),
+                                                                  JournalLine(our_side_account_id, credit=line_item.amount, description=f"پرداخت از حساب: {our_side_account_id}")])
     def get_all_payments(self) -> List[PaymentHeaderEntity]:
         headers = self.payment_header_repo.get_all(order_by="payment_date DESC, id DESC")
-        if self.person_manager:
-            for p_header in headers:
-                if p_header.person_id:
-                    person = self.person_manager.get_person_by_id(p_header.person_id)
-                    if person: p_header.person_name = person.name
+        self._attach_person_names(headers)
         return headers
 
+    def get_payments_page(self,
+                          after_key: Optional['KeysetKey'] = None,
+                          page_size: int = UI_LIST_PAGE_SIZE,
+                          payment_type: Optional[PaymentType] = None) -> 'KeysetPage[PaymentHeaderEntity]':
+        """یک صفحه از اسناد پرداخت/دریافت به ترتیب (payment_date DESC, id DESC) - صفحه‌بندی keyset."""
+        criteria = {"payment_type": payment_type.value} if payment_type else None
+        page = self.payment_header_repo.get_page("payment_date", page_size, after_key, criteria)
+        self._attach_person_names(page.items)
+        return page
+
+    def _attach_person_names(self, headers: List[PaymentHeaderEntity]) -> None:
+        """نام اشخاص همه اسناد با یک کوئری دسته‌ای پر می‌شود."""
+        if not self.person_manager or not headers:
+            return
+        persons = self.person_manager.get_persons_by_ids(p_header.person_id for p_header in headers)
+        for p_header in headers:
+            person = persons.get(p_header.person_id)
+            if person: p_header.person_name = person.name
+
+    def count_payments(self, payment_type: Optional[PaymentType] = None) -> int:
+        criteria = {"payment_type": payment_type.value} if payment_type else None
+        return self.payment_header_repo.count_by_criteria(criteria)
+
     def get_payment_with_line_items(self, payment_header_id: int) -> Optional[PaymentHeaderEntity]:
         header = self.payment_header_repo.get_by_id(payment_header_id)
         if not header or not header.id: return None
@@ -238,38 +259,39 @@ class PaymentManager:
         reversal_datetime = datetime.now()
 
         try:
-            self._reverse_payment_impacts(original_payment, reversal_datetime, reversal_reason)
-            self.payment_line_item_repo.delete_by_payment_header_id(payment_header_id)
-
-            new_line_items_data = update_data.get("line_items_data", [])
-            new_total_amount = sum((Decimal(str(item.get("amount", "0.0"))) for item in new_line_items_data), Decimal("0.0"))
-            
-            original_payment.payment_date = update_data["payment_date"]
-            original_payment.person_id = update_data.get("person_id")
-            original_payment.description = update_data.get("description")
-            original_payment.invoice_id = update_data.get("invoice_id")
-            original_payment.purchase_order_id = update_data.get("purchase_order_id")
-            original_payment.total_amount = new_total_amount
-            
-            updated_header = self.payment_header_repo.update(original_payment)
-            if not updated_header: raise Exception("خطا در به‌روزرسانی هدر پرداخت.")
-
-            saved_line_items = []
-            for item_data in new_line_items_data:
-                entity_fields = {k: v for k, v in item_data.items() if k in PaymentLineItemEntity.__annotations__}
-                line_item = PaymentLineItemEntity(**entity_fields)
-                line_item.payment_header_id = updated_header.id
-                saved_item = self.payment_line_item_repo.add(line_item)
-                if not saved_item: raise Exception(f"خطا در ذخیره قلم جدید پرداخت: {item_data}")
-                self._record_single_payment_line_financial_impact(updated_header, saved_item)
-                saved_line_items.append(saved_item)
-            
-            updated_header.line_items = saved_line_items
-            
-            if updated_header.invoice_id:
-                self.invoice_manager.update_payment_status(updated_header.invoice_id, updated_header.total_amount)
-            if updated_header.purchase_order_id and hasattr(self.po_manager, 'update_payment_status'):
-                self.po_manager.update_payment_status(updated_header.purchase_order_id, updated_header.total_amount)
+            with self.payment_header_repo.db_manager.transaction():
+                self._reverse_payment_impacts(original_payment, reversal_datetime, reversal_reason)
+                self.payment_line_item_repo.delete_by_payment_header_id(payment_header_id)
+
+                new_line_items_data = update_data.get("line_items_data", [])
+                new_total_amount = sum((Decimal(str(item.get("amount", "0.0"))) for item in new_line_items_data), Decimal("0.0"))
+
+                original_payment.payment_date = update_data["payment_date"]
+                original_payment.person_id = update_data.get("person_id")
+                original_payment.description = update_data.get("description")
+                original_payment.invoice_id = update_data.get("invoice_id")
+                original_payment.purchase_order_id = update_data.get("purchase_order_id")
+                original_payment.total_amount = new_total_amount
+
+                updated_header = self.payment_header_repo.update(original_payment)
+                if not updated_header: raise Exception("خطا در به‌روزرسانی هدر پرداخت.")
+
+                saved_line_items = []
+                for item_data in new_line_items_data:
+                    entity_fields = {k: v for k, v in item_data.items() if k in PaymentLineItemEntity.__annotations__}
+                    line_item = PaymentLineItemEntity(**entity_fields)
+                    line_item.payment_header_id = updated_header.id
+                    saved_item = self.payment_line_item_repo.add(line_item)
+                    if not saved_item: raise Exception(f"خطا در ذخیره قلم جدید پرداخت: {item_data}")
+                    self._record_single_payment_line_financial_impact(updated_header, saved_item)
+                    saved_line_items.append(saved_item)
+
+                updated_header.line_items = saved_line_items
+
+                if updated_header.invoice_id:
+                    self.invoice_manager.update_payment_status(updated_header.invoice_id, updated_header.total_amount)
+                if updated_header.purchase_order_id and hasattr(self.po_manager, 'update_payment_status'):
+                    self.po_manager.update_payment_status(updated_header.purchase_order_id, updated_header.total_amount)
 
             return self.get_payment_with_line_items(payment_header_id)
         except Exception as e:
@@ -284,8 +306,9 @@ class PaymentManager:
             return False
         
         try:
-            self._reverse_payment_impacts(payment_to_delete, datetime.now(), f"Delete Payment ID {payment_header_id}")
-            return self.payment_header_repo.delete(payment_header_id)
+            with self.payment_header_repo.db_manager.transaction():
+                self._reverse_payment_impacts(payment_to_delete, datetime.now(), f"Delete Payment ID {payment_header_id}")
+                return self.payment_header_repo.delete(payment_header_id)
         except Exception as e:
             logger.error(f"Error during deletion of payment {payment_header_id}: {e}", exc_info=True)
             return False
@@ -315,12 +338,14 @@ class PaymentManager:
             
             if target_account.type == AccountType.EXPENSE:
                 # معکوس پرداخت هزینه: Dr. Our Cash/Bank, Cr. Expense Account
-                self.ft_manager.create_financial_transaction(reversal_date_dt, line_item.account_id, FinancialTransactionType.INCOME, line_item.amount, description)
-                self.ft_manager.create_financial_transaction(reversal_date_dt, line_item.target_account_id, FinancialTransactionType.EXPENSE, line_item.amount, description)
+                self.ft_manager.post_journal_entry(reversal_date_dt, [JournalLine(line_item.account_id, debit=line_item.amount),
+                                                                      JournalLine(line_item.target_account_id, credit=line_item.amount)],
+                                                   description=description)
             elif target_account.type == AccountType.REVENUE:
                 # معکوس دریافت درآمد: Dr. Revenue Account, Cr. Our Cash/Bank
-                self.ft_manager.create_financial_transaction(reversal_date_dt, line_item.target_account_id, FinancialTransactionType.EXPENSE, line_item.amount, description)
-                self.ft_manager.create_financial_transaction(reversal_date_dt, line_item.account_id, FinancialTransactionType.EXPENSE, line_item.amount, description)
+                self.ft_manager.post_journal_entry(reversal_date_dt, [JournalLine(line_item.target_account_id, debit=line_item.amount),
+                                                                      JournalLine(line_item.account_id, credit=line_item.amount)],
+                                                   description=description)
         else: # حالت تسویه
             if not payment_header.person_id: return
             person = self.person_manager.get_person_by_id(payment_header.person_id)
@@ -338,11 +363,15 @@ class PaymentManager:
             if not our_side_account_id: return
 
             if payment_header.payment_type == PaymentType.RECEIPT:
-                self.ft_manager.create_financial_transaction(reversal_date_dt, person_subsidiary_account_id, FinancialTransactionType.INCOME, line_item.amount, description)
-                self.ft_manager.create_financial_transaction(reversal_date_dt, our_side_account_id, FinancialTransactionType.EXPENSE, line_item.amount, description)
+                # معکوس دریافت: Dr. Person, Cr. Our Side
+                self.ft_manager.post_journal_entry(reversal_date_dt, [JournalLine(person_subsidiary_account_id, debit=line_item.amount),
+                                                                      JournalLine(our_side_account_id, credit=line_item.amount)],
+                                                   description=description)
             elif payment_header.payment_type == PaymentType.PAYMENT:
-                self.ft_manager.create_financial_transaction(reversal_date_dt, our_side_account_id, FinancialTransactionType.INCOME, line_item.amount, description)
-                self.ft_manager.create_financial_transaction(reversal_date_dt, person_subsidiary_account_id, FinancialTransactionType.INCOME, line_item.amount, description)
+                # معکوس پرداخت: Dr. Our Side, Cr. Person
+                self.ft_manager.post_journal_entry(reversal_date_dt, [JournalLine(our_side_account_id, debit=line_item.amount),
+                                                                      JournalLine(person_subsidiary_account_id, credit=line_item.amount)],
+                                                   description=description)
     def get_payments_for_invoice(self, invoice_id: int) -> List[PaymentHeaderEntity]:
         logger.debug(f"PaymentManager: Attempting to fetch payments for Invoice ID: {invoice_id}") # <<< لاگ اضافه شده
         if not invoice_id:
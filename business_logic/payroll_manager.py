@@ -6,11 +6,11 @@ from datetime import date, datetime
 from src.business_logic.entities.payroll_entity import PayrollEntity
 from src.data_access.payrolls_repository import PayrollsRepository
 from src.business_logic.employee_manager import EmployeeManager
-from src.business_logic.financial_transaction_manager import FinancialTransactionManager
+from src.business_logic.financial_transaction_manager import FinancialTransactionManager, JournalLine
 from src.business_logic.account_manager import AccountManager # To validate payment account
-from src.business_logic.entities.financial_transaction_entity import FinancialTransactionEntity
 
-from src.constants import FinancialTransactionType, ReferenceType, AccountType
+from src.constants import ReferenceType, AccountType
+from src.utils.money import Money
 import logging
 
 logger = logging.getLogger(__name__)
@@ -77,6 +77,9 @@ class PayrollManager:
             if base_salary is None: # Should not happen if employee_details is correctly populated
                 raise ValueError(f"حقوق پایه برای کارمند {employee_id} یافت نشد.")
             gross_salary = float(base_salary)
+        # مبالغ به همان دقتی که ذخیره می‌شوند (واحد خرد) گرد می‌شوند
+        gross_salary = Money.of(gross_salary).to_float()
+        deductions = Money.of(deductions).to_float()
 
         if gross_salary < deductions:
             raise ValueError("کسورات نمی‌تواند بیشتر از حقوق ناخالص باشد.")
@@ -144,64 +147,31 @@ class PayrollManager:
 
         ft_description = f"Salary payment for Payroll ID {payroll_id}, Employee ID {payroll_to_pay.employee_id}"
         
-        # Use a more specific variable name for the first financial transaction leg
-        created_ft_expense_leg: Optional[FinancialTransactionEntity] = None
         try:
-            created_ft_expense_leg = self.ft_manager.create_financial_transaction(
-                transaction_date=ft_date,
-                account_id=salary_expense_account_id,
-                transaction_type=FinancialTransactionType.EXPENSE,
-                amount=net_salary_to_pay,
-                description=f"{ft_description} (Dr. Salary Expense)",
-                reference_id=payroll_id,
-                reference_type=ReferenceType.PAYROLL,
-                fiscal_year_id=ft_fiscal_year_id
-            )
-            # Explicit check for None and then for id
-            if created_ft_expense_leg is None:
-                 raise Exception("خطا در ایجاد آبجکت تراکنش بدهکار هزینه حقوق.")
-            if created_ft_expense_leg.id is None:
-                 raise Exception("خطا در دریافت شناسه برای تراکنش بدهکار هزینه حقوق.")
-
-            # Now created_ft_expense_leg is confirmed to be a FinancialTransactionEntity with an id
-            valid_ft_expense_leg: FinancialTransactionEntity = created_ft_expense_leg
-
-
-            created_ft_cash_leg = self.ft_manager.create_financial_transaction(
-                transaction_date=ft_date,
-                account_id=paid_by_account_id,
-                transaction_type=FinancialTransactionType.EXPENSE, 
-                amount=net_salary_to_pay,
-                description=f"{ft_description} (Cr. Bank/Cash)",
-                reference_id=payroll_id,
-                reference_type=ReferenceType.PAYROLL,
-                fiscal_year_id=ft_fiscal_year_id
-            )
-            if not created_ft_cash_leg: # Check if cash leg object itself is None
-                logger.error(f"Failed to create cash leg object for payroll ID {payroll_id}. Salary expense leg (FT ID: {valid_ft_expense_leg.id}) was successful but needs reversal.")
-                self.ft_manager._attempt_reversal(valid_ft_expense_leg) 
-                raise Exception("خطا در ایجاد آبجکت تراکنش بستانکار بانک/صندوق. پرداخت کامل نشد.")
-            if not created_ft_cash_leg.id: # Check if cash leg object has an ID
-                logger.error(f"Failed to get ID for cash leg for payroll ID {payroll_id}. Salary expense leg (FT ID: {valid_ft_expense_leg.id}) was successful but needs reversal.")
-                self.ft_manager._attempt_reversal(valid_ft_expense_leg)
-                raise Exception("خطا در دریافت شناسه تراکنش بستانکار بانک/صندوق. پرداخت کامل نشد.")
-
-
-            payroll_to_pay.is_paid = True
-            payroll_to_pay.payment_date = payment_date
-            payroll_to_pay.paid_by_account_id = paid_by_account_id
-            payroll_to_pay.transaction_id = valid_ft_expense_leg.id 
-
-            updated_payroll = self.payrolls_repository.update(payroll_to_pay)
+            # Dr. Salary Expense, Cr. Bank/Cash و علامت پرداخت لیست حقوق در یک تراکنش ثبت می‌شوند
+            with self.payrolls_repository.db_manager.transaction():
+                expense_leg, _ = self.ft_manager.post_journal_entry(
+                    ft_date,
+                    [JournalLine(salary_expense_account_id, debit=net_salary_to_pay, description=f"{ft_description} (Dr. Salary Expense)"),
+                     JournalLine(paid_by_account_id, credit=net_salary_to_pay, description=f"{ft_description} (Cr. Bank/Cash)")],
+                    reference_id=payroll_id,
+                    reference_type=ReferenceType.PAYROLL,
+                    fiscal_year_id=ft_fiscal_year_id
+                )
+
+                payroll_to_pay.is_paid = True
+                payroll_to_pay.payment_date = payment_date
+                payroll_to_pay.paid_by_account_id = paid_by_account_id
+                payroll_to_pay.transaction_id = expense_leg.id
+
+                updated_payroll = self.payrolls_repository.update(payroll_to_pay)
+                if not updated_payroll:
+                    raise Exception("خطا در به‌روزرسانی وضعیت پرداخت لیست حقوق.")
             logger.info(f"Payroll ID {payroll_id} processed for payment. Net: {net_salary_to_pay:.2f}, Paid from AccID: {paid_by_account_id}.")
             return updated_payroll
 
         except Exception as e:
             logger.error(f"Error processing payroll payment for ID {payroll_id}: {e}", exc_info=True)
-            if created_ft_expense_leg and not (locals().get('created_ft_cash_leg') and locals().get('created_ft_cash_leg').id): # type: ignore
-                 if hasattr(self.ft_manager, '_attempt_reversal'):
-                    logger.warning(f"Attempting reversal for expense leg FT {created_ft_expense_leg} due to payment processing failure.")
-                    self.ft_manager._attempt_reversal(created_ft_expense_leg) 
             raise
 
     def get_payroll_by_id(self, payroll_id: int) -> Optional[PayrollEntity]:
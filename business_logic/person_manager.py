@@ -1,6 +1,6 @@
 # src/business_logic/person_manager.py
 
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable
 from src.business_logic.entities.person_entity import PersonEntity
 from src.data_access.persons_repository import PersonsRepository
 from src.constants import PersonType
@@ -65,6 +65,10 @@ class PersonManager:
             logger.debug(f"Person with ID {person_id} not found.")
         return person
 
+    def get_persons_by_ids(self, person_ids: Iterable[int]) -> Dict[int, PersonEntity]:
+        """Retrieves several persons with a single batched query, keyed by ID."""
+        return self.persons_repository.get_by_ids(person_ids)
+
     def get_all_persons(self) -> List[PersonEntity]:
         """Retrieves all persons."""
         logger.debug("Fetching all persons.")
@@ -0,0 +1,102 @@
+# src/business_logic/posting_rules.py
+
+import threading
+from typing import Optional, Dict, Iterable, TYPE_CHECKING
+
+from src.constants import POSTING_ACCOUNT_NAMES, AccountType
+
+if TYPE_CHECKING:
+    from src.data_access.accounts_repository import AccountsRepository
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class PostingRulesRegistry:
+    """
+    حساب‌های مورد استفاده در ثبت اسناد: نقش (مثلاً "sales_revenue") -> شناسه حساب، شخص -> حساب معین او،
+    و نوع (ماهیت) حساب‌هایی که در اسناد آمده‌اند.
+    نقش‌ها با یک کوئری در اولین استفاده (یا با load در شروع برنامه) resolve و نگه داشته می‌شوند تا ثبت
+    یک سند هیچ جستجویی بر اساس نام حساب انجام ندهد. AccountManager بعد از افزودن، تغییر نام و حذف حساب‌ها
+    invalidate را صدا می‌زند. اگر invalidate یا ثبت حساب معین داخل تراکنشی باشد که rollback شود،
+    مقادیر نگه داشته شده بعد از پایان آن تراکنش هم دور ریخته می‌شوند. تغییر نوع حساب هم invalidate می‌کند.
+    """
+
+    def __init__(self, accounts_repository: 'AccountsRepository', account_names: Optional[Dict[str, str]] = None):
+        self.accounts_repository = accounts_repository
+        self.account_names: Dict[str, str] = dict(account_names if account_names is not None else POSTING_ACCOUNT_NAMES)
+        self._role_account_ids: Optional[Dict[str, int]] = None
+        self._person_account_ids: Dict[int, int] = {}
+        self._account_types: Dict[int, AccountType] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, int]:
+        """همه نقش‌ها را با یک کوئری resolve می‌کند؛ نقش‌هایی که حسابشان تعریف نشده در نتیجه نیستند."""
+        ids_by_name = self.accounts_repository.get_ids_by_names(self.account_names.values())
+        role_account_ids = {role: ids_by_name[name] for role, name in self.account_names.items() if name in ids_by_name}
+        missing_roles = [role for role in self.account_names if role not in role_account_ids]
+        if missing_roles:
+            logger.warning(f"Posting accounts not found for roles: {', '.join(missing_roles)}")
+        with self._lock:
+            self._role_account_ids = role_account_ids
+        logger.debug(f"Posting rules loaded: {role_account_ids}")
+        return dict(role_account_ids)
+
+    def account_id(self, role: str) -> Optional[int]:
+        """شناسه حساب یک نقش (None اگر حسابی با نام پیکربندی شده آن وجود ندارد)."""
+        if role not in self.account_names:
+            raise ValueError(f"نقش حسابداری '{role}' تعریف نشده است.")
+        role_account_ids = self._role_account_ids
+        if role_account_ids is None:
+            role_account_ids = self.load()
+        return role_account_ids.get(role)
+
+    def person_account_id(self, person_id: int) -> Optional[int]:
+        return self._person_account_ids.get(person_id)
+
+    def remember_person_account(self, person_id: int, account_id: int) -> None:
+        self._person_account_ids[person_id] = account_id
+        db_manager = self.accounts_repository.db_manager
+        if db_manager.in_transaction():
+            # حسابی که داخل یک تراکنش ساخته یا متصل شده، با rollback آن از بین می‌رود
+            def forget(committed: bool) -> None:
+                if not committed:
+                    self._person_account_ids.pop(person_id, None)
+            db_manager.after_transaction(forget)
+
+    def account_types(self, account_ids: Iterable[int]) -> Dict[int, AccountType]:
+        """
+        {شناسه حساب: نوع حساب}؛ حساب‌هایی که هنوز دیده نشده‌اند با یک کوئری خوانده می‌شوند.
+        حساب‌های ناموجود در نتیجه نیستند.
+        """
+        result: Dict[int, AccountType] = {}
+        missing_ids = []
+        for account_id in account_ids:
+            account_type = self._account_types.get(account_id)
+            if account_type is None:
+                missing_ids.append(account_id)
+            else:
+                result[account_id] = account_type
+        if missing_ids:
+            generation = self._generation
+            fetched = self.accounts_repository.get_types_by_ids(missing_ids)
+            result.update(fetched)
+            with self._lock:
+                # اگر حین خواندن invalidate شده باشد، مقادیر خوانده شده نگه داشته نمی‌شوند
+                if generation == self._generation:
+                    self._account_types.update(fetched)
+        return result
+
+    def invalidate(self) -> None:
+        """همه نگاشت‌ها را باطل می‌کند (بعد از افزودن، تغییر نام یا حذف حساب‌ها)."""
+        self._clear()
+        # تغییری که هنوز commit نشده ممکن است rollback شود؛ resolve های میان آن هم دور ریخته می‌شوند
+        self.accounts_repository.db_manager.after_transaction(lambda committed: self._clear())
+
+    def _clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._role_account_ids = None
+            self._person_account_ids.clear()
+            self._account_types.clear()
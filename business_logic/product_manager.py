@@ -1,5 +1,5 @@
 # src/business_logic/product_manager.py
-from typing import List, Optional, Dict, Any, TYPE_CHECKING
+from typing import List, Optional, Dict, Any, Iterable, TYPE_CHECKING
 from decimal import Decimal,InvalidOperation
 from datetime import datetime
 
@@ -35,6 +35,10 @@ class ProductManager:
             return None
         return product
 
+    def get_products_by_ids(self, product_ids: Iterable[int]) -> Dict[int, ProductEntity]:
+        """چند محصول را با یک کوئری دسته‌ای واکشی می‌کند (کلید: شناسه محصول)."""
+        return self.product_repo.get_by_ids(product_ids)
+
     def get_product_by_sku(self, sku: str) -> Optional[ProductEntity]:
         """یک محصول را با SKU آن واکشی می‌کند."""
         logger.debug(f"Fetching product by SKU: {sku}")
@@ -195,53 +199,59 @@ class ProductManager:
 
     def adjust_stock(self, product_id: int, quantity_change: Decimal, movement_type: InventoryMovementType, 
                      movement_date: Optional[datetime] = None, reference_id: Optional[int] = None, 
-                     reference_type: Optional[ReferenceType] = None, description: Optional[str] = None):
+                     reference_type: Optional[ReferenceType] = None, description: Optional[str] = None) -> bool:
         """
         Adjusts the stock for a given product and records the movement.
         This version includes enhanced logging for debugging.
+        Returns True on success (services are a no-op success). Failures raise, so an enclosing
+        transaction (e.g. the invoice or receipt being posted) is rolled back as a whole.
         """
         logger.debug(f"ADJUST_STOCK CALLED for Product ID {product_id} by {quantity_change}, type: {movement_type.value}")
         
         product = self.product_repo.get_by_id(product_id)
         if not product:
             logger.error(f"Product with ID {product_id} not found. Cannot adjust stock.")
-            return
+            raise ValueError(f"محصول با شناسه {product_id} یافت نشد.")
 
         # فقط برای کالاهایی که خدماتی نیستند، حرکت انبار ثبت کن
         if product.product_type == ProductType.SERVICE:
             logger.info(f"Product '{product.name}' is a service. Stock not adjusted.")
-            return
+            return True
 
-        old_stock = product.stock_quantity
-        new_stock = old_stock + quantity_change
-        product.stock_quantity = new_stock
-        
-        # ۱. ابتدا موجودی کالا در جدول محصولات را به‌روز می‌کنیم
-        update_success = self.product_repo.update(product)
-        if not update_success:
-            logger.error(f"Failed to update stock quantity for product ID {product_id} in products table.")
-            return
-        
-        # ۲. سپس یک رکورد برای حرکت انبار ایجاد می‌کنیم
-        movement = InventoryMovementEntity(
-            product_id=product_id,
-            movement_date=movement_date or datetime.now(),
-            quantity_change=quantity_change,
-            movement_type=movement_type,
-            reference_id=reference_id,
-            reference_type=reference_type,
-            description=description
-        )
-        saved_movement = self.inventory_movements_repo.add(movement)
-        
-        # --- لاگ کلیدی برای دیباگ ---
-        if saved_movement and saved_movement.id:
-            logger.info(f"SUCCESSFULLY SAVED INVENTORY MOVEMENT: ID={saved_movement.id}, ProductID={product_id}, Change={quantity_change}, RefType={reference_type}, RefID={reference_id}")
-        else:
-            logger.error(f"FAILED TO SAVE INVENTORY MOVEMENT for Product ID {product_id}")
-        # --- پایان لاگ کلیدی ---
+        # موجودی کالا، ردیف حرکت انبار و snapshot روزانه موجودی در یک تراکنش دیتابیس ثبت می‌شوند
+        with self.product_repo.db_manager.transaction():
+            # ۱. ابتدا موجودی کالا در جدول محصولات را (با UPDATE اتمیک stock_quantity = stock_quantity + ?) به‌روز می‌کنیم
+            update_success = self.product_repo.apply_stock_delta(product_id, quantity_change)
+            if not update_success:
+                logger.error(f"Failed to update stock quantity for product ID {product_id} in products table.")
+                raise Exception(f"خطا در به‌روزرسانی موجودی کالا با شناسه {product_id}.")
+
+            # ۲. سپس یک رکورد برای حرکت انبار ایجاد می‌کنیم
+            movement = InventoryMovementEntity(
+                product_id=product_id,
+                movement_date=movement_date or datetime.now(),
+                quantity_change=quantity_change,
+                movement_type=movement_type,
+                reference_id=reference_id,
+                reference_type=reference_type,
+                description=description
+            )
+            saved_movement = self.inventory_movements_repo.add(movement)
+
+            # --- لاگ کلیدی برای دیباگ ---
+            if saved_movement and saved_movement.id:
+                logger.info(f"SUCCESSFULLY SAVED INVENTORY MOVEMENT: ID={saved_movement.id}, ProductID={product_id}, Change={quantity_change}, RefType={reference_type}, RefID={reference_id}")
+            else:
+                logger.error(f"FAILED TO SAVE INVENTORY MOVEMENT for Product ID {product_id}")
+                # raise (نه return) تا تراکنش rollback شود و موجودی بدون ردیف حرکت ثبت نشود
+                raise Exception(f"خطا در ثبت حرکت انبار برای کالا با شناسه {product_id}.")
+            # --- پایان لاگ کلیدی ---
+
+            # ۳. موجودی تجمعی روزانه کالا (برای موجودی از قبل کاردکس)
+            self.inventory_movements_repo.apply_stock_snapshot_delta(product_id, movement.movement_date.date(), quantity_change)
 
-        logger.info(f"Stock for product '{product.name}' (ID: {product.id}) adjusted by {quantity_change}. Old: {old_stock}, New: {new_stock}.")
+        logger.info(f"Stock for product '{product.name}' (ID: {product.id}) adjusted by {quantity_change}.")
+        return True
 
 
     def get_product_display_details(self, product_id: Optional[int]) -> tuple[str, str, str]:
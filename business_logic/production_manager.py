@@ -113,76 +113,62 @@ class ProductionManager:
                     notes=item_data.get("notes")
                 ))
         
-        created_header: Optional[ManualProductionEntity] = None
-        # --- مدیریت تراکنش دیتابیس (نیاز به پیاده‌سازی در DatabaseManager یا استفاده از ORM دارد) ---
-        # self.manual_production_repo.db_manager.begin_transaction() 
+        # --- مدیریت تراکنش دیتابیس: هدر، اقلام مصرفی و تعدیل موجودی‌ها در یک تراکنش ---
         try:
-            mp_header_entity = ManualProductionEntity(
-                production_date=production_date,
-                finished_product_id=finished_product_id,
-                quantity_produced=quantity_produced,
-                description=description
-            )
-            created_header = self.manual_production_repo.add(mp_header_entity)
-            if not created_header or not created_header.id:
-                # self.manual_production_repo.db_manager.rollback_transaction()
-                raise Exception("خطا در ایجاد هدر تولید دستی.") # جزئیات بیشتر می‌تواند از repo بیاید
-            
-            saved_consumed_item_entities: List[ConsumedMaterialEntity] = []
-            if valid_consumed_entities:
+            with self.manual_production_repo.db_manager.transaction():
+                mp_header_entity = ManualProductionEntity(
+                    production_date=production_date,
+                    finished_product_id=finished_product_id,
+                    quantity_produced=quantity_produced,
+                    description=description
+                )
+                created_header = self.manual_production_repo.add(mp_header_entity)
+                if not created_header or not created_header.id:
+                    raise Exception("خطا در ایجاد هدر تولید دستی.") # جزئیات بیشتر می‌تواند از repo بیاید
+
                 for item_entity_to_save in valid_consumed_entities:
                     item_entity_to_save.manual_production_id = created_header.id
-                    saved_item = self.consumed_material_repo.add(item_entity_to_save)
-                    if not saved_item:
-                        raise Exception(f"خطا در ذخیره ماده مصرفی ID: {item_entity_to_save.component_product_id}.")
-                    saved_consumed_item_entities.append(saved_item)
-            
-            created_header.consumed_items = saved_consumed_item_entities
-            logger.info(f"Manual Production Header ID {created_header.id} and {len(saved_consumed_item_entities)} items saved.")
+                saved_consumed_item_entities = self.consumed_material_repo.add_many(valid_consumed_entities)
+                if saved_consumed_item_entities is None:
+                    raise Exception("خطا در ذخیره مواد مصرفی تولید دستی.")
 
-            movement_datetime = datetime.combine(production_date, datetime.min.time())
-            
-            # تعدیل موجودی محصول نهایی (افزایش)
-            if not self.product_manager.adjust_stock(
-                product_id=finished_product_id, quantity_change=quantity_produced,
-                movement_type=InventoryMovementType.MANUAL_PRODUCTION_RECEIPT, 
-                movement_date=movement_datetime, reference_id=created_header.id,
-                reference_type=ReferenceType.MANUAL_PRODUCTION,
-                description=f"تولید دستی: {finished_product.name} - {description or ''}"
-            ):
-                raise Exception(f"خطا در تعدیل موجودی محصول نهایی ID {finished_product_id}.")
-            
-            # تعدیل موجودی مواد اولیه مصرفی (کاهش)
-            for consumed_item_entity in saved_consumed_item_entities:
-                comp_prod_info = self.product_manager.get_product_by_id(consumed_item_entity.component_product_id) # type: ignore
-                comp_prod_name = comp_prod_info.name if comp_prod_info else f"ID {consumed_item_entity.component_product_id}"
-                if not self.product_manager.adjust_stock(
-                    product_id=consumed_item_entity.component_product_id, # type: ignore
-                    quantity_change= -consumed_item_entity.quantity_consumed, # type: ignore
-                    movement_type=InventoryMovementType.MANUAL_PRODUCTION_ISSUE,
+                created_header.consumed_items = saved_consumed_item_entities
+                logger.info(f"Manual Production Header ID {created_header.id} and {len(saved_consumed_item_entities)} items saved.")
+
+                movement_datetime = datetime.combine(production_date, datetime.min.time())
+
+                # تعدیل موجودی محصول نهایی (افزایش)
+                self.product_manager.adjust_stock(
+                    product_id=finished_product_id, quantity_change=quantity_produced,
+                    movement_type=InventoryMovementType.MANUAL_PRODUCTION_RECEIPT, 
                     movement_date=movement_datetime, reference_id=created_header.id,
                     reference_type=ReferenceType.MANUAL_PRODUCTION,
-                    description=f"مصرف ماده اولیه: {comp_prod_name} برای MP ID {created_header.id}"
-                ):
-                    raise Exception(f"خطا در تعدیل موجودی ماده اولیه ID {consumed_item_entity.component_product_id}.")
+                    description=f"تولید دستی: {finished_product.name} - {description or ''}"
+                )
 
-            # (اختیاری) ثبت آثار مالی
-            # if self.ft_manager and self.account_manager:
-            #     self._record_manual_production_financials(created_header)
+                # تعدیل موجودی مواد اولیه مصرفی (کاهش)
+                for consumed_item_entity in saved_consumed_item_entities:
+                    comp_prod_info = self.product_manager.get_product_by_id(consumed_item_entity.component_product_id) # type: ignore
+                    comp_prod_name = comp_prod_info.name if comp_prod_info else f"ID {consumed_item_entity.component_product_id}"
+                    self.product_manager.adjust_stock(
+                        product_id=consumed_item_entity.component_product_id, # type: ignore
+                        quantity_change= -consumed_item_entity.quantity_consumed, # type: ignore
+                        movement_type=InventoryMovementType.MANUAL_PRODUCTION_ISSUE,
+                        movement_date=movement_datetime, reference_id=created_header.id,
+                        reference_type=ReferenceType.MANUAL_PRODUCTION,
+                        description=f"مصرف ماده اولیه: {comp_prod_name} برای MP ID {created_header.id}"
+                    )
 
-            # self.manual_production_repo.db_manager.commit_transaction()
-            logger.info(f"Manual production MP ID {created_header.id} recorded and stock adjusted successfully.")
+                # (اختیاری) ثبت آثار مالی
+                # if self.ft_manager and self.account_manager:
+                #     self._record_manual_production_financials(created_header)
+
+                logger.info(f"Manual production MP ID {created_header.id} recorded and stock adjusted successfully.")
             return created_header
 
         except Exception as e:
             logger.error(f"Error in record_manual_production for product ID {finished_product_id}: {e}", exc_info=True)
-            # self.manual_production_repo.db_manager.rollback_transaction()
-            # اگر هدر ایجاد شده اما عملیات کامل نشده، آن را حذف کنید
-            if created_header and created_header.id:
-                 # ابتدا اقلام مصرفی مرتبط را پاک کنید
-                self.consumed_material_repo.delete_by_manual_production_id(created_header.id)
-                self.manual_production_repo.delete(created_header.id)
-                logger.info(f"Rolled back Manual Production Header ID {created_header.id} due to error.")
+            # تراکنش به طور کامل rollback شده است؛ نیازی به حذف دستی هدر نیست
             raise # خطا را برای نمایش در UI دوباره raise کنید
     
     def get_all_manual_productions_summary(self) -> List[ManualProductionEntity]:
@@ -231,101 +217,96 @@ class ProductionManager:
             raise ValueError(f"رکورد تولید دستی با شناسه {production_id} یافت نشد.")
 
         # --- مدیریت تراکنش دیتابیس ---
-        # self.manual_production_repo.db_manager.begin_transaction()
         try:
-            # ۲. داده‌های هدر را به‌روز کنید
-            original_production_header.production_date = update_data.get("production_date", original_production_header.production_date)
-            original_production_header.finished_product_id = update_data.get("finished_product_id", original_production_header.finished_product_id)
-            original_production_header.quantity_produced = Decimal(str(update_data.get("quantity_produced", original_production_header.quantity_produced)))
-            original_production_header.description = update_data.get("description", original_production_header.description)
-            
-            updated_header = self.manual_production_repo.update(original_production_header)
-            if not updated_header:
-                raise Exception("خطا در به‌روزرسانی هدر تولید دستی.")
-            
-            # ۳. اقلام مصرفی قدیمی را حذف کنید
-            self.consumed_material_repo.delete_by_manual_production_id(production_id)
-            
-            # ۴. اقلام مصرفی جدید را اضافه کنید
-            new_consumed_items_data = update_data.get("consumed_items_data", [])
-            saved_consumed_items: List[ConsumedMaterialEntity] = []
-            for item_data in new_consumed_items_data:
-                comp_id = item_data.get("component_product_id")
-                qty_consumed_val = item_data.get("quantity_consumed")
-                if comp_id is None or qty_consumed_val is None: continue # یا خطا
-                
-                qty_consumed_dec = Decimal(str(qty_consumed_val))
-                if qty_consumed_dec <= Decimal("0"): continue # یا خطا
+            with self.manual_production_repo.db_manager.transaction():
+                # ۲. داده‌های هدر را به‌روز کنید
+                original_production_header.production_date = update_data.get("production_date", original_production_header.production_date)
+                original_production_header.finished_product_id = update_data.get("finished_product_id", original_production_header.finished_product_id)
+                original_production_header.quantity_produced = Decimal(str(update_data.get("quantity_produced", original_production_header.quantity_produced)))
+                original_production_header.description = update_data.get("description", original_production_header.description)
 
-                item_entity = ConsumedMaterialEntity(
-                    manual_production_id=production_id,
-                    component_product_id=comp_id,
-                    quantity_consumed=qty_consumed_dec,
-                    notes=item_data.get("notes")
-                )
-                saved_item = self.consumed_material_repo.add(item_entity)
-                if not saved_item:
+                updated_header = self.manual_production_repo.update(original_production_header)
+                if not updated_header:
+                    raise Exception("خطا در به‌روزرسانی هدر تولید دستی.")
+
+                # ۳. اقلام مصرفی قدیمی را حذف کنید
+                self.consumed_material_repo.delete_by_manual_production_id(production_id)
+
+                # ۴. اقلام مصرفی جدید را اضافه کنید
+                new_consumed_items_data = update_data.get("consumed_items_data", [])
+                new_consumed_entities: List[ConsumedMaterialEntity] = []
+                for item_data in new_consumed_items_data:
+                    comp_id = item_data.get("component_product_id")
+                    qty_consumed_val = item_data.get("quantity_consumed")
+                    if comp_id is None or qty_consumed_val is None: continue # یا خطا
+
+                    qty_consumed_dec = Decimal(str(qty_consumed_val))
+                    if qty_consumed_dec <= Decimal("0"): continue # یا خطا
+
+                    new_consumed_entities.append(ConsumedMaterialEntity(
+                        manual_production_id=production_id,
+                        component_product_id=comp_id,
+                        quantity_consumed=qty_consumed_dec,
+                        notes=item_data.get("notes")
+                    ))
+                saved_consumed_items = self.consumed_material_repo.add_many(new_consumed_entities)
+                if saved_consumed_items is None:
                     raise Exception("خطا در ذخیره اقلام مصرفی جدید هنگام ویرایش.")
-                saved_consumed_items.append(saved_item)
-            
-            updated_header.consumed_items = saved_consumed_items
-
-            # ۵. تعدیل موجودی‌ها بر اساس *تفاوت* (این بخش پیچیده است و نیاز به منطق دقیق دارد)
-            # برای سادگی، فعلاً فرض می‌کنیم که کاربر مسئول اطمینان از صحت مقادیر است
-            # و ما فقط موجودی‌ها را بر اساس مقادیر جدید تعدیل می‌کنیم.
-            # این به معنی این است که ابتدا باید آثار تعدیلات قبلی را خنثی کنیم و سپس تعدیلات جدید را اعمال نماییم.
-            # یک راه ساده‌تر (اما نه کاملاً دقیق از نظر حسابداری انبار در برخی سناریوها) این است که:
-            # ابتدا موجودی‌های قبلی را برگردانیم و سپس موجودی‌های جدید را اعمال کنیم.
-
-            # الف) برگرداندن تعدیلات موجودی قبلی:
-            # افزایش موجودی مواد اولیه قبلی
-            if original_production_header.consumed_items:
-                for old_item in original_production_header.consumed_items:
-                    self.product_manager.adjust_stock(old_item.component_product_id, # type: ignore
-                                                      old_item.quantity_consumed, # type: ignore
-                                                      InventoryMovementType.MANUAL_PRODUCTION_ADJUST_RETURN, # نوع جدید
+
+                updated_header.consumed_items = saved_consumed_items
+
+                # ۵. تعدیل موجودی‌ها بر اساس *تفاوت* (این بخش پیچیده است و نیاز به منطق دقیق دارد)
+                # برای سادگی، فعلاً فرض می‌کنیم که کاربر مسئول اطمینان از صحت مقادیر است
+                # و ما فقط موجودی‌ها را بر اساس مقادیر جدید تعدیل می‌کنیم.
+                # این به معنی این است که ابتدا باید آثار تعدیلات قبلی را خنثی کنیم و سپس تعدیلات جدید را اعمال نماییم.
+                # یک راه ساده‌تر (اما نه کاملاً دقیق از نظر حسابداری انبار در برخی سناریوها) این است که:
+                # ابتدا موجودی‌های قبلی را برگردانیم و سپس موجودی‌های جدید را اعمال کنیم.
+
+                # الف) برگرداندن تعدیلات موجودی قبلی:
+                # افزایش موجودی مواد اولیه قبلی
+                if original_production_header.consumed_items:
+                    for old_item in original_production_header.consumed_items:
+                        self.product_manager.adjust_stock(old_item.component_product_id, # type: ignore
+                                                          old_item.quantity_consumed, # type: ignore
+                                                          InventoryMovementType.MANUAL_PRODUCTION_ADJUST_RETURN, # نوع جدید
+                                                          datetime.combine(updated_header.production_date, datetime.min.time()),
+                                                          reference_id=production_id, reference_type=ReferenceType.MANUAL_PRODUCTION,
+                                                          description=f"بازگشت مصرف برای ویرایش تولید دستی ID {production_id}")
+                # کاهش موجودی محصول نهایی قبلی
+                if original_production_header.finished_product_id is not None and original_production_header.quantity_produced > Decimal("0"):
+                    self.product_manager.adjust_stock(original_production_header.finished_product_id,
+                                                      -original_production_header.quantity_produced,
+                                                      InventoryMovementType.MANUAL_PRODUCTION_ADJUST_REVERSE, # نوع جدید
                                                       datetime.combine(updated_header.production_date, datetime.min.time()),
                                                       reference_id=production_id, reference_type=ReferenceType.MANUAL_PRODUCTION,
-                                                      description=f"بازگشت مصرف برای ویرایش تولید دستی ID {production_id}")
-            # کاهش موجودی محصول نهایی قبلی
-            if original_production_header.finished_product_id is not None and original_production_header.quantity_produced > Decimal("0"):
-                self.product_manager.adjust_stock(original_production_header.finished_product_id,
-                                                  -original_production_header.quantity_produced,
-                                                  InventoryMovementType.MANUAL_PRODUCTION_ADJUST_REVERSE, # نوع جدید
-                                                  datetime.combine(updated_header.production_date, datetime.min.time()),
-                                                  reference_id=production_id, reference_type=ReferenceType.MANUAL_PRODUCTION,
-                                                  description=f"بازگشت تولید برای ویرایش تولید دستی ID {production_id}")
-            
-            # ب) اعمال تعدیلات موجودی جدید:
-            movement_datetime_updated = datetime.combine(updated_header.production_date, datetime.min.time())
-            finished_product_new = self.product_manager.get_product_by_id(updated_header.finished_product_id) # type: ignore
-            if not self.product_manager.adjust_stock(
-                product_id=updated_header.finished_product_id, quantity_change=updated_header.quantity_produced, # type: ignore
-                movement_type=InventoryMovementType.MANUAL_PRODUCTION_RECEIPT, movement_date=movement_datetime_updated,
-                reference_id=production_id, reference_type=ReferenceType.MANUAL_PRODUCTION,
-                description=f"تولید دستی (ویرایش شده): {finished_product_new.name if finished_product_new else ''}" # type: ignore
-            ):
-                raise Exception("خطا در تعدیل موجودی محصول نهایی (ویرایش).")
-
-            for new_item in saved_consumed_items:
-                comp_prod_info_new = self.product_manager.get_product_by_id(new_item.component_product_id) # type: ignore
-                comp_prod_name_new = comp_prod_info_new.name if comp_prod_info_new else f"ID {new_item.component_product_id}"
-                if not self.product_manager.adjust_stock(
-                    product_id=new_item.component_product_id, quantity_change= -new_item.quantity_consumed, # type: ignore
-                    movement_type=InventoryMovementType.MANUAL_PRODUCTION_ISSUE, movement_date=movement_datetime_updated,
+                                                      description=f"بازگشت تولید برای ویرایش تولید دستی ID {production_id}")
+
+                # ب) اعمال تعدیلات موجودی جدید:
+                movement_datetime_updated = datetime.combine(updated_header.production_date, datetime.min.time())
+                finished_product_new = self.product_manager.get_product_by_id(updated_header.finished_product_id) # type: ignore
+                self.product_manager.adjust_stock(
+                    product_id=updated_header.finished_product_id, quantity_change=updated_header.quantity_produced, # type: ignore
+                    movement_type=InventoryMovementType.MANUAL_PRODUCTION_RECEIPT, movement_date=movement_datetime_updated,
                     reference_id=production_id, reference_type=ReferenceType.MANUAL_PRODUCTION,
-                    description=f"مصرف ماده (ویرایش شده): {comp_prod_name_new} برای MP ID {production_id}"
-                ):
-                    raise Exception(f"خطا در تعدیل موجودی ماده اولیه (ویرایش) ID {new_item.component_product_id}.")
+                    description=f"تولید دستی (ویرایش شده): {finished_product_new.name if finished_product_new else ''}" # type: ignore
+                )
 
-            # ۶. (اختیاری) اصلاح یا ایجاد مجدد آثار مالی
-            # self.manual_production_repo.db_manager.commit_transaction()
+                for new_item in saved_consumed_items:
+                    comp_prod_info_new = self.product_manager.get_product_by_id(new_item.component_product_id) # type: ignore
+                    comp_prod_name_new = comp_prod_info_new.name if comp_prod_info_new else f"ID {new_item.component_product_id}"
+                    self.product_manager.adjust_stock(
+                        product_id=new_item.component_product_id, quantity_change= -new_item.quantity_consumed, # type: ignore
+                        movement_type=InventoryMovementType.MANUAL_PRODUCTION_ISSUE, movement_date=movement_datetime_updated,
+                        reference_id=production_id, reference_type=ReferenceType.MANUAL_PRODUCTION,
+                        description=f"مصرف ماده (ویرایش شده): {comp_prod_name_new} برای MP ID {production_id}"
+                    )
+
+                # ۶. (اختیاری) اصلاح یا ایجاد مجدد آثار مالی
             logger.info(f"Manual production MP ID {production_id} updated successfully.")
             return updated_header
             
         except Exception as e:
             logger.error(f"Error in update_manual_production for ID {production_id}: {e}", exc_info=True)
-            # self.manual_production_repo.db_manager.rollback_transaction()
             raise
 
     def delete_manual_production(self, production_id: int) -> bool:
@@ -337,27 +318,21 @@ class ProductionManager:
         #     logger.error(f"Manual production with ID {production_id} not found for deletion.")
         #     return False
 
-        # self.manual_production_repo.db_manager.begin_transaction()
         try:
-            # ابتدا اقلام مصرفی مرتبط را حذف کنید
-            if not self.consumed_material_repo.delete_by_manual_production_id(production_id):
-                # self.manual_production_repo.db_manager.rollback_transaction()
-                logger.error(f"Failed to delete consumed items for manual production ID {production_id}.")
-                return False
-            
-            # سپس هدر تولید دستی را حذف کنید
-            if not self.manual_production_repo.delete(production_id):
-                # self.manual_production_repo.db_manager.rollback_transaction()
-                logger.error(f"Failed to delete manual production header for ID {production_id}.")
-                return False
-
-            # هشدار: حذف رکورد تولید، به طور خودکار موجودی انبار را برنمی‌گرداند.
-            # این کار باید با یک عملیات تعدیل موجودی جداگانه انجام شود اگر لازم است.
-            # یا اینکه منطق تعدیل معکوس در اینجا پیاده‌سازی شود (پیچیده‌تر).
+            with self.manual_production_repo.db_manager.transaction():
+                # ابتدا اقلام مصرفی مرتبط را حذف کنید
+                if not self.consumed_material_repo.delete_by_manual_production_id(production_id):
+                    raise Exception(f"Failed to delete consumed items for manual production ID {production_id}.")
+
+                # سپس هدر تولید دستی را حذف کنید
+                if not self.manual_production_repo.delete(production_id):
+                    raise Exception(f"Failed to delete manual production header for ID {production_id}.")
+
+                # هشدار: حذف رکورد تولید، به طور خودکار موجودی انبار را برنمی‌گرداند.
+                # این کار باید با یک عملیات تعدیل موجودی جداگانه انجام شود اگر لازم است.
+                # یا اینکه منطق تعدیل معکوس در اینجا پیاده‌سازی شود (پیچیده‌تر).
             logger.info(f"Manual production record ID {production_id} and its items deleted successfully. Stock levels were NOT automatically reversed.")
-            # self.manual_production_repo.db_manager.commit_transaction()
             return True
         except Exception as e:
             logger.error(f"Error deleting manual production ID {production_id}: {e}", exc_info=True)
-            # self.manual_production_repo.db_manager.rollback_transaction()
             return False
\ No newline at end of file
@@ -13,6 +13,7 @@ from src.business_logic.person_manager import PersonManager
 from src.business_logic.product_manager import ProductManager
 
 from src.constants import PersonType, PurchaseOrderStatus, ProductType
+from src.utils.money import Money
 import logging
 
 logger = logging.getLogger(__name__)
@@ -96,40 +97,32 @@ class PurchaseOrderManager:
             description=description,
             fiscal_year_id=fiscal_year_id
         )
-        created_po_header_from_db: Optional[PurchaseOrderEntity] = None
         try:
-            created_po_header_from_db = self.po_repository.add(po_header_entity)
-            if not created_po_header_from_db or not created_po_header_from_db.id:
-                raise Exception("خطا در ذخیره هدر سفارش خرید.")
-            logger.info(f"PO Header ID {created_po_header_from_db.id} created.")
-
-            saved_item_entities_list: List[PurchaseOrderItemEntity] = []
-            for item_data_for_creation in temp_item_entities_data_for_db:
-                item_entity_to_save = PurchaseOrderItemEntity(
-                    purchase_order_id=created_po_header_from_db.id, # type: ignore
-                    product_id=item_data_for_creation['product_id'],
-                    ordered_quantity=item_data_for_creation['ordered_quantity'],
-                    unit_price=item_data_for_creation['unit_price'],
-                    total_item_amount=item_data_for_creation['total_item_amount']
-                )
-                saved_item = self.po_items_repository.add(item_entity_to_save)
-                saved_item_entities_list.append(saved_item)
-            
+            with self.po_repository.db_manager.transaction():
+                created_po_header_from_db = self.po_repository.add(po_header_entity)
+                if not created_po_header_from_db or not created_po_header_from_db.id:
+                    raise Exception("خطا در ذخیره هدر سفارش خرید.")
+                logger.info(f"PO Header ID {created_po_header_from_db.id} created.")
+
+                item_entities_to_save = [
+                    PurchaseOrderItemEntity(
+                        purchase_order_id=created_po_header_from_db.id, # type: ignore
+                        product_id=item_data_for_creation['product_id'],
+                        ordered_quantity=item_data_for_creation['ordered_quantity'],
+                        unit_price=item_data_for_creation['unit_price'],
+                        total_item_amount=item_data_for_creation['total_item_amount']
+                    )
+                    for item_data_for_creation in temp_item_entities_data_for_db
+                ]
+                saved_item_entities_list = self.po_items_repository.add_many(item_entities_to_save)
+                if saved_item_entities_list is None:
+                    raise Exception("خطا در ذخیره اقلام سفارش خرید.")
+
             created_po_header_from_db.items = saved_item_entities_list
             return created_po_header_from_db
         except Exception as e:
-            # ... (منطق rollback که قبلا بود) ...
-            log_order_num = order_number_to_use 
-            if created_po_header_from_db and created_po_header_from_db.id: 
-                logger.error(f"Error during item processing for PO {log_order_num} (ID: {created_po_header_from_db.id}). Attempting rollback.", exc_info=True)
-                try:
-                    self.po_items_repository.delete_by_purchase_order_id(created_po_header_from_db.id) # type: ignore
-                    self.po_repository.delete(created_po_header_from_db.id) # type: ignore
-                    logger.info(f"Rolled back PO Header ID {created_po_header_from_db.id}")
-                except Exception as rb_e:
-                    logger.critical(f"Failed to rollback PO Header ID {created_po_header_from_db.id}: {rb_e}")
-            else: 
-                 logger.error(f"Error during Purchase Order creation for {log_order_num}: {e}", exc_info=True)
+            # هدر و اقلام در یک تراکنش هستند و با خطا به طور کامل rollback می‌شوند
+            logger.error(f"Error during Purchase Order creation for {order_number_to_use}: {e}. Transaction rolled back.", exc_info=True)
             raise
 
     
@@ -250,7 +243,8 @@ class PurchaseOrderManager:
             return None
         
         logger.info(f"Updating paid amount for PO ID {po_id}. Change: {payment_amount_change}. Current paid: {po.paid_amount}")
-        po.paid_amount += payment_amount_change
+        # جمع در واحد خرد انجام می‌شود تا خطای float در پرداخت‌های متوالی جمع نشود
+        po.paid_amount = (Money.of(po.paid_amount) + Money.of(payment_amount_change)).to_float()
         
         # Clamp paid_amount
         if po.paid_amount < 0: po.paid_amount = 0.0
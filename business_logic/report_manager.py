@@ -47,7 +47,8 @@ class ReportManager:
         self.loan_installments_repository = loan_installments_repository
         self.purchase_orders_repository = purchase_orders_repository
 
-    def generate_balance_sheet(self, as_of_date: date) -> Dict[str, Any]:
+    def generate_balance_sheet(self, as_of_date: date, include_subaccounts: bool = False) -> Dict[str, Any]:
+        # با include_subaccounts مانده نمایش‌داده‌شده هر حساب شامل زیرشاخه‌هایش است؛ جمع‌ها از مانده‌های مستقیم
         logger.info(f"Generating Balance Sheet as of {as_of_date.strftime(DATE_FORMAT)}")
         report_data: Dict[str, Any] = {
             "as_of_date": as_of_date.strftime(DATE_FORMAT),
@@ -58,11 +59,14 @@ class ReportManager:
         }
 
         all_accounts = self.accounts_repository.get_all()
+        balances_as_of = self.account_manager.get_account_balances_as_of(as_of_date)
+        listed_balances = self.account_manager.roll_up_totals(balances_as_of) if include_subaccounts else balances_as_of
         for acc in all_accounts:
             if acc.id is None: continue
 
-            balance_as_of = self.account_manager.get_account_balance_as_of(acc.id, as_of_date)
-            account_info = {"id": acc.id, "name": acc.name, "balance": round(balance_as_of, 2)}
+            balance_as_of = balances_as_of.get(acc.id, 0.0)
+            account_info = {"id": acc.id, "name": acc.name, "parent_id": acc.parent_id,
+                            "balance": round(listed_balances.get(acc.id, 0.0), 2)}
 
             if acc.type == AccountType.ASSET:
                 report_data["assets"].append(account_info)
@@ -91,14 +95,16 @@ class ReportManager:
         }
         
         all_accounts = self.accounts_repository.get_all()
+        # CORRECTED: Use timedelta from datetime module
+        balances_before_start = self.account_manager.get_account_balances_as_of(start_date - timedelta(days=1))
+        balances_at_end = self.account_manager.get_account_balances_as_of(end_date)
         for acc in all_accounts:
             if acc.id is None: continue
             if acc.type not in [AccountType.REVENUE, AccountType.EXPENSE]:
                 continue
 
-            # CORRECTED: Use timedelta from datetime module
-            balance_at_start_minus_1 = self.account_manager.get_account_balance_as_of(acc.id, start_date - timedelta(days=1))
-            balance_at_end = self.account_manager.get_account_balance_as_of(acc.id, end_date)
+            balance_at_start_minus_1 = balances_before_start.get(acc.id, 0.0)
+            balance_at_end = balances_at_end.get(acc.id, 0.0)
             period_activity = balance_at_end - balance_at_start_minus_1
             
             account_info = {"id": acc.id, "name": acc.name, "amount": round(period_activity, 2)}
@@ -1,11 +1,15 @@
-from typing import List, Dict, Any, Optional, TYPE_CHECKING
-from datetime import date,datetime
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterator, TYPE_CHECKING
+from datetime import date
 from decimal import Decimal
 from datetime import date, timedelta # <<< FIX: وارد کردن timedelta
 
+from src.config import UI_LIST_PAGE_SIZE
 from .entities.account_entity import AccountEntity
+from ..data_access.base_repository import KeysetPage, KeysetKey
 from ..constants import FinancialTransactionType,AccountType,PersonType
+from ..utils.money import money_from_db
 from .person_manager import PersonManager
+from .columnar_engine import TransactionColumns
 
 if TYPE_CHECKING:
     from .account_manager import AccountManager
@@ -34,60 +38,89 @@ class ReportsManager:
         self.inventory_movement_repo = inventory_movement_repository
         self.person_manager = person_manager # <<< اضافه شد
 
-    def get_trial_balance(self, end_date: date) -> List[Dict[str, Any]]:
+    def load_transaction_columns(self, end_date: Optional[date] = None, with_details: bool = False) -> TransactionColumns:
         """
-        Generates the trial balance data up to a specific end date.
-        
+        تراکنش‌ها تا end_date را یک بار در آرایه‌های ستونی (NumPy) بارگذاری می‌کند. نتیجه را می‌توان
+        به پارامتر columns گزارش‌ها داد تا چند گزارش پشت سر هم بدون کوئری مجدد از حافظه محاسبه شوند
+        (برای دفتر کل with_details لازم است). اگر numpy نصب نباشد ValueError ایجاد می‌شود.
+        """
+        return TransactionColumns.load(self.ft_manager, end_date, with_details)
+
+    def _account_turnovers(self,
+                           start_date: Optional[date],
+                           end_date: Optional[date],
+                           columns: Optional[TransactionColumns] = None) -> Tuple[List[AccountEntity], Dict[int, Tuple[Decimal, Decimal]]]:
+        """
+        موتور تجمیع مشترک تراز آزمایشی، صورت سود و زیان و ترازنامه.
+        گردش بدهکار/بستانکار همه حساب‌ها با یک کوئری GROUP BY (account_id, transaction_type) محاسبه می‌شود
+        (یا اگر columns داده شود، با group-by برداری روی آرایه‌های ستونی) و اطلاعات حساب‌ها فقط یک بار بارگذاری می‌شود.
+
         Returns:
-            A list of dictionaries, where each dictionary represents an account
-            with its debit/credit turnover and final balance.
+            (all_accounts, {account_id: (debit_turnover, credit_turnover)})
         """
-        logger.info(f"Generating Trial Balance for date up to {end_date}...")
-        
         all_accounts = self.account_manager.get_all_accounts()
-        if not all_accounts:
-            return []
-            
-        all_transactions = self.ft_manager.get_transactions_by_date_range(end_date=end_date)
-        
-        # A dictionary to hold the turnover for each account
-        # key: account_id, value: {"debit": Decimal, "credit": Decimal}
-        account_turnovers: Dict[int, Dict[str, Decimal]] = {}
-
-        for trans in all_transactions:
-            acc_id = trans.account_id
-            if acc_id not in account_turnovers:
-                account_turnovers[acc_id] = {"debit": Decimal("0.0"), "credit": Decimal("0.0")}
+        accounts_by_id = {account.id: account for account in all_accounts}
+        if columns is not None:
+            turnovers_by_type = columns.turnovers_by_account(start_date, end_date)
+        else:
+            turnovers_by_type = self.ft_manager.get_account_turnovers(start_date, end_date)
+        return all_accounts, self._debit_credit_turnovers(accounts_by_id, turnovers_by_type)
 
+    @staticmethod
+    def _debit_credit_turnovers(accounts_by_id: Dict[int, AccountEntity],
+                                turnovers_by_type: Dict[int, Dict[FinancialTransactionType, Decimal]]
+                                ) -> Dict[int, Tuple[Decimal, Decimal]]:
+        """گردش هر حساب به تفکیک نوع تراکنش را به (گردش بدهکار، گردش بستانکار) بر اساس ماهیت حساب تبدیل می‌کند."""
+        account_turnovers: Dict[int, Tuple[Decimal, Decimal]] = {}
+        for acc_id, totals in turnovers_by_type.items():
+            account = accounts_by_id.get(acc_id)
+            if not account:
+                continue
             # Based on the logic in AccountManager.process_financial_transaction
             # INCOME increases the balance, EXPENSE decreases it.
+            increases = totals.get(FinancialTransactionType.INCOME, Decimal("0.0")) + totals.get(FinancialTransactionType.DEPOSIT, Decimal("0.0"))
+            decreases = totals.get(FinancialTransactionType.EXPENSE, Decimal("0.0")) + totals.get(FinancialTransactionType.WITHDRAWAL, Decimal("0.0"))
             # For Asset/Expense accounts: Debit is increase (INCOME), Credit is decrease (EXPENSE)
             # For Liability/Equity/Revenue accounts: Debit is decrease (EXPENSE), Credit is increase (INCOME)
+            if account.type in (AccountType.ASSET, AccountType.EXPENSE):
+                account_turnovers[acc_id] = (increases, decreases)
+            else:
+                account_turnovers[acc_id] = (decreases, increases)
+        return account_turnovers
 
-            account = self.account_manager.get_account_by_id(acc_id)
-            if not account:
-                continue
+    @staticmethod
+    def _net_increase(account: AccountEntity, turnover: Tuple[Decimal, Decimal]) -> Decimal:
+        """افزایش خالص مانده حساب (INCOME منهای EXPENSE) از روی گردش بدهکار/بستانکار آن."""
+        debit_turnover, credit_turnover = turnover
+        if account.type in (AccountType.ASSET, AccountType.EXPENSE):
+            return debit_turnover - credit_turnover
+        return credit_turnover - debit_turnover
 
-            # This logic assumes a standard chart of accounts.
-            # You might need to adjust this based on your specific account types.
-            is_debit_increase = account.type in (AccountType.ASSET, AccountType.EXPENSE)
-            
-            if trans.transaction_type == FinancialTransactionType.INCOME:
-                if is_debit_increase:
-                    account_turnovers[acc_id]["debit"] += trans.amount
-                else: # Liability, Equity, Revenue
-                    account_turnovers[acc_id]["credit"] += trans.amount
-            elif trans.transaction_type == FinancialTransactionType.EXPENSE:
-                if is_debit_increase:
-                    account_turnovers[acc_id]["credit"] += trans.amount
-                else: # Liability, Equity, Revenue
-                    account_turnovers[acc_id]["debit"] += trans.amount
+    def get_trial_balance(self,
+                          end_date: date,
+                          include_subaccounts: bool = False,
+                          columns: Optional[TransactionColumns] = None) -> List[Dict[str, Any]]:
+        """
+        Generates the trial balance data up to a specific end date.
+        With include_subaccounts=True each account's turnovers include all of its sub-accounts
+        (rolled up through the account tree), so only top-level rows add up to the grand total.
+        
+        Returns:
+            A list of dictionaries, where each dictionary represents an account
+            with its debit/credit turnover and final balance.
+        """
+        logger.info(f"Generating Trial Balance for date up to {end_date}...")
+        
+        all_accounts, account_turnovers = self._account_turnovers(None, end_date, columns)
+        if not all_accounts:
+            return []
+        if include_subaccounts:
+            account_turnovers = self.account_manager.roll_up_totals(account_turnovers)
         
         report_data: List[Dict[str, Any]] = []
+        zero_turnover = (Decimal("0.0"), Decimal("0.0"))
         for account in all_accounts:
-            turnover = account_turnovers.get(account.id, {"debit": Decimal("0.0"), "credit": Decimal("0.0")})
-            debit_turnover = turnover["debit"]
-            credit_turnover = turnover["credit"]
+            debit_turnover, credit_turnover = account_turnovers.get(account.id, zero_turnover)
             
             balance = debit_turnover - credit_turnover
             
@@ -102,6 +135,7 @@ class ReportsManager:
             report_data.append({
                 "account_id": account.id,
                 "account_name": account.name,
+                "parent_id": account.parent_id,
                 "debit_turnover": debit_turnover,
                 "credit_turnover": credit_turnover,
                 "final_balance_debit": final_balance_debit,
@@ -110,165 +144,210 @@ class ReportsManager:
             
         logger.info(f"Trial Balance report generated with {len(report_data)} accounts.")
         return report_data
+    def _debit_credit(self, account_type: AccountType, transaction_type: FinancialTransactionType, amount: Decimal) -> Tuple[Decimal, Decimal]:
+        """
+        بدهکار/بستانکار یک تراکنش بر اساس ماهیت حساب: برای دارایی/هزینه افزایش (INCOME/DEPOSIT) بدهکار است
+        و برای بدهی/حقوق صاحبان سهام/درآمد بستانکار. TRANSFER اثری ندارد.
+        """
+        movement = self.account_manager.balance_effect(transaction_type, amount)
+        if account_type not in (AccountType.ASSET, AccountType.EXPENSE):
+            movement = -movement
+        return (movement, Decimal("0.0")) if movement > 0 else (Decimal("0.0"), -movement)
+
+    def _journal_rows(self, rows: List[Any]) -> List[Dict[str, Any]]:
+        report_rows: List[Dict[str, Any]] = []
+        for row in rows:
+            debit_amount, credit_amount = self._debit_credit(AccountType(row["account_type"]),
+                                                             FinancialTransactionType(row["transaction_type"]),
+                                                             money_from_db(row["amount"]))
+            report_rows.append({
+                "transaction_id": row["id"],
+                "transaction_date": date.fromisoformat(row["transaction_date"][:10]),
+                "account_id": row["account_id"],
+                "account_name": row["account_name"],
+                "description": row["description"],
+                "debit": debit_amount,
+                "credit": credit_amount,
+                "reference_id": row["reference_id"],
+                "reference_type": row["reference_type"] or ""
+            })
+        return report_rows
+
+    def iter_general_journal(self, start_date: date, end_date: date) -> Iterator[List[Dict[str, Any]]]:
+        """دفتر روزنامه به صورت دسته‌ای، از یک کوئری مرتب روی idx_ft_date با JOIN نام حساب‌ها."""
+        for batch in self.ft_manager.iter_journal_batches(start_date, end_date):
+            yield self._journal_rows(batch)
+
     def get_general_journal(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
         """
         Data for the General Journal report within a date range.
         It resolves account names for display.
         """
         logger.info(f"Generating General Journal from {start_date} to {end_date}...")
-        
-        transactions = self.ft_manager.get_transactions_by_date_range(start_date=start_date, end_date=end_date)
-        
         report_data: List[Dict[str, Any]] = []
-        if not transactions:
-            return report_data
-
-        # مرتب‌سازی بر اساس تاریخ و سپس شناسه برای اطمینان از ترتیب صحیح
-        transactions.sort(key=lambda t: (t.transaction_date, t.id))
-
-        for trans in transactions:
-            account = self.account_manager.get_account_by_id(trans.account_id)
-            if not account:
-                continue
-
-            # بر اساس منطق قبلی، ماهیت حساب را برای تعیین بدهکار/بستانکار مشخص می‌کنیم
-            is_debit_increase = account.type in (AccountType.ASSET, AccountType.EXPENSE)
-            debit_amount = Decimal("0.0")
-            credit_amount = Decimal("0.0")
-
-            if trans.transaction_type == FinancialTransactionType.INCOME:
-                if is_debit_increase:
-                    debit_amount = trans.amount
-                else:
-                    credit_amount = trans.amount
-            elif trans.transaction_type == FinancialTransactionType.EXPENSE:
-                if is_debit_increase:
-                    credit_amount = trans.amount
-                else:
-                    debit_amount = trans.amount
-            
-            report_data.append({
-                "transaction_id": trans.id,
-                "transaction_date": trans.transaction_date.date(),
-                "account_id": account.id,
-                "account_name": account.name,
-                "description": trans.description,
-                "debit": debit_amount,
-                "credit": credit_amount,
-                "reference_id": trans.reference_id,
-                "reference_type": trans.reference_type.value if trans.reference_type else ""
-            })
-            
+        for batch in self.iter_general_journal(start_date, end_date):
+            report_data.extend(batch)
         logger.info(f"General Journal report generated with {len(report_data)} entries.")
         return report_data
-    def get_general_ledger(self, account_id: int, start_date: date, end_date: date) -> List[Dict[str, Any]]:
-        """
-        Generates the General Ledger for a specific account and date range.
-        Calculates a running balance for each transaction.
-        """
-        logger.info(f"Generating General Ledger for Account ID {account_id} from {start_date} to {end_date}...")
-        
-        account = self.account_manager.get_account_by_id(account_id)
-        if not account:
-            logger.error(f"Account with ID {account_id} not found for General Ledger.")
-            return []
 
-        # ۱. محاسبه مانده اولیه (مانده از قبل)
-        # FIX: واکشی تراکنش‌ها تا "روز قبل" از تاریخ شروع
-        day_before_start = start_date - timedelta(days=1)
-        transactions_before_start = self.ft_manager.get_transactions_by_date_range(end_date=day_before_start)
-        
-        opening_balance = Decimal("0.0")
-        is_debit_increase = account.type in (AccountType.ASSET, AccountType.EXPENSE)
-        
-        for trans in transactions_before_start:
-            if trans.account_id == account_id:
-                 if trans.transaction_type == FinancialTransactionType.INCOME:
-                     opening_balance += trans.amount
-                 else: # EXPENSE
-                     opening_balance -= trans.amount if is_debit_increase else -trans.amount
-        
-        transactions_in_range = self.ft_manager.get_transactions_by_date_range(start_date=start_date, end_date=end_date)
-        
-        report_data: List[Dict[str, Any]] = []
-        report_data.append({
+    def get_general_journal_page(self,
+                                 start_date: date,
+                                 end_date: date,
+                                 after_key: Optional[KeysetKey] = None,
+                                 page_size: int = UI_LIST_PAGE_SIZE) -> KeysetPage:
+        """یک صفحه از دفتر روزنامه بعد از کلید (transaction_date, id) صفحه قبل (صفحه‌بندی keyset)."""
+        rows = [row for batch in self.ft_manager.iter_journal_batches(start_date, end_date,
+                                                                      after_key=after_key, limit=page_size + 1)
+                for row in batch]
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_key = (rows[-1]["transaction_date"], rows[-1]["id"]) if has_more else None
+        return KeysetPage(items=self._journal_rows(rows), next_key=next_key, has_more=has_more)
+
+    @staticmethod
+    def _ledger_opening_row(start_date: date, opening_balance: Decimal) -> Dict[str, Any]:
+        return {
             "transaction_date": start_date,
             "description": "مانده از قبل",
             "debit": opening_balance if opening_balance > 0 else Decimal("0.0"),
             "credit": -opening_balance if opening_balance < 0 else Decimal("0.0"),
             "balance": opening_balance
-        })
+        }
 
-        running_balance = opening_balance
-        transactions_in_range.sort(key=lambda t: t.transaction_date)
+    def _ledger_rows(self, rows: List[Any], sign: int, balance_before_rows: Decimal) -> List[Dict[str, Any]]:
+        """
+        ردیف‌های خام دفتر (با running_effect از SUM() OVER) را به ردیف گزارش تبدیل می‌کند.
+        مانده به صورت بدهکار منهای بستانکار است؛ sign برای حساب‌های دارایی/هزینه 1 و برای بقیه -1.
+        """
+        report_rows: List[Dict[str, Any]] = []
+        for row in rows:
+            movement = sign * self.account_manager.balance_effect(FinancialTransactionType(row["transaction_type"]),
+                                                                  money_from_db(row["amount"]))
+            report_rows.append({
+                "id": row["id"],
+                "transaction_date": date.fromisoformat(row["transaction_date"][:10]),
+                "description": row["description"],
+                "debit": movement if movement > 0 else Decimal("0.0"),
+                "credit": -movement if movement < 0 else Decimal("0.0"),
+                "balance": balance_before_rows + sign * money_from_db(row["running_effect"]),
+                "reference_id": row["reference_id"],
+                "reference_type": row["reference_type"],
+            })
+        return report_rows
 
-        for trans in transactions_in_range:
-            if trans.account_id == account_id:
-                debit_amount = Decimal("0.0")
-                credit_amount = Decimal("0.0")
-                
-                if trans.transaction_type == FinancialTransactionType.INCOME:
-                    if is_debit_increase:
-                        debit_amount = trans.amount
-                        running_balance += trans.amount
-                    else:
-                        credit_amount = trans.amount
-                        running_balance -= trans.amount # Credit increases liability/revenue, so balance becomes more negative
-                elif trans.transaction_type == FinancialTransactionType.EXPENSE:
-                    if is_debit_increase:
-                        credit_amount = trans.amount
-                        running_balance -= trans.amount
-                    else:
-                        debit_amount = trans.amount
-                        running_balance += trans.amount # Debit decreases liability/revenue
-                
-                report_data.append({
-                    "transaction_date": trans.transaction_date.date(),
-                    "description": trans.description,
-                    "debit": debit_amount,
-                    "credit": credit_amount,
-                    "balance": running_balance,
-                })
-        
+    def _ledger_account_sign(self, account_id: int) -> Optional[int]:
+        account = self.account_manager.get_account_by_id(account_id)
+        if not account:
+            logger.error(f"Account with ID {account_id} not found for General Ledger.")
+            return None
+        return 1 if account.type in (AccountType.ASSET, AccountType.EXPENSE) else -1
+
+    def iter_general_ledger(self,
+                            account_id: int,
+                            start_date: date,
+                            end_date: date,
+                            columns: Optional[TransactionColumns] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        دفتر کل یک حساب به صورت دسته‌ای: اولین دسته ردیف «مانده از قبل» است و بقیه از یک کوئری
+        روی همان حساب با مانده تجمعی SUM() OVER (ORDER BY transaction_date, id) خوانده می‌شوند
+        (یا با columns، از آرایه‌های ستونی با np.cumsum).
+        """
+        sign = self._ledger_account_sign(account_id)
+        if sign is None:
+            return
+        if columns is not None:
+            opening_balance = sign * columns.account_net_effect_before(account_id, start_date)
+            yield [self._ledger_opening_row(start_date, opening_balance)]
+            yield self._ledger_rows(columns.ledger_rows(account_id, start_date, end_date), sign, opening_balance)
+            return
+        opening_balance = sign * self.ft_manager.get_account_net_effect_before(account_id, start_date)
+        yield [self._ledger_opening_row(start_date, opening_balance)]
+        for batch in self.ft_manager.iter_account_ledger_batches(account_id, start_date, end_date):
+            yield self._ledger_rows(batch, sign, opening_balance)
+
+    def get_general_ledger(self,
+                           account_id: int,
+                           start_date: date,
+                           end_date: date,
+                           columns: Optional[TransactionColumns] = None) -> List[Dict[str, Any]]:
+        """
+        Generates the General Ledger for a specific account and date range.
+        Calculates a running balance for each transaction.
+        """
+        logger.info(f"Generating General Ledger for Account ID {account_id} from {start_date} to {end_date}...")
+        report_data: List[Dict[str, Any]] = []
+        for batch in self.iter_general_ledger(account_id, start_date, end_date, columns):
+            report_data.extend(batch)
         logger.info(f"General Ledger report for Account ID {account_id} generated with {len(report_data)} entries.")
         return report_data
 
+    def get_general_ledger_page_loader(self,
+                                       account_id: int,
+                                       start_date: date,
+                                       end_date: date,
+                                       page_size: int = UI_LIST_PAGE_SIZE) -> Callable[[Optional[KeysetKey]], KeysetPage]:
+        """
+        loader صفحه‌بندی keyset دفتر کل برای مدل‌های جدول (KeysetPagingMixin).
+        هر صفحه فقط page_size ردیف بعد از کلید (transaction_date, id) صفحه قبل را می‌خواند و
+        مانده پایان هر صفحه برای ادامه مانده تجمعی صفحه بعد نگه داشته می‌شود.
+        """
+        sign = self._ledger_account_sign(account_id)
+        if sign is None:
+            raise ValueError(f"حسابی با شناسه {account_id} یافت نشد.")
+        opening_balance = sign * self.ft_manager.get_account_net_effect_before(account_id, start_date)
+        balance_at_key: Dict[KeysetKey, Decimal] = {}
+
+        def load_page(after_key: Optional[KeysetKey]) -> KeysetPage:
+            rows = [row for batch in self.ft_manager.iter_account_ledger_batches(
+                        account_id, start_date, end_date, after_key=after_key, limit=page_size + 1)
+                    for row in batch]
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            items = self._ledger_rows(rows, sign, opening_balance if after_key is None else balance_at_key[after_key])
+            if after_key is None:
+                items.insert(0, self._ledger_opening_row(start_date, opening_balance))
+            next_key = None
+            if has_more:
+                next_key = (rows[-1]["transaction_date"], rows[-1]["id"])
+                balance_at_key[next_key] = items[-1]["balance"]
+            return KeysetPage(items=items, next_key=next_key, has_more=has_more)
+
+        return load_page
+
     def get_stock_ledger(self, product_id: int, start_date: date, end_date: date) -> List[Dict[str, Any]]:
         """
         کاردکس کالا را برای یک محصول و بازه زمانی مشخص تولید می‌کند.
+        موجودی از قبل از product_stock_snapshots خوانده می‌شود و حرکات بازه با یک جستجوی index
+        و مانده تجمعی SUM() OVER؛ هزینه آن به تعداد حرکات قبل از بازه بستگی ندارد.
         """
         logger.info(f"Generating Stock Ledger for Product ID {product_id} from {start_date} to {end_date}...")
         product = self.product_manager.get_product_by_id(product_id)
-        opening_stock = product.stock_quantity if product else Decimal("0.0")
-        all_movements = self.inventory_movement_repo.find_by_criteria(
-        {"product_id": product_id},
-        order_by="movement_date ASC, id ASC"
-    )
-        opening_movements = [
-        move for move in all_movements 
-        if isinstance(move.movement_date, (date, datetime)) 
-        and move.movement_date.date() < start_date
-    ]
-        opening_stock += sum(
-        Decimal(str(move.quantity_change)) for move in opening_movements
-    )
+        if not product:
+            logger.error(f"Product with ID {product_id} not found for Stock Ledger.")
+            return []
+
+        # stock_quantity موجودی فعلی است (شامل موجودی اولیه‌ای که حرکت انبار ندارد)؛
+        # موجودی از قبل = موجودی فعلی - جمع همه حرکات + جمع حرکات تا پایان روز قبل از شروع
+        movements_total = self.inventory_movement_repo.get_snapshot_quantity_as_of(product_id)
+        movements_before_start = self.inventory_movement_repo.get_snapshot_quantity_as_of(product_id, start_date - timedelta(days=1))
+        opening_stock = product.stock_quantity - movements_total + movements_before_start
+
         report_data: List[Dict[str, Any]] = [{
             "movement_date": start_date, "description": "موجودی از قبل",
             "qty_in": Decimal("0.0"), "qty_out": Decimal("0.0"), "balance": opening_stock
         }]
-
-        running_balance = opening_stock
-        for move in all_movements:
-            if start_date <= move.movement_date.date() <= end_date:
-                running_balance += move.quantity_change
+        for batch in self.inventory_movement_repo.iter_stock_ledger_batches(product_id, start_date, end_date):
+            for row in batch:
+                quantity_change = Decimal(str(row["quantity_change"]))
                 report_data.append({
-                    "movement_date": move.movement_date.date(),
-                    "description": move.description,
-                    "qty_in": move.quantity_change if move.quantity_change > 0 else Decimal("0.0"),
-                    "qty_out": -move.quantity_change if move.quantity_change < 0 else Decimal("0.0"),
-                    "balance": running_balance,
+                    "movement_date": date.fromisoformat(row["movement_date"][:10]),
+                    "description": row["description"],
+                    "qty_in": quantity_change if quantity_change > 0 else Decimal("0.0"),
+                    "qty_out": -quantity_change if quantity_change < 0 else Decimal("0.0"),
+                    "balance": opening_stock + Decimal(str(round(row["running_quantity"], 6))),
                 })
-            
+
+        logger.info(f"Stock Ledger for Product ID {product_id} generated with {len(report_data)} entries.")
         return report_data
 
 
@@ -277,47 +356,66 @@ class ReportsManager:
         گزارش مانده حساب اشخاص را بر اساس نوع (مشتری/تامین‌کننده) تولید می‌کند.
         """
         logger.info(f"Generating Persons Balance Report for type: {person_type_filter.value}")
-        
-        persons = self.person_manager.get_persons_by_type(person_type_filter)
-        if not persons:
-            return []
-            
-        report_data = []
-        for person in persons:
-            if not person.id:
-                continue
-                
-            subsidiary_account_id = self.account_manager.get_person_subsidiary_account_id(person.id)
-            if not subsidiary_account_id:
-                logger.warning(f"No subsidiary account found for Person ID {person.id} ({person.name}). Skipping.")
-                continue
-                
-            account = self.account_manager.get_account_by_id(subsidiary_account_id)
-            if not account:
-                logger.warning(f"Subsidiary account with ID {subsidiary_account_id} not found for Person ID {person.id}. Skipping.")
-                continue
-                
-            balance = account.balance
-            
-            # فقط اشخاصی که مانده غیر صفر دارند نمایش داده می‌شوند
-            if balance.copy_abs() > Decimal("0.001"):
-                report_data.append({
-                    "person_id": person.id,
-                    "person_name": person.name,
-                    "balance": balance
-                })
-                
+        # مانده همه اشخاص با یک کوئری تجمیعی روی accounts.person_id (بدون N+1 جستجوی حساب معین)
+        rows = self.account_manager.get_person_account_balances(person_type_filter)
+        report_data = [{"person_id": row["person_id"],
+                        "person_name": row["person_name"],
+                        "balance": row["balance"]} for row in rows]
         logger.info(f"Generated balance report for {len(report_data)} persons.")
         return report_data
 
-    def get_income_statement_data(self, start_date: date, end_date: date) -> Dict[str, Any]:
+    def get_persons_aging_report(self, person_type_filter: PersonType, as_of_date: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        گزارش مانده اشخاص همراه با سن بدهی فاکتورهای باز (0-30، 31-60، 61-90 و بیش از 90 روز از سررسید) تا as_of_date.
+        """
+        as_of_date = as_of_date or date.today()
+        logger.info(f"Generating Persons Aging Report for type: {person_type_filter.value} as of {as_of_date}")
+        rows = self.account_manager.get_person_account_balances(person_type_filter, aging_as_of=as_of_date)
+        report_data = [{"person_id": row["person_id"],
+                        "person_name": row["person_name"],
+                        "balance": row["balance"],
+                        "aging_0_30": row["aging_0_30"],
+                        "aging_31_60": row["aging_31_60"],
+                        "aging_61_90": row["aging_61_90"],
+                        "aging_over_90": row["aging_over_90"]} for row in rows]
+        logger.info(f"Generated aging report for {len(report_data)} persons.")
+        return report_data
+
+    def _fill_statement_sections(self,
+                                 report_data: Dict[str, Any],
+                                 all_accounts: List[AccountEntity],
+                                 account_turnovers: Dict[int, Tuple[Decimal, Decimal]],
+                                 sections: Dict[AccountType, Tuple[str, str]],
+                                 include_subaccounts: bool) -> None:
+        """
+        ردیف‌ها و جمع هر بخش صورت مالی را پر می‌کند. جمع بخش‌ها همیشه از مبالغ مستقیم حساب‌هاست؛
+        با include_subaccounts مبلغ نمایش‌داده‌شده هر حساب، مانده roll-up شده زیرشاخه‌هایش است.
+        """
+        listed_turnovers = self.account_manager.roll_up_totals(account_turnovers) if include_subaccounts else account_turnovers
+        for account in all_accounts:
+            if account.type not in sections:
+                continue
+            list_key, total_key = sections[account.type]
+            if account.id in account_turnovers:
+                report_data[total_key] += self._net_increase(account, account_turnovers[account.id])
+            if account.id in listed_turnovers:
+                amount = self._net_increase(account, listed_turnovers[account.id])
+                if amount.copy_abs() > Decimal("0.001"):
+                    report_data[list_key].append({"name": account.name, "amount": amount,
+                                                  "account_id": account.id, "parent_id": account.parent_id})
+
+    def get_income_statement_data(self,
+                                  start_date: date,
+                                  end_date: date,
+                                  include_subaccounts: bool = False,
+                                  columns: Optional[TransactionColumns] = None) -> Dict[str, Any]:
         """
         داده‌های لازم برای صورت سود و زیان را در یک بازه زمانی مشخص تولید می‌کند.
+        با include_subaccounts=True مبلغ هر حساب شامل زیرشاخه‌هایش است.
         """
         logger.info(f"Generating Income Statement from {start_date} to {end_date}...")
         
-        all_accounts = self.account_manager.get_all_accounts()
-        transactions_in_range = self.ft_manager.get_transactions_by_date_range(start_date, end_date)
+        all_accounts, account_turnovers = self._account_turnovers(start_date, end_date, columns)
         
         report_data: Dict[str, Any] = {
             "revenues": [],
@@ -329,30 +427,113 @@ class ReportsManager:
             "end_date": end_date
         }
         
-        # محاسبه مجموع درآمدها
-        revenue_accounts = [acc for acc in all_accounts if acc.type == AccountType.REVENUE]
-        for account in revenue_accounts:
-            account_turnover = sum(
-                (t.amount if t.transaction_type == FinancialTransactionType.INCOME else -t.amount)
-                for t in transactions_in_range if t.account_id == account.id
-            )
-            if account_turnover.copy_abs() > Decimal("0.001"):
-                report_data["revenues"].append({"name": account.name, "amount": account_turnover})
-                report_data["total_revenue"] += account_turnover
-                
-        # محاسبه مجموع هزینه‌ها
-        expense_accounts = [acc for acc in all_accounts if acc.type == AccountType.EXPENSE]
-        for account in expense_accounts:
-            account_turnover = sum(
-                (t.amount if t.transaction_type == FinancialTransactionType.INCOME else -t.amount)
-                for t in transactions_in_range if t.account_id == account.id
-            )
-            if account_turnover.copy_abs() > Decimal("0.001"):
-                report_data["expenses"].append({"name": account.name, "amount": account_turnover})
-                report_data["total_expense"] += account_turnover
+        # محاسبه مجموع درآمدها و هزینه‌ها
+        self._fill_statement_sections(report_data, all_accounts, account_turnovers,
+                                      {AccountType.REVENUE: ("revenues", "total_revenue"),
+                                       AccountType.EXPENSE: ("expenses", "total_expense")},
+                                      include_subaccounts)
                 
         # محاسبه سود (زیان) خالص
         report_data["net_income"] = report_data["total_revenue"] - report_data["total_expense"]
         
         logger.info(f"Income Statement generated. Net Income: {report_data['net_income']}")
         return report_data
+
+    def get_comparative_income_statement(self,
+                                         period_starts: List[date],
+                                         end_date: date,
+                                         include_subaccounts: bool = False,
+                                         columns: Optional[TransactionColumns] = None) -> Dict[str, Any]:
+        """
+        صورت سود و زیان مقایسه‌ای چند دوره (مثلاً ۱۲ ماه یا ۴ فصل سال مالی) کنار هم.
+        دوره i از period_starts[i] تا روز قبل از شروع دوره بعد (آخرین دوره تا end_date) است و گردش همه دوره‌ها
+        با یک اسکن GROUP BY (یا از آرایه‌های ستونی) محاسبه می‌شود. خروجی ماتریس حساب × دوره است:
+        هر ردیف revenues/expenses شامل amounts (مبلغ هر دوره) و total است و جمع‌ها و net_income لیست‌هایی به طول تعداد دوره‌ها هستند.
+        """
+        if not period_starts or any(later <= earlier for earlier, later in zip(period_starts, period_starts[1:])):
+            raise ValueError("تاریخ شروع دوره‌ها باید صعودی و بدون تکرار باشد.")
+        if period_starts[0] > end_date:
+            raise ValueError("تاریخ شروع اولین دوره نمی‌تواند بعد از تاریخ پایان باشد.")
+        period_starts = [period_start for period_start in period_starts if period_start <= end_date]
+        logger.info(f"Generating comparative Income Statement for {len(period_starts)} periods from {period_starts[0]} to {end_date}...")
+
+        all_accounts = self.account_manager.get_all_accounts()
+        accounts_by_id = {account.id: account for account in all_accounts}
+        if columns is not None:
+            turnovers_by_period = columns.turnovers_by_period_starts(period_starts, end_date)
+        else:
+            # بدون roll-up فقط گردش حساب‌های درآمد و هزینه لازم است (زیرشاخه‌ها ممکن است نوع دیگری داشته باشند)
+            account_types = None if include_subaccounts else [AccountType.REVENUE, AccountType.EXPENSE]
+            turnovers_by_period = self.ft_manager.get_account_turnovers_by_period(period_starts, end_date, account_types)
+
+        period_count = len(period_starts)
+        zero_amounts = [Decimal("0.0")] * period_count
+        report_data: Dict[str, Any] = {
+            "periods": [{"start_date": period_start,
+                         "end_date": (period_starts[index + 1] - timedelta(days=1)) if index + 1 < period_count else end_date}
+                        for index, period_start in enumerate(period_starts)],
+            "revenues": [],
+            "total_revenue": list(zero_amounts),
+            "expenses": [],
+            "total_expense": list(zero_amounts),
+            "net_income": list(zero_amounts),
+            "start_date": period_starts[0],
+            "end_date": end_date
+        }
+        rows_by_account: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        for index in range(period_count):
+            # هر دوره با همان منطق صورت سود و زیان تک‌دوره‌ای پر می‌شود و در ستون خودش قرار می‌گیرد
+            period_data: Dict[str, Any] = {"revenues": [], "total_revenue": Decimal("0.0"),
+                                           "expenses": [], "total_expense": Decimal("0.0")}
+            self._fill_statement_sections(period_data, all_accounts,
+                                          self._debit_credit_turnovers(accounts_by_id, turnovers_by_period.get(index, {})),
+                                          {AccountType.REVENUE: ("revenues", "total_revenue"),
+                                           AccountType.EXPENSE: ("expenses", "total_expense")},
+                                          include_subaccounts)
+            for list_key in ("revenues", "expenses"):
+                for item in period_data[list_key]:
+                    row = rows_by_account.get((list_key, item["account_id"]))
+                    if row is None:
+                        row = {"name": item["name"], "account_id": item["account_id"], "parent_id": item["parent_id"],
+                               "amounts": list(zero_amounts), "total": Decimal("0.0")}
+                        rows_by_account[(list_key, item["account_id"])] = row
+                    row["amounts"][index] = item["amount"]
+                    row["total"] += item["amount"]
+            report_data["total_revenue"][index] = period_data["total_revenue"]
+            report_data["total_expense"][index] = period_data["total_expense"]
+            report_data["net_income"][index] = period_data["total_revenue"] - period_data["total_expense"]
+
+        # ترتیب ردیف‌ها همان ترتیب حساب‌ها در صورت سود و زیان تک‌دوره‌ای است
+        for account in all_accounts:
+            for list_key in ("revenues", "expenses"):
+                row = rows_by_account.get((list_key, account.id))
+                if row is not None:
+                    report_data[list_key].append(row)
+        logger.info(f"Comparative Income Statement generated for {period_count} periods.")
+        return report_data
+
+    def get_balance_sheet_data(self,
+                               as_of_date: date,
+                               include_subaccounts: bool = False,
+                               columns: Optional[TransactionColumns] = None) -> Dict[str, Any]:
+        """
+        داده‌های ترازنامه (دارایی‌ها، بدهی‌ها و حقوق صاحبان سهام) در پایان as_of_date،
+        از همان موتور تجمیع تراز آزمایشی.
+        """
+        logger.info(f"Generating Balance Sheet as of {as_of_date}...")
+        all_accounts, account_turnovers = self._account_turnovers(None, as_of_date, columns)
+
+        report_data: Dict[str, Any] = {
+            "assets": [], "total_assets": Decimal("0.0"),
+            "liabilities": [], "total_liabilities": Decimal("0.0"),
+            "equity": [], "total_equity": Decimal("0.0"),
+            "as_of_date": as_of_date
+        }
+        self._fill_statement_sections(report_data, all_accounts, account_turnovers,
+                                      {AccountType.ASSET: ("assets", "total_assets"),
+                                       AccountType.LIABILITY: ("liabilities", "total_liabilities"),
+                                       AccountType.EQUITY: ("equity", "total_equity")},
+                                      include_subaccounts)
+
+        report_data["total_liabilities_equity"] = report_data["total_liabilities"] + report_data["total_equity"]
+        return report_data
@@ -13,6 +13,48 @@ DATABASE_PATH = os.path.join(DATA_DIR, DB_NAME)
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
+# --- Connection Pool Configuration ---
+# اگر فعال باشد، DatabaseManager برای هر thread یک اتصال ماندگار نگه می‌دارد
+# به جای اینکه برای هر کوئری یک اتصال جدید باز و بسته کند.
+DB_USE_CONNECTION_POOL = True
+DB_POOL_SIZE = 5            # حداکثر تعداد اتصال‌های همزمان (thread اصلی + worker ها)
+DB_POOL_TIMEOUT = 10.0      # حداکثر زمان انتظار (ثانیه) برای گرفتن اتصال از pool
+DB_FETCH_BATCH_SIZE = 1000  # تعداد ردیف‌هایی که iter_all / iter_by_criteria در هر fetchmany می‌خوانند
+DB_STATEMENT_CACHE_SIZE = 256 # تعداد دستورات آماده (prepared) که sqlite3 برای هر اتصال cache می‌کند (پیش‌فرض پایتون: 128)
+ENTITY_CACHE_SIZE = 2048     # حداکثر تعداد حساب / شخص / کالا در cache خواندنی (LRU) هر جدول؛ 0 یعنی بدون cache
+
+# --- Storage Performance Profile ---
+# PRAGMA هایی که DatabaseManager هنگام باز کردن هر اتصال اعمال می‌کند.
+# حالت WAL باعث می‌شود خواندن گزارش‌ها، نوشتن اسناد را مسدود نکند.
+#   durable     : حداکثر دوام (fsync در هر commit)
+#   balanced    : پیش‌فرض؛ WAL + synchronous=NORMAL (در صورت قطع برق فقط آخرین commit ها ممکن است از دست بروند)
+#   bulk-import : فقط برای ورود داده‌های حجیم؛ بدون fsync
+# cache_size منفی یعنی اندازه بر حسب KiB. mmap_size بر حسب بایت است.
+DB_PERFORMANCE_PROFILES = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,            # ~8 MB
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,           # ~32 MB
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "bulk-import": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -128000,          # ~128 MB
+        "mmap_size": 512 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+DB_PERFORMANCE_PROFILE = "balanced"
+
 # --- Logging Configuration ---
 LOGS_DIR = os.path.join(os.path.dirname(BASE_DIR), "logs") # accountingtest/logs/
 LOG_FILE_NAME = "app.log"
@@ -54,6 +96,7 @@ LOGGING_CONFIG = {
 
 # --- Application Settings (Defaults that might be overridden by DB settings) ---
 DEFAULT_CURRENCY = "IRR" # Example, can be changed
+UI_LIST_PAGE_SIZE = 200 # تعداد ردیف‌هایی که جداول لیست اسناد در هر مرحله (fetchMore) بارگذاری می‌کنند
 COMPANY_NAME = "نام شرکت شما" # Example, can be loaded from DB Settings
 # تنظیمات لاگ‌گیری
 LOG_LEVEL = logging.DEBUG  # می‌توانید از logging.INFO, logging.WARNING, logging.ERROR هم استفاده کنید
@@ -142,6 +142,13 @@ DEFAULT_ACCOUNTS_CONFIG_FOR_PAYMENT = {
     "checks_payable_account": 201       # <<< حساب "اسناد پرداختنی" اضافه شد
 }
 
+# نقش‌های حسابداری که با نام حساب شناخته می‌شوند (PostingRulesRegistry آن‌ها را یک بار به شناسه حساب تبدیل می‌کند)
+POSTING_ACCOUNT_NAMES = {
+    "sales_revenue": "فروش",
+    "accounts_receivable": "حساب‌های دریافتنی",   # حساب کل حساب‌های معین مشتریان
+    "accounts_payable": "حساب‌های پرداختنی",      # حساب کل حساب‌های معین تامین‌کنندگان
+}
+
 # دیکشنری برای پیکربندی حساب‌های پیش‌فرض در ماژول چک
 DEFAULT_ACCOUNTS_CONFIG_FOR_CHECKS = {
     "checks_receivable_account": 101,
@@ -1,11 +1,14 @@
 # src/data_access/accounts_repository.py
 
-from typing import Dict, Any, Optional, List, TYPE_CHECKING
+from typing import Dict, Any, Optional, List, Iterable, TYPE_CHECKING
 from decimal import Decimal # <<< اضافه کردن import برای Decimal
+from datetime import date
 
-from src.data_access.base_repository import BaseRepository
+from src.data_access.base_repository import BaseRepository, SQLITE_MAX_VARIABLES
 from src.data_access.database_manager import DatabaseManager
-from src.constants import AccountType
+from src.utils.money import money_to_db, money_from_db
+from src.config import ENTITY_CACHE_SIZE
+from src.constants import AccountType, PersonType, InvoiceType, InvoiceStatus
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,7 +23,8 @@ class AccountsRepository(BaseRepository['AccountEntity']):
         from src.business_logic.entities.account_entity import AccountEntity 
         super().__init__(db_manager=db_manager, 
                          model_type=AccountEntity, 
-                         table_name="accounts") 
+                         table_name="accounts",
+                         cache_size=ENTITY_CACHE_SIZE)
 
     def _entity_from_row(self, row: Dict[str, Any]) -> 'AccountEntity':
         from src.business_logic.entities.account_entity import AccountEntity 
@@ -43,7 +47,8 @@ class AccountsRepository(BaseRepository['AccountEntity']):
                 name=row.get('name', ''), # مقدار پیش‌فرض اگر name وجود ندارد
                 type=account_type_enum, # مقدار تبدیل شده یا None
                 parent_id=row.get('parent_id'),
-                balance=Decimal(str(row.get('balance', '0.0'))) # تبدیل به Decimal
+                balance=money_from_db(row.get('balance')),
+                person_id=row.get('person_id')
             )
         except KeyError as e: # این خطا کمتر محتمل است اگر از .get استفاده کنیم
             logger.error(f"KeyError when creating AccountEntity from row: {e}. Row: {row}", exc_info=True)
@@ -58,6 +63,103 @@ class AccountsRepository(BaseRepository['AccountEntity']):
         row = self.db_manager.fetch_one(query, (name,))
         return self._entity_from_row(dict(row)) if row else None
 
+    def apply_balance_delta(self, account_id: int, delta: Decimal) -> bool:
+        """
+        delta را با یک دستور اتمیک به مانده حساب اضافه می‌کند (False اگر حساب وجود ندارد).
+        داخل تراکنش ثبت سند صدا زده می‌شود؛ cache حساب بعد از پایان آن تراکنش باطل می‌شود.
+        """
+        cursor = self.db_manager.execute_query(f"UPDATE {self._table_name} SET balance = balance + ? WHERE id = ?",
+                                               (money_to_db(delta), account_id))
+        self.invalidate_cache((account_id,))
+        return cursor.rowcount > 0
+
+    def apply_balance_deltas(self, deltas: Dict[int, Decimal]) -> int:
+        """
+        چند تغییر مانده ({account_id: delta}) را با یک دستور UPDATE آماده (executemany) اعمال می‌کند
+        و تعداد حساب‌های به‌روز شده را برمی‌گرداند.
+        """
+        if not deltas:
+            return 0
+        with self.db_manager.transaction() as conn:
+            updated = conn.executemany(f"UPDATE {self._table_name} SET balance = balance + ? WHERE id = ?",
+                                       [(money_to_db(delta), account_id) for account_id, delta in deltas.items()]).rowcount
+            self.invalidate_cache(deltas.keys())
+        return updated
+
+    def get_types_by_ids(self, account_ids: Iterable[int]) -> Dict[int, AccountType]:
+        """{شناسه حساب: نوع حساب} برای چند حساب با یک کوئری به ازای هر SQLITE_MAX_VARIABLES شناسه (حساب‌های ناموجود در نتیجه نیستند)."""
+        unique_ids = list(dict.fromkeys(account_ids))
+        if not unique_ids:
+            return {}
+        types_by_id: Dict[int, AccountType] = {}
+        for start in range(0, len(unique_ids), SQLITE_MAX_VARIABLES):
+            chunk = unique_ids[start:start + SQLITE_MAX_VARIABLES]
+            query = f"SELECT id, type FROM {self._table_name} WHERE id IN ({', '.join(['?'] * len(chunk))})"
+            for row in self.db_manager.fetch_all(query, tuple(chunk)):
+                types_by_id[row['id']] = AccountType(row['type'])
+        return types_by_id
+
+    def get_ids_by_names(self, names: Iterable[str]) -> Dict[str, int]:
+        """{نام حساب: شناسه} برای چند نام با یک کوئری؛ اگر چند حساب هم‌نام باشند، کوچک‌ترین شناسه."""
+        unique_names = list(dict.fromkeys(names))
+        if not unique_names:
+            return {}
+        query = (f"SELECT name, MIN(id) AS id FROM {self._table_name} "
+                 f"WHERE name IN ({', '.join(['?'] * len(unique_names))}) GROUP BY name")
+        return {row['name']: row['id'] for row in self.db_manager.fetch_all(query, tuple(unique_names))}
+
+    def get_by_person_id(self, person_id: int) -> Optional['AccountEntity']:
+        """حساب معین یک شخص (از ستون person_id با index یکتا)."""
+        row = self.db_manager.fetch_one(f"SELECT * FROM {self._table_name} WHERE person_id = ?", (person_id,))
+        return self._entity_from_row(dict(row)) if row else None
+
+    def get_person_balances(self,
+                            person_type: PersonType,
+                            invoice_type: Optional[InvoiceType] = None,
+                            as_of_date: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        مانده حساب معین همه اشخاص یک نوع در یک کوئری (JOIN روی accounts.person_id).
+        با invoice_type، در همان کوئری مانده فاکتورهای باز هر شخص بر اساس روزهای گذشته از سررسید
+        (due_date یا در نبود آن invoice_date) تا as_of_date در بازه‌های 0-30، 31-60، 61-90 و بیش از 90 روز تفکیک می‌شود.
+        فقط اشخاصی که مانده حساب یا فاکتور باز دارند برگردانده می‌شوند. مبالغ (balance و aging_*) Decimal هستند.
+        """
+        params: List[Any] = []
+        aging_columns = ""
+        aging_join = ""
+        if invoice_type is not None:
+            aging_columns = (", COALESCE(aging.days_0_30, 0) AS aging_0_30, COALESCE(aging.days_31_60, 0) AS aging_31_60, "
+                             "COALESCE(aging.days_61_90, 0) AS aging_61_90, COALESCE(aging.days_over_90, 0) AS aging_over_90")
+            aging_join = (
+                " LEFT JOIN ("
+                "SELECT person_id, "
+                "SUM(CASE WHEN overdue_days <= 30 THEN open_amount ELSE 0 END) AS days_0_30, "
+                "SUM(CASE WHEN overdue_days > 30 AND overdue_days <= 60 THEN open_amount ELSE 0 END) AS days_31_60, "
+                "SUM(CASE WHEN overdue_days > 60 AND overdue_days <= 90 THEN open_amount ELSE 0 END) AS days_61_90, "
+                "SUM(CASE WHEN overdue_days > 90 THEN open_amount ELSE 0 END) AS days_over_90 "
+                "FROM (SELECT person_id, total_amount - paid_amount AS open_amount, "
+                "julianday(?) - julianday(substr(COALESCE(due_date, invoice_date), 1, 10)) AS overdue_days "
+                "FROM invoices WHERE invoice_type = ? AND is_paid = 0 AND status NOT IN (?, ?) "
+                "AND total_amount - paid_amount > 0) "
+                "GROUP BY person_id) aging ON aging.person_id = p.id")
+            params.extend(((as_of_date or date.today()).isoformat(), invoice_type.value,
+                           InvoiceStatus.CANCELED.value, InvoiceStatus.DRAFT.value))
+        query = (f"SELECT p.id AS person_id, p.name AS person_name, a.id AS account_id, a.balance{aging_columns} "
+                 f"FROM persons p JOIN {self._table_name} a ON a.person_id = p.id{aging_join} "
+                 f"WHERE p.person_type = ? AND (a.balance <> 0"
+                 f"{' OR aging.person_id IS NOT NULL' if invoice_type is not None else ''}) "
+                 f"ORDER BY p.name")
+        params.append(person_type.value)
+        # ستون‌های پولی عدد صحیح واحد خرد هستند، پس جمع‌های SQL دقیق‌اند و فقط به Decimal تبدیل می‌شوند
+        money_keys = ('balance', 'aging_0_30', 'aging_31_60', 'aging_61_90', 'aging_over_90')
+        rows = []
+        for row in self.db_manager.fetch_all(query, tuple(params)):
+            row = dict(row)
+            for key in money_keys:
+                if key in row:
+                    row[key] = money_from_db(row[key])
+            rows.append(row)
+        return rows
+
     def get_by_type(self, account_type: AccountType) -> List['AccountEntity']:
         query = f"SELECT * FROM {self._table_name} WHERE type = ?"
         rows = self.db_manager.fetch_all(query, (account_type.value,))
@@ -75,4 +177,70 @@ class AccountsRepository(BaseRepository['AccountEntity']):
             params = (parent_id,)
         
         rows = self.db_manager.fetch_all(query, params)
-        return [self._entity_from_row(dict(row)) for row in rows if row]
\ No newline at end of file
+        return [self._entity_from_row(dict(row)) for row in rows if row]
+
+    # --- جدول closure درخت حساب‌ها (account_closure) ---
+    # این متدها باید در همان تراکنشی صدا زده شوند که parent_id حساب را تغییر می‌دهد.
+    def insert_closure_paths(self, account_id: int, parent_id: Optional[int]) -> None:
+        """مسیرهای یک حساب تازه (بدون فرزند) را اضافه می‌کند: خودش و تمام اجداد والدش."""
+        with self.db_manager.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO account_closure (ancestor_id, descendant_id, depth) VALUES (?, ?, 0)",
+                         (account_id, account_id))
+            if parent_id is not None:
+                conn.execute(
+                    "INSERT OR IGNORE INTO account_closure (ancestor_id, descendant_id, depth) "
+                    "SELECT ancestor_id, ?, depth + 1 FROM account_closure WHERE descendant_id = ?",
+                    (account_id, parent_id))
+
+    def detach_closure_subtree(self, account_id: int) -> None:
+        """
+        زیردرخت account_id را از اجدادش جدا می‌کند (مسیرهای درون زیردرخت باقی می‌مانند).
+        """
+        self.db_manager.execute_query(
+            "DELETE FROM account_closure "
+            "WHERE descendant_id IN (SELECT descendant_id FROM account_closure WHERE ancestor_id = ?) "
+            "AND ancestor_id NOT IN (SELECT descendant_id FROM account_closure WHERE ancestor_id = ?)",
+            (account_id, account_id))
+
+    def move_closure_subtree(self, account_id: int, new_parent_id: Optional[int]) -> None:
+        """زیردرخت account_id را زیر new_parent_id (یا سطح بالا برای None) منتقل می‌کند."""
+        with self.db_manager.transaction() as conn:
+            self.detach_closure_subtree(account_id)
+            if new_parent_id is not None:
+                conn.execute(
+                    "INSERT OR IGNORE INTO account_closure (ancestor_id, descendant_id, depth) "
+                    "SELECT up.ancestor_id, down.descendant_id, up.depth + down.depth + 1 "
+                    "FROM account_closure up CROSS JOIN account_closure down "
+                    "WHERE up.descendant_id = ? AND down.ancestor_id = ?",
+                    (new_parent_id, account_id))
+
+    def detach_closure_children(self, account_id: int) -> None:
+        """
+        پیش از حذف یک حساب: زیردرخت فرزندانش را از اجداد آن جدا می‌کند
+        (فرزندان با ON DELETE SET NULL سطح بالا می‌شوند و ردیف‌های خود حساب با CASCADE حذف می‌شوند).
+        """
+        self.db_manager.execute_query(
+            "DELETE FROM account_closure "
+            "WHERE descendant_id IN (SELECT descendant_id FROM account_closure WHERE ancestor_id = ? AND depth > 0) "
+            "AND ancestor_id IN (SELECT ancestor_id FROM account_closure WHERE descendant_id = ? AND depth > 0)",
+            (account_id, account_id))
+
+    def get_descendant_ids(self, account_id: int, include_self: bool = True) -> List[int]:
+        query = "SELECT descendant_id FROM account_closure WHERE ancestor_id = ?"
+        if not include_self:
+            query += " AND depth > 0"
+        return [row[0] for row in self.db_manager.fetch_all(query, (account_id,))]
+
+    def get_ancestor_ids(self, account_id: int, include_self: bool = False) -> List[int]:
+        """اجداد حساب، از والد مستقیم تا ریشه."""
+        query = "SELECT ancestor_id FROM account_closure WHERE descendant_id = ?"
+        if not include_self:
+            query += " AND depth > 0"
+        query += " ORDER BY depth"
+        return [row[0] for row in self.db_manager.fetch_all(query, (account_id,))]
+
+    def is_in_subtree(self, ancestor_id: int, account_id: int) -> bool:
+        """آیا account_id خود ancestor_id یا یکی از نوادگان آن است؟"""
+        row = self.db_manager.fetch_one(
+            "SELECT 1 FROM account_closure WHERE ancestor_id = ? AND descendant_id = ?", (ancestor_id, account_id))
+        return row is not None
@@ -1,16 +1,20 @@
 # src/data_access/base_repository.py
 
 from abc import ABC, abstractmethod
-from typing import Generic, TypeVar, Type, List, Optional, Dict, Any, Tuple, TYPE_CHECKING, Union
+from typing import Generic, TypeVar, Type, List, Optional, Dict, Any, Tuple, TYPE_CHECKING, Union, Callable, Sequence, Iterator, Iterable
 
 from datetime import date, datetime
-from src.data_access.database_manager import DatabaseManager
+from src.data_access.database_manager import DatabaseManager, MONEY_COLUMNS
+from src.data_access.entity_cache import EntityCache, ALL_ROWS, current_identity_map
+from src.config import DB_FETCH_BATCH_SIZE
+from src.utils.money import money_to_db, money_from_db, money_float_from_db
 import logging # <<< این خط را اضافه کنید یا مطمئن شوید وجود دارد
 
 from typing import List, Optional, TypeVar, Generic, Any, Dict, TYPE_CHECKING, Type # <<< Add Type here
 from decimal import Decimal # <<< IMPORT DECIMAL HERE
 from enum import Enum
-from dataclasses import fields, is_dataclass, MISSING
+from dataclasses import dataclass, field, fields, is_dataclass, MISSING
+from operator import attrgetter
 # برای TypeVar، از "forward reference" به صورت رشته استفاده می‌کنیم
 # تا در زمان اجرا نیازی به import مستقیم BaseEntity در سطح ماژول نباشد.
 if TYPE_CHECKING:
@@ -23,26 +27,386 @@ logger = logging.getLogger(__name__)
 # برای اینکه برنامه در زمان اجرا BaseEntity را بشناسد، از یک رشته استفاده می‌کنیم
 # این تکنیک به عنوان "Forward Reference" شناخته می‌شود.
 T = TypeVar('T', bound='BaseEntity')
+
+# کلید صفحه‌بندی keyset: (مقدار ستون مرتب‌سازی به شکل ذخیره شده در دیتابیس، id)
+KeysetKey = Tuple[Any, int]
+
+
+@dataclass
+class KeysetPage(Generic[T]):
+    """یک صفحه از نتایج صفحه‌بندی keyset. next_key برای درخواست صفحه بعد به get_page داده می‌شود."""
+    items: List[T] = field(default_factory=list)
+    next_key: Optional[KeysetKey] = None
+    has_more: bool = False
+
+
+# سقف پیش‌فرض تعداد پارامترهای یک دستور در SQLite (نسخه‌های قبل از 3.32)؛ لیست‌های IN به دسته‌هایی با این اندازه تقسیم می‌شوند
+SQLITE_MAX_VARIABLES = 999
+
+# جداول دارای cache که حذف یک ردیف از جدول کلید، با ON DELETE (SET NULL / CASCADE) ردیف‌های آن‌ها را تغییر می‌دهد:
+# persons -> accounts.person_id و accounts -> accounts.parent_id
+ON_DELETE_DEPENDENT_CACHES: Dict[str, Tuple[str, ...]] = {
+    "persons": ("accounts",),
+    "accounts": ("accounts",),
+}
+
+
+def _discard_from_session(table_name: str, entity_ids: Optional[Iterable[int]]) -> None:
+    identity_map = current_identity_map()
+    if not identity_map:
+        return
+    if entity_ids is ALL_ROWS:
+        for key in [key for key in identity_map if key[0] == table_name]:
+            del identity_map[key]
+    else:
+        for entity_id in entity_ids:
+            identity_map.pop((table_name, entity_id), None)
+
+
+def _invalidate_entity_cache(db_manager: DatabaseManager, table_name: str, cache: EntityCache,
+                             entity_ids: Optional[Iterable[int]]) -> None:
+    """
+    بعد از نوشتن روی ردیف‌های یک جدول دارای cache: بیرون از تراکنش، ردیف‌ها فوراً از cache حذف می‌شوند؛
+    داخل تراکنش تا پایان آن برای همین thread «نوشته شده» علامت می‌خورند و بعد از commit/rollback حذف می‌شوند
+    (در rollback از نقشه هویت نشست هم حذف می‌شوند تا مقدار برگشت خورده دیده نشود).
+    """
+    _discard_from_session(table_name, entity_ids)
+    if not db_manager.in_transaction():
+        if entity_ids is ALL_ROWS:
+            cache.clear()
+        else:
+            cache.invalidate(entity_ids)
+        return
+    if cache.mark_written(entity_ids):
+        def finish(committed: bool) -> None:
+            written = cache.end_transaction()
+            if not committed:
+                _discard_from_session(table_name, written)
+        db_manager.after_transaction(finish)
+
+def _value_to_db(value: Any) -> Any:
+    """یک مقدار پایتونی را به شکلی که در دیتابیس ذخیره می‌شود تبدیل می‌کند (ستون‌های پولی: money_to_db)."""
+    if isinstance(value, Decimal): return float(value)
+    if isinstance(value, Enum): return value.value
+    if isinstance(value, bool): return 1 if value else 0
+    if isinstance(value, (datetime, date)): return value.isoformat()
+    return value
+
+def _apply_converter(converter: Callable[[Any], Any], value: Any) -> Any:
+    return converter(value)
 # --- پایان اصلاح ---
 
+# --- تبدیل‌کننده‌های مقادیر دیتابیس به نوع فیلدهای entity ---
+def _decimal_from_db(value: Any) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+def _datetime_from_db(value: Any) -> Any:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def _date_from_db(value: Any) -> Any:
+    # ستون‌های تاریخ گاهی به صورت datetime کامل ذخیره شده‌اند؛ فقط بخش YYYY-MM-DD را می‌خوانیم
+    return date.fromisoformat(value[:10]) if isinstance(value, str) else value
+
+def _bool_from_db(value: Any) -> Any:
+    return bool(value) if isinstance(value, int) else value
+
+def _enum_from_db(enum_type: Type[Enum]) -> Callable[[Any], Enum]:
+    members_by_value = enum_type._value2member_map_
+    def convert(value: Any) -> Enum:
+        member = members_by_value.get(value)
+        return member if member is not None else enum_type(value)
+    return convert
+
+def _is_list_type(field_type: Any) -> bool:
+    """آیا نوع فیلد (یا نوع داخل Optional آن) یک لیست است؟ (مثل items که ستون دیتابیس نیست)"""
+    if field_type is list or getattr(field_type, '__origin__', None) is list:
+        return True
+    if getattr(field_type, '__origin__', None) is Union:
+        return any(_is_list_type(arg) for arg in getattr(field_type, '__args__', ()))
+    return False
+
+
+# مقدار جایگزین NULL برای فیلد الزامی غیر Optional: خطای یکپارچگی داده
+_NULL_NOT_ALLOWED = object()
+
+
+class _DefaultFactory:
+    """default_factory فیلد؛ برای هر ردیف مقدار تازه می‌سازد (مثلاً لیست‌ها بین entity ها مشترک نشوند)."""
+    __slots__ = ("factory",)
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+
+    def __call__(self) -> Any:
+        return self.factory()
+
+
+# (اندیس ستون یا None، نام فیلد، تابع تبدیل یا None، مقدار جایگزین NULL)
+_PlanSlot = Tuple[Optional[int], str, Optional[Callable[[Any], Any]], Any]
+
+
+class _CompiledRowMapper:
+    """
+    نگاشت از پیش کامپایل شده ردیف‌های دیتابیس به یک نوع entity.
+    اطلاعات فیلدها (نوع واقعی، Optional بودن، Enum بودن و ...) فقط یک بار هنگام ساخت repository
+    استخراج می‌شود. برای هر ترتیب ستون (cursor.description) یک طرح شامل (اندیس ستون، نام فیلد، تابع تبدیل)
+    به ترتیب پارامترهای __init__ ساخته و cache می‌شود تا هر ردیف با یک tuple موقعیتی (model_type(*args))،
+    بدون دیکشنری kwargs و بدون reflection نگاشت شود. فیلدهای keyword-only (مثل id) بعد از ساخت مقداردهی می‌شوند.
+    فیلدهای money_fields (ستون‌های INTEGER واحد خرد) به Decimal یا float (بسته به نوع فیلد) تبدیل می‌شوند.
+    """
+    def __init__(self, model_type: Type[T], table_name: str,
+                 converter_overrides: Optional[Dict[str, Callable[[Any], Any]]] = None,
+                 money_fields: Iterable[str] = ()):
+        self.model_type = model_type
+        self.table_name = table_name
+        overrides = converter_overrides or {}
+        money_fields = frozenset(money_fields)
+        # (نام فیلد، تابع تبدیل یا None، مقدار جایگزین NULL، keyword-only بودن)
+        compiled_fields = []
+        for f in fields(model_type):
+            if not f.init:
+                continue
+            field_type = f.type
+            is_optional = False
+            if getattr(field_type, '__origin__', None) is Union:
+                type_args = getattr(field_type, '__args__', ())
+                is_optional = type(None) in type_args
+                possible_types = [arg for arg in type_args if arg is not type(None)]
+                if possible_types:
+                    field_type = possible_types[0]
+            # NULL (یا نبود ستون) در فیلد دارای پیش‌فرض همان پیش‌فرض را می‌دهد؛ در فیلد الزامی Optional مقدار None
+            if f.default_factory is not MISSING:
+                null_value = _DefaultFactory(f.default_factory)
+            elif f.default is not MISSING:
+                null_value = f.default
+            else:
+                null_value = None if is_optional else _NULL_NOT_ALLOWED
+            if f.name in money_fields:
+                converter = money_from_db if field_type is Decimal else money_float_from_db
+            else:
+                converter = self._converter_for(field_type)
+            compiled_fields.append((f.name, overrides.get(f.name) or converter, null_value, f.kw_only))
+        self._fields = tuple(compiled_fields)
+        # برای هر ترتیب ستون: (خانه‌های آرگومان‌های موقعیتی __init__، خانه‌های فیلدهای keyword-only،
+        # (اندیس ستون، نام فیلد) فیلدهای keyword-only که مقدار خام ستون را می‌گیرند)
+        self._plans: Dict[Tuple[str, ...], Tuple[Tuple[_PlanSlot, ...], Tuple[_PlanSlot, ...], Tuple[Tuple[int, str], ...]]] = {}
+
+    @staticmethod
+    def _converter_for(field_type: Any) -> Optional[Callable[[Any], Any]]:
+        if isinstance(field_type, type) and issubclass(field_type, Enum):
+            return _enum_from_db(field_type)
+        if field_type is Decimal:
+            return _decimal_from_db
+        if field_type is datetime:
+            return _datetime_from_db
+        if field_type is date:
+            return _date_from_db
+        if field_type is bool:
+            return _bool_from_db
+        return None
+
+    def _plan_for(self, column_names: Tuple[str, ...]):
+        plan = self._plans.get(column_names)
+        if plan is None:
+            positions = {name: index for index, name in enumerate(column_names)}
+            missing_required = [name for name, _, null_value, _ in self._fields
+                                if null_value is _NULL_NOT_ALLOWED and name not in positions]
+            if missing_required:
+                raise ValueError(f"Columns {missing_required} required by {self.model_type.__name__} "
+                                 f"are missing from the result set of '{self.table_name}'.")
+            # ترتیب fields() همان ترتیب پارامترهای موقعیتی __init__ است؛ فیلد بدون ستون (اندیس None) پیش‌فرضش را می‌گیرد
+            positional = [(positions.get(name), name, converter, null_value)
+                          for name, converter, null_value, kw_only in self._fields if not kw_only]
+            # پارامترهای انتهایی بدون ستون به پیش‌فرض خود __init__ سپرده می‌شوند
+            while positional and positional[-1][0] is None:
+                positional.pop()
+            keyword = [(positions[name], name, converter, null_value)
+                       for name, converter, null_value, kw_only in self._fields if kw_only and name in positions]
+            # فیلد keyword-only بدون تبدیل با پیش‌فرض None (مثل id) مقدار خام ستون را می‌گیرد
+            raw_keyword = tuple((index, name) for index, name, converter, null_value in keyword
+                                if converter is None and null_value is None)
+            keyword = tuple((index, name, converter, null_value) for index, name, converter, null_value in keyword
+                            if converter is not None or null_value is not None)
+            plan = self._plans[column_names] = (tuple(positional), keyword, raw_keyword)
+        return plan
+
+    def _null_field_error(self, name: str, row: Any) -> ValueError:
+        return ValueError(f"Database integrity error: NULL value found for required field '{name}' "
+                          f"in table '{self.table_name}' for row: {tuple(row)}")
+
+    def map_rows(self, rows: Sequence[Any], column_names: Optional[Sequence[str]] = None) -> List[T]:
+        """ردیف‌ها (sqlite3.Row یا tuple) را به صورت موقعیتی به entity تبدیل می‌کند."""
+        if not rows:
+            return []
+        if column_names is None:
+            column_names = rows[0].keys()
+        positional, keyword, raw_keyword = self._plan_for(tuple(column_names))
+        model_type = self.model_type
+        entities = []
+        for row in rows:
+            args = []
+            append = args.append
+            for index, name, converter, null_value in positional:
+                value = None if index is None else row[index]
+                if value is None:
+                    if null_value is _NULL_NOT_ALLOWED:
+                        raise self._null_field_error(name, row)
+                    append(null_value() if isinstance(null_value, _DefaultFactory) else null_value)
+                elif converter is None:
+                    append(value)
+                else:
+                    try:
+                        append(converter(value))
+                    except (ValueError, TypeError) as e:
+                        logger.warning(f"Type conversion failed for field '{name}' with value '{value}'. Setting to None. Error: {e}")
+                        append(None)
+            entity = model_type(*args)
+            for index, name in raw_keyword:
+                setattr(entity, name, row[index])
+            for index, name, converter, null_value in keyword:
+                value = row[index]
+                if value is None:
+                    if null_value is _NULL_NOT_ALLOWED:
+                        raise self._null_field_error(name, row)
+                    value = null_value() if isinstance(null_value, _DefaultFactory) else null_value
+                elif converter is not None:
+                    try:
+                        value = converter(value)
+                    except (ValueError, TypeError) as e:
+                        logger.warning(f"Type conversion failed for field '{name}' with value '{value}'. Setting to None. Error: {e}")
+                        value = None
+                setattr(entity, name, value)
+            entities.append(entity)
+        return entities
+
+    def map_dict(self, row: Dict[str, Any]) -> T:
+        return self.map_rows([tuple(row.values())], tuple(row.keys()))[0]
+
+
 class BaseRepository(Generic[T]):
-    def __init__(self, db_manager: DatabaseManager, model_type: Type[T], table_name: str):
+    def __init__(self, db_manager: DatabaseManager, model_type: Type[T], table_name: str,
+                 db_columns: Optional[List[str]] = None, cache_size: int = 0):
         self.db_manager = db_manager
         self.model_type = model_type
         self._table_name = table_name
-        self._db_columns = [f.name for f in fields(model_type) if f.init]
+        # repository هایی که entity آن‌ها فیلد غیر ستونی دارد، لیست ستون‌ها را صریحاً می‌دهند
+        self._db_columns = list(db_columns) if db_columns else [f.name for f in fields(model_type) if f.init]
+        # ستون‌های پولی جدول به صورت INTEGER واحد خرد ذخیره می‌شوند (MONEY_COLUMNS)
+        self._money_columns = frozenset(MONEY_COLUMNS.get(table_name, ()))
+        # نگاشت ردیف‌ها یک بار برای هر repository کامپایل می‌شود (بدون reflection در زمان خواندن)
+        self._row_mapper = _CompiledRowMapper(model_type, table_name, self._field_converters(), self._money_columns)
+        # ستون‌های قابل ذخیره و متن دستورات SQL یک بار ساخته می‌شوند؛ در مسیرهای پرتکرار درج/به‌روزرسانی
+        # نه رشته‌ای ساخته می‌شود و نه (به لطف cached_statements در sqlite3) دستوری دوباره parse می‌شود.
+        self._persist_columns: Tuple[str, ...] = self._resolve_persist_columns()
+        self._persist_getter = attrgetter(*self._persist_columns) if self._persist_columns else None
+        self._persist_converters = tuple(money_to_db if col in self._money_columns else _value_to_db
+                                         for col in self._persist_columns)
+        self._custom_serializer = type(self)._entity_to_dict_for_db is not BaseRepository._entity_to_dict_for_db
+        self._statement_cache: Dict[Any, str] = {}
+        # cache_size > 0: get_by_id / get_by_ids از cache مشترک LRU جدول (روی db_manager) می‌خوانند و
+        # داخل entity_session() نقشه هویت نشست را به کار می‌برند؛ update / update_many / delete آن را باطل می‌کنند.
+        self._entity_cache: Optional[EntityCache] = db_manager.get_entity_cache(table_name, cache_size) if cache_size > 0 else None
         logger.debug(f"BaseRepository for {self._table_name} initialized. Columns: {self._db_columns}")
 
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """آمار hit/miss cache موجودیت‌های این جدول (None اگر cache ندارد)."""
+        return self._entity_cache.stats() if self._entity_cache is not None else None
+
+    def invalidate_cache(self, entity_ids: Optional[Iterable[int]] = ALL_ROWS) -> None:
+        """برای نوشتن‌های مستقیم SQL زیرکلاس‌ها روی این جدول؛ بدون شناسه، کل cache جدول باطل می‌شود."""
+        if self._entity_cache is not None:
+            if entity_ids is not ALL_ROWS:
+                entity_ids = list(entity_ids)
+            _invalidate_entity_cache(self.db_manager, self._table_name, self._entity_cache, entity_ids)
+
+    def _cache_lookup(self, entity_id: int) -> Optional[T]:
+        if self._entity_cache.is_written(entity_id):
+            return None
+        return self._entity_cache.get(entity_id)
+
+    def _cache_store(self, entities: Iterable[T], generation: int) -> None:
+        for entity in entities:
+            if not self._entity_cache.is_written(entity.id):
+                self._entity_cache.put(entity, generation)
+
     def get_by_id(self, entity_id: int) -> Optional[T]:
+        if self._entity_cache is None:
+            return self._fetch_by_id(entity_id)
+        identity_map = current_identity_map()
+        key = (self._table_name, entity_id)
+        if identity_map is not None and key in identity_map:
+            return identity_map[key]
+        entity = self._cache_lookup(entity_id)
+        if entity is None:
+            generation = self._entity_cache.generation
+            entity = self._fetch_by_id(entity_id)
+            if entity is not None:
+                self._cache_store((entity,), generation)
+        if identity_map is not None and entity is not None:
+            identity_map[key] = entity
+        return entity
+
+    def _fetch_by_id(self, entity_id: int) -> Optional[T]:
         query = f"SELECT * FROM {self._table_name} WHERE id = ?"
         with self.db_manager as conn:
             cursor = conn.execute(query, (entity_id,))
             row = cursor.fetchone()
             if row:
-                row_dict = {k[0]: v for k, v in zip(cursor.description, row)}
-                return self._entity_from_row(row_dict)
+                return self._entities_from_rows([row], cursor.description)[0]
         return None
 
+    def get_by_ids(self, entity_ids: Iterable[int]) -> Dict[int, T]:
+        """
+        چند موجودیت را با WHERE id IN (...) واکشی می‌کند (به جای یک get_by_id و یک اتصال برای هر شناسه).
+        شناسه‌های تکراری و None حذف می‌شوند؛ شناسه‌هایی که پیدا نشوند در نتیجه نیستند.
+        """
+        unique_ids = list(dict.fromkeys(entity_id for entity_id in entity_ids if entity_id is not None))
+        entities_by_id: Dict[int, T] = {}
+        if not unique_ids:
+            return entities_by_id
+        if self._entity_cache is None:
+            return self._fetch_by_ids(unique_ids)
+
+        identity_map = current_identity_map()
+        missing_ids: List[int] = []
+        for entity_id in unique_ids:
+            entity = identity_map.get((self._table_name, entity_id)) if identity_map is not None else None
+            if entity is None:
+                entity = self._cache_lookup(entity_id)
+                if entity is not None and identity_map is not None:
+                    identity_map[(self._table_name, entity_id)] = entity
+            if entity is None:
+                missing_ids.append(entity_id)
+            else:
+                entities_by_id[entity_id] = entity
+        if missing_ids:
+            generation = self._entity_cache.generation
+            fetched = self._fetch_by_ids(missing_ids)
+            self._cache_store(fetched.values(), generation)
+            if identity_map is not None:
+                for entity_id, entity in fetched.items():
+                    identity_map[(self._table_name, entity_id)] = entity
+            entities_by_id.update(fetched)
+        return entities_by_id
+
+    def _fetch_by_ids(self, unique_ids: List[int]) -> Dict[int, T]:
+        entities_by_id: Dict[int, T] = {}
+        with self.db_manager as conn:
+            for start in range(0, len(unique_ids), SQLITE_MAX_VARIABLES):
+                chunk = unique_ids[start:start + SQLITE_MAX_VARIABLES]
+                cursor = conn.execute(self._select_by_ids_sql(len(chunk)), chunk)
+                for entity in self._entities_from_rows(cursor.fetchall(), cursor.description):
+                    entities_by_id[entity.id] = entity
+        return entities_by_id
+
+    def _select_by_ids_sql(self, id_count: int) -> str:
+        key = ("select_ids", id_count)
+        query = self._statement_cache.get(key)
+        if query is None:
+            query = f"SELECT * FROM {self._table_name} WHERE id IN ({', '.join(['?'] * id_count)})"
+            self._statement_cache[key] = query
+        return query
+
     def get_all(self, order_by: Optional[str] = None) -> List[T]:
         query = f"SELECT * FROM {self._table_name}"
         if order_by:
@@ -51,7 +415,18 @@ class BaseRepository(Generic[T]):
         with self.db_manager as conn:
             cursor = conn.execute(query)
             rows = cursor.fetchall()
-            return [self._entity_from_row({k[0]: v for k, v in zip(cursor.description, row)}) for row in rows]
+            return self._entities_from_rows(rows, cursor.description)
+
+    def iter_all(self, order_by: Optional[str] = None, batch_size: int = DB_FETCH_BATCH_SIZE) -> Iterator[T]:
+        """
+        نسخه generator از get_all: ردیف‌ها با fetchmany و در دسته‌های batch_size تایی خوانده
+        و entity ها یکی‌یکی yield می‌شوند؛ مصرف حافظه به اندازه جدول بستگی ندارد.
+        """
+        query = f"SELECT * FROM {self._table_name}"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        for rows in self.db_manager.fetch_batches(query, batch_size=batch_size):
+            yield from self._entities_from_rows(rows)
 
     def _get_table_name_from_entity(self) -> str:
         class_name = self._entity_type.__name__.replace("Entity", "")
@@ -93,36 +468,75 @@ class BaseRepository(Generic[T]):
                 logger.debug(f"Skipping list field '{k}' (likely related items).")
                 continue
 
-            processed_v = v
-            if isinstance(v, Decimal): processed_v = float(v)
-            elif isinstance(v, Enum): processed_v = v.value
-            elif isinstance(v, bool): processed_v = 1 if v else 0
-            elif isinstance(v, (datetime, date)): processed_v = v.isoformat()
-            
-            data_to_persist[k] = processed_v
+            data_to_persist[k] = money_to_db(v) if k in self._money_columns else _value_to_db(v)
         return data_to_persist
 
-    def add(self, entity: T) -> Optional[T]:
-        logger.debug(f"BaseRepository.add: Type {type(entity).__name__} to table '{self._table_name}'.")
-        
-        fields_to_insert = self._entity_to_dict_for_db(entity)
-        # 'id' نباید در INSERT باشد اگر اتوماتیک است
-        fields_to_insert.pop('id', None) # حذف id اگر وجود دارد
+    def _resolve_persist_columns(self) -> Tuple[str, ...]:
+        """ستون‌هایی که در INSERT/UPDATE نوشته می‌شوند: ستون‌های تعریف شده به جز id و فیلدهای لیستی (اقلام وابسته)."""
+        model_fields = {f.name: f for f in fields(self.model_type)} if is_dataclass(self.model_type) else {}
+        columns = []
+        for col in self._db_columns:
+            if col == 'id' or col not in model_fields:
+                continue
+            if _is_list_type(model_fields[col].type):
+                continue
+            columns.append(col)
+        return tuple(columns)
+
+    def _entity_to_db_values(self, entity: T) -> Tuple[Any, ...]:
+        """entity را مستقیماً (بدون ساخت دیکشنری) به tuple مقادیر ستون‌های self._persist_columns تبدیل می‌کند."""
+        values = self._persist_getter(entity)
+        if len(self._persist_columns) == 1:
+            return (self._persist_converters[0](values),)
+        if not self._money_columns:
+            return tuple(map(_value_to_db, values))
+        return tuple(map(_apply_converter, self._persist_converters, values))
+
+    def _rows_for_write(self, entities: Sequence[T]) -> Tuple[Tuple[str, ...], List[Tuple[Any, ...]]]:
+        """
+        ستون‌ها و tuple مقادیر هر entity را برای INSERT/UPDATE برمی‌گرداند.
+        اگر زیرکلاس _entity_to_dict_for_db را override کرده باشد، از همان استفاده می‌شود.
+        """
+        if not self._custom_serializer:
+            if not self._persist_columns:
+                return (), []
+            return self._persist_columns, [self._entity_to_db_values(entity) for entity in entities]
+
+        rows = []
+        for entity in entities:
+            data = self._entity_to_dict_for_db(entity)
+            data.pop('id', None)
+            rows.append(data)
+        column_names = tuple(rows[0].keys()) if rows else ()
+        return column_names, [tuple(row[col] for col in column_names) for row in rows]
+
+    def _insert_sql(self, column_names: Tuple[str, ...]) -> str:
+        key = ("insert", column_names)
+        query = self._statement_cache.get(key)
+        if query is None:
+            placeholders = ', '.join(['?'] * len(column_names))
+            query = f"INSERT INTO {self._table_name} ({', '.join(column_names)}) VALUES ({placeholders})"
+            self._statement_cache[key] = query
+        return query
+
+    def _update_sql(self, column_names: Tuple[str, ...]) -> str:
+        key = ("update", column_names)
+        query = self._statement_cache.get(key)
+        if query is None:
+            set_clause = ', '.join([f"{col} = ?" for col in column_names])
+            query = f"UPDATE {self._table_name} SET {set_clause} WHERE id = ?"
+            self._statement_cache[key] = query
+        return query
 
-        if not fields_to_insert:
+    def add(self, entity: T) -> Optional[T]:
+        column_names, rows = self._rows_for_write((entity,)) # 'id' نباید در INSERT باشد چون اتوماتیک است
+        if not column_names:
             logger.error(f"BaseRepository.add: No valid fields to insert for entity {type(entity)}.")
-            # raise ValueError(f"No columns to insert for entity {type(entity)}.") # شاید بهتر باشد None برگردانیم
             return None
 
-        columns = ', '.join(fields_to_insert.keys())
-        placeholders = ', '.join(['?'] * len(fields_to_insert))
-        values_tuple = tuple(fields_to_insert.values())
+        query = self._insert_sql(column_names)
+        values_tuple = rows[0]
 
-        logger.debug(f"BaseRepository.add: Columns for INSERT: {columns}")
-        logger.debug(f"BaseRepository.add: Values for INSERT: {values_tuple}")
-        
-        query = f"INSERT INTO {self._table_name} ({columns}) VALUES ({placeholders})"
-        
         try:
             cursor = self.db_manager.execute_query(query, values_tuple)
             if hasattr(entity, 'id') and cursor and cursor.lastrowid is not None:
@@ -148,35 +562,117 @@ class BaseRepository(Generic[T]):
             return None # یا خطا را raise کنید
 
         entity_id = entity.id
-        logger.debug(f"BaseRepository.update: Preparing to update entity ID {entity_id} in table '{self._table_name}'.")
-        
-        fields_to_update = self._entity_to_dict_for_db(entity)
-        fields_to_update.pop('id', None) # id در WHERE clause می‌آید، نه SET
+        column_names, rows = self._rows_for_write((entity,)) # id در WHERE clause می‌آید، نه SET
 
-        if not fields_to_update:
+        if not column_names:
             logger.warning(f"BaseRepository.update: No fields to update for entity ID {entity_id}. Returning original entity.")
             return entity # یا None
 
-        set_clause = ', '.join([f"{key} = ?" for key in fields_to_update.keys()])
-        values_list = list(fields_to_update.values())
-        values_list.append(entity_id) 
-        values_tuple = tuple(values_list)
+        query = self._update_sql(column_names)
+        values_tuple = rows[0] + (entity_id,)
 
-        query = f"UPDATE {self._table_name} SET {set_clause} WHERE id = ?"
-        
-        logger.debug(f"BaseRepository.update: Query: {query}")
-        logger.debug(f"BaseRepository.update: Values: {values_tuple}")
-        
         try:
             self.db_manager.execute_query(query, values_tuple)
             logger.info(f"BaseRepository.update: Entity ID {entity_id} in table {self._table_name} updated.")
+            self._after_update((entity,))
             return entity
         except Exception as e:
             logger.error(f"Error during UPDATE for entity ID {entity_id} in table {self._table_name}: {e}", exc_info=True)
             # raise e
             return None
 
-    
+    def add_many(self, entities: List[T]) -> Optional[List[T]]:
+        """
+        چند موجودیت را با یک دستور آماده (executemany) و در یک تراکنش درج می‌کند
+        و شناسه‌های تولید شده را به موجودیت‌ها برمی‌گرداند.
+        در صورت خطا هیچ ردیفی درج نمی‌شود و None برگردانده می‌شود.
+        """
+        if not entities:
+            return []
+        logger.debug(f"BaseRepository.add_many: {len(entities)} x {type(entities[0]).__name__} into '{self._table_name}'.")
+
+        try:
+            column_names, values = self._rows_for_write(entities)
+            if not column_names:
+                logger.error(f"BaseRepository.add_many: No valid fields to insert for {type(entities[0]).__name__}.")
+                return None
+            query = self._insert_sql(column_names)
+            with self.db_manager.transaction() as conn:
+                conn.executemany(query, values)
+                # lastrowid بعد از executemany قابل اعتماد نیست؛ چون تراکنش قفل نوشتن را نگه می‌دارد،
+                # شناسه‌های این دسته پشت سر هم و به آخرین شناسه درج شده ختم می‌شوند.
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            first_id = last_id - len(entities) + 1
+            for offset, entity in enumerate(entities):
+                entity.id = first_id + offset
+            logger.debug(f"BaseRepository.add_many: Inserted IDs {first_id}..{last_id} into {self._table_name}.")
+            return entities
+        except KeyError as e:
+            logger.error(f"BaseRepository.add_many: Entities for {self._table_name} do not share the same columns (missing {e}).")
+            return None
+        except Exception as e:
+            logger.error(f"Error during bulk INSERT into {self._table_name}: {e}", exc_info=True)
+            return None
+
+    def update_many(self, entities: List[T]) -> Optional[List[T]]:
+        """
+        چند موجودیت را با یک دستور UPDATE آماده (executemany) و در یک تراکنش به‌روز می‌کند.
+        در صورت خطا هیچ ردیفی تغییر نمی‌کند و None برگردانده می‌شود.
+        """
+        if not entities:
+            return []
+        if any(getattr(entity, 'id', None) is None for entity in entities):
+            logger.error(f"BaseRepository.update_many: All entities must have an ID to be updated ({self._table_name}).")
+            return None
+
+        try:
+            column_names, rows = self._rows_for_write(entities)
+            if not column_names:
+                logger.warning(f"BaseRepository.update_many: No fields to update for {self._table_name}.")
+                return entities
+            query = self._update_sql(column_names)
+            values = [row + (entity.id,) for row, entity in zip(rows, entities)]
+            with self.db_manager.transaction() as conn:
+                conn.executemany(query, values)
+                self._after_update(entities)
+            logger.info(f"BaseRepository.update_many: {len(entities)} rows in table {self._table_name} updated.")
+            return entities
+        except KeyError as e:
+            logger.error(f"BaseRepository.update_many: Entities for {self._table_name} do not share the same columns (missing {e}).")
+            return None
+        except Exception as e:
+            logger.error(f"Error during bulk UPDATE in table {self._table_name}: {e}", exc_info=True)
+            return None
+
+    def _after_update(self, entities: Sequence[T]) -> None:
+        if self._entity_cache is None:
+            return
+        self.invalidate_cache([entity.id for entity in entities])
+        # در نشست جاری، همان نمونه‌های نوشته شده دیده می‌شوند
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            for entity in entities:
+                identity_map[(self._table_name, entity.id)] = entity
+
+    def delete(self, entity_id: int) -> bool:
+        query = f"DELETE FROM {self._table_name} WHERE id = ?"
+        try:
+            self.db_manager.execute_query(query, (entity_id,))
+            logger.info(f"Entity ID {entity_id} deleted from table {self._table_name}.")
+        except Exception as e:
+            logger.error(f"Error deleting entity ID {entity_id} from table {self._table_name}: {e}", exc_info=True)
+            return False
+        self.invalidate_cache([entity_id])
+        # ON DELETE SET NULL / CASCADE ممکن است ردیف‌های جداول دیگر (مثلاً accounts.person_id) را هم تغییر دهد
+        dependent_tables = ON_DELETE_DEPENDENT_CACHES.get(self._table_name, ())
+        if dependent_tables:
+            entity_caches = self.db_manager.entity_caches()
+            for table_name in dependent_tables:
+                cache = entity_caches.get(table_name)
+                if cache is not None:
+                    _invalidate_entity_cache(self.db_manager, table_name, cache, ALL_ROWS)
+        return True
+
     def find_by_criteria(self, criteria: Dict[str, Any], order_by: Optional[str] = None) -> List[T]:
         """
         موجودیت‌ها را بر اساس دیکشنری از معیارها با پشتیبانی از عملگرهای پیچیده پیدا می‌کند.
@@ -184,87 +680,146 @@ class BaseRepository(Generic[T]):
         if not criteria:
             return self.get_all(order_by=order_by)
 
-        base_query = f"SELECT * FROM {self._table_name} WHERE "
-        conditions = []
+        query, params = self._build_criteria_query(criteria, order_by)
+
+        with self.db_manager as conn:
+            cursor = conn.execute(query, params)
+            rows = cursor.fetchall()
+            return self._entities_from_rows(rows, cursor.description)
+
+    def iter_by_criteria(self, criteria: Dict[str, Any], order_by: Optional[str] = None,
+                         batch_size: int = DB_FETCH_BATCH_SIZE) -> Iterator[T]:
+        """نسخه generator از find_by_criteria که نتایج را به صورت تدریجی (fetchmany) برمی‌گرداند."""
+        if not criteria:
+            yield from self.iter_all(order_by=order_by, batch_size=batch_size)
+            return
+
+        query, params = self._build_criteria_query(criteria, order_by)
+        logger.debug(f"BaseRepository.iter_by_criteria: Query: {query}, Values: {params}")
+        for rows in self.db_manager.fetch_batches(query, params, batch_size=batch_size):
+            yield from self._entities_from_rows(rows)
+
+    def get_page(self,
+                 key_column: str,
+                 page_size: int,
+                 after_key: Optional[KeysetKey] = None,
+                 criteria: Optional[Dict[str, Any]] = None,
+                 descending: bool = True) -> KeysetPage[T]:
+        """
+        صفحه‌بندی keyset روی (key_column, id): به جای OFFSET، ردیف‌های بعد از کلید آخرین ردیف صفحه قبل
+        خوانده می‌شوند، بنابراین هزینه هر صفحه به تعداد کل ردیف‌ها بستگی ندارد (با index روی key_column).
+        فیلترها (criteria) و مرتب‌سازی در خود SQL اعمال می‌شوند.
+        """
+        if key_column not in self._db_columns:
+            raise ValueError(f"Invalid keyset column '{key_column}' for table {self._table_name}.")
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+
+        conditions: List[str] = []
+        params: List[Any] = []
+        if criteria:
+            where_clause, criteria_params = self._build_where_clause(criteria)
+            conditions.append(where_clause)
+            params.extend(criteria_params)
+        if after_key is not None:
+            comparison = "<" if descending else ">"
+            conditions.append(f"({key_column}, id) {comparison} (?, ?)")
+            params.extend(after_key)
+
+        direction = "DESC" if descending else "ASC"
+        query = f"SELECT * FROM {self._table_name}"
+        if conditions:
+            query += " WHERE " + " AND ".join(f"({condition})" for condition in conditions)
+        # یک ردیف بیشتر می‌خوانیم تا بدون کوئری اضافه بفهمیم صفحه بعدی وجود دارد یا نه
+        query += f" ORDER BY {key_column} {direction}, id {direction} LIMIT ?"
+        params.append(page_size + 1)
+
+        logger.debug(f"BaseRepository.get_page: Query: {query}, Values: {tuple(params)}")
+        rows = self.db_manager.fetch_all(query, tuple(params))
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_key = (rows[-1][key_column], rows[-1]["id"]) if rows else None
+        return KeysetPage(items=self._entities_from_rows(rows), next_key=next_key, has_more=has_more)
+
+    def count_by_criteria(self, criteria: Optional[Dict[str, Any]] = None) -> int:
+        """تعداد ردیف‌های منطبق با criteria (برای نمایش تعداد کل در لیست‌های صفحه‌بندی شده)."""
+        query, params = f"SELECT COUNT(*) FROM {self._table_name}", ()
+        if criteria:
+            where_clause, params = self._build_where_clause(criteria)
+            query += f" WHERE {where_clause}"
+        row = self.db_manager.fetch_one(query, params)
+        return int(row[0]) if row else 0
+
+    def _build_criteria_query(self, criteria: Dict[str, Any], order_by: Optional[str] = None) -> Tuple[str, Tuple[Any, ...]]:
+        """کوئری SELECT و پارامترهای آن را از دیکشنری معیارها می‌سازد."""
+        where_clause, params = self._build_where_clause(criteria)
+        key = ("select", where_clause, order_by)
+        query = self._statement_cache.get(key)
+        if query is None:
+            query = f"SELECT * FROM {self._table_name} WHERE {where_clause}"
+            if order_by:
+                query += f" ORDER BY {order_by}"
+            self._statement_cache[key] = query
+        return query, params
+
+    def _build_where_clause(self, criteria: Dict[str, Any]) -> Tuple[str, Tuple[Any, ...]]:
+        """
+        شرط WHERE و پارامترهای آن را از دیکشنری معیارها می‌سازد.
+        مقدار می‌تواند یک مقدار ساده (=) یا یک tuple به شکل (operator, value) باشد؛ برای BETWEEN مقدار یک جفت است.
+        """
+        shape = []
         params = []
-        
+
         for key, value in criteria.items():
+            # مقدار معیار روی ستون پولی باید مثل خود ستون به واحد خرد باشد
+            to_db = money_to_db if key in self._money_columns else None
             if isinstance(value, tuple) and len(value) == 2:
                 operator, val = value
                 if str(operator).upper() == 'BETWEEN' and isinstance(val, (list, tuple)) and len(val) == 2:
-                    conditions.append(f"{key} BETWEEN ? AND ?")
-                    params.extend(val)
+                    shape.append((key, 'BETWEEN'))
+                    params.extend(map(to_db, val) if to_db else val)
                 else:
-                    conditions.append(f"{key} {operator} ?")
-                    params.append(val)
+                    shape.append((key, operator))
+                    params.append(to_db(val) if to_db else val)
             else:
-                conditions.append(f"{key} = ?")
-                params.append(value)
-        
-        query = base_query + " AND ".join(conditions)
-        if order_by:
-            query += f" ORDER BY {order_by}"
+                shape.append((key, '='))
+                params.append(to_db(value) if to_db else value)
+
+        # متن شرط فقط به «شکل» معیارها (ستون‌ها و عملگرها) بستگی دارد، نه به مقادیر
+        cache_key = ("where", tuple(shape))
+        where_clause = self._statement_cache.get(cache_key)
+        if where_clause is None:
+            where_clause = " AND ".join(
+                f"{key} BETWEEN ? AND ?" if operator == 'BETWEEN' else f"{key} {operator} ?"
+                for key, operator in shape)
+            self._statement_cache[cache_key] = where_clause
+        return where_clause, tuple(params)
+
+    def _field_converters(self) -> Dict[str, Callable[[Any], Any]]:
+        """
+        زیرکلاس‌ها می‌توانند برای فیلدهایی که تبدیل خاصی لازم دارند، تابع تبدیل اختصاصی برگردانند.
+        بقیه فیلدها بر اساس نوع تعریف شده در entity تبدیل می‌شوند.
+        """
+        return {}
 
-        logger.debug(f"BaseRepository.find_by_criteria: Query: {query}, Values: {tuple(params)}")
-        
-        with self.db_manager as conn:
-            cursor = conn.execute(query, tuple(params))
-            rows = cursor.fetchall()
-            return [self._entity_from_row({k[0]: v for k, v in zip(cursor.description, row)}) for row in rows]
+    def _entities_from_rows(self, rows: Sequence[Any], description: Optional[Sequence[Any]] = None) -> List[T]:
+        """
+        ردیف‌های خام را با نگاشت کامپایل شده و به صورت موقعیتی به entity تبدیل می‌کند.
+        repository هایی که _entity_from_row را بازنویسی کرده‌اند همچنان از نسخه خودشان استفاده می‌کنند.
+        """
+        rows = [row for row in rows if row]
+        if type(self)._entity_from_row is not BaseRepository._entity_from_row:
+            if description is not None:
+                column_names = [column[0] for column in description]
+                return [self._entity_from_row(dict(zip(column_names, row))) for row in rows]
+            return [self._entity_from_row(dict(row)) for row in rows]
+        column_names = [column[0] for column in description] if description is not None else None
+        return self._row_mapper.map_rows(rows, column_names)
 
     def _entity_from_row(self, row: Dict[str, Any]) -> T:
         """
         یک دیکشنری از داده‌های ردیف دیتابیس را به یک آبجکت دیتاکلاس تبدیل می‌کند.
         این نسخه بسیار قوی‌تر است و انواع داده و مقادیر None را مدیریت می‌کند.
+        برای result set های بزرگ از _entities_from_rows استفاده کنید که دیکشنری میانی نمی‌سازد.
         """
-        entity_data = {}
-        
-        for f in fields(self.model_type):
-            if not f.init:
-                continue
-
-            field_name = f.name
-            field_type = f.type
-            value_from_db = row.get(field_name)
-
-            if value_from_db is None:
-                if f.default is MISSING and f.default_factory is MISSING:
-                    is_optional = getattr(field_type, '__origin__', None) is Union and type(None) in getattr(field_type, '__args__', [])
-                    if not is_optional:
-                        raise ValueError(
-                            f"Database integrity error: NULL value found for required field '{field_name}' "
-                            f"in table '{self._table_name}' for row: {row}"
-                        )
-                continue
-
-            try:
-                actual_type = field_type
-                if getattr(field_type, '__origin__', None) is Union:
-                    possible_types = [arg for arg in getattr(field_type, '__args__', []) if arg is not type(None)]
-                    if possible_types:
-                        actual_type = possible_types[0]
-                
-                is_enum = isinstance(actual_type, type) and issubclass(actual_type, Enum)
-
-                if is_enum:
-                    entity_data[field_name] = actual_type(value_from_db)
-                elif actual_type == Decimal:
-                    entity_data[field_name] = Decimal(str(value_from_db))
-                elif actual_type == datetime and isinstance(value_from_db, str):
-                    entity_data[field_name] = datetime.fromisoformat(value_from_db)
-                elif actual_type == date and isinstance(value_from_db, str):
-                    entity_data[field_name] = date.fromisoformat(value_from_db.split(" ")[0])
-                elif actual_type == bool and isinstance(value_from_db, int):
-                    entity_data[field_name] = bool(value_from_db)
-                else:
-                    entity_data[field_name] = value_from_db
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Type conversion failed for field '{field_name}' with value '{value_from_db}'. Setting to None. Error: {e}")
-                entity_data[field_name] = None
-
-        try:
-            return self.model_type(**entity_data)
-        except TypeError as e:
-            logger.error(f"Failed to instantiate {self.model_type.__name__}. Error: {e}. Data passed: {entity_data}")
-            missing_fields = [f.name for f in fields(self.model_type) if f.init and f.name not in entity_data and f.default is MISSING and f.default_factory is MISSING]
-            raise TypeError(f"Missing required arguments for {self.model_type.__name__}: {missing_fields}. Original error: {e}") from e
+        return self._row_mapper.map_dict(row)
@@ -4,6 +4,7 @@ from typing import Dict, Any, Optional, List
 from datetime import date, datetime
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
 from src.business_logic.entities.check_entity import CheckEntity
 from src.constants import CheckType, CheckStatus, DATE_FORMAT
 import logging
@@ -27,7 +28,7 @@ class ChecksRepository(BaseRepository[CheckEntity]):
             return CheckEntity(
                 id=row['id'],
                 check_number=row['check_number'],
-                amount=float(row['amount']),
+                amount=money_float_from_db(row['amount']),
                 issue_date=issue_date_obj,
                 due_date=due_date_obj,
                 person_id=row['person_id'],
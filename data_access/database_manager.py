@@ -2,6 +2,12 @@
 
 import sqlite3
 import logging
+import queue
+import re
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 from src.config import DATABASE_PATH
 from src.constants import (
     AccountType, PersonType, ProductType, InvoiceType, FinancialTransactionType,
@@ -9,26 +15,620 @@ from src.constants import (
     ProductionOrderStatus, PurchaseOrderStatus, FiscalYearStatus, ReferenceType
 )
 from src.config import DATABASE_PATH, LOGGING_CONFIG # Added LOGGING_CONFIG
+from src.config import DB_USE_CONNECTION_POOL, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_FETCH_BATCH_SIZE, DB_STATEMENT_CACHE_SIZE
+from src.config import DB_PERFORMANCE_PROFILE, DB_PERFORMANCE_PROFILES
+from src.data_access.entity_cache import EntityCache
+from src.utils.money import MINOR_UNITS_PER_UNIT
 
 logger = logging.getLogger(__name__)
 
+
+# اثر یک ردیف financial_transactions روی مانده حساب؛ همان قاعده AccountManager.balance_effect
+FT_BALANCE_EFFECT_SQL = (
+    f"CASE transaction_type "
+    f"WHEN '{FinancialTransactionType.INCOME.value}' THEN amount "
+    f"WHEN '{FinancialTransactionType.DEPOSIT.value}' THEN amount "
+    f"WHEN '{FinancialTransactionType.EXPENSE.value}' THEN -amount "
+    f"WHEN '{FinancialTransactionType.WITHDRAWAL.value}' THEN -amount "
+    f"ELSE 0 END"
+)
+
+# ستون‌های پولی هر جدول؛ از مهاجرت 7 به بعد به صورت INTEGER و به واحد خرد (src.utils.money) ذخیره می‌شوند.
+# BaseRepository تبدیل این ستون‌ها را از روی همین نگاشت انجام می‌دهد.
+MONEY_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "accounts": ("balance",),
+    "financial_transactions": ("amount",),
+    "account_balance_snapshots": ("net_change", "closing_balance"),
+    "invoices": ("total_amount", "paid_amount"),
+    "invoice_items": ("unit_price",),
+    "payment_headers": ("total_amount",),
+    "payment_line_items": ("amount",),
+    "products": ("unit_price",),
+    "employees": ("base_salary",),
+    "checks": ("amount",),
+    "payrolls": ("gross_salary", "deductions", "net_salary"),
+    "loans": ("loan_amount", "installment_amount"),
+    "loan_installments": ("installment_amount", "principal_amount", "interest_amount"),
+    "purchase_orders": ("total_amount_expected", "paid_amount", "received_amount"),
+    "purchase_order_items": ("unit_price", "total_item_amount"),
+    "material_receipts": ("unit_price",),
+}
+
+
+def _convert_money_columns_to_minor_units(conn: sqlite3.Connection) -> None:
+    """
+    ستون‌های MONEY_COLUMNS را از REAL به INTEGER (واحد خرد) تبدیل می‌کند. SQLite نوع ستون را با ALTER تغییر
+    نمی‌دهد، پس هر جدول از روی تعریف فعلی خودش در sqlite_master (همراه ستون‌های اضافه شده با مهاجرت‌ها)
+    بازسازی می‌شود: جدول جدید، کپی داده‌ها با CAST(ROUND(x * 100) AS INTEGER)، حذف جدول قدیم، تغییر نام
+    و ساخت دوباره index ها و trigger ها. باید روی اتصالی با foreign_keys=OFF اجرا شود (apply_migrations).
+    """
+    for table_name, money_columns in MONEY_COLUMNS.items():
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+        if row is None:
+            continue
+        create_sql = row[0]
+        for column in money_columns:
+            create_sql = re.sub(
+                rf'(?<![\w"])("?{column}"?\s+)REAL\b((?:\s+NOT\s+NULL)?\s+DEFAULT\s+0\.0\b)?',
+                lambda m: m.group(1) + "INTEGER" + (m.group(2)[:-2] if m.group(2) else ""),
+                create_sql, flags=re.IGNORECASE)
+        new_table = f"{table_name}__minor"
+        create_sql, replaced = re.subn(rf'^CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?"?{table_name}"?',
+                                       f'CREATE TABLE "{new_table}"', create_sql, count=1, flags=re.IGNORECASE)
+        if not replaced:
+            raise sqlite3.OperationalError(f"Unexpected CREATE statement for table {table_name}.")
+
+        columns = [info[1] for info in conn.execute(f'PRAGMA table_info("{table_name}")')]
+        dependent_sql = [r[0] for r in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL",
+            (table_name,))]
+        has_sequence = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'").fetchone() is not None
+        sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table_name,)).fetchone() \
+            if has_sequence else None
+
+        conn.execute(f'DROP TABLE IF EXISTS "{new_table}"')
+        conn.execute(create_sql)
+        new_types = {info[1]: info[2].upper() for info in conn.execute(f'PRAGMA table_info("{new_table}")')}
+        unconverted = [column for column in money_columns if column in new_types and new_types[column] != "INTEGER"]
+        if unconverted:
+            raise sqlite3.OperationalError(f"Could not convert money columns {unconverted} of table {table_name}.")
+        select_list = ", ".join(
+            f'CAST(ROUND("{column}" * {MINOR_UNITS_PER_UNIT}) AS INTEGER)' if column in money_columns else f'"{column}"'
+            for column in columns)
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        conn.execute(f'INSERT INTO "{new_table}" ({column_list}) SELECT {select_list} FROM "{table_name}"')
+        conn.execute(f'DROP TABLE "{table_name}"')
+        conn.execute(f'ALTER TABLE "{new_table}" RENAME TO "{table_name}"')
+        for sql in dependent_sql:
+            conn.execute(sql)
+        if sequence is not None:
+            # شماره‌های AUTOINCREMENT ردیف‌های حذف شده دوباره استفاده نشوند
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table_name))
+        logger.info(f"Money columns of table {table_name} converted to integer minor units.")
+
+
+# --- Schema Migrations ---
+# هر مهاجرت یک (نسخه، توضیح، لیست دستورات SQL) است. نسخه اعمال شده در PRAGMA user_version
+# ذخیره می‌شود و apply_migrations فقط مهاجرت‌های جدیدتر را به ترتیب اجرا می‌کند.
+# به جای یک دستور SQL می‌توان تابعی گذاشت که اتصال مهاجرت را می‌گیرد (برای تغییراتی مثل بازسازی جدول).
+# مهاجرت‌ها باید فقط به انتهای این لیست اضافه شوند و هرگز ویرایش نشوند.
+MigrationStatement = Union[str, Callable[[sqlite3.Connection], None]]
+
+SCHEMA_MIGRATIONS: List[Tuple[int, str, List[MigrationStatement]]] = [
+    (1, "Secondary indexes for hot foreign-key and date columns", [
+        # financial_transactions: get_by_account_id / get_by_reference / get_by_fiscal_year_id و بازه‌های تاریخ گزارش‌ها
+        "CREATE INDEX IF NOT EXISTS idx_ft_account_date ON financial_transactions (account_id, transaction_date)",
+        "CREATE INDEX IF NOT EXISTS idx_ft_date ON financial_transactions (transaction_date)",
+        "CREATE INDEX IF NOT EXISTS idx_ft_reference ON financial_transactions (reference_id, reference_type)",
+        "CREATE INDEX IF NOT EXISTS idx_ft_fiscal_year_date ON financial_transactions (fiscal_year_id, transaction_date)",
+        # invoices / invoice_items
+        "CREATE INDEX IF NOT EXISTS idx_invoices_person_date ON invoices (person_id, invoice_date)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices (invoice_date)",
+        "CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items (invoice_id)",
+        # inventory_movements: کاردکس کالا و حرکات یک سند
+        "CREATE INDEX IF NOT EXISTS idx_inv_mov_product_date ON inventory_movements (product_id, movement_date)",
+        "CREATE INDEX IF NOT EXISTS idx_inv_mov_reference ON inventory_movements (reference_id, reference_type)",
+        # checks: get_by_status / get_by_person_id / get_by_due_date_range (همه بر اساس due_date مرتب می‌شوند)
+        "CREATE INDEX IF NOT EXISTS idx_checks_due_date ON checks (due_date)",
+        "CREATE INDEX IF NOT EXISTS idx_checks_status_due ON checks (status, due_date)",
+        "CREATE INDEX IF NOT EXISTS idx_checks_person_due ON checks (person_id, due_date)",
+        # payments
+        "CREATE INDEX IF NOT EXISTS idx_payment_headers_person ON payment_headers (person_id)",
+        "CREATE INDEX IF NOT EXISTS idx_payment_headers_invoice ON payment_headers (invoice_id)",
+        "CREATE INDEX IF NOT EXISTS idx_payment_headers_date ON payment_headers (payment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_payment_line_items_header ON payment_line_items (payment_header_id)",
+        # accounts: جستجوی حساب تفصیلی اشخاص بر اساس نام و پیمایش درخت حساب‌ها
+        "CREATE INDEX IF NOT EXISTS idx_accounts_name ON accounts (name)",
+        "CREATE INDEX IF NOT EXISTS idx_accounts_parent ON accounts (parent_id)",
+        # سایر جداول جزئیات (header -> items)
+        "CREATE INDEX IF NOT EXISTS idx_loan_installments_loan_due ON loan_installments (loan_id, due_date)",
+        "CREATE INDEX IF NOT EXISTS idx_bom_items_bom ON bom_items (bom_id)",
+        "CREATE INDEX IF NOT EXISTS idx_consumed_materials_mp ON consumed_materials (manual_production_id)",
+        "CREATE INDEX IF NOT EXISTS idx_po_items_po ON purchase_order_items (purchase_order_id)",
+        "CREATE INDEX IF NOT EXISTS idx_material_receipts_po ON material_receipts (purchase_order_id)",
+        "CREATE INDEX IF NOT EXISTS idx_material_receipts_date ON material_receipts (receipt_date)",
+    ]),
+    (2, "Daily account balance snapshots for as-of balance queries", [
+        # برای هر حساب و هر روزی که تراکنش داشته: جمع تغییرات آن روز و مانده پایان روز (تجمعی از ابتدا)
+        """
+        CREATE TABLE IF NOT EXISTS account_balance_snapshots (
+            account_id INTEGER NOT NULL,
+            snapshot_date TEXT NOT NULL,
+            net_change REAL NOT NULL DEFAULT 0,
+            closing_balance REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (account_id, snapshot_date),
+            FOREIGN KEY (account_id) REFERENCES accounts(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """,
+        # ساخت snapshot ها از تراکنش‌های موجود
+        f"""
+        INSERT OR REPLACE INTO account_balance_snapshots (account_id, snapshot_date, net_change, closing_balance)
+        SELECT account_id, day, net_change,
+               SUM(net_change) OVER (PARTITION BY account_id ORDER BY day ROWS UNBOUNDED PRECEDING)
+        FROM (
+            SELECT account_id, substr(transaction_date, 1, 10) AS day, SUM({FT_BALANCE_EFFECT_SQL}) AS net_change
+            FROM financial_transactions
+            GROUP BY account_id, day
+        )
+        """,
+    ]),
+    (3, "Covering index for per-account turnover aggregation", [
+        # get_turnovers_by_account: GROUP BY (account_id, transaction_type) فقط از روی همین index خوانده می‌شود
+        # (بدون دسترسی به جدول و بدون temp B-tree برای GROUP BY)
+        "CREATE INDEX IF NOT EXISTS idx_ft_turnover ON financial_transactions "
+        "(account_id, transaction_type, transaction_date, amount)",
+    ]),
+    (4, "Closure table for the accounts hierarchy", [
+        # برای هر جفت (جد، نواده) در درخت حساب‌ها یک ردیف؛ هر حساب با depth=0 جد خودش است.
+        # توسط AccountManager (add_account / update_account_details / delete_account) به‌روز نگه داشته می‌شود.
+        """
+        CREATE TABLE IF NOT EXISTS account_closure (
+            ancestor_id INTEGER NOT NULL,
+            descendant_id INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id),
+            FOREIGN KEY (ancestor_id) REFERENCES accounts(id) ON DELETE CASCADE,
+            FOREIGN KEY (descendant_id) REFERENCES accounts(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_account_closure_descendant ON account_closure (descendant_id, depth)",
+        # ساخت مسیرها از parent_id های موجود (حلقه‌های احتمالی با محدودیت عمق قطع می‌شوند)
+        """
+        INSERT OR IGNORE INTO account_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE paths(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM accounts
+            UNION ALL
+            SELECT p.ancestor_id, a.id, p.depth + 1
+            FROM paths p JOIN accounts a ON a.parent_id = p.descendant_id
+            WHERE p.depth < (SELECT COUNT(*) FROM accounts)
+        )
+        SELECT ancestor_id, descendant_id, MIN(depth) FROM paths GROUP BY ancestor_id, descendant_id
+        """,
+    ]),
+    (5, "Daily product stock snapshots for the stock ledger", [
+        # برای هر کالا و هر روزی که حرکت انبار داشته: جمع تغییرات آن روز و جمع تجمعی حرکات تا پایان روز
+        """
+        CREATE TABLE IF NOT EXISTS product_stock_snapshots (
+            product_id INTEGER NOT NULL,
+            snapshot_date TEXT NOT NULL,
+            net_change REAL NOT NULL DEFAULT 0,
+            closing_quantity REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (product_id, snapshot_date),
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR REPLACE INTO product_stock_snapshots (product_id, snapshot_date, net_change, closing_quantity)
+        SELECT product_id, day, net_change,
+               SUM(net_change) OVER (PARTITION BY product_id ORDER BY day ROWS UNBOUNDED PRECEDING)
+        FROM (
+            SELECT product_id, substr(movement_date, 1, 10) AS day, SUM(quantity_change) AS net_change
+            FROM inventory_movements
+            GROUP BY product_id, day
+        )
+        """,
+    ]),
+    (6, "Persisted person to subsidiary account mapping", [
+        # حساب معین هر شخص به جای جستجوی نام 'PERSON-<id>' با ستون person_id مشخص می‌شود
+        "ALTER TABLE accounts ADD COLUMN person_id INTEGER REFERENCES persons(id) ON DELETE SET NULL",
+        """
+        UPDATE accounts SET person_id = CAST(substr(name, 8) AS INTEGER)
+        WHERE name GLOB 'PERSON-[0-9]*' AND CAST(substr(name, 8) AS INTEGER) IN (SELECT id FROM persons)
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_accounts_person ON accounts (person_id) WHERE person_id IS NOT NULL",
+    ]),
+    (7, "Store money columns as INTEGER minor units", [
+        # مبالغ به جای REAL به صورت عدد صحیح واحد خرد ذخیره می‌شوند تا SUM ها در SQL دقیق باشند
+        _convert_money_columns_to_minor_units,
+    ]),
+]
+
+# کوئری‌های پرتکرار repository ها؛ check_query_plans بررسی می‌کند که هیچ‌کدام به full table scan نرسند.
+HOT_QUERY_PLANS: List[Tuple[str, Tuple[Any, ...]]] = [
+    ("SELECT * FROM financial_transactions WHERE account_id = ? ORDER BY transaction_date DESC", (1,)),
+    ("SELECT * FROM financial_transactions WHERE reference_id = ? AND reference_type = ?", (1, "")),
+    ("SELECT * FROM financial_transactions WHERE fiscal_year_id = ? ORDER BY transaction_date DESC", (1,)),
+    ("SELECT * FROM financial_transactions WHERE transaction_date BETWEEN ? AND ?", ("", "")),
+    ("SELECT * FROM invoice_items WHERE invoice_id = ?", (1,)),
+    ("SELECT * FROM inventory_movements WHERE product_id = ? ORDER BY movement_date DESC", (1,)),
+    ("SELECT * FROM inventory_movements WHERE product_id = ? AND movement_date BETWEEN ? AND ?", (1, "", "")),
+    ("SELECT * FROM checks WHERE status = ? ORDER BY due_date ASC", ("",)),
+    ("SELECT * FROM checks WHERE person_id = ? ORDER BY due_date ASC", (1,)),
+    ("SELECT * FROM checks WHERE due_date BETWEEN ? AND ? ORDER BY due_date ASC", ("", "")),
+    ("SELECT * FROM accounts WHERE name = ?", ("",)),
+    ("SELECT * FROM accounts WHERE person_id = ?", (1,)),
+    ("SELECT descendant_id FROM account_closure WHERE ancestor_id = ?", (1,)),
+    ("SELECT ancestor_id FROM account_closure WHERE descendant_id = ? ORDER BY depth", (1,)),
+    ("SELECT closing_balance FROM account_balance_snapshots WHERE account_id = ? AND snapshot_date <= ? "
+     "ORDER BY snapshot_date DESC LIMIT 1", (1, "")),
+    ("SELECT closing_quantity FROM product_stock_snapshots WHERE product_id = ? AND snapshot_date <= ? "
+     "ORDER BY snapshot_date DESC LIMIT 1", (1, "")),
+]
+
+
+class _ThreadConnectionHolder:
+    """
+    نگه‌دارنده اتصال اختصاصی یک thread.
+    وقتی thread تمام شود و این شیء از بین برود، اتصال به pool برگردانده می‌شود.
+    """
+    __slots__ = ("conn", "finalizer", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.finalizer: Optional[weakref.finalize] = None
+
+
 class DatabaseManager:
-    def __init__(self, db_path=DATABASE_PATH):
+    def __init__(self, db_path=DATABASE_PATH,
+                 use_pool: bool = DB_USE_CONNECTION_POOL,
+                 pool_size: int = DB_POOL_SIZE,
+                 pool_timeout: float = DB_POOL_TIMEOUT,
+                 performance_profile: str = DB_PERFORMANCE_PROFILE):
         self.db_path = db_path
         self.conn = None
 
+        if performance_profile not in DB_PERFORMANCE_PROFILES:
+            raise ValueError(f"Unknown database performance profile '{performance_profile}'. "
+                             f"Valid profiles: {', '.join(DB_PERFORMANCE_PROFILES)}")
+        self.performance_profile = performance_profile
+
+        # --- Connection pool state ---
+        # در حالت pool، هر thread یک اتصال ماندگار دارد (self._local.holder).
+        # تعداد کل اتصال‌های باز با یک semaphore به pool_size محدود می‌شود
+        # و اتصال‌های آزاد شده در _idle_connections برای استفاده مجدد نگه داشته می‌شوند.
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.use_pool = use_pool
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._local = threading.local()
+        self._pool_slots = threading.BoundedSemaphore(pool_size)
+        self._idle_connections: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._open_connections: Set[sqlite3.Connection] = set()
+        self._pool_lock = threading.Lock()
+        self._pool_closed = False
+
+        # cache موجودیت‌های مرجع، یکی برای هر جدول؛ همه repository های همان جدول در آن شریک‌اند
+        self._entity_caches: Dict[str, EntityCache] = {}
+        self._entity_caches_lock = threading.Lock()
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """یک اتصال جدید با تنظیمات استاندارد پروژه باز می‌کند."""
+        # check_same_thread=False لازم است چون اتصال‌های pool بین thread ها دست به دست می‌شوند.
+        # در هر لحظه فقط یک thread صاحب یک اتصال است.
+        conn = sqlite3.connect(self.db_path, check_same_thread=not self.use_pool,
+                               cached_statements=DB_STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row # Access columns by name
+        conn.execute("PRAGMA foreign_keys = ON;") # Enforce foreign key constraints
+        self._apply_performance_profile(conn)
+        logger.debug(f"Database connection established to {self.db_path} (profile: {self.performance_profile})")
+        return conn
+
+    def _apply_performance_profile(self, conn: sqlite3.Connection) -> None:
+        """PRAGMA های پروفایل کارایی انتخاب شده در config را روی اتصال اعمال می‌کند."""
+        for pragma, value in DB_PERFORMANCE_PROFILES[self.performance_profile].items():
+            try:
+                result = conn.execute(f"PRAGMA {pragma} = {value};").fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not apply PRAGMA {pragma}={value}: {e}")
+                continue
+            # journal_mode مقدار واقعی اعمال شده را برمی‌گرداند (مثلاً 'memory' برای پایگاه داده درون حافظه)
+            if pragma == "journal_mode" and result and str(result[0]).lower() != str(value).lower():
+                logger.info(f"journal_mode={value} not applied for {self.db_path}; using '{result[0]}'.")
+
+    @staticmethod
+    def _is_connection_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _close_pooled_connection(self, conn: sqlite3.Connection) -> None:
+        with self._pool_lock:
+            self._open_connections.discard(conn)
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Error while closing pooled connection: {e}")
+
+    def _checkout_connection(self) -> sqlite3.Connection:
+        """یک اتصال از pool می‌گیرد؛ اگر pool پر باشد تا pool_timeout صبر می‌کند."""
+        if self._pool_closed:
+            raise sqlite3.ProgrammingError(f"Connection pool for {self.db_path} is closed.")
+        if not self._pool_slots.acquire(timeout=self.pool_timeout):
+            logger.error(f"Connection pool exhausted ({self.pool_size} connections) for {self.db_path}.")
+            raise sqlite3.OperationalError(
+                f"Connection pool exhausted: no connection available within {self.pool_timeout} seconds."
+            )
+        try:
+            while True:
+                try:
+                    conn = self._idle_connections.get_nowait()
+                except queue.Empty:
+                    break
+                if self._is_connection_healthy(conn):
+                    return conn
+                logger.warning("Discarding unhealthy pooled connection.")
+                self._close_pooled_connection(conn)
+
+            conn = self._open_connection()
+            with self._pool_lock:
+                self._open_connections.add(conn)
+            return conn
+        except Exception:
+            self._pool_slots.release()
+            raise
+
+    def _return_connection(self, conn: sqlite3.Connection) -> None:
+        """اتصال را به pool برمی‌گرداند (تراکنش نیمه‌کاره rollback می‌شود)."""
+        try:
+            if self._pool_closed or not self._is_connection_healthy(conn):
+                self._close_pooled_connection(conn)
+                return
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle_connections.put(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to return connection to pool, closing it: {e}")
+            self._close_pooled_connection(conn)
+        finally:
+            self._pool_slots.release()
+
+    def get_connection(self) -> sqlite3.Connection:
+        """
+        اتصال ماندگار thread جاری را برمی‌گرداند و در صورت نیاز آن را از pool می‌گیرد.
+        فقط در حالت pool قابل استفاده است.
+        """
+        if not self.use_pool:
+            raise sqlite3.ProgrammingError("get_connection is only available when the connection pool is enabled.")
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = self._checkout_connection()
+            holder = _ThreadConnectionHolder(conn)
+            # اگر یک worker thread بدون release_connection تمام شود، اتصالش به pool برمی‌گردد.
+            holder.finalizer = weakref.finalize(holder, self._return_connection, conn)
+            self._local.holder = holder
+            logger.debug(f"Connection checked out from pool for thread {threading.current_thread().name}.")
+        return holder.conn
+
+    def release_connection(self) -> None:
+        """
+        اتصال thread جاری را به pool برمی‌گرداند.
+        worker thread ها باید در پایان کار خود این متد را صدا بزنند.
+        """
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            return
+        if self.in_transaction():
+            logger.warning("release_connection called inside an open transaction. Connection kept.")
+            return
+        del self._local.holder
+        holder.finalizer() # فقط یک بار اجرا می‌شود و اتصال را به pool برمی‌گرداند
+        logger.debug(f"Connection released to pool by thread {threading.current_thread().name}.")
+
+    def check_health(self) -> bool:
+        """سلامت اتصال thread جاری را بررسی می‌کند و در صورت خرابی آن را جایگزین می‌کند."""
+        if not self.use_pool:
+            try:
+                with self as conn:
+                    return self._is_connection_healthy(conn)
+            except sqlite3.Error:
+                return False
+        conn = self.get_connection()
+        if self._is_connection_healthy(conn):
+            return True
+        logger.warning(f"Connection of thread {threading.current_thread().name} is unhealthy. Reconnecting.")
+        self.release_connection()
+        try:
+            return self._is_connection_healthy(self.get_connection())
+        except sqlite3.Error:
+            return False
+
+    def close(self) -> None:
+        """تمام اتصال‌های pool را می‌بندد. در هنگام خروج از برنامه فراخوانی شود."""
+        if not self.use_pool:
+            return
+        self._pool_closed = True
+        self.release_connection()
+        while True:
+            try:
+                conn = self._idle_connections.get_nowait()
+            except queue.Empty:
+                break
+            self._close_pooled_connection(conn)
+        with self._pool_lock:
+            remaining = list(self._open_connections)
+        if remaining:
+            logger.warning(f"Closing {len(remaining)} connection(s) still held by other threads.")
+        for conn in remaining:
+            self._close_pooled_connection(conn)
+        logger.info(f"Connection pool for {self.db_path} closed.")
+
+    # --- Unit of work / transaction scope ---
+    # تا زمانی که یک تراکنش روی thread جاری باز است، تمام متدهای این کلاس و همه
+    # BaseRepository ها از همان اتصال استفاده می‌کنند و commit جداگانه انجام نمی‌دهند.
+    # فراخوانی‌های تو در تو به صورت SAVEPOINT پیاده‌سازی می‌شوند.
+
+    def in_transaction(self) -> bool:
+        return getattr(self._local, "tx_depth", 0) > 0
+
+    def _transaction_connection(self) -> sqlite3.Connection:
+        if self.use_pool:
+            return self.get_connection()
+        return self._local.tx_conn
+
+    def begin_transaction(self) -> None:
+        depth = getattr(self._local, "tx_depth", 0)
+        if depth == 0:
+            if self.use_pool:
+                conn = self.get_connection()
+            else:
+                conn = self._open_connection()
+                self._local.tx_conn = conn
+            if conn.in_transaction:
+                logger.warning("Discarding uncommitted changes left on connection before starting a new transaction.")
+                conn.rollback()
+            # IMMEDIATE: قفل نوشتن از ابتدا گرفته می‌شود تا سند در میانه کار با SQLITE_BUSY مواجه نشود.
+            conn.execute("BEGIN IMMEDIATE")
+            logger.debug("Database transaction started.")
+        else:
+            self._transaction_connection().execute(f"SAVEPOINT uow_{depth}")
+            logger.debug(f"Savepoint uow_{depth} created.")
+        self._local.tx_depth = depth + 1
+
+    def commit_transaction(self) -> None:
+        depth = getattr(self._local, "tx_depth", 0)
+        if depth == 0:
+            raise sqlite3.ProgrammingError("commit_transaction called without an active transaction.")
+        conn = self._transaction_connection()
+        self._local.tx_depth = depth - 1
+        if depth > 1:
+            conn.execute(f"RELEASE SAVEPOINT uow_{depth - 1}")
+            return
+        committed = False
+        try:
+            conn.commit()
+            committed = True
+            logger.debug("Database transaction committed.")
+        finally:
+            self._end_transaction_connection()
+            self._run_transaction_callbacks(committed)
+
+    def rollback_transaction(self) -> None:
+        depth = getattr(self._local, "tx_depth", 0)
+        if depth == 0:
+            logger.warning("rollback_transaction called without an active transaction. Ignored.")
+            return
+        conn = self._transaction_connection()
+        self._local.tx_depth = depth - 1
+        if depth > 1:
+            conn.execute(f"ROLLBACK TO SAVEPOINT uow_{depth - 1}")
+            conn.execute(f"RELEASE SAVEPOINT uow_{depth - 1}")
+            logger.debug(f"Rolled back to savepoint uow_{depth - 1}.")
+            return
+        try:
+            conn.rollback()
+            logger.info("Database transaction rolled back.")
+        finally:
+            self._end_transaction_connection()
+            self._run_transaction_callbacks(False)
+
+    def _end_transaction_connection(self) -> None:
+        if not self.use_pool:
+            conn = self._local.tx_conn
+            del self._local.tx_conn
+            conn.close()
+
+    def after_transaction(self, callback: Callable[[bool], None]) -> None:
+        """
+        callback(committed) را بعد از پایان تراکنش بیرونی thread جاری اجرا می‌کند (committed=False یعنی rollback).
+        اگر تراکنشی باز نیست (نوشتن‌ها autocommit هستند)، callback بلافاصله با committed=True اجرا می‌شود.
+        """
+        if not self.in_transaction():
+            callback(True)
+            return
+        callbacks = getattr(self._local, "tx_callbacks", None)
+        if callbacks is None:
+            callbacks = self._local.tx_callbacks = []
+        callbacks.append(callback)
+
+    def _run_transaction_callbacks(self, committed: bool) -> None:
+        callbacks = getattr(self._local, "tx_callbacks", None)
+        if not callbacks:
+            return
+        self._local.tx_callbacks = None
+        for callback in callbacks:
+            try:
+                callback(committed)
+            except Exception as e:
+                logger.error(f"Error in after-transaction callback: {e}", exc_info=True)
+
+    # --- Entity caches ---
+
+    def get_entity_cache(self, table_name: str, max_size: int) -> EntityCache:
+        """cache مشترک موجودیت‌های یک جدول (در اولین درخواست با ظرفیت max_size ساخته می‌شود)."""
+        with self._entity_caches_lock:
+            cache = self._entity_caches.get(table_name)
+            if cache is None:
+                cache = self._entity_caches[table_name] = EntityCache(table_name, max_size)
+            return cache
+
+    def entity_caches(self) -> Dict[str, EntityCache]:
+        with self._entity_caches_lock:
+            return dict(self._entity_caches)
+
+    def clear_entity_caches(self) -> None:
+        """همه cache های موجودیت را خالی می‌کند (مثلاً بعد از حذف‌هایی که با ON DELETE ردیف‌های جداول دیگر را تغییر می‌دهند)."""
+        for cache in self.entity_caches().values():
+            cache.clear()
+
+    def entity_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """آمار hit/miss و اندازه cache هر جدول: {نام جدول: {...}}"""
+        return {table_name: cache.stats() for table_name, cache in self.entity_caches().items()}
+
+    @contextmanager
+    def transaction(self):
+        """
+        یک واحد کار (unit of work) اتمیک: همه نوشتن‌های داخل این بلوک با هم commit
+        یا در صورت بروز خطا با هم rollback می‌شوند.
+
+            with db_manager.transaction():
+                invoices_repo.add(header)
+                invoice_items_repo.add(item)
+        """
+        self.begin_transaction()
+        try:
+            yield self._transaction_connection()
+        except BaseException:
+            self.rollback_transaction()
+            raise
+        else:
+            self.commit_transaction()
+
     def __enter__(self):
+        if self.in_transaction():
+            return self._transaction_connection()
+        if self.use_pool:
+            return self.get_connection()
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.conn.row_factory = sqlite3.Row # Access columns by name
-            self.conn.execute("PRAGMA foreign_keys = ON;") # Enforce foreign key constraints
-            logger.debug(f"Database connection established to {self.db_path}")
+            self.conn = self._open_connection()
             return self.conn
         except sqlite3.Error as e:
             logger.error(f"Error connecting to database {self.db_path}: {e}")
             raise
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.in_transaction():
+            return # اتصال متعلق به تراکنش جاری است؛ commit/rollback با صاحب تراکنش است
+        if self.use_pool:
+            # اتصال باز می‌ماند؛ فقط تغییرات commit نشده دور ریخته می‌شوند
+            # (همان رفتاری که بستن اتصال در حالت عادی داشت).
+            conn = self._local.holder.conn if getattr(self._local, "holder", None) else None
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            return
         if self.conn:
             self.conn.close()
             logger.debug("Database connection closed.")
@@ -38,7 +638,8 @@ class DatabaseManager:
             with self as conn:
                 cursor = conn.cursor()
                 cursor.execute(query, params or ())
-                conn.commit()
+                if not self.in_transaction():
+                    conn.commit()
                 return cursor
         except sqlite3.Error as e:
             logger.error(f"Query execution failed: {query} with params {params} - {e}")
@@ -65,6 +666,38 @@ class DatabaseManager:
             logger.error(f"Fetch all failed: {query} with params {params} - {e}")
             raise
 
+    def fetch_batches(self, query, params=None, batch_size: int = DB_FETCH_BATCH_SIZE) -> Iterator[List[sqlite3.Row]]:
+        """
+        نتیجه کوئری را به صورت دسته‌های batch_size تایی (با fetchmany) برمی‌گرداند
+        تا نتایج بزرگ بدون بارگذاری کامل در حافظه پیمایش شوند.
+        در حالت بدون pool یک اتصال اختصاصی برای مدت پیمایش باز می‌شود
+        تا کوئری‌های دیگر در همین حین اتصال آن را نبندند.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        dedicated_conn: Optional[sqlite3.Connection] = None
+        if self.in_transaction():
+            conn = self._transaction_connection()
+        elif self.use_pool:
+            conn = self.get_connection()
+        else:
+            conn = dedicated_conn = self._open_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        except sqlite3.Error as e:
+            logger.error(f"Fetch batches failed: {query} with params {params} - {e}")
+            raise
+        finally:
+            cursor.close()
+            if dedicated_conn is not None:
+                dedicated_conn.close()
+
     def create_tables(self):
         queries = [
             # ... (All your CREATE TABLE query strings as defined before) ...
@@ -590,6 +1223,82 @@ class DatabaseManager:
             # در صورت بروز خطا، ممکن است بخواهید conn.rollback() را فراخوانی کنید اگر تراکنش صریحی باز کرده بودید
             raise
 
+        self.apply_migrations()
+
+    def get_schema_version(self) -> int:
+        row = self.fetch_one("PRAGMA user_version;")
+        return int(row[0]) if row else 0
+
+    def apply_migrations(self) -> int:
+        """
+        مهاجرت‌های SCHEMA_MIGRATIONS که هنوز اعمال نشده‌اند را به ترتیب اجرا می‌کند.
+        هر مهاجرت در یک تراکنش جداگانه اجرا و نسخه آن در PRAGMA user_version ثبت می‌شود.
+        مهاجرت‌ها روی یک اتصال اختصاصی با foreign_keys=OFF اجرا می‌شوند تا بازسازی جداول (DROP TABLE)
+        اثر ON DELETE روی جداول وابسته نداشته باشد؛ در عوض اگر مهاجرتی ارجاع نامعتبر تازه‌ای بسازد
+        (PRAGMA foreign_key_check)، rollback می‌شود.
+        Returns the schema version after migrating.
+        """
+        if self.in_transaction():
+            raise sqlite3.ProgrammingError("apply_migrations cannot run inside an open transaction.")
+        current_version = self.get_schema_version()
+        pending = [migration for migration in SCHEMA_MIGRATIONS if migration[0] > current_version]
+        if not pending:
+            return current_version
+        conn = self._open_connection()
+        try:
+            # foreign_keys داخل تراکنش قابل تغییر نیست؛ قبل از BEGIN خاموش می‌شود
+            conn.execute("PRAGMA foreign_keys = OFF;")
+            for version, description, statements in pending:
+                logger.info(f"Applying schema migration {version}: {description}")
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    violations_before = len(conn.execute("PRAGMA foreign_key_check;").fetchall())
+                    for statement in statements:
+                        if callable(statement):
+                            statement(conn)
+                        else:
+                            conn.execute(statement)
+                    violations_after = len(conn.execute("PRAGMA foreign_key_check;").fetchall())
+                    if violations_after > violations_before:
+                        raise sqlite3.IntegrityError(
+                            f"Migration would add {violations_after - violations_before} foreign key violation(s).")
+                    # PRAGMA مقدار پارامتری نمی‌پذیرد؛ version یک عدد صحیح داخلی است
+                    conn.execute(f"PRAGMA user_version = {int(version)};")
+                    conn.commit()
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    logger.error(f"Schema migration {version} failed: {e}", exc_info=True)
+                    raise
+                current_version = version
+        finally:
+            conn.close()
+        # مقادیر cache شده ممکن است از قبل از مهاجرت باشند
+        self.clear_entity_caches()
+        return current_version
+
+    def explain_query_plan(self, query: str, params: tuple = ()) -> List[str]:
+        """خروجی EXPLAIN QUERY PLAN را به صورت لیست رشته‌های detail برمی‌گرداند."""
+        with self as conn:
+            # EXPLAIN کوکی schema را بررسی نمی‌کند؛ اتصال pool که پیش از مهاجرت‌ها باز شده، بدون این خواندن
+            # plan را با schema قدیمی (بدون index های جدید) می‌سازد. هر خواندن معمولی schema را دوباره بارگذاری می‌کند.
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+        return [row["detail"] for row in rows]
+
+    def check_query_plans(self) -> List[Tuple[str, List[str]]]:
+        """
+        کوئری‌های HOT_QUERY_PLANS را بررسی می‌کند و آن‌هایی را که به full table scan
+        (SCAN <table> بدون استفاده از index) می‌رسند، همراه با plan آن‌ها برمی‌گرداند.
+        لیست خالی یعنی همه کوئری‌های پرتکرار از index استفاده می‌کنند.
+        """
+        regressions: List[Tuple[str, List[str]]] = []
+        for query, params in HOT_QUERY_PLANS:
+            plan = self.explain_query_plan(query, params)
+            if any(detail.startswith("SCAN") and "INDEX" not in detail for detail in plan):
+                logger.warning(f"Query plan regression (full table scan): {query} -> {plan}")
+                regressions.append((query, plan))
+        return regressions
+
 
 # Example usage (typically called once at application startup)
 if __name__ == '__main__':
@@ -5,6 +5,7 @@ from datetime import datetime
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
 from src.business_logic.entities.employee_entity import EmployeeEntity
 from src.constants import DATE_FORMAT
 import logging
@@ -27,7 +28,7 @@ class EmployeesRepository(BaseRepository[EmployeeEntity]):
                 person_id=row['person_id'],
                 national_id=row.get('national_id'),
                 position=row.get('position'),
-                base_salary=float(row['base_salary']),
+                base_salary=money_float_from_db(row['base_salary']),
                 hire_date=datetime.strptime(hire_date_str, DATE_FORMAT).date() if hire_date_str else None,
                 is_active=bool(row['is_active']) # DB stores 0 or 1
             )
@@ -0,0 +1,154 @@
+# src/data_access/entity_cache.py
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Generic, TypeVar, Optional, Dict, Any, Set, Tuple, Iterable, Iterator, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..business_logic.entities.base_entity import BaseEntity
+
+import logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T', bound='BaseEntity')
+
+# علامت «همه ردیف‌های جدول» در مجموعه نوشته‌شده‌های یک تراکنش (مثلاً بعد از DELETE با اثر ON DELETE)
+ALL_ROWS = None
+
+# نقشه هویت (identity map) نشست جاری هر thread: {(نام جدول، شناسه): entity}
+_session_state = threading.local()
+
+
+@contextmanager
+def entity_session() -> Iterator[None]:
+    """
+    محدوده یک نشست (مثلاً ثبت یک دسته سند): داخل این بلوک get_by_id در repository های دارای cache
+    برای هر شناسه همیشه همان instance را برمی‌گرداند (identity map)، پس همه مراحل ثبت داده‌های یکسان می‌بینند
+    و تغییرات نوشته شده با update همان repository در نشست دیده می‌شوند. بلوک‌های تو در تو همان نشست بیرونی را به کار می‌برند.
+
+        with entity_session(), db_manager.transaction():
+            ...
+    """
+    if getattr(_session_state, "identity_map", None) is not None:
+        yield
+        return
+    _session_state.identity_map = {}
+    try:
+        yield
+    finally:
+        _session_state.identity_map = None
+
+
+def current_identity_map() -> Optional[Dict[Tuple[str, int], Any]]:
+    """نقشه هویت نشست فعال در thread جاری (یا None اگر نشستی باز نیست)."""
+    return getattr(_session_state, "identity_map", None)
+
+
+class EntityCache(Generic[T]):
+    """
+    cache خواندنی LRU با اندازه محدود برای entity های مرجع (حساب‌ها، اشخاص، کالاها) یک repository.
+    - entity ها به صورت کپی ذخیره و برگردانده می‌شوند تا تغییر یک نمونه توسط فراخوان، cache را خراب نکند.
+    - هر invalidate شماره نسل (generation) را زیاد می‌کند؛ put فقط وقتی پذیرفته می‌شود که از شروع خواندن
+      آن ردیف از دیتابیس تا put نسل عوض نشده باشد (خواندن همزمان یک thread دیگر مقدار قدیمی را برنمی‌گرداند).
+    - ردیف‌هایی که تراکنش باز thread جاری نوشته (mark_written) تا پایان تراکنش از cache خوانده نمی‌شوند و
+      بعد از commit/rollback با end_transaction از cache حذف می‌شوند؛ بقیه ردیف‌ها داخل تراکنش هم از cache می‌آیند.
+    """
+
+    def __init__(self, name: str, max_size: int):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.name = name
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, T]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        # شناسه‌های نوشته شده در تراکنش باز هر thread (یا ALL_ROWS)
+        self._tx_state = threading.local()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, entity_id: int) -> Optional[T]:
+        with self._lock:
+            entity = self._entries.get(entity_id)
+            if entity is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entity_id)
+            self.hits += 1
+        return replace(entity)
+
+    def put(self, entity: T, generation: int) -> None:
+        if entity.id is None:
+            return
+        cached = replace(entity)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[entity.id] = cached
+            self._entries.move_to_end(entity.id)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, entity_ids: Iterable[int]) -> None:
+        with self._lock:
+            self._generation += 1
+            for entity_id in entity_ids:
+                self._entries.pop(entity_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def mark_written(self, entity_ids: Optional[Iterable[int]] = ALL_ROWS) -> bool:
+        """
+        ردیف‌های نوشته شده در تراکنش باز thread جاری را ثبت می‌کند (ALL_ROWS یعنی کل جدول).
+        True یعنی این اولین نوشتن این تراکنش است و فراخوان باید end_transaction را برای پایان آن زمان‌بندی کند.
+        """
+        state = self._tx_state
+        first_write = not getattr(state, "active", False)
+        if first_write:
+            state.active = True
+            state.written = set()
+        if entity_ids is ALL_ROWS:
+            state.written = ALL_ROWS
+        elif state.written is not ALL_ROWS:
+            state.written.update(entity_ids)
+        return first_write
+
+    def is_written(self, entity_id: int) -> bool:
+        state = self._tx_state
+        if not getattr(state, "active", False):
+            return False
+        return state.written is ALL_ROWS or entity_id in state.written
+
+    def end_transaction(self) -> Union[Set[int], None]:
+        """پایان تراکنش thread جاری: ردیف‌های نوشته شده را از cache حذف و برمی‌گرداند (ALL_ROWS برای کل جدول)."""
+        state = self._tx_state
+        if not getattr(state, "active", False):
+            return set()
+        written = state.written
+        state.active = False
+        state.written = set()
+        if written is ALL_ROWS:
+            self.clear()
+        else:
+            self.invalidate(written)
+        return written
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "max_size": self.max_size,
+                    "hit_ratio": (self.hits / lookups) if lookups else 0.0}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
@@ -1,80 +1,258 @@
 # src/data_access/financial_transactions_repository.py
 
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable, Tuple, Iterator
+from datetime import datetime, date, timedelta
 
-from src.data_access.base_repository import BaseRepository
-from src.data_access.database_manager import DatabaseManager
+from src.data_access.base_repository import BaseRepository, KeysetKey
+from src.data_access.database_manager import DatabaseManager, FT_BALANCE_EFFECT_SQL
+from src.utils.money import money_to_db, money_from_db
+from src.config import DB_FETCH_BATCH_SIZE
 from src.business_logic.entities.financial_transaction_entity import FinancialTransactionEntity
-from src.constants import FinancialTransactionType, ReferenceType, DATETIME_FORMAT
+from src.constants import FinancialTransactionType, ReferenceType, AccountType, DATETIME_FORMAT
 import logging
 from decimal import Decimal
 logger = logging.getLogger(__name__)
 
+
+def _parse_transaction_date(value: Any) -> datetime:
+    if not isinstance(value, str):
+        return value
+    try:
+        # fromisoformat می‌تواند فرمت‌های مختلف ISO شامل 'T' را مدیریت کند
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # اگر fromisoformat شکست خورد، به عنوان fallback سعی می‌کنیم با فرمت قبلی بخوانیم
+        logger.warning(f"Could not parse date '{value}' with fromisoformat, trying DATETIME_FORMAT")
+        try:
+            return datetime.strptime(value, DATETIME_FORMAT)
+        except ValueError as e_strptime:
+            raise ValueError(f"فرمت تاریخ تراکنش نامعتبر است: {value}") from e_strptime
+
+
 class FinancialTransactionsRepository(BaseRepository[FinancialTransactionEntity]):
     def __init__(self, db_manager: DatabaseManager):
         
         super().__init__(db_manager=db_manager, 
                          model_type=FinancialTransactionEntity,  # <<< Pass the CLASS AccountEntity
                          table_name="financial_transactions") 
-    def _entity_from_row(self, row: Dict[str, Any]) -> 'FinancialTransactionEntity':
-        from src.business_logic.entities.financial_transaction_entity import FinancialTransactionEntity # وارد کردن محلی
-
-        if row is None:
-            raise ValueError("Input row cannot be None for FinancialTransactionEntity")
-        try:
-            transaction_date_str = row.get('transaction_date')
-            reference_type_str = row.get('reference_type')
-
-            # استفاده از fromisoformat برای خواندن تاریخ و زمان با فرمت ISO (شامل T)
-            parsed_transaction_date = None
-            if transaction_date_str:
-                try:
-                    # fromisoformat می‌تواند فرمت‌های مختلف ISO شامل 'T' را مدیریت کند
-                    parsed_transaction_date = datetime.fromisoformat(transaction_date_str)
-                except ValueError:
-                    # اگر fromisoformat شکست خورد، به عنوان fallback سعی می‌کنیم با فرمت قبلی بخوانیم
-                    # این حالت نباید رخ دهد اگر همه تاریخ‌ها با isoformat ذخیره شده باشند
-                    logger.warning(f"Could not parse date '{transaction_date_str}' with fromisoformat, trying DATETIME_FORMAT for FT ID {row.get('id')}")
-                    try:
-                        parsed_transaction_date = datetime.strptime(transaction_date_str, DATETIME_FORMAT)
-                    except ValueError as e_strptime:
-                        logger.error(f"Failed to parse transaction_date '{transaction_date_str}' with all known formats for FT ID {row.get('id')}: {e_strptime}")
-                        # می‌توانید خطا ایجاد کنید یا None برگردانید یا تاریخ پیش‌فرض بگذارید
-                        raise ValueError(f"فرمت تاریخ تراکنش نامعتبر است: {transaction_date_str}") from e_strptime
-
-
-            return FinancialTransactionEntity(
-                id=row['id'],
-                transaction_date=parsed_transaction_date, # <<< استفاده از تاریخ تجزیه شده # type: ignore
-                account_id=row['account_id'],
-                transaction_type=FinancialTransactionType(row['transaction_type']),
-                amount=Decimal(str(row.get('amount', '0.0'))),
-                description=row.get('description'),
-                category=row.get('category'),
-                reference_id=row.get('reference_id'),
-                reference_type=ReferenceType(reference_type_str) if reference_type_str else None,
-                fiscal_year_id=row.get('fiscal_year_id')
-            )
-        except KeyError as e:
-            logger.error(f"KeyError when creating FinancialTransactionEntity from row: {e}. Row: {row}")
-            raise
-        except ValueError as e: 
-            logger.error(f"ValueError when creating FinancialTransactionEntity: {e}. Row: {row}")
-            raise
+    def _field_converters(self) -> Dict[str, Callable[[Any], Any]]:
+        # تاریخ تراکنش‌های قدیمی ممکن است با DATETIME_FORMAT (بدون T) ذخیره شده باشند
+        return {"transaction_date": _parse_transaction_date}
 
     # ... (other methods remain the same) ...
     def get_by_account_id(self, account_id: int) -> List[FinancialTransactionEntity]:
         query = f"SELECT * FROM {self._table_name} WHERE account_id = ? ORDER BY transaction_date DESC"
         rows = self.db_manager.fetch_all(query, (account_id,))
-        return [self._entity_from_row(dict(row)) for row in rows if row]
+        return self._entities_from_rows(rows)
 
     def get_by_reference(self, reference_id: int, reference_type: ReferenceType) -> List[FinancialTransactionEntity]:
         query = f"SELECT * FROM {self._table_name} WHERE reference_id = ? AND reference_type = ?"
         rows = self.db_manager.fetch_all(query, (reference_id, reference_type.value))
-        return [self._entity_from_row(dict(row)) for row in rows if row]
+        return self._entities_from_rows(rows)
 
     def get_by_fiscal_year_id(self, fiscal_year_id: int) -> List[FinancialTransactionEntity]:
         query = f"SELECT * FROM {self._table_name} WHERE fiscal_year_id = ? ORDER BY transaction_date DESC"
         rows = self.db_manager.fetch_all(query, (fiscal_year_id,))
-        return [self._entity_from_row(dict(row)) for row in rows if row]
\ No newline at end of file
+        return self._entities_from_rows(rows)
+
+    @staticmethod
+    def _day_range_conditions(start_date: Optional[date], end_date: Optional[date]) -> Tuple[List[str], List[Any]]:
+        """
+        شرط بازه روزهای [start_date, end_date] روی transaction_date.
+        مرز بالا «کمتر از روز بعد» است تا تراکنش‌های روز پایانی با هر دو قالب ذخیره ('T' یا فاصله) شامل شوند.
+        """
+        conditions: List[str] = []
+        params: List[Any] = []
+        if start_date:
+            conditions.append("transaction_date >= ?")
+            params.append(start_date.isoformat())
+        if end_date:
+            conditions.append("transaction_date < ?")
+            params.append((end_date + timedelta(days=1)).isoformat())
+        return conditions, params
+
+    def get_turnovers_by_account(self,
+                                 start_date: Optional[date] = None,
+                                 end_date: Optional[date] = None) -> Dict[int, Dict[FinancialTransactionType, Decimal]]:
+        """
+        جمع مبالغ هر حساب به تفکیک نوع تراکنش در بازه تاریخ، با یک کوئری GROUP BY (بدون بارگذاری تراکنش‌ها).
+        خروجی: {account_id: {FinancialTransactionType: مجموع مبلغ}}
+        """
+        conditions, params = self._day_range_conditions(start_date, end_date)
+        # بدون INDEXED BY، planner برای بازه تاریخ idx_ft_date را انتخاب می‌کند و برای GROUP BY یک temp B-tree
+        # می‌سازد؛ اسکن covering روی idx_ft_turnover برای هر بازه‌ای زمان ثابت و کمتری دارد.
+        query = (f"SELECT account_id, transaction_type, SUM(amount) FROM {self._table_name} "
+                 f"INDEXED BY idx_ft_turnover")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY account_id, transaction_type"
+
+        turnovers: Dict[int, Dict[FinancialTransactionType, Decimal]] = {}
+        for account_id, transaction_type, total in self.db_manager.fetch_all(query, tuple(params)):
+            turnovers.setdefault(account_id, {})[FinancialTransactionType(transaction_type)] = money_from_db(total)
+        return turnovers
+
+    def get_turnovers_by_period(self,
+                                period_starts: List[date],
+                                end_date: date,
+                                account_types: Optional[List[AccountType]] = None
+                                ) -> Dict[int, Dict[int, Dict[FinancialTransactionType, Decimal]]]:
+        """
+        گردش هر حساب به تفکیک دوره و نوع تراکنش با یک اسکن GROUP BY. دوره i از period_starts[i] تا روز قبل از
+        period_starts[i + 1] (و آخرین دوره تا پایان end_date) است؛ period_starts باید صعودی باشد.
+        با account_types فقط حساب‌های آن انواع خوانده می‌شوند (جستجو روی account_id در idx_ft_turnover).
+        خروجی: {اندیس دوره: {account_id: {FinancialTransactionType: مجموع مبلغ}}}
+        """
+        conditions, params = self._day_range_conditions(period_starts[0], end_date)
+        if account_types:
+            conditions.insert(0, f"account_id IN (SELECT id FROM accounts WHERE type IN ({', '.join('?' for _ in account_types)}))")
+            params[0:0] = [account_type.value for account_type in account_types]
+        # اندیس دوره هر تراکنش با یک CASE روی مرزهای دوره‌ها در همان اسکن محاسبه می‌شود
+        period_case = "0"
+        if len(period_starts) > 1:
+            period_case = ("CASE " + " ".join(f"WHEN transaction_date < ? THEN {index}" for index in range(len(period_starts) - 1))
+                           + f" ELSE {len(period_starts) - 1} END")
+        case_params = [period_start.isoformat() for period_start in period_starts[1:]]
+        query = (f"SELECT {period_case} AS period_index, account_id, transaction_type, SUM(amount) "
+                 f"FROM {self._table_name} INDEXED BY idx_ft_turnover WHERE {' AND '.join(conditions)} "
+                 f"GROUP BY account_id, transaction_type, period_index")
+
+        turnovers: Dict[int, Dict[int, Dict[FinancialTransactionType, Decimal]]] = {}
+        for period_index, account_id, transaction_type, total in self.db_manager.fetch_all(query, tuple(case_params + params)):
+            turnovers.setdefault(period_index, {}).setdefault(account_id, {})[FinancialTransactionType(transaction_type)] = money_from_db(total)
+        return turnovers
+
+    # --- دفتر کل یک حساب ---
+    def iter_ledger_batches(self,
+                            account_id: int,
+                            start_date: Optional[date],
+                            end_date: Optional[date],
+                            after_key: Optional[KeysetKey] = None,
+                            limit: Optional[int] = None,
+                            batch_size: int = DB_FETCH_BATCH_SIZE) -> Iterator[List[Any]]:
+        """
+        ردیف‌های دفتر یک حساب به ترتیب (transaction_date, id) با ستون running_effect:
+        جمع تجمعی اثر تراکنش‌ها از اولین ردیف همین نتیجه (SUM() OVER)، به صورت دسته‌ای (fetchmany).
+        amount و running_effect خام (عدد صحیح واحد خرد) هستند؛ با money_from_db تبدیل شوند.
+        با after_key فقط ردیف‌های بعد از آن کلید (صفحه بعد) خوانده می‌شوند؛ جستجو روی idx_ft_account_date است.
+        """
+        # کلید صفحه قبل از start_date جلوتر است؛ مرز پایین بازه index را همان تاریخ کلید قرار می‌دهیم
+        conditions, params = self._day_range_conditions(start_date if after_key is None else None, end_date)
+        conditions.insert(0, "account_id = ?")
+        params.insert(0, account_id)
+        if after_key is not None:
+            conditions.append("transaction_date >= ?")
+            conditions.append("(transaction_date, id) > (?, ?)")
+            params.extend((after_key[0], after_key[0], after_key[1]))
+        query = (f"SELECT id, transaction_date, transaction_type, amount, description, reference_id, reference_type, "
+                 f"SUM({FT_BALANCE_EFFECT_SQL}) OVER (ORDER BY transaction_date, id ROWS UNBOUNDED PRECEDING) AS running_effect "
+                 f"FROM {self._table_name} WHERE {' AND '.join(conditions)} ORDER BY transaction_date, id")
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        return self.db_manager.fetch_batches(query, tuple(params), batch_size=batch_size)
+
+    # --- دفتر روزنامه ---
+    def iter_journal_batches(self,
+                             start_date: Optional[date],
+                             end_date: Optional[date],
+                             after_key: Optional[KeysetKey] = None,
+                             limit: Optional[int] = None,
+                             batch_size: int = DB_FETCH_BATCH_SIZE) -> Iterator[List[Any]]:
+        """
+        ردیف‌های دفتر روزنامه (همه حساب‌ها) به ترتیب (transaction_date, id) همراه با نام و نوع حساب
+        (JOIN با accounts)، به صورت دسته‌ای. مرتب‌سازی از idx_ft_date خوانده می‌شود (بدون sort جداگانه).
+        """
+        conditions, params = self._day_range_conditions(start_date if after_key is None else None, end_date)
+        if after_key is not None:
+            conditions.append("transaction_date >= ?")
+            conditions.append("(transaction_date, ft.id) > (?, ?)")
+            params.extend((after_key[0], after_key[0], after_key[1]))
+        query = (f"SELECT ft.id, ft.transaction_date, ft.transaction_type, ft.amount, ft.description, "
+                 f"ft.reference_id, ft.reference_type, ft.account_id, a.name AS account_name, a.type AS account_type "
+                 f"FROM {self._table_name} ft JOIN accounts a ON a.id = ft.account_id")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY transaction_date, ft.id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        return self.db_manager.fetch_batches(query, tuple(params), batch_size=batch_size)
+
+    # --- بارگذاری ستونی (موتور گزارش columnar_engine) ---
+    def iter_column_batches(self,
+                            end_date: Optional[date] = None,
+                            with_details: bool = False,
+                            batch_size: int = DB_FETCH_BATCH_SIZE) -> Iterator[List[Any]]:
+        """
+        همه تراکنش‌ها تا پایان end_date برای ساخت آرایه‌های ستونی، به ترتیب id
+        (مرتب‌سازی پایدار بر اساس transaction_date در خود آرایه‌ها انجام می‌شود).
+        ستون‌های متنی (description, reference_id, reference_type) فقط با with_details خوانده می‌شوند.
+        """
+        conditions, params = self._day_range_conditions(None, end_date)
+        detail_columns = ", description, reference_id, reference_type" if with_details else ""
+        # تقریباً کل جدول خوانده می‌شود؛ اسکن ترتیبی جدول (ترتیب rowid، بدون sort) از پیمایش idx_ft_date
+        # (یک جستجوی جدول به ازای هر ردیف) یا ORDER BY transaction_date در SQLite بسیار سریع‌تر است.
+        query = (f"SELECT id, account_id, transaction_date, transaction_type, amount{detail_columns} "
+                 f"FROM {self._table_name} NOT INDEXED")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id"
+        return self.db_manager.fetch_batches(query, tuple(params), batch_size=batch_size)
+
+    # --- مانده‌های روزانه (account_balance_snapshots) ---
+    def apply_balance_snapshot_delta(self, account_id: int, snapshot_date: date, delta: Decimal) -> None:
+        """
+        اثر یک تراکنش را به snapshot روز آن و مانده پایان همه روزهای بعدی همان حساب اضافه می‌کند.
+        باید در همان تراکنش دیتابیسی که ردیف financial_transactions را درج/حذف می‌کند صدا زده شود.
+        """
+        self.apply_balance_snapshot_deltas(snapshot_date, {account_id: delta})
+
+    def apply_balance_snapshot_deltas(self, snapshot_date: date, deltas: Dict[int, Decimal]) -> None:
+        """
+        نسخه چند حسابی apply_balance_snapshot_delta برای یک روز ({account_id: delta})؛
+        هر دو دستور برای همه حساب‌ها با executemany اجرا می‌شوند.
+        """
+        if not deltas:
+            return
+        day = snapshot_date.isoformat()
+        with self.db_manager.transaction() as conn:
+            # اگر برای این روز snapshot نداریم، با مانده پایان آخرین روز قبلی ساخته می‌شود
+            conn.executemany(
+                "INSERT OR IGNORE INTO account_balance_snapshots (account_id, snapshot_date, net_change, closing_balance) "
+                "VALUES (?, ?, 0, COALESCE((SELECT closing_balance FROM account_balance_snapshots "
+                "WHERE account_id = ? AND snapshot_date < ? ORDER BY snapshot_date DESC LIMIT 1), 0))",
+                [(account_id, day, account_id, day) for account_id in deltas])
+            conn.executemany(
+                "UPDATE account_balance_snapshots SET closing_balance = closing_balance + ?, "
+                "net_change = net_change + CASE WHEN snapshot_date = ? THEN ? ELSE 0 END "
+                "WHERE account_id = ? AND snapshot_date >= ?",
+                [(minor_delta, day, minor_delta, account_id, day)
+                 for account_id, minor_delta in ((account_id, money_to_db(delta)) for account_id, delta in deltas.items())])
+
+    def get_snapshot_balance_as_of(self, account_id: int, as_of_date: date) -> Decimal:
+        """مانده حساب در پایان as_of_date (جمع اثر تمام تراکنش‌ها تا آن روز) با یک جستجوی index."""
+        row = self.db_manager.fetch_one(
+            "SELECT closing_balance FROM account_balance_snapshots "
+            "WHERE account_id = ? AND snapshot_date <= ? ORDER BY snapshot_date DESC LIMIT 1",
+            (account_id, as_of_date.isoformat()))
+        return money_from_db(row[0]) if row else Decimal("0.0")
+
+    def get_subtree_snapshot_balance_as_of(self, account_id: int, as_of_date: date) -> Decimal:
+        """جمع مانده پایان as_of_date حساب و تمام نوادگانش (از طریق account_closure) در یک کوئری."""
+        row = self.db_manager.fetch_one(
+            "SELECT SUM((SELECT s.closing_balance FROM account_balance_snapshots s "
+            "WHERE s.account_id = c.descendant_id AND s.snapshot_date <= ? ORDER BY s.snapshot_date DESC LIMIT 1)) "
+            "FROM account_closure c WHERE c.ancestor_id = ?",
+            (as_of_date.isoformat(), account_id))
+        return money_from_db(row[0]) if row and row[0] is not None else Decimal("0.0")
+
+    def get_snapshot_balances_as_of(self, as_of_date: date) -> Dict[int, Decimal]:
+        """مانده پایان as_of_date برای همه حساب‌هایی که تا آن روز تراکنش داشته‌اند، در یک کوئری."""
+        # برای هر حساب فقط یک جستجوی index روی (account_id, snapshot_date)
+        rows = self.db_manager.fetch_all(
+            "SELECT a.id, (SELECT s.closing_balance FROM account_balance_snapshots s "
+            "WHERE s.account_id = a.id AND s.snapshot_date <= ? ORDER BY s.snapshot_date DESC LIMIT 1) "
+            "FROM accounts a",
+            (as_of_date.isoformat(),))
+        return {row[0]: money_from_db(row[1]) for row in rows if row[1] is not None}
\ No newline at end of file
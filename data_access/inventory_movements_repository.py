@@ -1,37 +1,41 @@
 # src/data_access/inventory_movements_repository.py
 
-from typing import Dict, Any, List
-from datetime import datetime
+from typing import Dict, Any, List, Callable, Optional, Iterator
+from datetime import datetime, date, timedelta
+from decimal import Decimal
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.config import DB_FETCH_BATCH_SIZE
 from src.business_logic.entities.inventory_movement_entity import InventoryMovementEntity
 from src.constants import InventoryMovementType, ReferenceType, DATETIME_FORMAT
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def _parse_movement_date(value: Any) -> datetime:
+    if not isinstance(value, str):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError as e_iso:
+        raise ValueError(f"فرمت تاریخ حرکت انبار نامعتبر است: {value}") from e_iso
+
+
+def _quantity_from_db(value: Any) -> Decimal:
+    # جمع‌های REAL خطای گرد کردن float دارند
+    return Decimal(str(round(value, 6))) if value is not None else Decimal("0.0")
+
+
 class InventoryMovementsRepository(BaseRepository[InventoryMovementEntity]):
     def __init__(self, db_manager: DatabaseManager):
         super().__init__(db_manager=db_manager, 
                          model_type=InventoryMovementEntity,  # <<< Pass the CLASS AccountEntity
                          table_name="inventory_movements") 
-    def _entity_from_row(self, row: Dict[str, Any]) -> 'InventoryMovementEntity':
-        # ...
-        movement_date_str = row.get('movement_date')
-        parsed_movement_date = None
-        if movement_date_str:
-            try:
-                parsed_movement_date = datetime.fromisoformat(movement_date_str)
-            except ValueError as e_iso:
-                logger.error(f"Failed to parse movement_date '{movement_date_str}' with fromisoformat for IM ID {row.get('id')}: {e_iso}")
-                raise ValueError(f"فرمت تاریخ حرکت انبار نامعتبر است: {movement_date_str}") from e_iso
-        # ...
-        return InventoryMovementEntity(
-            # ...
-            movement_date=parsed_movement_date, # type: ignore # Pylance might not know parsed_movement_date is datetime here
-            # ...
-        )
+    def _field_converters(self) -> Dict[str, Callable[[Any], Any]]:
+        # بقیه فیلدها (Decimal و Enum ها) را نگاشت پیش‌فرض BaseRepository تبدیل می‌کند
+        return {"movement_date": _parse_movement_date}
     
     # ... (other methods remain the same) ...
     def get_by_product_id(self, product_id: int) -> List[InventoryMovementEntity]:
@@ -48,4 +52,56 @@ class InventoryMovementsRepository(BaseRepository[InventoryMovementEntity]):
         """
         تمام حرکات انبار مربوط به یک کالای خاص را برمی‌گرداند.
         """
-        return self.find_by_criteria({"product_id": product_id}, order_by="movement_date ASC, id ASC")
\ No newline at end of file
+        return self.find_by_criteria({"product_id": product_id}, order_by="movement_date ASC, id ASC")
+
+    # --- کاردکس کالا ---
+    def iter_stock_ledger_batches(self,
+                                  product_id: int,
+                                  start_date: date,
+                                  end_date: date,
+                                  batch_size: int = DB_FETCH_BATCH_SIZE) -> Iterator[List[Any]]:
+        """
+        حرکات یک کالا در بازه [start_date, end_date] به ترتیب (movement_date, id) با ستون running_quantity
+        (جمع تجمعی تغییرات از ابتدای بازه با SUM() OVER)، با جستجوی idx_inv_mov_product_date و به صورت دسته‌ای.
+        """
+        query = (f"SELECT id, movement_date, quantity_change, movement_type, description, reference_id, reference_type, "
+                 f"SUM(quantity_change) OVER (ORDER BY movement_date, id ROWS UNBOUNDED PRECEDING) AS running_quantity "
+                 f"FROM {self._table_name} WHERE product_id = ? AND movement_date >= ? AND movement_date < ? "
+                 f"ORDER BY movement_date, id")
+        params = (product_id, start_date.isoformat(), (end_date + timedelta(days=1)).isoformat())
+        return self.db_manager.fetch_batches(query, params, batch_size=batch_size)
+
+    # --- موجودی روزانه (product_stock_snapshots) ---
+    def apply_stock_snapshot_delta(self, product_id: int, snapshot_date: date, delta: Decimal) -> None:
+        """
+        تغییر یک حرکت انبار را به snapshot روز آن و مقدار تجمعی همه روزهای بعدی همان کالا اضافه می‌کند.
+        باید در همان تراکنش دیتابیسی که ردیف inventory_movements را درج می‌کند صدا زده شود.
+        """
+        day = snapshot_date.isoformat()
+        delta_value = float(delta)
+        with self.db_manager.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO product_stock_snapshots (product_id, snapshot_date, net_change, closing_quantity) "
+                "VALUES (?, ?, 0, COALESCE((SELECT closing_quantity FROM product_stock_snapshots "
+                "WHERE product_id = ? AND snapshot_date < ? ORDER BY snapshot_date DESC LIMIT 1), 0))",
+                (product_id, day, product_id, day))
+            conn.execute(
+                "UPDATE product_stock_snapshots SET closing_quantity = closing_quantity + ?, "
+                "net_change = net_change + CASE WHEN snapshot_date = ? THEN ? ELSE 0 END "
+                "WHERE product_id = ? AND snapshot_date >= ?",
+                (delta_value, day, delta_value, product_id, day))
+
+    def get_snapshot_quantity_as_of(self, product_id: int, as_of_date: Optional[date] = None) -> Decimal:
+        """
+        جمع تغییرات همه حرکات کالا تا پایان as_of_date (None: تا آخرین حرکت) با یک جستجوی index.
+        """
+        if as_of_date is None:
+            row = self.db_manager.fetch_one(
+                "SELECT closing_quantity FROM product_stock_snapshots "
+                "WHERE product_id = ? ORDER BY snapshot_date DESC LIMIT 1", (product_id,))
+        else:
+            row = self.db_manager.fetch_one(
+                "SELECT closing_quantity FROM product_stock_snapshots "
+                "WHERE product_id = ? AND snapshot_date <= ? ORDER BY snapshot_date DESC LIMIT 1",
+                (product_id, as_of_date.isoformat()))
+        return _quantity_from_db(row[0]) if row else Decimal("0.0")
\ No newline at end of file
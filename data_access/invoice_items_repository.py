@@ -4,6 +4,7 @@ from typing import Dict, Any, List
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_from_db
 from src.business_logic.entities.invoice_item_entity import InvoiceItemEntity
 import logging
 from decimal import Decimal
@@ -33,7 +34,7 @@ class InvoiceItemsRepository(BaseRepository[InvoiceItemEntity]):
             invoice_id=row.get('invoice_id'),
             product_id=row.get('product_id'),
             quantity=Decimal(str(row.get('quantity', '0.0'))),
-            unit_price=Decimal(str(row.get('unit_price', '0.0'))),
+            unit_price=money_from_db(row.get('unit_price')),
             description=row.get('description')
         )
         except KeyError as e:
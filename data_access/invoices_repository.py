@@ -5,6 +5,7 @@ from datetime import datetime
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
 from src.business_logic.entities.invoice_entity import InvoiceEntity
 from src.constants import InvoiceType, DATE_FORMAT,InvoiceStatus
 import logging
@@ -33,8 +34,8 @@ class InvoicesRepository(BaseRepository[InvoiceEntity]):
                 invoice_date=invoice_date_obj, # Directly assign non-optional
                 due_date=due_date_obj,         # Assign optional
                 person_id=row['person_id'],
-                total_amount=float(row['total_amount']),
-                paid_amount=float(row['paid_amount']),
+                total_amount=money_float_from_db(row['total_amount']),
+                paid_amount=money_float_from_db(row['paid_amount']),
                 description=row.get('description'),
                 is_paid=bool(row['is_paid']), # Now a direct field
                 invoice_type=InvoiceType(row['invoice_type']),
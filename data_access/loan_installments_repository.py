@@ -5,6 +5,7 @@ from datetime import datetime
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
 from src.business_logic.entities.loan_installment_entity import LoanInstallmentEntity
 from src.constants import PaymentMethod, DATE_FORMAT
 import logging
@@ -34,9 +35,9 @@ class LoanInstallmentsRepository(BaseRepository[LoanInstallmentEntity]):
                 id=row['id'],
                 loan_id=row['loan_id'],
                 due_date=due_date_obj,
-                installment_amount=float(row['installment_amount']),
-                principal_amount=float(row.get('principal_amount', 0.0)), # Default if NULL
-                interest_amount=float(row.get('interest_amount', 0.0)),   # Default if NULL
+                installment_amount=money_float_from_db(row['installment_amount']),
+                principal_amount=money_float_from_db(row.get('principal_amount')), # Default if NULL
+                interest_amount=money_float_from_db(row.get('interest_amount')),   # Default if NULL
                 paid_date=paid_date_obj,
                 payment_method=payment_method_obj,
                 description=row.get('description'),
@@ -5,6 +5,7 @@ from datetime import datetime
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
 from src.business_logic.entities.loan_entity import LoanEntity
 from src.constants import LoanStatus, DATE_FORMAT
 import logging
@@ -29,11 +30,11 @@ class LoansRepository(BaseRepository[LoanEntity]):
             return LoanEntity(
                 id=row['id'],
                 person_id=row['person_id'],
-                loan_amount=float(row['loan_amount']),
+                loan_amount=money_float_from_db(row['loan_amount']),
                 interest_rate=float(row['interest_rate']),
                 start_date=start_date_obj,
                 end_date=end_date_obj,
-                installment_amount=float(row['installment_amount']),
+                installment_amount=money_float_from_db(row['installment_amount']),
                 status=LoanStatus(row['status']),
                 description=row.get('description'),
                 fiscal_year_id=row.get('fiscal_year_id')
@@ -5,6 +5,7 @@ from datetime import date, datetime # Ensure date is imported
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
 from src.business_logic.entities.material_receipt_entity import MaterialReceiptEntity
 from src.constants import DATE_FORMAT
 import logging
@@ -32,7 +33,7 @@ class MaterialReceiptsRepository(BaseRepository[MaterialReceiptEntity]):
                 person_id=row['person_id'], # Supplier ID
                 product_id=row['product_id'],
                 quantity_received=float(row['quantity_received']),
-                unit_price=float(unit_price_val) if unit_price_val is not None else None,
+                unit_price=money_float_from_db(unit_price_val) if unit_price_val is not None else None,
                 purchase_order_id=row.get('purchase_order_id'),
                 purchase_order_item_id=row.get('purchase_order_item_id'),
                 description=row.get('description'),
@@ -5,10 +5,10 @@ from datetime import date, datetime
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_from_db
 from src.constants import DATE_FORMAT,PaymentType # برای تبدیل تاریخ
 import logging
 from src.business_logic.entities.payment_header_entity import PaymentHeaderEntity
-from decimal import Decimal # برای مبلغ
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +39,7 @@ class PaymentHeaderRepository(BaseRepository['PaymentHeaderEntity']):
             id=row.get('id'),
             payment_date=date.fromisoformat(row['payment_date']) if row.get('payment_date') else date.today(),
             person_id=row.get('person_id'),
-            total_amount=Decimal(str(row.get('total_amount', '0.0'))),
+            total_amount=money_from_db(row.get('total_amount')),
             description=row.get('description'),
             invoice_id=row.get('invoice_id'),
             purchase_order_id=row.get('purchase_order_id'),
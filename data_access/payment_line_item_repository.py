@@ -4,6 +4,7 @@ from typing import Dict, Any, Optional, List, TYPE_CHECKING
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
 from src.constants import PaymentMethod # برای تبدیل نوع از رشته به Enum
 import logging
 from src.business_logic.entities.payment_line_item_entity import PaymentLineItemEntity
@@ -41,7 +42,7 @@ class PaymentLineItemRepository(BaseRepository['PaymentLineItemEntity']):
                 id=row['id'],
                 payment_header_id=row['payment_header_id'],
                 payment_method=pm_enum, # type: ignore # اطمینان از اینکه pm_enum مقداردهی شده
-                amount=float(row['amount']),
+                amount=money_float_from_db(row['amount']),
                 account_id=row.get('account_id'), # می‌تواند None باشد
                 check_id=row.get('check_id'),     # می‌تواند None باشد
                 description=row.get('description'),
@@ -4,6 +4,7 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime,date
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
 from src.business_logic.entities.payroll_entity import PayrollEntity
 from src.constants import DATE_FORMAT
 import logging
@@ -32,8 +33,8 @@ class PayrollsRepository(BaseRepository[PayrollEntity]):
                 employee_id=row['employee_id'],
                 pay_period_start=pay_period_start_obj,
                 pay_period_end=pay_period_end_obj,
-                gross_salary=float(row['gross_salary']),
-                deductions=float(row['deductions']),
+                gross_salary=money_float_from_db(row['gross_salary']),
+                deductions=money_float_from_db(row['deductions']),
                 # net_salary is a @property in the entity
                 payment_date=payment_date_obj,
                 paid_by_account_id=row.get('paid_by_account_id'),
@@ -4,6 +4,7 @@ from typing import Dict, Any, Optional, List
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.config import ENTITY_CACHE_SIZE
 from src.business_logic.entities.person_entity import PersonEntity
 from src.constants import PersonType
 import logging
@@ -14,7 +15,8 @@ class PersonsRepository(BaseRepository[PersonEntity]):
     def __init__(self, db_manager: DatabaseManager):
         super().__init__(db_manager=db_manager, 
                          model_type=PersonEntity,  # <<< Pass the CLASS AccountEntity
-                         table_name="persons") 
+                         table_name="persons",
+                         cache_size=ENTITY_CACHE_SIZE)
 
     def _entity_from_row(self, row: Dict[str, Any]) -> PersonEntity:
         if row is None:
@@ -4,6 +4,8 @@ from typing import Dict, Any, Optional, List
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
+from src.config import ENTITY_CACHE_SIZE
 from src.business_logic.entities.product_entity import ProductEntity
 from src.constants import ProductType
 import logging
@@ -14,7 +16,8 @@ class ProductsRepository(BaseRepository[ProductEntity]):
     def __init__(self, db_manager: DatabaseManager):
         super().__init__(db_manager=db_manager, 
                          model_type=ProductEntity,  # <<< Pass the CLASS AccountEntity
-                         table_name="products") 
+                         table_name="products",
+                         cache_size=ENTITY_CACHE_SIZE)
 
     def _entity_from_row(self, row: Dict[str, Any]) -> ProductEntity:
         from src.business_logic.entities.product_entity import ProductEntity # باید ProductEntity باشد
@@ -27,7 +30,7 @@ class ProductsRepository(BaseRepository[ProductEntity]):
             name=row['name'],
             product_type=ProductType(row['product_type']), # <<< این خط را به بعد از name منتقل کردم تا با ترتیب جدید Entity سازگار باشد
             sku=row.get('sku'),
-            unit_price=float(row['unit_price']),
+            unit_price=money_float_from_db(row['unit_price']),
             stock_quantity=Decimal(str(row.get('stock_quantity', '0.0'))),
             unit_of_measure=row.get('unit_of_measure'), # <<< خواندن فیلد جدید
             description=row.get('description'),
@@ -40,6 +43,16 @@ class ProductsRepository(BaseRepository[ProductEntity]):
             logger.error(f"ValueError when creating ProductEntity: {e}. Row: {row}")
             raise
 
+    def apply_stock_delta(self, product_id: int, delta: Decimal) -> bool:
+        """
+        delta را با یک دستور اتمیک به موجودی کالا اضافه می‌کند (False اگر کالا وجود ندارد).
+        داخل تراکنش ثبت حرکت انبار صدا زده می‌شود؛ cache کالا بعد از پایان آن تراکنش باطل می‌شود.
+        """
+        cursor = self.db_manager.execute_query(f"UPDATE {self._table_name} SET stock_quantity = stock_quantity + ? WHERE id = ?",
+                                               (float(delta), product_id))
+        self.invalidate_cache((product_id,))
+        return cursor.rowcount > 0
+
     def get_by_sku(self, sku: str) -> Optional[ProductEntity]:
         query = f"SELECT * FROM {self._table_name} WHERE sku = ?"
         row = self.db_manager.fetch_one(query, (sku,))
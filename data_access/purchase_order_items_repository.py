@@ -4,6 +4,7 @@ from typing import Dict, Any, List
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
 from src.business_logic.entities.purchase_order_item_entity import PurchaseOrderItemEntity
 import logging
 
@@ -26,8 +27,8 @@ class PurchaseOrderItemsRepository(BaseRepository[PurchaseOrderItemEntity]):
                 purchase_order_id=row['purchase_order_id'],
                 product_id=row['product_id'],
                 ordered_quantity=float(row['ordered_quantity']),
-                unit_price=float(row['unit_price']),
-                total_item_amount=float(row['total_item_amount']) # <<< این خط اضافه/اصلاح شد
+                unit_price=money_float_from_db(row['unit_price']),
+                total_item_amount=money_float_from_db(row['total_item_amount']) # <<< این خط اضافه/اصلاح شد
             )
         except KeyError as e:
             logger.error(f"KeyError when creating PurchaseOrderItemEntity from row: {e}. Row: {row}")
@@ -5,6 +5,7 @@ from datetime import date, datetime # Ensure date is imported
 
 from src.data_access.base_repository import BaseRepository
 from src.data_access.database_manager import DatabaseManager
+from src.utils.money import money_float_from_db
 from src.business_logic.entities.purchase_order_entity import PurchaseOrderEntity
 from src.constants import PurchaseOrderStatus, DATE_FORMAT
 import logging
@@ -31,9 +32,9 @@ class PurchaseOrdersRepository(BaseRepository[PurchaseOrderEntity]):
                 order_number=row['order_number'],
                 person_id=row['person_id'], # Supplier ID
                 order_date=order_date_obj,
-                total_amount_expected=float(row['total_amount_expected']),
-                paid_amount=float(row['paid_amount']),
-                received_amount=float(row.get('received_amount', 0.0)),
+                total_amount_expected=money_float_from_db(row['total_amount_expected']),
+                paid_amount=money_float_from_db(row['paid_amount']),
+                received_amount=money_float_from_db(row.get('received_amount')),
                 status=PurchaseOrderStatus(row['status']),
                 description=row.get('description'),
                 fiscal_year_id=row.get('fiscal_year_id')
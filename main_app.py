@@ -121,6 +121,8 @@ class MainWindow(QMainWindow):
            financial_transactions_repository=self.financial_transactions_repository,
             person_manager=self.person_manager
         )
+        # حساب‌های نقش‌های ثبت اسناد یک بار در شروع برنامه resolve می‌شوند
+        self.account_manager.posting_rules.load()
         self.product_manager = ProductManager(self.products_repo, self.inventory_movements_repo)
         self.ft_manager = FinancialTransactionManager(self.financial_transactions_repository, self.account_manager)
         
@@ -294,7 +296,9 @@ def main():
     main_window = MainWindow()
     main_window.show()
     logger.info("Application started successfully. Main window shown.")
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    main_window.db_manager.close() # بستن اتصال‌های pool پیش از خروج
+    sys.exit(exit_code)
 
 if __name__ == '__main__':
     main()
@@ -11,6 +11,7 @@ from typing import List, Optional, Any, Dict
 from datetime import date
 from src.utils import date_converter
 from .custom_widgets import ShamsiDateEdit # <<< ویجت جدید تاریخ شمسی
+from .paged_models import KeysetPagingMixin
 # Import entities, enums, and managers
 from src.business_logic.entities.check_entity import CheckEntity
 from src.constants import CheckType, CheckStatus, DATE_FORMAT, PersonType, AccountType
@@ -24,7 +25,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 # --- Table Model for Checks ---
-class CheckTableModel(QAbstractTableModel):
+class CheckTableModel(KeysetPagingMixin, QAbstractTableModel):
     def __init__(self, 
                  data: Optional[List[CheckEntity]] = None, 
                  person_manager: Optional[PersonManager] = None,
@@ -59,11 +60,13 @@ class CheckTableModel(QAbstractTableModel):
             elif col == 4: return date_converter.to_shamsi_str(check.due_date)
 
             elif col == 5: # Person Name
+                if check.person_name: return check.person_name
                 if self._person_manager and check.person_id:
                     person = self._person_manager.get_person_by_id(check.person_id)
                     return person.name if person else f"ID: {check.person_id}"
                 return str(check.person_id)
             elif col == 6: # Bank Account Name
+                if check.bank_account_name: return check.bank_account_name
                 if self._account_manager and check.account_id:
                     acc = self._account_manager.get_account_by_id(check.account_id)
                     return acc.name if acc else f"ID: {check.account_id}"
@@ -94,6 +97,7 @@ class CheckTableModel(QAbstractTableModel):
 
     def update_data(self, new_data: List[CheckEntity]):
         self.beginResetModel()
+        self.clear_page_loader()
         self._data = new_data
         self.endResetModel()
 
@@ -437,7 +441,7 @@ class ChecksUI(QWidget):
         search_layout.addWidget(QLabel("جستجو:"))
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("جستجو در شماره چک، مبلغ، نام شخص و ...")
-        self.search_input.textChanged.connect(self.proxy_model.setFilterRegExp)
+        self.search_input.textChanged.connect(self._on_search_text_changed)
         search_layout.addWidget(self.search_input)
         main_layout.addLayout(search_layout)
         
@@ -491,13 +495,22 @@ class ChecksUI(QWidget):
     def load_checks_data(self):
         logger.debug("Loading checks data...")
         try:
-            checks = self.check_manager.get_all_checks()
-            self.table_model.update_data(checks)
-            logger.info(f"{len(checks)} checks loaded.")
+            total = self.check_manager.count_checks()
+            self.table_model.set_page_loader(
+                lambda after_key: self.check_manager.get_checks_page(after_key), total)
+            if self.search_input.text():
+                self.table_model.fetch_all_remaining()
+            logger.info(f"{self.table_model.rowCount()} of {total} checks loaded.")
         except Exception as e:
             logger.error(f"Error loading checks: {e}", exc_info=True)
             QMessageBox.critical(self, "خطا", f"خطا در بارگذاری لیست چک‌ها: {e}")
 
+    def _on_search_text_changed(self, text: str):
+        # فیلتر پروکسی فقط روی ردیف‌های بارگذاری‌شده کار می‌کند؛ برای جستجو همه صفحات خوانده می‌شوند
+        if text:
+            self.table_model.fetch_all_remaining()
+        self.proxy_model.setFilterRegExp(text)
+
     def _get_selected_check(self) -> Optional[CheckEntity]:
         selection_model = self.checks_table_view.selectionModel()
         if not selection_model or not selection_model.hasSelection():
@@ -33,6 +33,7 @@ import os
 from src.constants import InvoiceStatus,PaymentMethod, PersonType, ProductType, DATE_FORMAT
 from src.utils import date_converter
 from .custom_widgets import ShamsiDateEdit # <<< ویجت جدید اضافه شد
+from .paged_models import KeysetPagingMixin
 
 import logging
 logger = logging.getLogger(__name__)
@@ -69,7 +70,9 @@ class JalaliDateEdit(QDateEdit):
         return self.date().toPyDate()
 
 # --- Table Model for the main list of Invoices ---
-class InvoiceTableModel(QAbstractTableModel):
+class InvoiceTableModel(KeysetPagingMixin, QAbstractTableModel):
+    _paged_rows_attr = "_invoices"
+
     def __init__(self, 
                  person_manager: Optional[PersonManager] = None, 
                  data: Optional[List[InvoiceEntity]] = None,
@@ -102,6 +105,7 @@ class InvoiceTableModel(QAbstractTableModel):
                 return date_converter.to_shamsi_str(invoice.invoice_date)
             
             elif col == 3: 
+                if getattr(invoice, 'person_name', None): return invoice.person_name
                 if self._person_manager and invoice.person_id is not None:
                     try:
                         person = self._person_manager.get_person_by_id(int(invoice.person_id))
@@ -137,6 +141,7 @@ class InvoiceTableModel(QAbstractTableModel):
 
     def update_data(self, new_data: List[InvoiceEntity]):
         self.beginResetModel()
+        self.clear_page_loader()
         self._invoices = new_data if new_data is not None else []
         self.endResetModel()
         logger.debug(f"InvoiceTableModel updated with {len(self._invoices)} invoices.")
@@ -817,7 +822,7 @@ class InvoicesUI (QWidget):
         search_layout.addWidget(QLabel("جستجو:"))
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("جستجو در تمام ستون‌ها...")
-        self.search_input.textChanged.connect(self.proxy_model.setFilterRegExp)
+        self.search_input.textChanged.connect(self._on_search_text_changed)
         search_layout.addWidget(self.search_input)
         main_layout.addLayout(search_layout)
         # TODO: افزودن فیلترهای پیشرفته‌تر (تاریخ، نوع، شخص، وضعیت)
@@ -881,12 +886,22 @@ class InvoicesUI (QWidget):
     def load_invoices_data(self):
         logger.debug("Loading invoices data...")
         try:
-            invoices = self.invoice_manager.get_all_invoices_summary()
-            self.table_model.update_data(invoices)
-            logger.info(f"{len(invoices)} invoices loaded into table model.")
+            total = self.invoice_manager.count_invoices()
+            self.table_model.set_page_loader(
+                lambda after_key: self.invoice_manager.get_invoices_page(after_key), total)
+            if self.search_input.text():
+                self.table_model.fetch_all_remaining()
+            logger.info(f"{self.table_model.rowCount()} of {total} invoices loaded into table model.")
         except Exception as e:
             logger.error(f"Error loading invoices: {e}", exc_info=True)
             QMessageBox.critical(self, "خطا", f"خطا در بارگذاری لیست فاکتورها: {e}")
+
+    def _on_search_text_changed(self, text: str):
+        # فیلتر پروکسی فقط روی ردیف‌های بارگذاری‌شده کار می‌کند؛ برای جستجو همه صفحات خوانده می‌شوند
+        if text:
+            self.table_model.fetch_all_remaining()
+        self.proxy_model.setFilterRegExp(text)
+
     def _get_selected_invoice_header(self) -> Optional[InvoiceEntity]:
         selection_model = self.invoice_table_view.selectionModel()
         if not selection_model or not selection_model.hasSelection():
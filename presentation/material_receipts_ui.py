@@ -31,12 +31,13 @@ from src.business_logic.product_manager import ProductManager
 from src.business_logic.person_manager import PersonManager
 from src.utils import date_converter
 from .custom_widgets import ShamsiDateEdit # <<< ویجت جدید تاریخ شمسی
+from .paged_models import KeysetPagingMixin
 import logging
 logger = logging.getLogger(__name__)
 
 
 # --- Table Model for Material Receipts ---
-class MaterialReceiptTableModel(QAbstractTableModel):
+class MaterialReceiptTableModel(KeysetPagingMixin, QAbstractTableModel):
     def __init__(self, 
                  data: Optional[List[MaterialReceiptEntity]] = None, 
                  person_manager: Optional[PersonManager] = None,
@@ -99,6 +100,7 @@ class MaterialReceiptTableModel(QAbstractTableModel):
 
     def update_data(self, new_data: List[MaterialReceiptEntity]):
         self.beginResetModel()
+        self.clear_page_loader()
         self._data = new_data
         self.endResetModel()
 
@@ -585,9 +587,10 @@ class MaterialReceiptsUI(QWidget):
     def load_receipts_data(self):
         logger.debug("Loading material receipts data...")
         try:
-            receipts = self.receipt_manager.get_all_receipts()
-            self.table_model.update_data(receipts)
-            logger.info(f"{len(receipts)} material receipts loaded into table.")
+            total = self.receipt_manager.count_receipts()
+            self.table_model.set_page_loader(
+                lambda after_key: self.receipt_manager.get_receipts_page(after_key), total)
+            logger.info(f"{self.table_model.rowCount()} of {total} material receipts loaded into table.")
         except Exception as e:
             logger.error(f"Error loading material receipts: {e}", exc_info=True)
             QMessageBox.critical(self, "خطا در بارگذاری", f"خطا در بارگذاری لیست رسیدها: {e}")
@@ -0,0 +1,69 @@
+# src/presentation/paged_models.py
+
+from PyQt5.QtCore import QModelIndex
+from typing import Any, Callable, List, Optional
+from src.data_access.base_repository import KeysetPage, KeysetKey
+import logging
+
+logger = logging.getLogger(__name__)
+
+PageLoader = Callable[[Optional[KeysetKey]], KeysetPage]
+
+
+class KeysetPagingMixin:
+    """
+    صفحه‌بندی تدریجی (lazy) برای مدل‌های جدول.
+    مدل ابتدا فقط صفحه اول را بارگذاری می‌کند و با اسکرول کاربر، Qt از طریق
+    canFetchMore/fetchMore صفحه بعدی را با کلید keyset آخرین ردیف می‌خواند.
+    کلاس استفاده‌کننده باید نام لیست ردیف‌های خود را در _paged_rows_attr مشخص کند.
+    """
+    _paged_rows_attr: str = "_data"
+    _page_loader: Optional[PageLoader] = None
+    _next_key: Optional[KeysetKey] = None
+    _has_more: bool = False
+    _total_count: Optional[int] = None
+
+    def _paged_rows(self) -> List[Any]:
+        return getattr(self, self._paged_rows_attr)
+
+    def set_page_loader(self, loader: PageLoader, total_count: Optional[int] = None):
+        """داده‌های مدل را با صفحه اول loader جایگزین می‌کند."""
+        self.beginResetModel()
+        self._page_loader = loader
+        self._total_count = total_count
+        page = loader(None)
+        setattr(self, self._paged_rows_attr, list(page.items))
+        self._next_key, self._has_more = page.next_key, page.has_more
+        self.endResetModel()
+
+    def clear_page_loader(self):
+        """باید هنگام جایگزینی کامل داده‌ها (update_data) صدا زده شود."""
+        self._page_loader = None
+        self._next_key, self._has_more, self._total_count = None, False, None
+
+    @property
+    def total_count(self) -> Optional[int]:
+        return self._total_count
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.isValid():
+            return False
+        return self._page_loader is not None and self._has_more
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        page = self._page_loader(self._next_key)
+        self._next_key, self._has_more = page.next_key, page.has_more
+        if not page.items:
+            return
+        rows = self._paged_rows()
+        self.beginInsertRows(QModelIndex(), len(rows), len(rows) + len(page.items) - 1)
+        rows.extend(page.items)
+        self.endInsertRows()
+        logger.debug(f"{type(self).__name__}: fetched {len(page.items)} more rows ({len(rows)} loaded).")
+
+    def fetch_all_remaining(self):
+        """همه صفحات باقیمانده را می‌خواند (مثلاً قبل از جستجو در همه ردیف‌ها)."""
+        while self.canFetchMore():
+            self.fetchMore()
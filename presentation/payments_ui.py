@@ -17,6 +17,7 @@ from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
 from src.utils import date_converter
 from .custom_widgets import ShamsiDateEdit
+from .paged_models import KeysetPagingMixin
 # --- Entities, Enums, Managers ---
 from src.business_logic.entities.payment_header_entity import PaymentHeaderEntity
 from src.business_logic.entities.payment_line_item_entity import PaymentLineItemEntity
@@ -51,7 +52,9 @@ except ImportError:
 # ============================================================
 #  PaymentTableModel (برای جدول اصلی لیست پرداخت‌ها)
 # ============================================================
-class PaymentTableModel(QAbstractTableModel):
+class PaymentTableModel(KeysetPagingMixin, QAbstractTableModel):
+    _paged_rows_attr = "_payment_headers"
+
     def __init__(self, 
                  person_manager: Optional[PersonManager] = None,
                  parent=None):
@@ -101,6 +104,7 @@ class PaymentTableModel(QAbstractTableModel):
 
     def update_data(self, new_data: List[PaymentHeaderEntity]):
         self.beginResetModel()
+        self.clear_page_loader()
         self._payment_headers = new_data if new_data is not None else []
         self.endResetModel()
 
@@ -1115,7 +1119,7 @@ class PaymentsUI(QWidget):
         search_layout.addWidget(QLabel("جستجو:"))
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("جستجو در شماره، شخص، مبلغ و ...")
-        self.search_input.textChanged.connect(self.proxy_model.setFilterRegExp)
+        self.search_input.textChanged.connect(self._on_search_text_changed)
         search_layout.addWidget(self.search_input)
         main_layout.addLayout(search_layout)
         self.payment_table_view = QTableView(self)
@@ -1161,13 +1165,22 @@ class PaymentsUI(QWidget):
     def load_payments_data(self):
         logger.debug("PaymentsUI: Loading payment headers data...")
         try:
-            payment_headers = self.payment_manager.get_all_payments()
-            self.table_model.update_data(payment_headers)
-            logger.info(f"PaymentsUI: {len(payment_headers)} payment headers loaded.")
+            total = self.payment_manager.count_payments()
+            self.table_model.set_page_loader(
+                lambda after_key: self.payment_manager.get_payments_page(after_key), total)
+            if self.search_input.text():
+                self.table_model.fetch_all_remaining()
+            logger.info(f"PaymentsUI: {self.table_model.rowCount()} of {total} payment headers loaded.")
         except Exception as e:
             logger.error(f"Error loading payments: {e}", exc_info=True)
             QMessageBox.critical(self, "خطا", f"خطا در بارگذاری لیست پرداخت/دریافت‌ها: {e}")
 
+    def _on_search_text_changed(self, text: str):
+        # فیلتر پروکسی فقط روی ردیف‌های بارگذاری‌شده کار می‌کند؛ برای جستجو همه صفحات خوانده می‌شوند
+        if text:
+            self.table_model.fetch_all_remaining()
+        self.proxy_model.setFilterRegExp(text)
+
     def _get_selected_payment_header(self) -> Optional[PaymentHeaderEntity]:
         selection_model = self.payment_table_view.selectionModel()
         if not selection_model or not selection_model.hasSelection():
@@ -13,6 +13,7 @@ from src.business_logic.reports_manager import ReportsManager
 from src.business_logic.account_manager import AccountManager
 from src.business_logic.product_manager import ProductManager
 from .custom_widgets import ShamsiDateEdit
+from .paged_models import KeysetPagingMixin
 from src.utils import date_converter
 from src.constants import PersonType # <<< Import جدید
 
@@ -133,7 +134,9 @@ class TrialBalanceWidget(QWidget):
 # ============================================================
 #  کلاس جدید: GeneralJournalTableModel
 # ============================================================
-class GeneralJournalTableModel(QAbstractTableModel):
+class GeneralJournalTableModel(KeysetPagingMixin, QAbstractTableModel):
+    """ردیف‌های دفتر روزنامه صفحه به صفحه (با اسکرول) خوانده می‌شوند."""
+
     def __init__(self, data: Optional[List[Dict[str, Any]]] = None, parent=None):
         super().__init__(parent)
         self._data: List[Dict[str, Any]] = data if data is not None else []
@@ -181,6 +184,7 @@ class GeneralJournalTableModel(QAbstractTableModel):
 
     def update_data(self, new_data: List[Dict[str, Any]]):
         self.beginResetModel()
+        self.clear_page_loader()
         self._data = new_data
         self.endResetModel()
 class PersonsBalanceTableModel(QAbstractTableModel):
@@ -255,13 +259,15 @@ class GeneralJournalWidget(QWidget):
             return
             
         try:
-            report_data = self.reports_manager.get_general_journal(start_date=start_date, end_date=end_date)
-            self.journal_model.update_data(report_data)
+            self.journal_model.set_page_loader(
+                lambda after_key: self.reports_manager.get_general_journal_page(start_date, end_date, after_key))
             logger.info("General Journal report displayed successfully.")
         except Exception as e:
             logger.error(f"Error generating general journal report: {e}", exc_info=True)
             QMessageBox.critical(self, "خطا", f"خطا در تهیه دفتر روزنامه: {e}")
-class GeneralLedgerTableModel(QAbstractTableModel):
+class GeneralLedgerTableModel(KeysetPagingMixin, QAbstractTableModel):
+    """ردیف‌های دفتر کل صفحه به صفحه (با اسکرول) از loader دفتر کل خوانده می‌شوند."""
+
     def __init__(self, data: Optional[List[Dict[str, Any]]] = None, parent=None):
         super().__init__(parent)
         self._data: List[Dict[str, Any]] = data if data is not None else []
@@ -296,6 +302,7 @@ class GeneralLedgerTableModel(QAbstractTableModel):
 
     def update_data(self, new_data: List[Dict[str, Any]]):
         self.beginResetModel()
+        self.clear_page_loader()
         self._data = new_data
         self.endResetModel()
 
@@ -410,8 +417,8 @@ class GeneralLedgerWidget(QWidget):
             return
             
         try:
-            report_data = self.reports_manager.get_general_ledger(account_id, start_date, end_date)
-            self.ledger_model.update_data(report_data)
+            self.ledger_model.set_page_loader(
+                self.reports_manager.get_general_ledger_page_loader(account_id, start_date, end_date))
             logger.info("General Ledger report displayed successfully.")
         except Exception as e:
             logger.error(f"Error generating general ledger report: {e}", exc_info=True)
@@ -600,6 +607,115 @@ class IncomeStatementWidget(QWidget):
         """
         return html
 
+# ============================================================
+#  صورت سود و زیان مقایسه‌ای (ماهانه / فصلی)
+# ============================================================
+class ComparativeStatementTableModel(QAbstractTableModel):
+    """ماتریس حساب × دوره صورت سود و زیان مقایسه‌ای؛ ردیف‌های عنوان بخش، جمع و سود خالص پررنگ نمایش داده می‌شوند."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[Dict[str, Any]] = []
+        self._headers: List[str] = ["حساب", "جمع"]
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self._headers)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid(): return QVariant()
+        row = self._rows[index.row()]
+        col = index.column()
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0: return row["label"]
+            if row["amounts"] is None: return ""
+            if col == len(self._headers) - 1: return f"{row['total']:,.0f}"
+            return f"{row['amounts'][col - 1]:,.0f}"
+        if row["kind"] != "account":
+            if role == Qt.ItemDataRole.FontRole:
+                font = QFont(); font.setBold(True); return font
+            if role == Qt.ItemDataRole.BackgroundRole:
+                return QColor("#f0f0f0")
+        return QVariant()
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            if 0 <= section < len(self._headers): return self._headers[section]
+        return QVariant()
+
+    def update_data(self, report_data: Dict[str, Any]):
+        self.beginResetModel()
+        self._headers = (["حساب"]
+                         + [f"{date_converter.to_shamsi_str(period['start_date'])} تا {date_converter.to_shamsi_str(period['end_date'])}"
+                            for period in report_data["periods"]]
+                         + ["جمع"])
+        self._rows = []
+        for title, list_key, total_key, total_label in (("درآمدها", "revenues", "total_revenue", "جمع کل درآمدها"),
+                                                        ("هزینه‌ها", "expenses", "total_expense", "جمع کل هزینه‌ها")):
+            self._rows.append({"kind": "section", "label": title, "amounts": None})
+            for item in report_data[list_key]:
+                self._rows.append({"kind": "account", "label": item["name"], "amounts": item["amounts"], "total": item["total"]})
+            self._rows.append({"kind": "total", "label": total_label, "amounts": report_data[total_key],
+                               "total": sum(report_data[total_key], Decimal("0.0"))})
+        self._rows.append({"kind": "total", "label": "سود (زیان) خالص", "amounts": report_data["net_income"],
+                           "total": sum(report_data["net_income"], Decimal("0.0"))})
+        self.endResetModel()
+
+class ComparativeIncomeStatementWidget(QWidget):
+    def __init__(self, reports_manager: ReportsManager, parent=None):
+        super().__init__(parent)
+        self.reports_manager = reports_manager
+        self._init_ui()
+
+    def _init_ui(self):
+        layout = QVBoxLayout(self)
+
+        options_group = QGroupBox("فیلتر صورت سود و زیان مقایسه‌ای")
+        options_layout = QFormLayout(options_group)
+
+        self.start_date_edit = ShamsiDateEdit(self)
+        self.end_date_edit = ShamsiDateEdit(self)
+        self.period_combo = QComboBox(self)
+        self.period_combo.addItem("ماهانه", 1)
+        self.period_combo.addItem("فصلی", 3)
+        self.generate_button = QPushButton("تهیه گزارش")
+
+        options_layout.addRow("از تاریخ (شروع سال مالی):", self.start_date_edit)
+        options_layout.addRow("تا تاریخ:", self.end_date_edit)
+        options_layout.addRow("دوره:", self.period_combo)
+        options_layout.addRow(self.generate_button)
+        layout.addWidget(options_group)
+
+        self.table = QTableView(self)
+        self.model = ComparativeStatementTableModel()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        layout.addWidget(self.table)
+
+        self.generate_button.clicked.connect(self._generate_report)
+
+    def _generate_report(self):
+        start_date = self.start_date_edit.date()
+        end_date = self.end_date_edit.date()
+
+        if not all([start_date, end_date]):
+            QMessageBox.warning(self, "خطا", "لطفاً هر دو تاریخ شروع و پایان را انتخاب کنید.")
+            return
+        if start_date > end_date:
+            QMessageBox.warning(self, "خطا", "تاریخ شروع نمی‌تواند بعد از تاریخ پایان باشد.")
+            return
+
+        try:
+            # دوره‌ها بر اساس ماه‌های شمسی از تاریخ شروع تعیین می‌شوند
+            period_starts = date_converter.shamsi_period_starts(start_date, end_date, self.period_combo.currentData())
+            report_data = self.reports_manager.get_comparative_income_statement(period_starts, end_date)
+            self.model.update_data(report_data)
+        except Exception as e:
+            logger.error(f"Error generating comparative income statement: {e}", exc_info=True)
+            QMessageBox.critical(self, "خطا", f"خطا در تهیه صورت سود و زیان مقایسه‌ای: {e}")
+
 # ============================================================
 #  کلاس اصلی: ReportsUI
 # ============================================================
@@ -634,3 +750,6 @@ class ReportsUI(QWidget):
         self.report_tabs.addTab(self.persons_balance_widget, "مانده حساب اشخاص")
         self.income_statement_widget = IncomeStatementWidget(self.reports_manager)
         self.report_tabs.addTab(self.income_statement_widget, "صورت سود و زیان")
+
+        self.comparative_income_statement_widget = ComparativeIncomeStatementWidget(self.reports_manager)
+        self.report_tabs.addTab(self.comparative_income_statement_widget, "سود و زیان مقایسه‌ای")
@@ -0,0 +1,28 @@
+# src/tests/conftest.py
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+# کد برنامه با پیشوند src. import می‌شود؛ ریشه مخزن (که خودش پکیج src است) با همین نام ثبت می‌شود
+# تا تست‌ها مستقل از نام پوشه checkout اجرا شوند.
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if "src" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        "src", REPO_ROOT / "__init__.py", submodule_search_locations=[str(REPO_ROOT)])
+    _src = importlib.util.module_from_spec(_spec)
+    sys.modules["src"] = _src
+    _spec.loader.exec_module(_src)
+
+from src.data_access.database_manager import DatabaseManager
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """دیتابیس تازه روی فایل موقت با همه جداول و مهاجرت‌ها (در حالت pool، مثل برنامه)."""
+    manager = DatabaseManager(str(tmp_path / "test.db"))
+    manager.create_tables()
+    yield manager
+    manager.close()
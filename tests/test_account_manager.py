@@ -0,0 +1,41 @@
+# src/tests/test_account_manager.py
+
+import pytest
+
+from src.business_logic.account_manager import AccountManager
+from src.business_logic.person_manager import PersonManager
+from src.constants import AccountType, CheckStatus, CheckType, PersonType
+from src.data_access import AccountsRepository, FinancialTransactionsRepository, PersonsRepository
+
+
+@pytest.fixture
+def account_manager(db_manager):
+    return AccountManager(AccountsRepository(db_manager), FinancialTransactionsRepository(db_manager),
+                          PersonManager(PersonsRepository(db_manager)))
+
+
+def _closure_rows(db_manager):
+    return db_manager.fetch_all("SELECT ancestor_id, descendant_id, depth FROM account_closure "
+                                "ORDER BY ancestor_id, descendant_id")
+
+
+def test_delete_account_blocked_by_foreign_key_keeps_closure(db_manager, account_manager):
+    root = account_manager.add_account("Root", AccountType.ASSET)
+    bank = account_manager.add_account("Bank", AccountType.ASSET, parent_id=root.id)
+    branch = account_manager.add_account("Branch", AccountType.ASSET, parent_id=bank.id)
+    db_manager.execute_query("INSERT INTO persons (name, person_type) VALUES (?, ?)", ("Ali", PersonType.CUSTOMER.value))
+    person_id = db_manager.fetch_one("SELECT MAX(id) FROM persons")[0]
+    # چک ثبت شده روی حساب بانک، حذف آن را با کلید خارجی checks.account_id مسدود می‌کند
+    db_manager.execute_query(
+        "INSERT INTO checks (check_number, amount, issue_date, due_date, person_id, account_id, check_type, status) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ("C-1", 1000, "2025-01-01", "2025-02-01", person_id, bank.id,
+         CheckType.RECEIVED.value, CheckStatus.PENDING.value))
+    closure_before = [tuple(row) for row in _closure_rows(db_manager)]
+
+    with pytest.raises(ValueError):
+        account_manager.delete_account(bank.id)
+
+    assert [tuple(row) for row in _closure_rows(db_manager)] == closure_before
+    assert account_manager.get_account_by_id(bank.id) is not None
+    assert account_manager.get_ancestor_ids(branch.id) == [bank.id, root.id]
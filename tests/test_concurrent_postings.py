@@ -0,0 +1,55 @@
+# src/tests/test_concurrent_postings.py
+
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+from src.business_logic.account_manager import AccountManager
+from src.business_logic.financial_transaction_manager import FinancialTransactionManager
+from src.business_logic.person_manager import PersonManager
+from src.business_logic.product_manager import ProductManager
+from src.constants import AccountType, FinancialTransactionType, InventoryMovementType, ProductType
+from src.data_access import (AccountsRepository, FinancialTransactionsRepository, InventoryMovementsRepository,
+                             PersonsRepository, ProductsRepository)
+
+THREAD_COUNT = 4
+POSTINGS_PER_THREAD = 50
+
+
+def test_concurrent_postings_to_one_account_are_not_lost(db_manager):
+    account_manager = AccountManager(AccountsRepository(db_manager), FinancialTransactionsRepository(db_manager),
+                                     PersonManager(PersonsRepository(db_manager)))
+    ft_manager = FinancialTransactionManager(account_manager.financial_transactions_repository, account_manager)
+    product_manager = ProductManager(ProductsRepository(db_manager), InventoryMovementsRepository(db_manager))
+    cash = account_manager.add_account("Cash", AccountType.ASSET)
+    product = product_manager.create_product("Widget", ProductType.FINISHED_GOOD, Decimal("1"), Decimal("0"), "pcs")
+    # هر thread مبلغ متفاوتی ثبت می‌کند تا گم شدن یک ثبت با ثبت تکراری دیگری جبران نشود
+    amounts = [Decimal(thread_index + 1) + Decimal("0.01") for thread_index in range(THREAD_COUNT)]
+    errors = []
+    start = threading.Barrier(THREAD_COUNT)
+
+    def post(amount):
+        try:
+            start.wait()
+            for _ in range(POSTINGS_PER_THREAD):
+                ft_manager.create_financial_transaction(datetime(2025, 1, 1), cash.id, FinancialTransactionType.INCOME,
+                                                        amount, "concurrent posting")
+                product_manager.adjust_stock(product.id, Decimal("1"), InventoryMovementType.PURCHASE_RECEIPT,
+                                             datetime(2025, 1, 1))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db_manager.release_connection()
+
+    threads = [threading.Thread(target=post, args=(amount,)) for amount in amounts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    expected_balance = sum(amounts) * POSTINGS_PER_THREAD
+    assert account_manager.get_account_by_id(cash.id).balance == expected_balance
+    assert sum(ft.amount for ft in account_manager.financial_transactions_repository.get_by_account_id(cash.id)) \
+        == expected_balance
+    assert product_manager.get_product_by_id(product.id).stock_quantity == THREAD_COUNT * POSTINGS_PER_THREAD
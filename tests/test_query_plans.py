@@ -0,0 +1,18 @@
+# src/tests/test_query_plans.py
+
+from src.data_access.database_manager import HOT_QUERY_PLANS
+
+
+def test_hot_queries_use_indexes(db_manager):
+    # همان اتصال pool که create_tables (و مهاجرت‌ها) را اجرا کرده است
+    assert db_manager.check_query_plans() == []
+
+
+def test_dropped_index_is_reported_as_scan(db_manager):
+    db_manager.execute_query("DROP INDEX idx_invoice_items_invoice")
+
+    regressions = dict(db_manager.check_query_plans())
+
+    query = "SELECT * FROM invoice_items WHERE invoice_id = ?"
+    assert query in dict(HOT_QUERY_PLANS)
+    assert regressions[query] == ["SCAN invoice_items"]
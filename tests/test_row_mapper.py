@@ -0,0 +1,51 @@
+# src/tests/test_row_mapper.py
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import List, Optional
+
+import pytest
+
+from src.business_logic.entities.base_entity import BaseEntity
+from src.constants import AccountType
+from src.data_access.base_repository import _CompiledRowMapper
+
+
+@dataclass
+class _SampleEntity(BaseEntity):
+    name: str
+    type: AccountType
+    note: Optional[str] = None
+    balance: Decimal = field(default_factory=lambda: Decimal("0"))
+    tags: List[str] = field(default_factory=list)
+    parent_id: Optional[int] = None
+
+
+def test_maps_rows_positionally_with_keyword_only_id():
+    mapper = _CompiledRowMapper(_SampleEntity, "samples", money_fields=("balance",))
+
+    entity, = mapper.map_rows([(7, "Cash", AccountType.ASSET.value, "n", 1250, 3)],
+                              ("id", "name", "type", "note", "balance", "parent_id"))
+
+    assert entity == _SampleEntity(id=7, name="Cash", type=AccountType.ASSET, note="n",
+                                   balance=Decimal("12.50"), parent_id=3)
+
+
+def test_missing_and_null_columns_take_field_defaults():
+    mapper = _CompiledRowMapper(_SampleEntity, "samples")
+
+    # ستون tags (بین balance و parent_id) در نتیجه نیست و balance مقدار NULL دارد
+    first, second = mapper.map_rows([(1, "A", AccountType.ASSET.value, None, None, 5),
+                                     (2, "B", AccountType.LIABILITY.value, None, None, None)],
+                                    ("id", "name", "type", "note", "balance", "parent_id"))
+
+    assert (first.balance, first.tags, first.parent_id) == (Decimal("0"), [], 5)
+    assert second.parent_id is None
+    assert first.tags is not second.tags
+
+
+def test_null_in_required_field_raises():
+    mapper = _CompiledRowMapper(_SampleEntity, "samples")
+
+    with pytest.raises(ValueError, match="required field 'name'"):
+        mapper.map_rows([(1, None, AccountType.ASSET.value)], ("id", "name", "type"))
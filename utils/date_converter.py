@@ -1,7 +1,7 @@
 # src/utils/date_converter.py
 
 from datetime import date, datetime
-from typing import Optional, Union
+from typing import Optional, Union, List
 import jdatetime
 
 # اطمینان حاصل کنید که کتابخانه jdatetime نصب شده است: pip install jdatetime
@@ -41,4 +41,28 @@ def to_qdate(g_date: Optional[Union[date, datetime]]) -> 'QDate':
     from PyQt5.QtCore import QDate
     if g_date is None:
         return QDate.currentDate()
-    return QDate(g_date.year, g_date.month, g_date.day)
\ No newline at end of file
+    return QDate(g_date.year, g_date.month, g_date.day)
+
+def shamsi_period_starts(start_date: date, end_date: date, months_per_period: int = 1) -> List[date]:
+    """
+    تاریخ میلادی شروع دوره‌های متوالی شمسی (ماهانه با months_per_period=1، فصلی با 3) از start_date تا end_date.
+    هر دوره از همان روز ماه شمسی start_date شروع می‌شود (برای ماه‌های کوتاه‌تر، آخرین روز آن ماه).
+    """
+    start_shamsi = jdatetime.date.fromgregorian(date=start_date)
+    period_starts: List[date] = []
+    month_index = 0
+    while True:
+        year, month = divmod(start_shamsi.month - 1 + month_index, 12)
+        year += start_shamsi.year
+        month += 1
+        day = start_shamsi.day
+        while True:
+            try:
+                period_start = jdatetime.date(year, month, day).togregorian()
+                break
+            except ValueError:
+                day -= 1
+        if period_start > end_date:
+            return period_starts
+        period_starts.append(period_start)
+        month_index += months_per_period
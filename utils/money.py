@@ -0,0 +1,95 @@
+# src/utils/money.py
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Optional
+
+# مبالغ پولی در دیتابیس به صورت عدد صحیح «واحد خرد» (یک صدم واحد پول) ذخیره می‌شوند.
+# تغییر این مقدار بدون یک مهاجرت داده، همه مبالغ ذخیره شده را خراب می‌کند.
+MINOR_UNIT_EXPONENT = 2
+MINOR_UNITS_PER_UNIT = 10 ** MINOR_UNIT_EXPONENT
+# ضرب در این مقدار (به جای Decimal(str(...))) عدد صحیح واحد خرد را دقیق به Decimal واحد اصلی تبدیل می‌کند
+_MINOR_UNIT = Decimal(1).scaleb(-MINOR_UNIT_EXPONENT)
+
+
+class Money(int):
+    """
+    مبلغ پولی به صورت عدد صحیح واحد خرد (مثلاً Money(12345) یعنی 123.45).
+    چون زیرکلاس int است، مستقیماً به عنوان پارامتر به sqlite3 داده می‌شود و جمع، تفریق و SUM آن دقیق است.
+    جمع و تفریق با int/Money نتیجه Money می‌دهد؛ محاسبات دیگر (ضرب در مقدار، درصد و ...) با Decimal انجام
+    و نتیجه با Money.of گرد می‌شود.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, amount: Any) -> 'Money':
+        """مبلغ به واحد اصلی (Decimal، float، int یا رشته) -> Money، با گرد کردن نیم به بالا در واحد خرد."""
+        if isinstance(amount, Money):
+            return amount
+        if isinstance(amount, int) and not isinstance(amount, bool):
+            return cls(amount * MINOR_UNITS_PER_UNIT)
+        try:
+            # repr کوتاه‌ترین نمایش float است (همان چیزی که کاربر وارد کرده، مثلاً 0.1 و نه 0.1000000000000000055...)
+            decimal_amount = amount if isinstance(amount, Decimal) else Decimal(repr(amount) if isinstance(amount, float) else amount)
+        except (InvalidOperation, TypeError, ValueError):
+            raise ValueError(f"مبلغ '{amount}' یک عدد معتبر نیست.")
+        if not decimal_amount.is_finite():
+            raise ValueError(f"مبلغ '{amount}' یک عدد معتبر نیست.")
+        return cls(decimal_amount.scaleb(MINOR_UNIT_EXPONENT).to_integral_value(rounding=ROUND_HALF_UP))
+
+    def to_decimal(self) -> Decimal:
+        return Decimal(int(self)) * _MINOR_UNIT
+
+    def to_float(self) -> float:
+        """برای entity هایی که فیلد پولی آن‌ها float تعریف شده است."""
+        return int(self) / MINOR_UNITS_PER_UNIT
+
+    def __add__(self, other: Any) -> 'Money':
+        if isinstance(other, int):
+            return Money(int(self) + int(other))
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other: Any) -> 'Money':
+        if isinstance(other, int):
+            return Money(int(self) - int(other))
+        return NotImplemented
+
+    def __rsub__(self, other: Any) -> 'Money':
+        if isinstance(other, int):
+            return Money(int(other) - int(self))
+        return NotImplemented
+
+    def __neg__(self) -> 'Money':
+        return Money(-int(self))
+
+    def __abs__(self) -> 'Money':
+        return Money(abs(int(self)))
+
+    def __str__(self) -> str:
+        return str(self.to_decimal())
+
+    def __repr__(self) -> str:
+        return f"Money('{self.to_decimal()}')"
+
+
+# --- تبدیل‌کننده‌های لایه ذخیره‌سازی (ستون‌های INTEGER واحد خرد) ---
+def money_to_db(value: Any) -> Optional[int]:
+    """مقدار یک فیلد یا پارامتر پولی (Decimal، float، int یا Money) -> عدد صحیح واحد خرد برای ذخیره."""
+    if value is None:
+        return None
+    return Money.of(value)
+
+
+def money_from_db(value: Any) -> Decimal:
+    """مقدار ستون پولی (یا SUM آن) -> Decimal واحد اصلی؛ NULL (مثلاً SUM بدون ردیف) صفر است."""
+    if value is None:
+        return Decimal(0) * _MINOR_UNIT
+    return Decimal(value if isinstance(value, int) else round(value)) * _MINOR_UNIT
+
+
+def money_float_from_db(value: Any) -> float:
+    """برای entity هایی که فیلد پولی آن‌ها float تعریف شده است."""
+    if value is None:
+        return 0.0
+    return (value if isinstance(value, int) else round(value)) / MINOR_UNITS_PER_UNIT